@@ -0,0 +1,303 @@
+"""Command-line maintenance tasks.
+
+Run from the backend directory, e.g.:
+    python -m app.cli migrate
+    python -m app.cli import-applications leads.csv
+    python -m app.cli export-applications applications.ndjson
+    python -m app.cli rebuild-analytics
+    python -m app.cli rebuild-search-index
+    python -m app.cli rebuild-identity-keys
+    python -m app.cli find-duplicates
+    python -m app.cli create-admin admin@camopabeverages.com
+    python -m app.cli dispatch-notifications
+    python -m app.cli reconcile-payments statement.csv
+    python -m app.cli archive
+    python -m app.cli storage-report
+    python -m app.cli run-jobs
+"""
+import argparse
+import getpass
+import json
+import sys
+
+from app.database import SessionLocal
+
+def _format_for(path: str, fmt: str = None) -> str:
+    if fmt:
+        return fmt
+    return "csv" if path.lower().endswith(".csv") else "ndjson"
+
+def import_applications(args):
+    from app.services import bulk
+
+    fmt = _format_for(args.path, args.format)
+    db = SessionLocal()
+    try:
+        with open(args.path, "rb") as stream:
+            report = bulk.import_applications(db, bulk.iter_records(stream, fmt), batch_size=args.batch_size)
+    finally:
+        db.close()
+    json.dump(vars(report), sys.stdout, indent=2)
+    print()
+    return 1 if report.failed else 0
+
+def export_applications(args):
+    from app.services import bulk
+
+    fmt = _format_for(args.path, args.format)
+    db = SessionLocal()
+    try:
+        out = sys.stdout if args.path == "-" else open(args.path, "w", newline="")
+        try:
+            for chunk in bulk.export_applications(db, fmt, batch_size=args.batch_size):
+                out.write(chunk)
+        finally:
+            if out is not sys.stdout:
+                out.close()
+    finally:
+        db.close()
+    return 0
+
+def migrate(args):
+    from app.utils import migrations
+
+    migrations.upgrade(args.revision)
+    print(f"Database at revision {migrations.current_revision()}")
+    return 0
+
+def rebuild_analytics(args):
+    from app.services import analytics
+
+    db = SessionLocal()
+    try:
+        analytics.rebuild(db)
+        db.commit()
+    finally:
+        db.close()
+    print("Analytics counters rebuilt")
+    return 0
+
+def rebuild_search_index(args):
+    from app.services import search
+
+    db = SessionLocal()
+    try:
+        search.ensure_index(db)
+        db.commit()
+    finally:
+        db.close()
+    print("Search index rebuilt")
+    return 0
+
+def rebuild_identity_keys(args):
+    from app.services import dedupe
+
+    db = SessionLocal()
+    try:
+        count = dedupe.rebuild_keys(db, batch_size=args.batch_size)
+        db.commit()
+    finally:
+        db.close()
+    print(f"Identity keys rebuilt for {count} applications")
+    return 0
+
+def find_duplicates(args):
+    from app.services import dedupe
+
+    db = SessionLocal()
+    try:
+        report = dedupe.find_duplicates(db, threshold=args.threshold, dry_run=args.dry_run)
+        if not args.dry_run:
+            db.commit()
+    finally:
+        db.close()
+    json.dump(vars(report), sys.stdout, indent=2)
+    print()
+    return 0
+
+def create_admin(args):
+    from app import crud, schemas
+    from app.services import auth
+    from app.utils import passwords
+
+    password = args.password or getpass.getpass("Password: ")
+    hashed_password = passwords.hash_password(password, auth.BCRYPT_ROUNDS)
+    db = SessionLocal()
+    try:
+        user = crud.get_user_by_email(db, args.email)
+        if user is None:
+            user = crud.create_user(db, schemas.UserCreate(email=args.email, password=password), hashed_password, is_admin=True)
+        else:
+            user.hashed_password = hashed_password
+            user.is_admin = True
+        db.commit()
+        print(f"Admin user {user.email} (id {user.id}) ready")
+    finally:
+        db.close()
+    return 0
+
+def dispatch_notifications(args):
+    import asyncio
+    import logging
+    import signal
+    from app.services import notifications
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    dispatcher = notifications.OutboxDispatcher(batch_size=args.batch_size or notifications.OUTBOX_BATCH_SIZE)
+
+    async def run():
+        if args.once:
+            try:
+                while await dispatcher.run_once() == dispatcher.batch_size:
+                    pass
+            finally:
+                dispatcher.pool.close()
+            return
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signum, stop.set)
+        await dispatcher.run(stop)
+
+    asyncio.run(run())
+    print(json.dumps(dict(notifications.metrics)))
+    return 0
+
+def reconcile_payments(args):
+    from app.services import reconciliation
+
+    fmt = args.format or ("ofx" if args.path.lower().endswith((".ofx", ".qfx")) else "csv")
+    db = SessionLocal()
+    try:
+        with open(args.path, "rb") as stream:
+            report = reconciliation.reconcile(db, reconciliation.iter_statement(stream, fmt), dry_run=args.dry_run)
+    finally:
+        db.close()
+    json.dump(vars(report), sys.stdout, indent=2)
+    print()
+    return 1 if report.failed or report.ambiguous else 0
+
+def archive(args):
+    from app.services import lifecycle
+
+    def option(value, default):
+        # An explicit 0 (archive everything due now) is not the default
+        return default if value is None else value
+
+    db = SessionLocal()
+    try:
+        report = lifecycle.archive(
+            db,
+            applications_after_days=option(args.applications_after_days, lifecycle.ARCHIVE_APPLICATIONS_AFTER_DAYS),
+            support_after_days=option(args.support_after_days, lifecycle.ARCHIVE_SUPPORT_AFTER_DAYS),
+            batch_size=option(args.batch_size, lifecycle.ARCHIVE_BATCH_SIZE),
+            dry_run=args.dry_run,
+        )
+    finally:
+        db.close()
+    json.dump(vars(report), sys.stdout, indent=2)
+    print()
+    return 0
+
+def storage_report(args):
+    from app.services import lifecycle
+
+    db = SessionLocal()
+    try:
+        report = lifecycle.storage_report(db)
+    finally:
+        db.close()
+    json.dump(report, sys.stdout, indent=2)
+    print()
+    return 0
+
+def run_jobs(args):
+    import logging
+    from app.services import scheduler
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    runner = scheduler.Scheduler()
+    if args.job and args.job not in runner.jobs:
+        print(f"Unknown or disabled job {args.job}; jobs: {', '.join(sorted(runner.jobs))}", file=sys.stderr)
+        return 2
+    names = [args.job] if args.job else runner.due_jobs()
+    # None: not due, or another worker is running it
+    results = {name: runner.run_job(runner.jobs[name], force=args.force) for name in names}
+    json.dump(results, sys.stdout, indent=2)
+    print()
+    return 1 if any(result and result["error"] for result in results.values()) else 0
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m app.cli", description="Camopa backend maintenance tasks")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    command = commands.add_parser("migrate", help="Create or upgrade the database schema")
+    command.add_argument("revision", nargs="?", default="head")
+    command.set_defaults(handler=migrate)
+
+    command = commands.add_parser("import-applications", help="Bulk import applications from CSV or NDJSON")
+    command.add_argument("path")
+    command.add_argument("--format", choices=("csv", "ndjson"))
+    command.add_argument("--batch-size", type=int, default=1000)
+    command.set_defaults(handler=import_applications)
+
+    command = commands.add_parser("export-applications", help="Stream all applications to CSV or NDJSON")
+    command.add_argument("path", help="output file, or - for stdout")
+    command.add_argument("--format", choices=("csv", "ndjson"))
+    command.add_argument("--batch-size", type=int, default=1000)
+    command.set_defaults(handler=export_applications)
+
+    command = commands.add_parser("rebuild-analytics", help="Recompute dashboard aggregates from scratch")
+    command.set_defaults(handler=rebuild_analytics)
+
+    command = commands.add_parser("rebuild-search-index", help="Create the application search index and rebuild it")
+    command.set_defaults(handler=rebuild_search_index)
+
+    command = commands.add_parser("rebuild-identity-keys", help="Recompute the duplicate-detection keys of every application")
+    command.add_argument("--batch-size", type=int, default=10000)
+    command.set_defaults(handler=rebuild_identity_keys)
+
+    command = commands.add_parser("find-duplicates", help="Cluster duplicate applications for admin review")
+    command.add_argument("--threshold", type=float, help="minimum pair score, defaults to DEDUPE_CLUSTER_THRESHOLD")
+    command.add_argument("--dry-run", action="store_true", help="report clusters without storing them")
+    command.set_defaults(handler=find_duplicates)
+
+    command = commands.add_parser("create-admin", help="Create an admin user, or reset an existing user as admin")
+    command.add_argument("email")
+    command.add_argument("--password", help="prompted for when omitted")
+    command.set_defaults(handler=create_admin)
+
+    command = commands.add_parser("dispatch-notifications", help="Send queued notification emails until stopped")
+    command.add_argument("--once", action="store_true", help="exit once nothing is due")
+    command.add_argument("--batch-size", type=int, help="defaults to OUTBOX_BATCH_SIZE")
+    command.set_defaults(handler=dispatch_notifications)
+
+    command = commands.add_parser("reconcile-payments", help="Complete pending payments found in a UPI bank statement")
+    command.add_argument("path")
+    command.add_argument("--format", choices=("csv", "ofx"))
+    command.add_argument("--dry-run", action="store_true", help="report matches without updating payments")
+    command.set_defaults(handler=reconcile_payments)
+
+    command = commands.add_parser("archive", help="Move old rejected applications and resolved support requests to the archive")
+    command.add_argument("--applications-after-days", type=int, help="defaults to ARCHIVE_APPLICATIONS_AFTER_DAYS")
+    command.add_argument("--support-after-days", type=int, help="defaults to ARCHIVE_SUPPORT_AFTER_DAYS")
+    command.add_argument("--batch-size", type=int, help="records per archive file, defaults to ARCHIVE_BATCH_SIZE")
+    command.add_argument("--dry-run", action="store_true", help="count what is due without moving it")
+    command.set_defaults(handler=archive)
+
+    command = commands.add_parser("storage-report", help="Show the size of the tables archival keeps small")
+    command.set_defaults(handler=storage_report)
+
+    command = commands.add_parser("run-jobs", help="Run the scheduled jobs that are due, or one job, once")
+    command.add_argument("--job", help="run only this job")
+    command.add_argument("--force", action="store_true", help="run even if not due yet")
+    command.set_defaults(handler=run_jobs)
+
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.handler(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,12 +1,14 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import bindparam, func, select, update, insert, literal
+from sqlalchemy.orm import Session, joinedload, raiseload, selectinload
 from app import schemas
 from app.database import User, Application, Payment, ApprovalLetter, ApplicationStatusUpdate, SupportRequest, ApplicationStatus
+from app.database import ApplicationDuplicate, ApplicationIdentityKey
+from app.utils import ids
+from app.utils.pagination import keyset_page
+from app.services.cache import mark_tracking_stale
+from app.services import analytics, dedupe, events, letters, lifecycle, notifications, territories
+from collections import defaultdict
 from datetime import datetime
-import uuid
-from passlib.context import CryptContext
-
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 # User CRUD operations
 def get_user(db: Session, user_id: int):
@@ -15,12 +17,11 @@ def get_user(db: Session, user_id: int):
 def get_user_by_email(db: Session, email: str):
     return db.query(User).filter(User.email == email).first()
 
-def create_user(db: Session, user: schemas.UserCreate):
-    hashed_password = pwd_context.hash(user.password)
-    db_user = User(email=user.email, hashed_password=hashed_password)
+def create_user(db: Session, user: schemas.UserCreate, hashed_password: str, is_admin: bool = False):
+    # Hash with app.services.auth (off the event loop) before calling this
+    db_user = User(email=user.email, hashed_password=hashed_password, is_admin=is_admin)
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    db.flush()
     return db_user
 
 # Application CRUD operations
@@ -33,9 +34,127 @@ def get_application_by_tracking_id(db: Session, tracking_id: str):
 def get_applications(db: Session, skip: int = 0, limit: int = 100):
     return db.query(Application).offset(skip).limit(limit).all()
 
+# Read paths that only serialize ApplicationResponse load just its columns as
+# plain rows, skipping ORM instance state; the row keys match the schema fields
+def schema_columns(model, schema):
+    """The model columns backing a response schema's fields"""
+    table = model.__table__
+    return [getattr(model, name) for name in schema.__fields__ if name in table.c]
+
+APPLICATION_RESPONSE_COLUMNS = schema_columns(Application, schemas.ApplicationResponse)
+
+# Built once; constructing a 19-column select costs more than running it
+_application_response_by_tracking_id = select(*APPLICATION_RESPONSE_COLUMNS).where(
+    Application.tracking_id == bindparam("tracking_id")
+)
+
+def get_application_response(db: Session, tracking_id: str):
+    return db.execute(_application_response_by_tracking_id, {"tracking_id": tracking_id}).mappings().first()
+
+def get_archived_application_response(db: Session, tracking_id: str):
+    """The same fields for an application moved to the archive, or None"""
+    application = lifecycle.get_archived_application(db, tracking_id)
+    if application is None:
+        return None
+    return {column.key: application.get(column.key) for column in APPLICATION_RESPONSE_COLUMNS}
+
+def get_applications_page(
+    db: Session,
+    cursor: str = None,
+    limit: int = 100,
+    status: ApplicationStatus = None,
+    state: str = None,
+    city: str = None,
+):
+    query = db.query(*APPLICATION_RESPONSE_COLUMNS)
+    if status:
+        query = query.filter(Application.status == status)
+    if state:
+        query = query.filter(Application.state == state)
+    if city:
+        query = query.filter(Application.city == city)
+    return keyset_page(query, Application, cursor, limit)
+
+# Detail views load an application's payments, approval letter and status
+# history up front. The one-to-one letter joins into the application query;
+# each collection is one "WHERE application_id IN (...)" query for the whole
+# page, so a page costs three queries however many rows it has. Anything else
+# raises instead of lazy loading, so a new nested field cannot add N queries
+APPLICATION_DETAIL_OPTIONS = (
+    joinedload(Application.approval_letter),
+    selectinload(Application.payments),
+    selectinload(Application.status_updates),
+    raiseload("*"),
+)
+
+def get_application_detail(db: Session, application_id: int):
+    return db.query(Application).options(*APPLICATION_DETAIL_OPTIONS).filter(Application.id == application_id).first()
+
+def get_application_details_page(
+    db: Session,
+    cursor: str = None,
+    limit: int = 100,
+    status: ApplicationStatus = None,
+):
+    query = db.query(Application).options(*APPLICATION_DETAIL_OPTIONS)
+    if status:
+        query = query.filter(Application.status == status)
+    return keyset_page(query, Application, cursor, limit)
+
+# Duplicates: live matches from the identity key index, and the clusters
+# stored by the last run of `python -m app.cli find-duplicates`
+def get_application_duplicates(db: Session, application_id: int):
+    """Applications sharing identity keys with this one; None if it does not exist"""
+    keys = db.execute(
+        select(ApplicationIdentityKey.kind, ApplicationIdentityKey.value)
+        .where(ApplicationIdentityKey.application_id == application_id)
+    ).all()
+    if not keys:
+        return [] if db.scalar(select(Application.id).where(Application.id == application_id)) else None
+    matches = dedupe.find_matches(db, keys, exclude_id=application_id)
+    rows = db.execute(
+        select(*APPLICATION_RESPONSE_COLUMNS).where(Application.id.in_(matches)).order_by(Application.id)
+    ).mappings()
+    return [dict(row, matched_on=sorted(matches[row["id"]])) for row in rows]
+
+def get_duplicate_clusters(db: Session, limit: int = 20, offset: int = 0, min_score: float = 0.0):
+    """Clusters best score first, with their applications; returns (clusters, next_offset)"""
+    score = func.max(ApplicationDuplicate.score)
+    ranked = db.execute(
+        select(ApplicationDuplicate.cluster_id, score)
+        .group_by(ApplicationDuplicate.cluster_id)
+        .having(score >= min_score)
+        .order_by(score.desc(), ApplicationDuplicate.cluster_id)
+        .offset(offset)
+        .limit(limit + 1)
+    ).all()
+    next_offset = offset + limit if len(ranked) > limit else None
+    ranked = ranked[:limit]
+
+    members = defaultdict(list)
+    rows = db.execute(
+        select(
+            *APPLICATION_RESPONSE_COLUMNS,
+            ApplicationDuplicate.cluster_id, ApplicationDuplicate.score, ApplicationDuplicate.matched_on,
+        )
+        .join(ApplicationDuplicate, ApplicationDuplicate.application_id == Application.id)
+        .where(ApplicationDuplicate.cluster_id.in_([cluster_id for cluster_id, _ in ranked]))
+        .order_by(Application.id)
+    ).mappings()
+    for row in rows:
+        members[row["cluster_id"]].append(dict(row, matched_on=row["matched_on"].split(",")))
+    clusters = [
+        {"cluster_id": cluster_id, "score": cluster_score, "applications": members[cluster_id]}
+        for cluster_id, cluster_score in ranked
+    ]
+    return clusters, next_offset
+
+def generate_tracking_id():
+    return ids.new_tracking_id()
+
 def create_application(db: Session, application: schemas.ApplicationCreate, user_id: int):
     # Generate a unique tracking ID
-    tracking_id = str(uuid.uuid4())[:8].upper()
+    tracking_id = generate_tracking_id()
     
     db_application = Application(
         tracking_id=tracking_id,
@@ -43,17 +162,47 @@ def create_application(db: Session, application: schemas.ApplicationCreate, user
         **application.dict()
     )
     db.add(db_application)
-    db.commit()
-    db.refresh(db_application)
+    db.flush()
+    # Raises dedupe.DuplicateApplication for a business already applying
+    dedupe.register(db, db_application)
+    # Raises territories.TerritoryCovered in reject mode; flags it otherwise
+    territories.check_submission(db, db_application)
+    analytics.record_applications_created(db, [db_application])
     return db_application
 
 def update_application_status(db: Session, application_id: int, status: ApplicationStatus, admin_id: int, notes: str = None):
+    # On PostgreSQL the status history row and the application update go out
+    # as one statement; other dialects issue them in the same transaction
+    if db.get_bind().dialect.name == "postgresql":
+        result = _update_application_status_returning(db, application_id, status, admin_id, notes)
+    else:
+        result = _update_application_status_orm(db, application_id, status, admin_id, notes)
+    if result is None:
+        return None
+
+    db_application, previous_status, status_update_id = result
+    mark_tracking_stale(db, db_application.tracking_id)
+    analytics.record_status_change(db, db_application, previous_status, status)
+    territories.record_status_change(db, db_application, previous_status, status)
+    if status == ApplicationStatus.APPROVED and previous_status != ApplicationStatus.APPROVED:
+        letters.enqueue_letter(db, db_application.id)
+    if status != previous_status:
+        # Written to the outbox in this transaction; the email goes out later
+        notifications.enqueue_status_change(db, db_application, previous_status, status, status_update_id)
+    events.publish_status_change(db, events.status_event(
+        status_update_id, db_application.tracking_id, status, previous_status, datetime.utcnow()
+    ))
+    return db_application
+
+def _update_application_status_orm(db: Session, application_id: int, status: ApplicationStatus, admin_id: int, notes: str = None):
     db_application = get_application(db, application_id)
     if db_application:
+        previous_status = db_application.status
+
         # Create status update record
         status_update = ApplicationStatusUpdate(
             application_id=application_id,
-            previous_status=db_application.status,
+            previous_status=previous_status,
             new_status=status,
             notes=notes,
             updated_by=admin_id
@@ -65,11 +214,85 @@ def update_application_status(db: Session, application_id: int, status: Applicat
         if notes:
             db_application.admin_notes = notes
         
-        db.commit()
-        db.refresh(db_application)
-        return db_application
+        db.flush()
+        return db_application, previous_status, status_update.id
     return None
 
+def _update_application_status_returning(db: Session, application_id: int, status: ApplicationStatus, admin_id: int, notes: str = None):
+    now = datetime.utcnow()
+    history = ApplicationStatusUpdate.__table__
+
+    # WITH prev AS (SELECT ... FOR UPDATE), upd AS (UPDATE ... RETURNING),
+    #      ins AS (INSERT INTO application_status_updates SELECT ... FROM upd RETURNING id)
+    # SELECT upd.*, ins.id FROM upd JOIN ins ON ins.application_id = upd.id
+    prev = (
+        select(Application.id, Application.status)
+        .where(Application.id == application_id)
+        .with_for_update()
+        .cte("prev")
+    )
+    values = {"status": status, "updated_at": now}
+    if notes:
+        values["admin_notes"] = notes
+    upd = (
+        update(Application)
+        .where(Application.id == prev.c.id)
+        .values(**values)
+        .returning(*Application.__table__.c, prev.c.status.label("previous_status"))
+        .cte("upd")
+    )
+    ins = insert(history).from_select(
+        ["application_id", "previous_status", "new_status", "notes", "updated_by", "created_at"],
+        select(
+            upd.c.id,
+            upd.c.previous_status,
+            literal(status, history.c.new_status.type),
+            literal(notes, history.c.notes.type),
+            literal(admin_id, history.c.updated_by.type),
+            literal(now, history.c.created_at.type),
+        ),
+    ).returning(history.c.id, history.c.application_id).cte("ins")
+
+    stmt = select(
+        *[upd.c[column.key] for column in Application.__table__.c],
+        upd.c.previous_status,
+        ins.c.id.label("status_update_id"),
+    ).select_from(upd.join(ins, ins.c.application_id == upd.c.id))
+    row = db.execute(
+        select(Application, upd.c.previous_status, ins.c.id.label("status_update_id")).from_statement(stmt),
+        execution_options={"populate_existing": True},
+    ).first()
+    return tuple(row) if row else None
+
+def get_status_events(db: Session, tracking_id: str, after_id: int = None):
+    """Status events for a tracking ID, or None if there is no such application
+
+    With after_id, the history rows after it, oldest first; without, one
+    event for the current status carrying the latest history id.
+    """
+    latest_id = (
+        select(func.max(ApplicationStatusUpdate.id))
+        .where(ApplicationStatusUpdate.application_id == Application.id)
+        .scalar_subquery()
+    )
+    application = db.execute(
+        select(Application.id, Application.status, Application.updated_at, latest_id.label("latest_id"))
+        .where(Application.tracking_id == tracking_id)
+    ).first()
+    if application is None:
+        return None
+    if after_id is None:
+        return [events.status_event(application.latest_id or 0, tracking_id, application.status, None, application.updated_at)]
+    updates = db.execute(
+        select(ApplicationStatusUpdate.id, ApplicationStatusUpdate.new_status,
+               ApplicationStatusUpdate.previous_status, ApplicationStatusUpdate.created_at)
+        .where(ApplicationStatusUpdate.application_id == application.id, ApplicationStatusUpdate.id > after_id)
+        .order_by(ApplicationStatusUpdate.id.desc())
+        .limit(events.EVENTS_MAX_REPLAY)
+    ).all()
+    # The most recent ones if there are more, so the last event is current
+    return [events.status_event(row.id, tracking_id, row.new_status, row.previous_status, row.created_at) for row in reversed(updates)]
+
 # Payment CRUD operations
 def get_payment(db: Session, payment_id: int):
     return db.query(Payment).filter(Payment.id == payment_id).first()
@@ -77,22 +300,32 @@ def get_payment(db: Session, payment_id: int):
 def get_payments_by_application(db: Session, application_id: int):
     return db.query(Payment).filter(Payment.application_id == application_id).all()
 
+def _mark_application_stale(db: Session, application_id: int):
+    # Usually already in the identity map, so this does not hit the database
+    db_application = db.get(Application, application_id)
+    if db_application:
+        mark_tracking_stale(db, db_application.tracking_id)
+
 def create_payment(db: Session, payment: schemas.PaymentCreate):
     db_payment = Payment(**payment.dict())
     db.add(db_payment)
-    db.commit()
-    db.refresh(db_payment)
+    db.flush()
+    _mark_application_stale(db, db_payment.application_id)
+    analytics.record_payment_change(db, None, None, db_payment.status, db_payment.amount)
     return db_payment
 
 def update_payment(db: Session, payment_id: int, payment_update: schemas.PaymentUpdate):
     db_payment = get_payment(db, payment_id)
     if db_payment:
+        previous_status, previous_amount = db_payment.status, db_payment.amount
         update_data = payment_update.dict(exclude_unset=True)
         for key, value in update_data.items():
             setattr(db_payment, key, value)
         
-        db.commit()
-        db.refresh(db_payment)
+        db.flush()
+        _mark_application_stale(db, db_payment.application_id)
+        if (previous_status, previous_amount) != (db_payment.status, db_payment.amount):
+            analytics.record_payment_change(db, previous_status, previous_amount, db_payment.status, db_payment.amount)
         return db_payment
     return None
 
@@ -103,8 +336,7 @@ def get_approval_letter(db: Session, application_id: int):
 def create_approval_letter(db: Session, letter: schemas.ApprovalLetterCreate):
     db_letter = ApprovalLetter(**letter.dict())
     db.add(db_letter)
-    db.commit()
-    db.refresh(db_letter)
+    db.flush()
     return db_letter
 
 # Support Request CRUD operations
@@ -114,11 +346,16 @@ def get_support_request(db: Session, request_id: int):
 def get_support_requests(db: Session, skip: int = 0, limit: int = 100):
     return db.query(SupportRequest).offset(skip).limit(limit).all()
 
+def get_support_requests_page(db: Session, cursor: str = None, limit: int = 100, is_resolved: bool = None):
+    query = db.query(SupportRequest)
+    if is_resolved is not None:
+        query = query.filter(SupportRequest.is_resolved == is_resolved)
+    return keyset_page(query, SupportRequest, cursor, limit)
+
 def create_support_request(db: Session, request: schemas.SupportRequestCreate):
     db_request = SupportRequest(**request.dict())
     db.add(db_request)
-    db.commit()
-    db.refresh(db_request)
+    db.flush()
     return db_request
 
 def update_support_request(db: Session, request_id: int, is_resolved: bool):
@@ -126,7 +363,6 @@ def update_support_request(db: Session, request_id: int, is_resolved: bool):
     if db_request:
         db_request.is_resolved = is_resolved
         db_request.updated_at = datetime.utcnow()
-        db.commit()
-        db.refresh(db_request)
+        db.flush()
         return db_request
     return None
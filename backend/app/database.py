@@ -1,37 +1,76 @@
-from sqlalchemy import create_engine, Column, Integer, String, Float, Boolean, DateTime, ForeignKey, Text, Enum
+from sqlalchemy import create_engine, Column, Integer, String, Float, Boolean, DateTime, ForeignKey, Text, Enum, Index, UniqueConstraint
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 import enum
 from datetime import datetime
 import os
 from dotenv import load_dotenv
+from fastapi import Depends
 
 load_dotenv()
 
+from app.utils.db_pool import engine_options
+
 # Get database URL from environment variables
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./camopa.db")
 
-# Create SQLAlchemy engine
-engine = create_engine(
-    DATABASE_URL,
-    echo=True,  # Set to False in production
-    connect_args={"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {},
-)
+# Create SQLAlchemy engine; pool sizing, timeouts and echo come from the
+# DB_* environment variables (see app.utils.db_pool)
+engine = create_engine(DATABASE_URL, **engine_options(DATABASE_URL))
 
 # Create session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+def _async_database_url(url: str) -> str:
+    """Map a sync driver URL onto its async driver (asyncpg / aiosqlite)"""
+    if url.startswith("sqlite:"):
+        return url.replace("sqlite:", "sqlite+aiosqlite:", 1)
+    if url.startswith(("postgresql:", "postgresql+psycopg2:", "postgres:")):
+        return "postgresql+asyncpg:" + url.split(":", 1)[1]
+    return url
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", _async_database_url(DATABASE_URL))
+
+# Create async SQLAlchemy engine used by the API routers
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **engine_options(ASYNC_DATABASE_URL, is_async=True))
+
+# Create async session factory; objects stay loaded after commit so they can be
+# serialized without lazy loads outside the session
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
+
 # Create base class for models
 Base = declarative_base()
 
-# Dependency to get DB session
+# Dependency to get DB session; commits once when the caller is done
 def get_db():
     db = SessionLocal()
     try:
         yield db
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
     finally:
         db.close()
 
+# Dependency to get async DB session as a request-scoped unit of work: crud
+# functions only flush, and the request commits once after the handler returns
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        try:
+            yield db
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            raise
+
+# Routers declare `db: AsyncSession = UnitOfWork`. The "function" scope commits
+# before the response is sent, so a failed commit surfaces as an error
+UnitOfWork = Depends(get_async_db, scope="function")
+
 # Define application status enum
 class ApplicationStatus(str, enum.Enum):
     SUBMITTED = "submitted"
@@ -47,6 +86,26 @@ class PaymentStatus(str, enum.Enum):
     FAILED = "failed"
     REFUNDED = "refunded"
 
+# Define approval letter job status enum
+class LetterJobStatus(str, enum.Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+# Define notification outbox status enum
+class NotificationStatus(str, enum.Enum):
+    PENDING = "pending"
+    SENDING = "sending"
+    SENT = "sent"
+    FAILED = "failed"
+
+# Define scheduled job run status enum
+class JobRunStatus(str, enum.Enum):
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
 # User model
 class User(Base):
     __tablename__ = "users"
@@ -94,6 +153,8 @@ class Application(Base):
     # Application Status
     status = Column(Enum(ApplicationStatus), default=ApplicationStatus.SUBMITTED)
     admin_notes = Column(Text)
+    # When admins were last reminded of it while under review (app.services.scheduler)
+    review_nudged_at = Column(DateTime)
     
     # Timestamps
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -101,16 +162,26 @@ class Application(Base):
     
     # Relationships
     user = relationship("User", back_populates="applications")
-    payments = relationship("Payment", back_populates="application")
+    # Collections load in insertion order, so history reads chronologically
+    payments = relationship("Payment", back_populates="application", order_by="Payment.id")
     approval_letter = relationship("ApprovalLetter", back_populates="application", uselist=False)
-    status_updates = relationship("ApplicationStatusUpdate", back_populates="application")
+    status_updates = relationship(
+        "ApplicationStatusUpdate", back_populates="application", order_by="ApplicationStatusUpdate.id"
+    )
+
+    # Composite indexes for keyset pagination by (created_at, id), optionally filtered
+    __table_args__ = (
+        Index("ix_applications_created_at_id", "created_at", "id"),
+        Index("ix_applications_status_created_at_id", "status", "created_at", "id"),
+        Index("ix_applications_state_city_created_at_id", "state", "city", "created_at", "id"),
+    )
 
 # Payment model
 class Payment(Base):
     __tablename__ = "payments"
 
     id = Column(Integer, primary_key=True, index=True)
-    application_id = Column(Integer, ForeignKey("applications.id"))
+    application_id = Column(Integer, ForeignKey("applications.id"), index=True)
     amount = Column(Float)
     transaction_id = Column(String, unique=True, index=True)
     payment_method = Column(String)
@@ -125,6 +196,11 @@ class Payment(Base):
     # Relationships
     application = relationship("Application", back_populates="payments")
 
+    # Finds pending payments due to expire (app.services.scheduler)
+    __table_args__ = (
+        Index("ix_payments_status_created_at", "status", "created_at"),
+    )
+
 # Approval Letter model
 class ApprovalLetter(Base):
     __tablename__ = "approval_letters"
@@ -142,23 +218,68 @@ class ApprovalLetter(Base):
     # Relationships
     application = relationship("Application", back_populates="approval_letter")
 
+# Approval Letter rendering job model
+class ApprovalLetterJob(Base):
+    __tablename__ = "approval_letter_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    application_id = Column(Integer, ForeignKey("applications.id"), index=True)
+    status = Column(Enum(LetterJobStatus), default=LetterJobStatus.QUEUED, nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)
+    error = Column(Text)
+    file_path = Column(String)
+    
+    # Timestamps
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_approval_letter_jobs_status_created_at", "status", "created_at"),
+    )
+
 # Application Status Update model (for tracking history)
 class ApplicationStatusUpdate(Base):
     __tablename__ = "application_status_updates"
 
     id = Column(Integer, primary_key=True, index=True)
-    application_id = Column(Integer, ForeignKey("applications.id"))
+    application_id = Column(Integer, ForeignKey("applications.id"), index=True)
     previous_status = Column(Enum(ApplicationStatus))
     new_status = Column(Enum(ApplicationStatus))
     notes = Column(Text)
     updated_by = Column(Integer, ForeignKey("users.id"))
     
-    # Timestamps
-    created_at = Column(DateTime, default=datetime.utcnow)
+    # Timestamps; the partition key on PostgreSQL (app.services.lifecycle)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     
     # Relationships
     application = relationship("Application", back_populates="status_updates")
 
+# Notification outbox model: emails written in the transaction that caused
+# them and delivered by app.services.notifications. next_attempt_at is when a
+# PENDING row is due, or when a SENDING row's claim expires
+class NotificationOutbox(Base):
+    __tablename__ = "notification_outbox"
+
+    id = Column(Integer, primary_key=True, index=True)
+    idempotency_key = Column(String, unique=True, nullable=False)
+    application_id = Column(Integer, ForeignKey("applications.id"), index=True)
+    recipient = Column(String, nullable=False)
+    subject = Column(String, nullable=False)
+    body = Column(Text, nullable=False)
+    status = Column(Enum(NotificationStatus), default=NotificationStatus.PENDING, nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)
+    next_attempt_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    error = Column(Text)
+    sent_at = Column(DateTime)
+
+    # Timestamps
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_notification_outbox_status_next_attempt_at", "status", "next_attempt_at"),
+    )
+
 # Support Request model
 class SupportRequest(Base):
     __tablename__ = "support_requests"
@@ -170,6 +291,97 @@ class SupportRequest(Base):
     message = Column(Text)
     is_resolved = Column(Boolean, default=False)
     
+    # Timestamps; created_at is the partition key on PostgreSQL (app.services.lifecycle)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    # Composite indexes for keyset pagination by (created_at, id)
+    __table_args__ = (
+        Index("ix_support_requests_created_at_id", "created_at", "id"),
+        Index("ix_support_requests_is_resolved_created_at_id", "is_resolved", "created_at", "id"),
+    )
+
+# Analytics counter model (incrementally maintained dashboard aggregates)
+class AnalyticsCounter(Base):
+    __tablename__ = "analytics_counters"
+
+    id = Column(Integer, primary_key=True, index=True)
+    metric = Column(String, nullable=False)
+    key = Column(String, nullable=False)
+    count = Column(Integer, nullable=False, default=0)
+    total = Column(Float, nullable=False, default=0.0)
+
+    __table_args__ = (
+        UniqueConstraint("metric", "key", name="uq_analytics_counters_metric_key"),
+    )
+
+# Identity key model: normalised PAN, GSTIN, phone, email and business name
+# per application, looked up by app.services.dedupe to find duplicates
+class ApplicationIdentityKey(Base):
+    __tablename__ = "application_identity_keys"
+
+    id = Column(Integer, primary_key=True)
+    application_id = Column(Integer, ForeignKey("applications.id"), nullable=False, index=True)
+    kind = Column(String, nullable=False)
+    value = Column(String, nullable=False)
+
+    __table_args__ = (
+        Index("ix_application_identity_keys_kind_value", "kind", "value"),
+    )
+
+# Duplicate cluster membership, replaced by each run of the clustering job.
+# cluster_id is the lowest application id in the cluster
+class ApplicationDuplicate(Base):
+    __tablename__ = "application_duplicates"
+
+    id = Column(Integer, primary_key=True)
+    cluster_id = Column(Integer, nullable=False, index=True)
+    application_id = Column(Integer, ForeignKey("applications.id"), nullable=False, unique=True)
+    score = Column(Float, nullable=False)
+    matched_on = Column(String, nullable=False)
+    detected_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+# Where an archived application or support request now lives: line `line` of
+# the gzipped NDJSON file `archive_file` under ARCHIVE_DIR (app.services.lifecycle).
+# lookup_key is the tracking ID of an application
+class ArchivedRecord(Base):
+    __tablename__ = "archived_records"
+
+    id = Column(Integer, primary_key=True)
+    kind = Column(String, nullable=False)
+    record_id = Column(Integer, nullable=False)
+    lookup_key = Column(String, index=True)
+    archive_file = Column(String, nullable=False)
+    line = Column(Integer, nullable=False)
+    # The record's own creation time
+    created_at = Column(DateTime, nullable=False)
+    archived_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("kind", "record_id", name="uq_archived_records_kind_record_id"),
+    )
+
+# Scheduled job state, one row per job of app.services.scheduler. A worker
+# claims a due run by moving next_run_at on by the job's interval; the rest
+# records how the last run went
+class ScheduledJob(Base):
+    __tablename__ = "scheduled_jobs"
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String, unique=True, nullable=False)
+    status = Column(Enum(JobRunStatus))
+    next_run_at = Column(DateTime, nullable=False)
+    last_started_at = Column(DateTime)
+    last_finished_at = Column(DateTime)
+    # Seconds
+    last_duration = Column(Float)
+    last_processed = Column(Integer)
+    # Items still due after the last run
+    backlog = Column(Integer)
+    last_error = Column(Text)
+    runs = Column(Integer, default=0, nullable=False)
+    failures = Column(Integer, default=0, nullable=False)
+
     # Timestamps
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
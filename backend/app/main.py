@@ -1,18 +1,51 @@
 from fastapi import FastAPI, Depends, HTTPException, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
+from contextlib import asynccontextmanager
 import os
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
+# Start and stop background workers with each app process
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    from app.services.auth import hasher as password_hasher, signing_key
+    from app.services.events import listener as event_listener
+    from app.services.letters import dispatcher as letter_dispatcher
+    from app.services.metrics import snapshot_writer
+    from app.services.scheduler import scheduler
+    # Refuse to serve without a token signing key
+    signing_key()
+    password_hasher.start()
+    letter_dispatcher.start()
+    snapshot_writer.start()
+    scheduler.start()
+    if event_listener:
+        event_listener.start()
+    await letter_dispatcher.resume_queued()
+    yield
+    await scheduler.stop()
+    if event_listener:
+        await event_listener.stop()
+    await snapshot_writer.stop()
+    await letter_dispatcher.stop()
+    password_hasher.stop()
+
 # Create FastAPI app
 app = FastAPI(
     title="Camopa Beverages Dealership API",
     description="API for the Camopa Beverages Dealership Management System",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
+# Token-bucket limits on the public submission and tracking endpoints. Added
+# before CORS so 429 responses still carry CORS headers
+from app.services.ratelimit import RateLimitMiddleware
+app.add_middleware(RateLimitMiddleware)
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -22,11 +55,47 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request, latency and SQL metrics for every route. Added last so it is the
+# outermost middleware and also times rate-limited and CORS preflight requests
+from app import database
+from app.services import metrics
+metrics.instrument_engine(database.engine)
+metrics.instrument_engine(database.async_engine.sync_engine)
+app.add_middleware(metrics.MetricsMiddleware)
+
+# Prometheus text exposition; keep it off the public proxy. Async so it reads
+# the metrics on the event loop thread that updates them
+@app.get("/metrics", tags=["Health"], include_in_schema=False)
+async def read_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 # Health check endpoint
 @app.get("/health", tags=["Health"])
 def health_check():
     return {"status": "healthy", "message": "API is running"}
 
+# Connection pool metrics for this worker process
+@app.get("/health/db", tags=["Health"])
+def database_pool_health():
+    from app.database import engine, async_engine
+    from app.utils.db_pool import pool_status
+    return {
+        "pid": os.getpid(),
+        "sync_pool": pool_status(engine),
+        "async_pool": pool_status(async_engine),
+    }
+
+# Rate limit rejections and coalesced tracking loads for this worker process
+@app.get("/health/traffic", tags=["Health"])
+def traffic_health():
+    from app.services import ratelimit
+    from app.services.cache import tracking_loads
+    return {
+        "pid": os.getpid(),
+        "rate_limit": dict(ratelimit.metrics),
+        "tracking_loads": {"queries": tracking_loads.loads, "coalesced": tracking_loads.coalesced},
+    }
+
 # Root endpoint
 @app.get("/", tags=["Root"])
 def root():
@@ -36,12 +105,16 @@ def root():
     }
 
 # Import and include routers
-from app.routers import applications
-app.include_router(applications.router)
+from app.routers import applications, payments, approval_letters, support, admin, auth
+from app.utils import fast_json
+for router in (applications.router, payments.router, approval_letters.router, support.router, admin.router, auth.router):
+    # Optionally render response models with orjson, skipping re-validation
+    if fast_json.FAST_JSON_RESPONSES:
+        fast_json.enable(router)
+    app.include_router(router)
 
-# Set up database connection
-from app.database import engine, Base
-Base.metadata.create_all(bind=engine)
+# The schema is managed by migrations (python -m app.cli migrate), run once
+# per deploy rather than by every worker at import time
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,186 @@
+from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile, status as http_status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from app import crud, schemas
+from app.database import ApplicationStatus, SessionLocal, UnitOfWork
+from app.services import analytics, auth, bulk, lifecycle, reconciliation, scheduler, search, territories
+
+router = APIRouter(
+    prefix="/admin",
+    tags=["admin"],
+    dependencies=[Depends(auth.require_admin)],
+    responses={404: {"description": "Not found"}},
+)
+
+def _import_upload(upload: UploadFile, fmt: str, batch_size: int):
+    db = SessionLocal()
+    try:
+        return bulk.import_applications(db, bulk.iter_records(upload.file, fmt), batch_size=batch_size)
+    finally:
+        db.close()
+
+@router.post("/applications/import", response_model=schemas.BulkImportResponse)
+async def import_applications(
+    file: UploadFile = File(...),
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    batch_size: int = Query(1000, ge=1, le=10000)
+):
+    # Parsing, validation and batched inserts are CPU and blocking IO heavy, so
+    # they run on a worker thread with a plain session instead of the event loop
+    report = await run_in_threadpool(_import_upload, file, format, batch_size)
+    return vars(report)
+
+def _reconcile_upload(upload: UploadFile, fmt: str, dry_run: bool):
+    db = SessionLocal()
+    try:
+        return reconciliation.reconcile(db, reconciliation.iter_statement(upload.file, fmt), dry_run=dry_run)
+    finally:
+        db.close()
+
+@router.post("/payments/reconcile", response_model=schemas.ReconciliationResponse)
+async def reconcile_payments(
+    file: UploadFile = File(...),
+    format: str = Query("csv", pattern="^(csv|ofx)$"),
+    dry_run: bool = False
+):
+    # Matching a large statement is CPU bound, so like imports it runs on a
+    # worker thread with a plain session
+    try:
+        report = await run_in_threadpool(_reconcile_upload, file, format, dry_run)
+    except ValueError as exc:
+        raise HTTPException(status_code=http_status.HTTP_400_BAD_REQUEST, detail=str(exc))
+    return vars(report)
+
+@router.get("/applications/search", response_model=schemas.ApplicationSearchPage)
+async def search_applications(
+    q: str = Query(..., min_length=2, max_length=200),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0, le=search.MAX_OFFSET),
+    status: Optional[ApplicationStatus] = None,
+    db: AsyncSession = UnitOfWork
+):
+    # Matches name, business, city, GST/PAN and phone; prefixes and typos included
+    items, next_offset, approximate = await db.run_sync(
+        search.search_applications, q=q, limit=limit, offset=offset, status=status
+    )
+    return {"items": items, "next_offset": next_offset, "approximate": approximate}
+
+@router.get("/applications/export")
+async def export_applications(
+    format: str = Query("ndjson", pattern="^(csv|ndjson)$"),
+    batch_size: int = Query(1000, ge=1, le=10000)
+):
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        bulk.stream_export(SessionLocal, format, batch_size),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="applications.{format}"'},
+    )
+
+# Applications with payments, approval letter and status history; three
+# queries per request whatever the page size (see crud.APPLICATION_DETAIL_OPTIONS)
+@router.get("/applications/details", response_model=schemas.ApplicationDetailPage)
+async def list_application_details(
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    status: Optional[ApplicationStatus] = None,
+    db: AsyncSession = UnitOfWork
+):
+    try:
+        items, next_cursor = await db.run_sync(
+            crud.get_application_details_page, cursor=cursor, limit=limit, status=status
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=http_status.HTTP_400_BAD_REQUEST, detail=str(exc))
+    return {"items": items, "next_cursor": next_cursor}
+
+# Clusters found by `python -m app.cli find-duplicates`, most certain first
+@router.get("/applications/duplicates", response_model=schemas.DuplicateClusterPage)
+async def list_duplicate_clusters(
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    min_score: float = Query(0.0, ge=0.0, le=1.0),
+    db: AsyncSession = UnitOfWork
+):
+    items, next_offset = await db.run_sync(
+        crud.get_duplicate_clusters, limit=limit, offset=offset, min_score=min_score
+    )
+    return {"items": items, "next_offset": next_offset}
+
+# Declared after the other /applications/... paths so it does not capture them
+@router.get("/applications/{application_id}", response_model=schemas.ApplicationDetailResponse)
+async def read_application_detail(application_id: int, db: AsyncSession = UnitOfWork):
+    application = await db.run_sync(crud.get_application_detail, application_id=application_id)
+    if application is None:
+        raise HTTPException(status_code=http_status.HTTP_404_NOT_FOUND, detail="Application not found")
+    return application
+
+# Live lookup in the identity key index: same PAN, GSTIN, phone, email or
+# business name and pincode
+@router.get("/applications/{application_id}/duplicates", response_model=List[schemas.ApplicationDuplicateMatch])
+async def read_application_duplicates(application_id: int, db: AsyncSession = UnitOfWork):
+    matches = await db.run_sync(crud.get_application_duplicates, application_id=application_id)
+    if matches is None:
+        raise HTTPException(status_code=http_status.HTTP_404_NOT_FOUND, detail="Application not found")
+    return matches
+
+# The applicant's email is written to the notification outbox in the same
+# transaction and sent by the dispatcher process, so SMTP never delays this
+@router.put("/applications/{application_id}/status", response_model=schemas.ApplicationResponse)
+async def update_application_status(
+    application_id: int,
+    change: schemas.ApplicationStatusChange,
+    admin: auth.CurrentUser = Depends(auth.require_admin),
+    db: AsyncSession = UnitOfWork,
+):
+    application = await db.run_sync(
+        crud.update_application_status,
+        application_id=application_id, status=change.status, admin_id=admin.id, notes=change.notes,
+    )
+    if application is None:
+        raise HTTPException(status_code=http_status.HTTP_404_NOT_FOUND, detail="Application not found")
+    return application
+
+# Dashboard analytics, served from the precomputed counters
+@router.get("/analytics", response_model=schemas.AnalyticsSummary)
+async def read_analytics_summary(db: AsyncSession = UnitOfWork):
+    return await db.run_sync(analytics.summary)
+
+@router.get("/analytics/locations", response_model=schemas.LocationAnalytics)
+async def read_location_analytics(limit: int = Query(50, ge=1, le=500), db: AsyncSession = UnitOfWork):
+    return await db.run_sync(analytics.locations, limit=limit)
+
+@router.get("/analytics/daily", response_model=List[schemas.DailyAnalytics])
+async def read_daily_analytics(days: int = Query(30, ge=1, le=366), db: AsyncSession = UnitOfWork):
+    return await db.run_sync(analytics.daily, days=days)
+
+# Answered from the in-memory territory index (app/services/territories.py)
+@router.get("/territories/{pincode}/coverage", response_model=schemas.TerritoryCoverage)
+async def read_territory_coverage(pincode: str, db: AsyncSession = UnitOfWork):
+    coverage = await db.run_sync(territories.get_coverage, pincode=pincode)
+    if coverage is None:
+        raise HTTPException(status_code=http_status.HTTP_404_NOT_FOUND, detail="Unknown pincode")
+    return coverage
+
+# Records moved out of the database by `python -m app.cli archive`, read back
+# from their archive file on demand
+@router.get("/archive/applications/{tracking_id}", response_model=schemas.ArchivedRecord)
+async def read_archived_application(tracking_id: str, db: AsyncSession = UnitOfWork):
+    record = await db.run_sync(lifecycle.get_archived, kind=lifecycle.APPLICATION, lookup_key=tracking_id)
+    if record is None:
+        raise HTTPException(status_code=http_status.HTTP_404_NOT_FOUND, detail="No archived application with this tracking ID")
+    return record
+
+@router.get("/archive/support-requests/{request_id}", response_model=schemas.ArchivedRecord)
+async def read_archived_support_request(request_id: int, db: AsyncSession = UnitOfWork):
+    record = await db.run_sync(lifecycle.get_archived, kind=lifecycle.SUPPORT_REQUEST, record_id=request_id)
+    if record is None:
+        raise HTTPException(status_code=http_status.HTTP_404_NOT_FOUND, detail="No archived support request with this ID")
+    return record
+
+# State of the periodic jobs run by app/services/scheduler.py, as of their last run
+@router.get("/jobs", response_model=List[schemas.ScheduledJobState])
+async def read_scheduled_jobs(db: AsyncSession = UnitOfWork):
+    return await db.run_sync(scheduler.list_jobs)
@@ -1,113 +1,197 @@
-from fastapi import APIRouter, HTTPException, Depends, status
-from typing import List, Optional
-from sqlalchemy.orm import Session
-from datetime import datetime
-import uuid
+from fastapi import APIRouter, HTTPException, Header, Query, Response, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from typing import Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+import json
 
-from app.schemas.application import (
-    ApplicationCreate, 
-    ApplicationResponse, 
-    ApplicationStatus,
-    ApplicationStatusUpdate
-)
-from app.models.application import Application
-from app.database import get_db
+from app.database import AsyncSessionLocal, UnitOfWork
+from app import schemas, crud
+from app.services import dedupe, events, territories
+from app.services.cache import tracking_cache, tracking_loads
+from app.utils import ids
 
 router = APIRouter(prefix="/applications", tags=["Applications"])
 
-@router.post("/", response_model=ApplicationResponse, status_code=status.HTTP_201_CREATED)
-def create_application(application: ApplicationCreate, db: Session = Depends(get_db)):
+@router.post("/", response_model=schemas.ApplicationResponse, status_code=status.HTTP_201_CREATED)
+async def create_application(application: schemas.ApplicationCreate, db: AsyncSession = UnitOfWork):
     """Create a new dealership application"""
+    try:
+        return await db.run_sync(crud.create_application, application=application, user_id=None)
+    except dedupe.DuplicateApplication as exc:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=exc.public_message)
+    except territories.TerritoryCovered as exc:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(exc))
+
+@router.get("/", response_model=schemas.ApplicationPage)
+async def list_applications(
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=500),
+    application_status: Optional[schemas.ApplicationStatus] = Query(None, alias="status"),
+    state: Optional[str] = None,
+    city: Optional[str] = None,
+    db: AsyncSession = UnitOfWork
+):
+    """List applications newest first using keyset pagination"""
     
-    # Generate tracking ID
-    tracking_id = f"CMPA-{uuid.uuid4().hex[:8].upper()}"
-    
-    db_application = Application(
-        tracking_id=tracking_id,
-        status=ApplicationStatus.SUBMITTED,
-        first_name=application.firstName,
-        last_name=application.lastName,
-        email=application.email,
-        phone=application.phone,
-        business_name=application.businessName,
-        business_type=application.businessType,
-        gst_number=application.gstNumber,
-        pan_number=application.panNumber,
-        years_in_business=application.yearsInBusiness,
-        address=application.address,
-        city=application.city,
-        state=application.state,
-        pincode=application.pincode,
-        area=application.area,
-        investment_capacity=application.investmentCapacity,
-        existing_business=application.existingBusiness,
-        reason_for_interest=application.reasonForInterest
-    )
+    try:
+        applications, next_cursor = await db.run_sync(
+            crud.get_applications_page,
+            cursor=cursor,
+            limit=limit,
+            status=application_status,
+            state=state,
+            city=city
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
     
-    db.add(db_application)
-    db.commit()
-    db.refresh(db_application)
+    return {"items": applications, "next_cursor": next_cursor}
+
+async def _load_tracking_body(tracking_id: str) -> Optional[bytes]:
+    # Shared by every request coalesced onto this load, so it uses a session
+    # of its own rather than one request's
+    return await tracking_cache.fill(tracking_id, lambda: _render_tracking_body(tracking_id))
+
+async def _render_tracking_body(tracking_id: str) -> Optional[bytes]:
+    async with AsyncSessionLocal() as db:
+        application = await db.run_sync(crud.get_application_response, tracking_id=tracking_id)
+        if not application:
+            application = await db.run_sync(crud.get_archived_application_response, tracking_id=tracking_id)
+    if not application:
+        return None
     
-    return ApplicationResponse(
-        id=db_application.id,
-        trackingId=db_application.tracking_id,
-        status=db_application.status,
-        firstName=db_application.first_name,
-        lastName=db_application.last_name,
-        email=db_application.email,
-        phone=db_application.phone,
-        businessName=db_application.business_name,
-        businessType=db_application.business_type,
-        gstNumber=db_application.gst_number,
-        panNumber=db_application.pan_number,
-        yearsInBusiness=db_application.years_in_business,
-        address=db_application.address,
-        city=db_application.city,
-        state=db_application.state,
-        pincode=db_application.pincode,
-        area=db_application.area,
-        investmentCapacity=db_application.investment_capacity,
-        existingBusiness=db_application.existing_business,
-        reasonForInterest=db_application.reason_for_interest,
-        createdAt=db_application.created_at,
-        updatedAt=db_application.updated_at
-    )
+    # Stored rows were validated on the way in; re-running EmailStr
+    # validation on every response dominates serialization cost
+    return schemas.ApplicationResponse.construct(**application).json().encode()
+
+def _canonical_tracking_id(tracking_id: str) -> str:
+    # A mistyped ID fails its check character and is turned away here, before
+    # the cache or the database is consulted
+    canonical = ids.normalize(tracking_id)
+    if canonical is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Application not found. Please check your tracking ID."
+        )
+    return canonical
 
-@router.get("/track/{tracking_id}", response_model=ApplicationResponse)
-def track_application(tracking_id: str, db: Session = Depends(get_db)):
+@router.get("/track/{tracking_id}", response_model=schemas.ApplicationResponse)
+async def track_application(
+    tracking_id: str,
+    if_none_match: Optional[str] = Header(None)
+):
     """Track an application using tracking ID"""
     
-    application = db.query(Application).filter(Application.tracking_id == tracking_id).first()
+    tracking_id = _canonical_tracking_id(tracking_id)
+    body = await tracking_cache.get(tracking_id)
+    if body is None:
+        body = await tracking_loads.do(tracking_id, lambda: _load_tracking_body(tracking_id))
+        if body is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Application not found. Please check your tracking ID."
+            )
     
-    if not application:
+    # Polling clients revalidate with If-None-Match and get an empty 304 while
+    # the application is unchanged
+    etag = tracking_cache.etag(body)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if if_none_match and _etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
+    return Response(content=body, media_type="application/json", headers=headers)
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or any(tag.replace("W/", "", 1) == etag for tag in candidates)
+
+# Status change push, instead of polling /track/{tracking_id}
+
+async def _subscribe(tracking_id: str, last_event_id: Optional[int]):
+    """(subscription, backlog), or None if there is no such application"""
+    # Subscribe first so nothing committed while the backlog loads is missed;
+    # the session is closed before streaming so no connection is held
+    subscription = events.event_bus.subscribe(tracking_id)
+    try:
+        async with AsyncSessionLocal() as db:
+            backlog = await db.run_sync(crud.get_status_events, tracking_id=tracking_id, after_id=last_event_id)
+    except BaseException:
+        events.event_bus.unsubscribe(subscription)
+        raise
+    if backlog is None:
+        events.event_bus.unsubscribe(subscription)
+        return None
+    return subscription, backlog
+
+async def _server_sent_events(subscription: events.Subscription, backlog):
+    try:
+        yield f"retry: {events.EVENTS_RETRY_MS}\n\n"
+        async for payload in events.stream(subscription, backlog):
+            if payload is None:
+                yield ": heartbeat\n\n"
+            else:
+                yield f"id: {payload['id']}\nevent: status\ndata: {json.dumps(payload)}\n\n"
+    finally:
+        events.event_bus.unsubscribe(subscription)
+
+@router.get("/track/{tracking_id}/events")
+async def track_application_events(tracking_id: str, last_event_id: Optional[str] = Header(None)):
+    """Stream status changes as server-sent events
+
+    Starts with the current status, or with the changes after Last-Event-ID
+    when the client is resuming. Comment lines are sent as heartbeats.
+    """
+    try:
+        after_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid Last-Event-ID")
+    tracking_id = _canonical_tracking_id(tracking_id)
+    try:
+        result = await _subscribe(tracking_id, after_id)
+    except events.EventStreamsFull:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many open event streams, please retry later",
+            headers={"Retry-After": str(events.EVENTS_RETRY_MS // 1000)},
+        )
+    if result is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Application not found. Please check your tracking ID."
         )
-    
-    return ApplicationResponse(
-        id=application.id,
-        trackingId=application.tracking_id,
-        status=application.status,
-        firstName=application.first_name,
-        lastName=application.last_name,
-        email=application.email,
-        phone=application.phone,
-        businessName=application.business_name,
-        businessType=application.business_type,
-        gstNumber=application.gst_number,
-        panNumber=application.pan_number,
-        yearsInBusiness=application.years_in_business,
-        address=application.address,
-        city=application.city,
-        state=application.state,
-        pincode=application.pincode,
-        area=application.area,
-        investmentCapacity=application.investment_capacity,
-        existingBusiness=application.existing_business,
-        reasonForInterest=application.reason_for_interest,
-        rejectionReason=application.rejection_reason,
-        paymentAmount=application.payment_amount,
-        createdAt=application.created_at,
-        updatedAt=application.updated_at
+    subscription, backlog = result
+    return StreamingResponse(
+        _server_sent_events(subscription, backlog),
+        media_type="text/event-stream",
+        # Also unsubscribes when the client leaves before the stream starts
+        background=BackgroundTask(events.event_bus.unsubscribe, subscription),
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
+
+@router.websocket("/track/{tracking_id}/ws")
+async def track_application_socket(websocket: WebSocket, tracking_id: str, last_event_id: Optional[int] = None):
+    """The same events as /events, as JSON messages; resume with ?last_event_id="""
+    canonical = ids.normalize(tracking_id)
+    if canonical is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Application not found")
+        return
+    try:
+        result = await _subscribe(canonical, last_event_id)
+    except events.EventStreamsFull:
+        await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+        return
+    if result is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Application not found")
+        return
+    subscription, backlog = result
+    try:
+        await websocket.accept()
+        async for payload in events.stream(subscription, backlog):
+            await websocket.send_json({"type": "heartbeat"} if payload is None else {"type": "status", **payload})
+        # Fell behind or lost the event feed; the client resumes from its last id
+        await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        events.event_bus.unsubscribe(subscription)
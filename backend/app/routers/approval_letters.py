@@ -1,16 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, Header, HTTPException, Response, status
+from fastapi.responses import FileResponse, RedirectResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+import os
 from app import schemas, crud
-from app.database import SessionLocal
-
-# Dependency to get DB session
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+from app.database import ApprovalLetterJob, UnitOfWork
+from app.services import auth, letters
 
 router = APIRouter(
     prefix="/approval-letters",
@@ -19,9 +14,9 @@ router = APIRouter(
 )
 
 @router.post("/", response_model=schemas.ApprovalLetterResponse)
-def create_approval_letter(letter: schemas.ApprovalLetterCreate, db: Session = Depends(get_db)):
+async def create_approval_letter(letter: schemas.ApprovalLetterCreate, db: AsyncSession = UnitOfWork):
     # Verify application exists
-    db_application = crud.get_application(db, application_id=letter.application_id)
+    db_application = await db.run_sync(crud.get_application, application_id=letter.application_id)
     if db_application is None:
         raise HTTPException(status_code=404, detail="Application not found")
     
@@ -33,18 +28,73 @@ def create_approval_letter(letter: schemas.ApprovalLetterCreate, db: Session = D
         )
     
     # Check if approval letter already exists
-    existing_letter = crud.get_approval_letter(db, application_id=letter.application_id)
+    existing_letter = await db.run_sync(crud.get_approval_letter, application_id=letter.application_id)
     if existing_letter:
         raise HTTPException(
             status_code=400,
             detail="Approval letter already exists for this application"
         )
     
-    return crud.create_approval_letter(db=db, letter=letter)
+    return await db.run_sync(crud.create_approval_letter, letter=letter)
 
 @router.get("/{application_id}", response_model=schemas.ApprovalLetterResponse)
-def read_approval_letter(application_id: int, db: Session = Depends(get_db)):
-    db_letter = crud.get_approval_letter(db, application_id=application_id)
+async def read_approval_letter(application_id: int, db: AsyncSession = UnitOfWork):
+    db_letter = await db.run_sync(crud.get_approval_letter, application_id=application_id)
     if db_letter is None:
         raise HTTPException(status_code=404, detail="Approval letter not found")
     return db_letter
+
+@router.post(
+    "/{application_id}/render",
+    response_model=schemas.ApprovalLetterJobResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+    dependencies=[Depends(auth.require_admin)],
+)
+async def render_approval_letter(application_id: int, db: AsyncSession = UnitOfWork):
+    db_application = await db.run_sync(crud.get_application, application_id=application_id)
+    if db_application is None:
+        raise HTTPException(status_code=404, detail="Application not found")
+    if db_application.status != "approved":
+        raise HTTPException(
+            status_code=400,
+            detail="Cannot create approval letter for non-approved application"
+        )
+    return await db.run_sync(letters.enqueue_letter, application_id)
+
+@router.get("/jobs/{job_id}", response_model=schemas.ApprovalLetterJobResponse)
+async def read_approval_letter_job(job_id: int, db: AsyncSession = UnitOfWork):
+    db_job = await db.get(ApprovalLetterJob, job_id)
+    if db_job is None:
+        raise HTTPException(status_code=404, detail="Approval letter job not found")
+    return db_job
+
+@router.get("/{application_id}/download")
+async def download_approval_letter(application_id: int, db: AsyncSession = UnitOfWork):
+    db_letter = await db.run_sync(crud.get_approval_letter, application_id=application_id)
+    if db_letter is None or not db_letter.file_path:
+        raise HTTPException(status_code=404, detail="Approval letter not found")
+    
+    # Rendered letters live at an immutable, content-addressed URL
+    digest = letters.digest_of(db_letter.file_path)
+    if digest:
+        return RedirectResponse(
+            router.url_path_for("read_approval_letter_file", digest=digest),
+            status_code=status.HTTP_307_TEMPORARY_REDIRECT,
+        )
+    if not os.path.isfile(db_letter.file_path):
+        raise HTTPException(status_code=404, detail="Approval letter file not found")
+    return FileResponse(db_letter.file_path, media_type="application/pdf")
+
+@router.get("/files/{digest}.pdf")
+async def read_approval_letter_file(digest: str, if_none_match: Optional[str] = Header(None)):
+    if not letters.DIGEST_PATTERN.match(digest):
+        raise HTTPException(status_code=404, detail="Approval letter file not found")
+    path = letters.letter_path(digest)
+    if not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail="Approval letter file not found")
+    
+    headers = {"ETag": f'"{digest}"', "Cache-Control": "private, max-age=31536000, immutable"}
+    if if_none_match and f'"{digest}"' in if_none_match:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    # FileResponse handles Range requests and uses zero-copy sends where the server supports them
+    return FileResponse(path, media_type="application/pdf", headers=headers, filename="approval-letter.pdf")
@@ -0,0 +1,28 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy.ext.asyncio import AsyncSession
+from app import schemas
+from app.database import UnitOfWork
+from app.services import auth
+
+router = APIRouter(
+    prefix="/auth",
+    tags=["auth"],
+)
+
+@router.post("/login", response_model=schemas.Token)
+async def login(form: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = UnitOfWork):
+    """Exchange an email (as username) and password for a bearer token"""
+    user = await auth.authenticate(db, form.username, form.password)
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Incorrect email or password",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    token, expires_in = auth.create_access_token(user)
+    return {"access_token": token, "token_type": "bearer", "expires_in": expires_in}
+
+@router.get("/me", response_model=schemas.CurrentUserResponse)
+async def read_current_user(user: auth.CurrentUser = Depends(auth.get_current_user)):
+    return user
@@ -1,16 +1,8 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 from app import schemas, crud
-from app.database import SessionLocal
-
-# Dependency to get DB session
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+from app.database import UnitOfWork
 
 router = APIRouter(
     prefix="/payments",
@@ -19,38 +11,38 @@ router = APIRouter(
 )
 
 @router.post("/", response_model=schemas.PaymentResponse)
-def create_payment(payment: schemas.PaymentCreate, db: Session = Depends(get_db)):
+async def create_payment(payment: schemas.PaymentCreate, db: AsyncSession = UnitOfWork):
     # Verify application exists
-    db_application = crud.get_application(db, application_id=payment.application_id)
+    db_application = await db.run_sync(crud.get_application, application_id=payment.application_id)
     if db_application is None:
         raise HTTPException(status_code=404, detail="Application not found")
     
-    return crud.create_payment(db=db, payment=payment)
+    return await db.run_sync(crud.create_payment, payment=payment)
 
 @router.get("/{payment_id}", response_model=schemas.PaymentResponse)
-def read_payment(payment_id: int, db: Session = Depends(get_db)):
-    db_payment = crud.get_payment(db, payment_id=payment_id)
+async def read_payment(payment_id: int, db: AsyncSession = UnitOfWork):
+    db_payment = await db.run_sync(crud.get_payment, payment_id=payment_id)
     if db_payment is None:
         raise HTTPException(status_code=404, detail="Payment not found")
     return db_payment
 
 @router.get("/application/{application_id}", response_model=List[schemas.PaymentResponse])
-def read_payments_by_application(application_id: int, db: Session = Depends(get_db)):
+async def read_payments_by_application(application_id: int, db: AsyncSession = UnitOfWork):
     # Verify application exists
-    db_application = crud.get_application(db, application_id=application_id)
+    db_application = await db.run_sync(crud.get_application, application_id=application_id)
     if db_application is None:
         raise HTTPException(status_code=404, detail="Application not found")
     
-    payments = crud.get_payments_by_application(db, application_id=application_id)
+    payments = await db.run_sync(crud.get_payments_by_application, application_id=application_id)
     return payments
 
 @router.patch("/{payment_id}", response_model=schemas.PaymentResponse)
-def update_payment(
+async def update_payment(
     payment_id: int, 
     payment_update: schemas.PaymentUpdate, 
-    db: Session = Depends(get_db)
+    db: AsyncSession = UnitOfWork
 ):
-    db_payment = crud.update_payment(db=db, payment_id=payment_id, payment_update=payment_update)
+    db_payment = await db.run_sync(crud.update_payment, payment_id=payment_id, payment_update=payment_update)
     if db_payment is None:
         raise HTTPException(status_code=404, detail="Payment not found")
     return db_payment
@@ -1,16 +1,8 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
 from app import schemas, crud
-from app.database import SessionLocal
-
-# Dependency to get DB session
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+from app.database import UnitOfWork
 
 router = APIRouter(
     prefix="/support",
@@ -19,29 +11,44 @@ router = APIRouter(
 )
 
 @router.post("/", response_model=schemas.SupportRequestResponse)
-def create_support_request(request: schemas.SupportRequestCreate, db: Session = Depends(get_db)):
-    return crud.create_support_request(db=db, request=request)
+async def create_support_request(request: schemas.SupportRequestCreate, db: AsyncSession = UnitOfWork):
+    return await db.run_sync(crud.create_support_request, request=request)
 
 @router.get("/", response_model=List[schemas.SupportRequestResponse])
-def read_support_requests(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    requests = crud.get_support_requests(db, skip=skip, limit=limit)
+async def read_support_requests(skip: int = 0, limit: int = 100, db: AsyncSession = UnitOfWork):
+    requests = await db.run_sync(crud.get_support_requests, skip=skip, limit=limit)
     return requests
 
+@router.get("/page", response_model=schemas.SupportRequestPage)
+async def read_support_requests_page(
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=500),
+    is_resolved: Optional[bool] = None,
+    db: AsyncSession = UnitOfWork
+):
+    try:
+        requests, next_cursor = await db.run_sync(
+            crud.get_support_requests_page, cursor=cursor, limit=limit, is_resolved=is_resolved
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return {"items": requests, "next_cursor": next_cursor}
+
 @router.get("/{request_id}", response_model=schemas.SupportRequestResponse)
-def read_support_request(request_id: int, db: Session = Depends(get_db)):
-    db_request = crud.get_support_request(db, request_id=request_id)
+async def read_support_request(request_id: int, db: AsyncSession = UnitOfWork):
+    db_request = await db.run_sync(crud.get_support_request, request_id=request_id)
     if db_request is None:
         raise HTTPException(status_code=404, detail="Support request not found")
     return db_request
 
 @router.patch("/{request_id}", response_model=schemas.SupportRequestResponse)
-def update_support_request(
+async def update_support_request(
     request_id: int, 
     request_update: schemas.SupportRequestUpdate, 
-    db: Session = Depends(get_db)
+    db: AsyncSession = UnitOfWork
 ):
-    db_request = crud.update_support_request(
-        db=db, 
+    db_request = await db.run_sync(
+        crud.update_support_request,
         request_id=request_id, 
         is_resolved=request_update.is_resolved
     )
@@ -1,7 +1,7 @@
 from pydantic import BaseModel, EmailStr, Field, validator
-from typing import Optional, List
+from typing import Any, Optional, List, Dict
 from datetime import datetime
-from app.database import ApplicationStatus, PaymentStatus
+from app.database import ApplicationStatus, PaymentStatus, LetterJobStatus, JobRunStatus
 
 # User schemas
 class UserBase(BaseModel):
@@ -18,6 +18,18 @@ class UserResponse(UserBase):
     class Config:
         orm_mode = True
 
+class CurrentUserResponse(UserBase):
+    id: int
+    is_admin: bool
+
+    class Config:
+        orm_mode = True
+
+class Token(BaseModel):
+    access_token: str
+    token_type: str = "bearer"
+    expires_in: int
+
 # Application schemas
 class ApplicationBase(BaseModel):
     full_name: str
@@ -61,6 +73,90 @@ class ApplicationDetailResponse(ApplicationResponse):
     class Config:
         orm_mode = True
 
+class ApplicationPage(BaseModel):
+    items: List[ApplicationResponse]
+    next_cursor: Optional[str] = None
+
+class ApplicationDetailPage(BaseModel):
+    items: List[ApplicationDetailResponse]
+    next_cursor: Optional[str] = None
+
+class ApplicationSearchHit(ApplicationResponse):
+    # Relevance, higher is better; only comparable within one result set
+    score: float
+
+class ApplicationSearchPage(BaseModel):
+    items: List[ApplicationSearchHit]
+    next_offset: Optional[int] = None
+    # True when nothing matched exactly and these are typo-tolerant matches
+    approximate: bool = False
+
+class ApplicationDuplicateMatch(ApplicationResponse):
+    # Identity keys shared with the application looked up
+    matched_on: List[str]
+
+class DuplicateClusterMember(ApplicationResponse):
+    # Best pair score and the evidence behind it, from the clustering job
+    score: float
+    matched_on: List[str]
+
+class DuplicateCluster(BaseModel):
+    cluster_id: int
+    score: float
+    applications: List[DuplicateClusterMember]
+
+class DuplicateClusterPage(BaseModel):
+    items: List[DuplicateCluster]
+    next_offset: Optional[int] = None
+
+class TerritoryDealer(BaseModel):
+    application_id: int
+    tracking_id: str
+    business_name: Optional[str] = None
+    city: Optional[str] = None
+    postal_code: str
+
+class TerritoryCoverage(BaseModel):
+    pincode: str
+    # The pincode's first TERRITORY_PREFIX_LENGTH digits
+    territory: str
+    territory_name: str
+    state: Optional[str] = None
+    # Most specific place the pincode data names for this pincode
+    place: str
+    max_dealers: int
+    covered: bool
+    dealers: List[TerritoryDealer]
+
+class ArchivedRecord(BaseModel):
+    kind: str
+    record_id: int
+    created_at: datetime
+    archived_at: datetime
+    # Relative to ARCHIVE_DIR
+    archive_file: str
+    # The archived line: the record's columns under its kind, and for an
+    # application its status_updates, payments, approval_letters, letter_jobs
+    # and notifications
+    data: Dict[str, Any]
+
+class BulkImportError(BaseModel):
+    row: int
+    error: str
+
+class BulkImportConflict(BaseModel):
+    row: int
+    conflict: str
+    rejected: bool
+
+class BulkImportResponse(BaseModel):
+    total: int
+    inserted: int
+    failed: int
+    flagged: int = 0
+    errors: List[BulkImportError] = []
+    conflicts: List[BulkImportConflict] = []
+
 # Payment schemas
 class PaymentBase(BaseModel):
     amount: float
@@ -86,6 +182,26 @@ class PaymentResponse(PaymentBase):
     class Config:
         orm_mode = True
 
+class ReconciliationEntry(BaseModel):
+    row: int
+    reference: Optional[str] = None
+    amount: Optional[float] = None
+    reason: str
+    payment_ids: List[int] = []
+
+class ReconciliationResponse(BaseModel):
+    total: int
+    matched: int
+    applied: int
+    ignored: int
+    unmatched: int
+    ambiguous: int
+    failed: int
+    dry_run: bool
+    unmatched_entries: List[ReconciliationEntry] = []
+    ambiguous_entries: List[ReconciliationEntry] = []
+    errors: List[BulkImportError] = []
+
 # Approval Letter schemas
 class ApprovalLetterBase(BaseModel):
     application_id: int
@@ -103,6 +219,18 @@ class ApprovalLetterResponse(ApprovalLetterBase):
     class Config:
         orm_mode = True
 
+class ApprovalLetterJobResponse(BaseModel):
+    id: int
+    application_id: int
+    status: LetterJobStatus
+    attempts: int
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+
+    class Config:
+        orm_mode = True
+
 # Status Update schemas
 class StatusUpdateBase(BaseModel):
     application_id: int
@@ -114,6 +242,10 @@ class StatusUpdateBase(BaseModel):
 class StatusUpdateCreate(StatusUpdateBase):
     pass
 
+class ApplicationStatusChange(BaseModel):
+    status: ApplicationStatus
+    notes: Optional[str] = None
+
 class StatusUpdateResponse(StatusUpdateBase):
     id: int
     created_at: datetime
@@ -142,5 +274,54 @@ class SupportRequestResponse(SupportRequestBase):
     class Config:
         orm_mode = True
 
+class SupportRequestPage(BaseModel):
+    items: List[SupportRequestResponse]
+    next_cursor: Optional[str] = None
+
+# Analytics schemas
+class PaymentTotals(BaseModel):
+    count: int
+    amount: float
+
+class ApprovalTimeStats(BaseModel):
+    count: int
+    mean_hours: Optional[float] = None
+    p50_hours: Optional[float] = None
+    p90_hours: Optional[float] = None
+    p99_hours: Optional[float] = None
+
+class AnalyticsSummary(BaseModel):
+    total_applications: int
+    applications_by_status: Dict[str, int]
+    payments_by_status: Dict[str, PaymentTotals]
+    time_to_approval: ApprovalTimeStats
+
+class LocationAnalytics(BaseModel):
+    by_state: Dict[str, int]
+    by_city: Dict[str, int]
+
+class DailyAnalytics(BaseModel):
+    date: str
+    submissions: int
+    approvals: int
+
+# Scheduled job schemas
+class ScheduledJobState(BaseModel):
+    name: str
+    status: Optional[JobRunStatus] = None
+    next_run_at: datetime
+    last_started_at: Optional[datetime] = None
+    last_finished_at: Optional[datetime] = None
+    last_duration: Optional[float] = None
+    last_processed: Optional[int] = None
+    backlog: Optional[int] = None
+    last_error: Optional[str] = None
+    runs: int
+    failures: int
+
+    class Config:
+        orm_mode = True
+
 # Update forward references
 ApplicationDetailResponse.update_forward_refs()
+ApplicationDetailPage.update_forward_refs()
@@ -0,0 +1,281 @@
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import and_, delete, func, or_, select, text
+from sqlalchemy.orm import Session
+
+from app.database import (
+    AnalyticsCounter, Application, ApplicationStatus, ApplicationStatusUpdate, Payment
+)
+
+# Incrementally maintained dashboard aggregates
+#
+# Every write path that changes applications or payments applies a small set of
+# (metric, key) deltas to analytics_counters in the same transaction, so the
+# admin dashboard reads a handful of indexed rows instead of scanning tables.
+# `rebuild` recomputes everything from the source tables.
+
+APPLICATIONS_BY_STATUS = "applications_by_status"
+APPLICATIONS_BY_STATE = "applications_by_state"
+APPLICATIONS_BY_CITY = "applications_by_city"
+DAILY_SUBMISSIONS = "daily_submissions"
+DAILY_APPROVALS = "daily_approvals"
+PAYMENTS_BY_STATUS = "payments_by_status"
+TIME_TO_APPROVAL = "time_to_approval_hours"
+
+# Upper bounds (hours) of the time-to-approval histogram buckets
+APPROVAL_BUCKETS = (1, 2, 4, 8, 12, 24, 48, 72, 120, 168, 336, 720, 1440, 2160)
+
+Deltas = Dict[Tuple[str, str], list]
+
+def _new_deltas() -> Deltas:
+    return defaultdict(lambda: [0, 0.0])
+
+def _status_key(status) -> str:
+    return str(getattr(status, "value", status)).lower()
+
+def _field(obj, name):
+    return obj.get(name) if isinstance(obj, dict) else getattr(obj, name, None)
+
+def _bucket_key(hours: float) -> str:
+    for bound in APPROVAL_BUCKETS:
+        if hours <= bound:
+            return str(bound)
+    return "inf"
+
+def apply(db: Session, deltas: Deltas):
+    """Add count/total deltas to their counters with a single upsert"""
+    rows = [
+        {"metric": metric, "key": key, "count": count, "total": total}
+        for (metric, key), (count, total) in sorted(deltas.items())
+        if count or total
+    ]
+    if not rows:
+        return
+
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        for row in rows:
+            counter = db.query(AnalyticsCounter).filter_by(metric=row["metric"], key=row["key"]).first()
+            if counter is None:
+                counter = AnalyticsCounter(metric=row["metric"], key=row["key"], count=0, total=0.0)
+                db.add(counter)
+            counter.count += row["count"]
+            counter.total += row["total"]
+        db.flush()
+        return
+
+    table = AnalyticsCounter.__table__
+    stmt = insert(table)
+    # Rows are sorted so concurrent writers lock counters in the same order
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.metric, table.c.key],
+        set_={"count": table.c.count + stmt.excluded.count, "total": table.c.total + stmt.excluded.total},
+    )
+    db.execute(stmt, rows)
+
+def _add_created(deltas: Deltas, application):
+    state = _field(application, "state")
+    city = _field(application, "city")
+    created_at = _field(application, "created_at") or datetime.utcnow()
+    deltas[(APPLICATIONS_BY_STATUS, _status_key(_field(application, "status") or ApplicationStatus.SUBMITTED))][0] += 1
+    deltas[(DAILY_SUBMISSIONS, created_at.date().isoformat())][0] += 1
+    if state:
+        deltas[(APPLICATIONS_BY_STATE, state)][0] += 1
+        if city:
+            deltas[(APPLICATIONS_BY_CITY, f"{state}/{city}")][0] += 1
+
+def _add_approval(deltas: Deltas, created_at: Optional[datetime], approved_at: datetime):
+    deltas[(DAILY_APPROVALS, approved_at.date().isoformat())][0] += 1
+    if created_at:
+        hours = max((approved_at - created_at).total_seconds() / 3600, 0.0)
+        delta = deltas[(TIME_TO_APPROVAL, _bucket_key(hours))]
+        delta[0] += 1
+        delta[1] += hours
+
+def record_applications_created(db: Session, applications: Iterable):
+    """Count new applications (ORM objects or row dicts)"""
+    deltas = _new_deltas()
+    for application in applications:
+        _add_created(deltas, application)
+    apply(db, deltas)
+
+def record_status_change(db: Session, application, previous_status, new_status, changed_at: datetime = None):
+    previous_key, new_key = _status_key(previous_status), _status_key(new_status)
+    if previous_key == new_key:
+        return
+    deltas = _new_deltas()
+    deltas[(APPLICATIONS_BY_STATUS, previous_key)][0] -= 1
+    deltas[(APPLICATIONS_BY_STATUS, new_key)][0] += 1
+    if new_key == ApplicationStatus.APPROVED.value:
+        _add_approval(deltas, application.created_at, changed_at or datetime.utcnow())
+    apply(db, deltas)
+
+def record_payment_change(db: Session, previous_status, previous_amount, new_status, new_amount):
+    """Move a payment between status buckets; pass None for a new payment's previous values"""
+    record_payment_changes(db, [(previous_status, previous_amount, new_status, new_amount)])
+
+def record_payment_changes(db: Session, changes: Iterable[Tuple]):
+    """record_payment_change for many (previous_status, previous_amount, new_status, new_amount) in one upsert"""
+    deltas = _new_deltas()
+    for previous_status, previous_amount, new_status, new_amount in changes:
+        if previous_status is not None:
+            delta = deltas[(PAYMENTS_BY_STATUS, _status_key(previous_status))]
+            delta[0] -= 1
+            delta[1] -= previous_amount or 0.0
+        delta = deltas[(PAYMENTS_BY_STATUS, _status_key(new_status))]
+        delta[0] += 1
+        delta[1] += new_amount or 0.0
+    apply(db, deltas)
+
+def _is_approval(update) -> bool:
+    # Transitions into APPROVED from any other status, as rebuild counts them
+    previous_status = _field(update, "previous_status")
+    return (
+        _field(update, "new_status") == ApplicationStatus.APPROVED
+        and previous_status != ApplicationStatus.APPROVED
+        and _field(update, "created_at") is not None
+    )
+
+def record_applications_removed(db: Session, applications: Iterable[Tuple]):
+    """Uncount deleted applications, given (application, status_updates, payments) row dicts
+
+    Everything rebuild would count for them is taken out, so the counters
+    still agree with the tables afterwards.
+    """
+    deltas = _new_deltas()
+    for application, status_updates, payments in applications:
+        _add_created(deltas, application)
+        for update in status_updates:
+            if _is_approval(update):
+                _add_approval(deltas, _field(application, "created_at"), _field(update, "created_at"))
+        for payment in payments:
+            if _field(payment, "status") is not None:
+                delta = deltas[(PAYMENTS_BY_STATUS, _status_key(_field(payment, "status")))]
+                delta[0] += 1
+                delta[1] += _field(payment, "amount") or 0.0
+    apply(db, {key: [-count, -total] for key, (count, total) in deltas.items()})
+
+def rebuild(db: Session, batch_size: int = 10000):
+    """Recompute every counter from the source tables in one transaction"""
+    if db.get_bind().dialect.name == "postgresql":
+        # Holds back writers' deltas until the new counters commit; otherwise a
+        # change committed after the source tables are read would be lost
+        db.execute(text("LOCK TABLE analytics_counters IN EXCLUSIVE MODE"))
+    deltas = _new_deltas()
+
+    for status, count in db.query(Application.status, func.count()).group_by(Application.status):
+        if status is not None:
+            deltas[(APPLICATIONS_BY_STATUS, _status_key(status))][0] += count
+    for state, city, count in db.query(Application.state, Application.city, func.count()).group_by(Application.state, Application.city):
+        if state:
+            deltas[(APPLICATIONS_BY_STATE, state)][0] += count
+            if city:
+                deltas[(APPLICATIONS_BY_CITY, f"{state}/{city}")][0] += count
+    day = func.date(Application.created_at)
+    for created_on, count in db.query(day, func.count()).filter(Application.created_at.isnot(None)).group_by(day):
+        deltas[(DAILY_SUBMISSIONS, str(created_on))][0] += count
+
+    # Approval events: transitions into APPROVED from any other status
+    approvals = (
+        select(Application.created_at, ApplicationStatusUpdate.created_at)
+        .join(Application, Application.id == ApplicationStatusUpdate.application_id)
+        .where(
+            ApplicationStatusUpdate.new_status == ApplicationStatus.APPROVED,
+            or_(
+                ApplicationStatusUpdate.previous_status.is_(None),
+                ApplicationStatusUpdate.previous_status != ApplicationStatus.APPROVED,
+            ),
+            ApplicationStatusUpdate.created_at.isnot(None),
+        )
+    )
+    result = db.execute(approvals, execution_options={"stream_results": True, "yield_per": batch_size})
+    for created_at, approved_at in result:
+        _add_approval(deltas, created_at, approved_at)
+
+    for status, count, amount in db.query(Payment.status, func.count(), func.coalesce(func.sum(Payment.amount), 0.0)).group_by(Payment.status):
+        if status is not None:
+            delta = deltas[(PAYMENTS_BY_STATUS, _status_key(status))]
+            delta[0] += count
+            delta[1] += amount
+
+    db.execute(delete(AnalyticsCounter))
+    apply(db, deltas)
+
+# Reads
+
+def _counters(db: Session, *metrics: str):
+    return db.query(AnalyticsCounter).filter(AnalyticsCounter.metric.in_(metrics)).all()
+
+def _percentile(buckets: Dict[str, int], total: int, fraction: float) -> Optional[float]:
+    """Estimated from the histogram, taking a bucket's values as spread evenly over it"""
+    if not total:
+        return None
+    threshold = fraction * total
+    seen, lower = 0, 0.0
+    for bound in APPROVAL_BUCKETS:
+        count = buckets.get(str(bound), 0)
+        if count and seen + count >= threshold:
+            return round(lower + (bound - lower) * (threshold - seen) / count, 2)
+        seen += count
+        lower = float(bound)
+    return None  # falls in the open-ended bucket
+
+def summary(db: Session) -> dict:
+    applications_by_status = {}
+    payments_by_status = {}
+    approval_buckets = {}
+    approval_hours = 0.0
+    for counter in _counters(db, APPLICATIONS_BY_STATUS, PAYMENTS_BY_STATUS, TIME_TO_APPROVAL):
+        if counter.metric == APPLICATIONS_BY_STATUS:
+            applications_by_status[counter.key] = counter.count
+        elif counter.metric == PAYMENTS_BY_STATUS:
+            payments_by_status[counter.key] = {"count": counter.count, "amount": round(counter.total, 2)}
+        else:
+            approval_buckets[counter.key] = counter.count
+            approval_hours += counter.total
+
+    approved = sum(approval_buckets.values())
+    return {
+        "total_applications": sum(applications_by_status.values()),
+        "applications_by_status": applications_by_status,
+        "payments_by_status": payments_by_status,
+        "time_to_approval": {
+            "count": approved,
+            "mean_hours": round(approval_hours / approved, 2) if approved else None,
+            "p50_hours": _percentile(approval_buckets, approved, 0.50),
+            "p90_hours": _percentile(approval_buckets, approved, 0.90),
+            "p99_hours": _percentile(approval_buckets, approved, 0.99),
+        },
+    }
+
+def locations(db: Session, limit: int = 50) -> dict:
+    by_state = db.query(AnalyticsCounter).filter(AnalyticsCounter.metric == APPLICATIONS_BY_STATE, AnalyticsCounter.count > 0)
+    by_city = db.query(AnalyticsCounter).filter(AnalyticsCounter.metric == APPLICATIONS_BY_CITY, AnalyticsCounter.count > 0)
+    return {
+        "by_state": {c.key: c.count for c in by_state.order_by(AnalyticsCounter.count.desc()).limit(limit)},
+        "by_city": {c.key: c.count for c in by_city.order_by(AnalyticsCounter.count.desc()).limit(limit)},
+    }
+
+def daily(db: Session, days: int = 30) -> list:
+    since = (datetime.utcnow().date() - timedelta(days=days - 1)).isoformat()
+    counters = (
+        db.query(AnalyticsCounter)
+        .filter(
+            or_(
+                and_(AnalyticsCounter.metric == DAILY_SUBMISSIONS, AnalyticsCounter.key >= since),
+                and_(AnalyticsCounter.metric == DAILY_APPROVALS, AnalyticsCounter.key >= since),
+            )
+        )
+        .all()
+    )
+    series = defaultdict(lambda: {"submissions": 0, "approvals": 0})
+    for counter in counters:
+        field = "submissions" if counter.metric == DAILY_SUBMISSIONS else "approvals"
+        series[counter.key][field] = counter.count
+    return [{"date": day, **values} for day, values in sorted(series.items())]
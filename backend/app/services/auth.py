@@ -0,0 +1,171 @@
+import asyncio
+import multiprocessing
+import os
+import secrets
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+
+from fastapi import Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.security import OAuth2PasswordBearer
+from jose import JWTError, jwt
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import crud
+from app.database import UnitOfWork, User
+from app.services.cache import LRUCacheBackend
+from app.utils import passwords
+from app.utils.settings import env_bool
+
+# Authentication
+#
+# bcrypt costs hundreds of milliseconds of CPU per call, so hashing and
+# verification run in a small dedicated process pool instead of on the event
+# loop. Logins rehash the password when BCRYPT_ROUNDS has changed since it was
+# stored. Access tokens are JWTs; once a token has been checked against the
+# users table its claims are cached, so further requests with the same token
+# skip the User lookup until the token or AUTH_CLAIMS_CACHE_TTL expires.
+#
+# There is no default signing key: the app refuses to start without
+# JWT_SECRET, since a known key lets anyone forge an admin token.
+# JWT_DEV_RANDOM_SECRET=True signs with a random key per process instead, for
+# development only; tokens then stop working on restart and are not accepted
+# by other workers.
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+AUTH_HASH_WORKERS = int(os.getenv("AUTH_HASH_WORKERS", "2"))
+AUTH_CLAIMS_CACHE_TTL = float(os.getenv("AUTH_CLAIMS_CACHE_TTL", "60"))
+AUTH_CLAIMS_CACHE_MAXSIZE = int(os.getenv("AUTH_CLAIMS_CACHE_MAXSIZE", "10000"))
+
+JWT_DEV_RANDOM_SECRET = env_bool("JWT_DEV_RANDOM_SECRET", False)
+JWT_SECRET = os.getenv("JWT_SECRET") or (secrets.token_urlsafe(48) if JWT_DEV_RANDOM_SECRET else None)
+JWT_ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
+JWT_EXPIRATION_MINUTES = int(os.getenv("JWT_EXPIRATION_MINUTES", "1440"))
+
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
+
+class MissingSecretError(RuntimeError):
+    """JWT_SECRET is unset and no development key was asked for"""
+
+def signing_key() -> str:
+    if not JWT_SECRET:
+        raise MissingSecretError(
+            "JWT_SECRET is not set. Set it to a long random value, e.g. the output of "
+            "`python -c \"import secrets; print(secrets.token_urlsafe(48))\"`, "
+            "or set JWT_DEV_RANDOM_SECRET=True for a throwaway key in development"
+        )
+    return JWT_SECRET
+
+# Password hashing
+
+class PasswordHasher:
+    """Async front end to bcrypt running in a bounded process pool"""
+
+    def __init__(self, max_workers: int = AUTH_HASH_WORKERS, rounds: int = BCRYPT_ROUNDS):
+        self.max_workers = max_workers
+        self.rounds = rounds
+        self._executor = None
+        self._dummy_hash = None
+
+    def start(self):
+        # spawn: forking a process that runs an event loop and DB pools is unsafe
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn")
+        )
+
+    def stop(self):
+        if self._executor:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    async def _run(self, fn, *args):
+        if self._executor is None:
+            # Not started (scripts, CLI): still keep the event loop free
+            return await run_in_threadpool(fn, *args)
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    async def hash(self, password: str) -> str:
+        return await self._run(passwords.hash_password, password, self.rounds)
+
+    async def verify(self, password: str, hashed: Optional[str]) -> Tuple[bool, Optional[str]]:
+        """Returns (matches, replacement hash if the cost factor changed)"""
+        return await self._run(passwords.verify_password, password, hashed, self.rounds)
+
+    async def verify_dummy(self, password: str):
+        # Unknown emails cost as much as wrong passwords, so timing does not
+        # reveal which accounts exist
+        if self._dummy_hash is None:
+            self._dummy_hash = await self.hash("dummy-password")
+        await self.verify(password, self._dummy_hash)
+
+hasher = PasswordHasher()
+
+async def authenticate(db: AsyncSession, email: str, password: str) -> Optional[User]:
+    """Return the user if the password matches, upgrading its hash if needed"""
+    user = await db.run_sync(crud.get_user_by_email, email=email)
+    if user is None:
+        await hasher.verify_dummy(password)
+        return None
+    ok, new_hash = await hasher.verify(password, user.hashed_password)
+    if not ok:
+        return None
+    if new_hash:
+        user.hashed_password = new_hash  # committed with the request's unit of work
+    return user
+
+# Tokens
+
+@dataclass(frozen=True)
+class CurrentUser:
+    id: int
+    email: str
+    is_admin: bool
+
+def create_access_token(user: User) -> Tuple[str, int]:
+    """Returns (token, lifetime in seconds)"""
+    now = datetime.utcnow()
+    expires_in = JWT_EXPIRATION_MINUTES * 60
+    claims = {
+        "sub": str(user.id),
+        "email": user.email,
+        "admin": bool(user.is_admin),
+        "iat": now,
+        "exp": now + timedelta(seconds=expires_in),
+    }
+    return jwt.encode(claims, signing_key(), algorithm=JWT_ALGORITHM), expires_in
+
+# token -> (CurrentUser, exp timestamp)
+claims_cache = LRUCacheBackend(maxsize=AUTH_CLAIMS_CACHE_MAXSIZE, ttl=AUTH_CLAIMS_CACHE_TTL)
+
+_credentials_error = HTTPException(
+    status_code=status.HTTP_401_UNAUTHORIZED,
+    detail="Could not validate credentials",
+    headers={"WWW-Authenticate": "Bearer"},
+)
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = UnitOfWork) -> CurrentUser:
+    cached = await claims_cache.get(token)
+    if cached is not None and cached[1] > time.time():
+        return cached[0]
+
+    try:
+        claims = jwt.decode(token, signing_key(), algorithms=[JWT_ALGORITHM])
+        user_id = int(claims["sub"])
+    except (JWTError, KeyError, ValueError):
+        raise _credentials_error
+
+    user = await db.get(User, user_id)
+    if user is None:
+        raise _credentials_error
+
+    current = CurrentUser(id=user.id, email=user.email, is_admin=bool(user.is_admin))
+    await claims_cache.set(token, (current, claims["exp"]))
+    return current
+
+async def require_admin(user: CurrentUser = Depends(get_current_user)) -> CurrentUser:
+    if not user.is_admin:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin privileges required")
+    return user
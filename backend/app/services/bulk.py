@@ -0,0 +1,239 @@
+import csv
+import io
+import json
+from dataclasses import dataclass, field
+from datetime import datetime
+from itertools import islice
+from typing import IO, Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+
+from app import schemas
+from app.crud import generate_tracking_id
+from app.services import analytics, dedupe, territories
+from app.database import Application, ApplicationStatus
+
+# Bulk import and export of applications
+#
+# Input is streamed and processed in batches, so memory stays bounded by the
+# batch size rather than the file size. Rows that fail validation or insertion
+# are reported individually; the rest of their batch is still written. Rows
+# duplicating an application in progress, or an earlier row of the file, are
+# rejected like a submission would be (app.services.dedupe). Rows for a
+# territory that already has its dealers are rejected or flagged in their
+# admin notes as TERRITORY_CONFLICT_MODE says (app.services.territories), and
+# listed in the report's conflicts either way.
+
+FORMATS = ("csv", "ndjson")
+MAX_REPORTED_ERRORS = 1000
+
+@dataclass
+class ImportReport:
+    total: int = 0
+    inserted: int = 0
+    failed: int = 0
+    flagged: int = 0
+    errors: List[dict] = field(default_factory=list)
+    # Territory conflicts, rejected (also in errors) or flagged
+    conflicts: List[dict] = field(default_factory=list)
+
+    def add_error(self, row: int, error):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"row": row, "error": str(error)})
+
+    def add_conflict(self, row: int, conflict: territories.TerritoryCovered, rejected: bool):
+        if rejected:
+            self.add_error(row, conflict)
+        else:
+            self.flagged += 1
+        if len(self.conflicts) < MAX_REPORTED_ERRORS:
+            self.conflicts.append({"row": row, "conflict": str(conflict), "rejected": rejected})
+
+def iter_records(stream: IO[bytes], fmt: str) -> Iterator[Tuple[int, Optional[dict], Optional[str]]]:
+    """Yield (row number, record, parse error) from a binary CSV or NDJSON stream"""
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    if fmt == "csv":
+        # Row 1 is the header
+        for row_number, record in enumerate(csv.DictReader(text), start=2):
+            yield row_number, record, None
+    elif fmt == "ndjson":
+        for row_number, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield row_number, json.loads(line), None
+            except ValueError as exc:
+                yield row_number, None, f"Invalid JSON: {exc}"
+    else:
+        raise ValueError(f"Unsupported format '{fmt}', expected one of {FORMATS}")
+
+def _application_row(application: schemas.ApplicationCreate, user_id: Optional[int], now: datetime) -> dict:
+    # Defaults are filled in here because COPY does not run column defaults
+    return dict(
+        application.dict(),
+        tracking_id=generate_tracking_id(),
+        user_id=user_id,
+        status=ApplicationStatus.SUBMITTED,
+        admin_notes=None,
+        created_at=now,
+        updated_at=now,
+    )
+
+def _copy_field(value) -> str:
+    # In COPY's CSV format an unquoted empty field is NULL and a quoted one is
+    # an empty string, so every value but None is quoted
+    if value is None:
+        return ""
+    if isinstance(value, ApplicationStatus):
+        value = value.name
+    return '"' + str(value).replace('"', '""') + '"'
+
+def _copy_rows(db: Session, rows: List[dict]):
+    """Load rows with COPY ... FROM STDIN (PostgreSQL with psycopg2)"""
+    table = Application.__table__
+    columns = list(rows[0])
+    preparer = db.get_bind().dialect.identifier_preparer
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write(",".join(_copy_field(row[column]) for column in columns))
+        buffer.write("\n")
+    buffer.seek(0)
+    sql = "COPY {} ({}) FROM STDIN WITH (FORMAT csv)".format(
+        preparer.format_table(table), ", ".join(preparer.quote(column) for column in columns)
+    )
+    cursor = db.connection().connection.driver_connection.cursor()
+    try:
+        cursor.copy_expert(sql, buffer)
+    finally:
+        cursor.close()
+
+def _index_rows(db: Session, inserted: List[Tuple[dict, list]]):
+    """Store the identity keys of inserted rows, which COPY returns no ids for"""
+    if not inserted:
+        return
+    table = Application.__table__
+    ids_by_tracking_id = dict(db.execute(
+        select(table.c.tracking_id, table.c.id).where(table.c.tracking_id.in_([row["tracking_id"] for row, _ in inserted]))
+    ).all())
+    dedupe.add_keys(db, [(ids_by_tracking_id[row["tracking_id"]], keys) for row, keys in inserted])
+
+def _insert_batch(db: Session, batch: List[Tuple[int, dict, list]], report: ImportReport, use_copy: bool):
+    rows = [row for _, row, _ in batch]
+    try:
+        with db.begin_nested():
+            if use_copy:
+                _copy_rows(db, rows)
+            else:
+                db.execute(insert(Application.__table__), rows)
+        inserted = [(row, keys) for _, row, keys in batch]
+    except Exception:
+        # Isolate the failing rows so the rest of the batch still goes in
+        inserted = []
+        for row_number, row, keys in batch:
+            try:
+                with db.begin_nested():
+                    db.execute(insert(Application.__table__), [row])
+                inserted.append((row, keys))
+            except Exception as exc:
+                report.add_error(row_number, getattr(exc, "orig", exc))
+
+    report.inserted += len(inserted)
+    _index_rows(db, inserted)
+    analytics.record_applications_created(db, [row for row, _ in inserted])
+
+def import_applications(
+    db: Session,
+    records: Iterable[Tuple[int, Optional[dict], Optional[str]]],
+    batch_size: int = 1000,
+    user_id: Optional[int] = None,
+) -> ImportReport:
+    """Validate and insert application records, committing once per batch"""
+    report = ImportReport()
+    bind = db.get_bind()
+    use_copy = bind.dialect.name == "postgresql" and bind.dialect.driver == "psycopg2"
+    records = iter(records)
+    seen_keys = set()
+
+    while True:
+        chunk = list(islice(records, batch_size))
+        if not chunk:
+            break
+
+        now = datetime.utcnow()
+        batch = []
+        for row_number, record, parse_error in chunk:
+            report.total += 1
+            if parse_error:
+                report.add_error(row_number, parse_error)
+                continue
+            try:
+                application = schemas.ApplicationCreate(**record)
+            except (TypeError, ValueError) as exc:
+                report.add_error(row_number, exc)
+                continue
+            batch.append((row_number, _application_row(application, user_id, now)))
+
+        keys, duplicates = dedupe.screen_batch(db, [row for _, row in batch], seen_keys)
+        accepted = []
+        for (row_number, row), row_keys, matched_on in zip(batch, keys, duplicates):
+            if matched_on:
+                report.add_error(row_number, dedupe.DuplicateApplication(matched_on))
+                continue
+            conflict = territories.find_conflict(db, row["postal_code"])
+            if conflict is not None:
+                rejected = territories.TERRITORY_CONFLICT_MODE == "reject"
+                report.add_conflict(row_number, conflict, rejected)
+                if rejected:
+                    continue
+                row["admin_notes"] = str(conflict)
+            accepted.append((row_number, row, row_keys))
+
+        if accepted:
+            _insert_batch(db, accepted, report, use_copy)
+        db.commit()
+
+    return report
+
+def _plain(value):
+    return value.value if isinstance(value, ApplicationStatus) else value
+
+def export_applications(db: Session, fmt: str, batch_size: int = 1000) -> Iterator[str]:
+    """Stream every application as CSV or NDJSON text chunks, one chunk per batch"""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported format '{fmt}', expected one of {FORMATS}")
+
+    table = Application.__table__
+    columns = [column.key for column in table.c]
+    # stream_results uses a server-side cursor where the driver supports it
+    result = db.execute(
+        select(table).order_by(table.c.id),
+        execution_options={"stream_results": True, "yield_per": batch_size},
+    )
+
+    if fmt == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+        for partition in result.partitions():
+            writer.writerows([_plain(value) for value in row] for row in partition)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue()
+    else:
+        for partition in result.partitions():
+            yield "".join(
+                json.dumps({key: _plain(value) for key, value in zip(columns, row)}, default=str) + "\n"
+                for row in partition
+            )
+
+def stream_export(session_factory, fmt: str, batch_size: int = 1000) -> Iterator[str]:
+    """Export generator owning its session, for streaming HTTP responses"""
+    db = session_factory()
+    try:
+        yield from export_applications(db, fmt, batch_size)
+    finally:
+        db.close()
@@ -0,0 +1,216 @@
+import asyncio
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Iterable, Optional, Set
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+# Read-through response cache for GET /applications/track/{tracking_id}
+#
+# Entries hold the rendered JSON body. Writes that change an application mark
+# its tracking ID stale on the session, and the entries are dropped once the
+# transaction commits; the TTL bounds staleness for writes made elsewhere.
+#
+# A miss is filled by one query whose result is stored afterwards, so an
+# invalidation can land while the query runs and the body it read is already
+# stale. Each key being filled has a generation that invalidation bumps; a
+# fill whose generation changed is returned to its callers but not stored.
+#
+# The memory backend is per process. With several workers, an invalidation
+# only reaches the other workers' caches with EVENTS_BACKEND=postgresql,
+# which sends it along with the status events (app.services.events);
+# otherwise use the redis backend, or accept up to TRACKING_CACHE_TTL of
+# staleness.
+
+TRACKING_CACHE_BACKEND = os.getenv("TRACKING_CACHE_BACKEND", "memory")
+TRACKING_CACHE_TTL = float(os.getenv("TRACKING_CACHE_TTL", "30"))
+TRACKING_CACHE_MAXSIZE = int(os.getenv("TRACKING_CACHE_MAXSIZE", "10000"))
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+class LRUCacheBackend:
+    """In-process LRU cache with a per-entry TTL"""
+
+    def __init__(self, maxsize: int = 10000, ttl: float = 30):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    async def set(self, key: str, value: bytes):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def delete_many(self, keys: Iterable[str]):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+class RedisCacheBackend:
+    """Cache backed by any Redis-compatible asyncio client (get/set/delete)"""
+
+    def __init__(self, client, ttl: float = 30, prefix: str = "camopa:track:"):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+        self._pending = set()
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self.client.get(self.prefix + key)
+
+    async def set(self, key: str, value: bytes):
+        await self.client.set(self.prefix + key, value, ex=max(1, int(self.ttl)))
+
+    def delete_many(self, keys: Iterable[str]):
+        names = [self.prefix + key for key in keys]
+        if not names:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # Called from a sync script outside any event loop
+            asyncio.run(self.client.delete(*names))
+            return
+        task = loop.create_task(self.client.delete(*names))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+class ResponseCache:
+    """Rendered JSON bodies with strong ETags derived from their content"""
+
+    def __init__(self, backend):
+        self.backend = backend
+        # key -> [generation, fills running], only while a fill runs
+        self._fills = {}
+        self._lock = threading.Lock()
+        self.stale_fills = 0
+
+    @staticmethod
+    def etag(body: bytes) -> str:
+        return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self.backend.get(key)
+
+    async def set(self, key: str, body: bytes):
+        await self.backend.set(key, body)
+
+    async def fill(self, key: str, load) -> Optional[bytes]:
+        """Return await load() and store it, unless key is invalidated before it is stored"""
+        with self._lock:
+            state = self._fills.setdefault(key, [0, 0])
+            state[1] += 1
+            generation = state[0]
+        try:
+            body = await load()
+            if body is None:
+                return None
+            if state[0] == generation:
+                await self.backend.set(key, body)
+                # Invalidated while storing: the delete may have run first
+                if state[0] == generation:
+                    return body
+                self.backend.delete_many([key])
+            self.stale_fills += 1
+            return body
+        finally:
+            with self._lock:
+                state[1] -= 1
+                if not state[1]:
+                    self._fills.pop(key, None)
+
+    def invalidate(self, keys: Iterable[str]):
+        keys = list(keys)
+        with self._lock:
+            for key in keys:
+                state = self._fills.get(key)
+                if state:
+                    state[0] += 1
+        self.backend.delete_many(keys)
+
+    def clear(self):
+        """Drop every entry of the memory backend, e.g. after invalidations may have been missed"""
+        with self._lock:
+            for state in self._fills.values():
+                state[0] += 1
+        self.backend.clear()
+
+def create_backend(name: str = TRACKING_CACHE_BACKEND):
+    if name == "redis":
+        try:
+            import redis.asyncio as redis
+        except ImportError as exc:
+            raise RuntimeError("TRACKING_CACHE_BACKEND=redis requires the 'redis' package") from exc
+        return RedisCacheBackend(redis.from_url(REDIS_URL), ttl=TRACKING_CACHE_TTL)
+    return LRUCacheBackend(maxsize=TRACKING_CACHE_MAXSIZE, ttl=TRACKING_CACHE_TTL)
+
+tracking_cache = ResponseCache(create_backend())
+
+class SingleFlight:
+    """Concurrent loads of the same key share one call and its result"""
+
+    def __init__(self):
+        self._inflight = {}
+        self.loads = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, load):
+        task = self._inflight.get(key)
+        if task is None:
+            # A task of its own, so a caller that disconnects does not cancel
+            # the load for everyone else waiting on it
+            task = asyncio.ensure_future(load())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+            self.loads += 1
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+# Cache misses for one tracking ID (a burst of polls after a status change)
+# run a single query
+tracking_loads = SingleFlight()
+
+# Invalidation tied to the transaction outcome
+_STALE_KEY = "stale_tracking_ids"
+
+def mark_tracking_stale(db: Session, tracking_id: Optional[str]):
+    """Drop the cached tracking response once this session commits"""
+    if tracking_id:
+        db.info.setdefault(_STALE_KEY, set()).add(tracking_id)
+
+def stale_tracking_ids(db: Session) -> Set[str]:
+    """Tracking IDs this session's commit will invalidate"""
+    return db.info.get(_STALE_KEY, set())
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session):
+    stale = session.info.pop(_STALE_KEY, None)
+    if stale:
+        tracking_cache.invalidate(stale)
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_after_rollback(session, previous_transaction):
+    session.info.pop(_STALE_KEY, None)
@@ -0,0 +1,393 @@
+import difflib
+import logging
+import os
+import re
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from datetime import datetime
+from itertools import islice
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import and_, delete, insert, or_, select, text
+from sqlalchemy.orm import Session
+
+from app.database import Application, ApplicationDuplicate, ApplicationIdentityKey, ApplicationStatus
+
+# Duplicate application detection
+#
+# Each application's identity keys are normalised once, when it is created,
+# and kept in application_identity_keys, indexed by (kind, value):
+#
+#   pan           the PAN, given as the registration number or read from
+#                 characters 3-12 of a GSTIN
+#   gst           the GSTIN
+#   phone         the last ten digits of the phone number
+#   email         the lower-cased email address
+#   name_pincode  the pincode and the business name without punctuation or
+#                 legal words (M/s, Pvt, Ltd, ...)
+#
+# A submission looks its keys up with one indexed query. In DEDUPE_MODE=reject
+# (the default) sharing one of DEDUPE_BLOCKING_KINDS with an application that
+# has not been rejected turns it away; any other match is noted in the new
+# application's admin notes, as every match is in flag mode. Keys are written
+# once: applicants cannot edit their details after submitting.
+#
+# find_duplicates clusters the existing applications. Candidate pairs come
+# from blocks of applications sharing a key, or a pincode and the first word
+# of the business name. Each pair is scored on the evidence it shares, and
+# pairs scoring DEDUPE_CLUSTER_THRESHOLD or more are merged into clusters,
+# stored in application_duplicates for admins to review.
+
+# reject, flag or off
+DEDUPE_MODE = os.getenv("DEDUPE_MODE", "reject")
+DEDUPE_BLOCKING_KINDS = frozenset(
+    kind.strip() for kind in os.getenv("DEDUPE_BLOCKING_KINDS", "pan,gst,email,phone").split(",") if kind.strip()
+)
+DEDUPE_CLUSTER_THRESHOLD = float(os.getenv("DEDUPE_CLUSTER_THRESHOLD", "0.8"))
+# A block this large (a consultant's email, a shared office phone) is weak
+# evidence and would pair every member with every other; it is skipped
+DEDUPE_MAX_BLOCK_SIZE = int(os.getenv("DEDUPE_MAX_BLOCK_SIZE", "100"))
+
+# Evidence weights; a pair scores 1 - product(1 - weight) over what it shares
+WEIGHTS = {"pan": 0.9, "gst": 0.95, "email": 0.7, "phone": 0.6, "name_pincode": 0.6}
+# Business names in one pincode at least this similar count as name evidence,
+# weighted by their similarity
+NAME_SIMILARITY = 0.85
+
+# Leading words too common to block names on
+COMMON_FIRST_WORDS = frozenset({"sri", "shri", "shree", "new", "om", "jai", "maa"})
+LEGAL_WORDS = frozenset({"m", "s", "the", "and", "co", "company", "pvt", "private", "ltd", "limited", "llp", "firm"})
+
+GSTIN_PATTERN = re.compile(r"^\d{2}([A-Z]{5}\d{4}[A-Z])[1-9A-Z]Z[0-9A-Z]$")
+PAN_PATTERN = re.compile(r"^[A-Z]{5}\d{4}[A-Z]$")
+
+# pg_advisory_xact_lock(class, key) class for submissions' identity keys
+LOCK_CLASS = 0x0DED
+
+# Keys per lookup query, under SQLite's bound parameter limit
+LOOKUP_CHUNK_SIZE = 2000
+
+logger = logging.getLogger(__name__)
+
+metrics = Counter()
+
+class DuplicateApplication(Exception):
+    """A submission shares identity keys with an application still in progress.
+
+    The message names the kinds matched, for logs and admins; applicants are
+    shown public_message, which does not confirm what another applicant gave.
+    """
+
+    public_message = "An application for this business is already in progress"
+
+    def __init__(self, matched_on: Iterable[str]):
+        self.matched_on = sorted(matched_on)
+        super().__init__(f"An application with the same {', '.join(self.matched_on)} is already in progress")
+
+# Normalisation
+
+def normalize_email(value: Optional[str]) -> Optional[str]:
+    value = (value or "").strip().lower()
+    return value if "@" in value else None
+
+def normalize_phone(value: Optional[str]) -> Optional[str]:
+    """The last ten digits, so +91 and trunk-0 prefixes compare equal"""
+    digits = re.sub(r"\D", "", value or "")
+    return digits[-10:] if len(digits) >= 10 else None
+
+def normalize_registration(value: Optional[str]) -> Tuple[Optional[str], Optional[str]]:
+    """(PAN, GSTIN) from a registration number holding either"""
+    value = re.sub(r"[^0-9A-Za-z]", "", value or "").upper()
+    match = GSTIN_PATTERN.match(value)
+    if match:
+        return match.group(1), value
+    if PAN_PATTERN.match(value):
+        return value, None
+    return None, None
+
+def normalize_business_name(value: Optional[str]) -> str:
+    words = re.sub(r"[^0-9a-z]+", " ", (value or "").lower()).split()
+    return " ".join(word for word in words if word not in LEGAL_WORDS)
+
+def normalize_pincode(value: Optional[str]) -> Optional[str]:
+    digits = re.sub(r"\D", "", value or "")
+    return digits if len(digits) == 6 else None
+
+def _field(obj, name):
+    return obj.get(name) if isinstance(obj, dict) else getattr(obj, name, None)
+
+def identity_keys(application) -> List[Tuple[str, str]]:
+    """(kind, value) pairs for an application, an ApplicationCreate or a row dict"""
+    pan, gstin = normalize_registration(_field(application, "registration_number"))
+    name = normalize_business_name(_field(application, "business_name"))
+    pincode = normalize_pincode(_field(application, "postal_code"))
+    keys = [
+        ("pan", pan),
+        ("gst", gstin),
+        ("phone", normalize_phone(_field(application, "phone"))),
+        ("email", normalize_email(_field(application, "email"))),
+        ("name_pincode", f"{pincode}:{name}" if name and pincode else None),
+    ]
+    return [(kind, value) for kind, value in keys if value]
+
+# Lookups
+
+def _key_condition(keys: Iterable[Tuple[str, str]]):
+    values = defaultdict(set)
+    for kind, value in keys:
+        values[kind].add(value)
+    return or_(*(
+        and_(ApplicationIdentityKey.kind == kind, ApplicationIdentityKey.value.in_(sorted(kind_values)))
+        for kind, kind_values in values.items()
+    ))
+
+def lookup(db: Session, keys: Iterable[Tuple[str, str]], exclude_id: Optional[int] = None):
+    """(application id, kind, value, status) for every stored key among `keys`"""
+    keys = iter(sorted(set(keys)))
+    rows = []
+    while True:
+        chunk = list(islice(keys, LOOKUP_CHUNK_SIZE))
+        if not chunk:
+            return rows
+        query = (
+            select(
+                ApplicationIdentityKey.application_id, ApplicationIdentityKey.kind, ApplicationIdentityKey.value,
+                Application.status,
+            )
+            .join(Application, Application.id == ApplicationIdentityKey.application_id)
+            .where(_key_condition(chunk))
+        )
+        if exclude_id is not None:
+            query = query.where(ApplicationIdentityKey.application_id != exclude_id)
+        rows.extend(db.execute(query).all())
+
+def find_matches(db: Session, keys: Iterable[Tuple[str, str]], exclude_id: Optional[int] = None) -> Dict[int, Set[str]]:
+    """{application id: kinds shared} for applications sharing any of `keys`"""
+    matches = defaultdict(set)
+    for application_id, kind, _, _ in lookup(db, keys, exclude_id):
+        matches[application_id].add(kind)
+    return dict(matches)
+
+def add_keys(db: Session, applications: Iterable[Tuple[int, List[Tuple[str, str]]]]):
+    """Store (application id, keys) pairs"""
+    rows = [
+        {"application_id": application_id, "kind": kind, "value": value}
+        for application_id, keys in applications for kind, value in keys
+    ]
+    if rows:
+        db.execute(insert(ApplicationIdentityKey.__table__), rows)
+
+# Submissions
+
+def _lock(db: Session, keys: List[Tuple[str, str]]):
+    # Held until commit: a concurrent submission sharing a key waits and then
+    # sees this one. In sorted order, so two submissions cannot deadlock.
+    # SQLite needs no lock: the application insert already holds the database
+    # write lock when the keys are looked up
+    for kind, value in sorted(keys):
+        db.execute(
+            text("SELECT pg_advisory_xact_lock(:lock_class, hashtext(:key))"),
+            {"lock_class": LOCK_CLASS, "key": f"{kind}:{value}"},
+        )
+
+def register(db: Session, application: Application):
+    """Check a new, flushed application against the index, then index it.
+
+    Raises DuplicateApplication in reject mode; the caller rolls back.
+    """
+    keys = identity_keys(application)
+    if DEDUPE_MODE != "off" and keys:
+        blocking = [key for key in keys if key[0] in DEDUPE_BLOCKING_KINDS]
+        if blocking and db.get_bind().dialect.name == "postgresql":
+            _lock(db, blocking)
+        rows = lookup(db, keys, exclude_id=application.id)
+        metrics["checked"] += 1
+        if rows:
+            in_progress = {
+                kind for _, kind, _, status in rows
+                if kind in DEDUPE_BLOCKING_KINDS and status != ApplicationStatus.REJECTED
+            }
+            if DEDUPE_MODE == "reject" and in_progress:
+                metrics["rejected"] += 1
+                exc = DuplicateApplication(in_progress)
+                logger.info("Rejected submission: %s", exc)
+                raise exc
+            metrics["flagged"] += 1
+            matches = defaultdict(set)
+            for application_id, kind, _, _ in rows:
+                matches[application_id].add(kind)
+            note = "Possible duplicate of " + "; ".join(
+                f"#{application_id} ({', '.join(sorted(kinds))})" for application_id, kinds in sorted(matches.items())
+            )
+            application.admin_notes = f"{application.admin_notes}\n{note}" if application.admin_notes else note
+    add_keys(db, [(application.id, keys)])
+
+def screen_batch(db: Session, rows: List[dict], seen: Set[Tuple[str, str]]):
+    """Identity keys for each row of an import batch, and the blocking kinds
+    each one duplicates (empty for rows that may go in).
+
+    `seen` collects the blocking keys of rows accepted so far in the import,
+    so a file repeating a business is caught as well. Imports take no locks;
+    find_duplicates catches a duplicate submitted during one.
+    """
+    keys = [identity_keys(row) for row in rows]
+    duplicates = [set() for _ in rows]
+    if DEDUPE_MODE != "reject":
+        return keys, duplicates
+
+    blocking = {key for row_keys in keys for key in row_keys if key[0] in DEDUPE_BLOCKING_KINDS}
+    stored = {
+        (kind, value) for _, kind, value, status in lookup(db, blocking)
+        if status != ApplicationStatus.REJECTED
+    }
+    for row_keys, row_duplicates in zip(keys, duplicates):
+        row_blocking = [key for key in row_keys if key[0] in DEDUPE_BLOCKING_KINDS]
+        row_duplicates.update(kind for kind, value in row_blocking if (kind, value) in stored or (kind, value) in seen)
+        if not row_duplicates:
+            seen.update(row_blocking)
+    metrics["checked"] += len(rows)
+    metrics["rejected"] += sum(1 for row_duplicates in duplicates if row_duplicates)
+    return keys, duplicates
+
+def rebuild_keys(db: Session, batch_size: int = 10000) -> int:
+    """Recompute every application's keys, for data that predates the index"""
+    db.execute(delete(ApplicationIdentityKey))
+    columns = (Application.id, Application.registration_number, Application.phone, Application.email,
+               Application.business_name, Application.postal_code)
+    result = db.execute(
+        select(*columns).order_by(Application.id),
+        execution_options={"stream_results": True, "yield_per": batch_size},
+    )
+    count = 0
+    for partition in result.partitions():
+        applications = [(row.id, identity_keys(row)) for row in partition]
+        add_keys(db, applications)
+        count += len(applications)
+    return count
+
+# Clustering
+
+@dataclass
+class ClusterReport:
+    applications: int = 0
+    blocks: int = 0
+    oversized_blocks: int = 0
+    candidate_pairs: int = 0
+    duplicate_pairs: int = 0
+    clusters: int = 0
+    clustered_applications: int = 0
+    dry_run: bool = False
+
+def _name_similarity(a: str, b: str) -> float:
+    return difflib.SequenceMatcher(None, a, b).ratio()
+
+def score_pair(shared: Set[str], name_a: Optional[Tuple[str, str]], name_b: Optional[Tuple[str, str]]):
+    """(score, evidence) for two applications sharing the keys in `shared`;
+    names are (pincode, normalised business name)"""
+    evidence = {kind: WEIGHTS[kind] for kind in shared}
+    if "name_pincode" not in evidence and name_a and name_b and name_a[0] == name_b[0]:
+        similarity = _name_similarity(name_a[1], name_b[1])
+        if similarity >= NAME_SIMILARITY:
+            evidence["similar_name"] = WEIGHTS["name_pincode"] * similarity
+    remaining = 1.0
+    for weight in evidence.values():
+        remaining *= 1 - weight
+    return 1 - remaining, sorted(evidence)
+
+class _DisjointSet:
+    def __init__(self):
+        self.parent = {}
+
+    def find(self, item):
+        parent = self.parent.setdefault(item, item)
+        if parent != item:
+            parent = self.parent[item] = self.find(parent)
+        return parent
+
+    def union(self, a, b):
+        a, b = self.find(a), self.find(b)
+        if a != b:
+            self.parent[max(a, b)] = min(a, b)
+
+def find_duplicates(db: Session, threshold: Optional[float] = None, dry_run: bool = False, batch_size: int = 10000) -> ClusterReport:
+    """Cluster duplicate applications and replace application_duplicates
+    with the result (unless dry_run); the caller commits"""
+    threshold = DEDUPE_CLUSTER_THRESHOLD if threshold is None else threshold
+    report = ClusterReport(dry_run=dry_run)
+    shared = defaultdict(set)
+    names = {}
+    seen = set()
+
+    def pair(members, kind=None):
+        members = sorted(set(members))
+        if len(members) < 2:
+            return
+        report.blocks += 1
+        if len(members) > DEDUPE_MAX_BLOCK_SIZE:
+            report.oversized_blocks += 1
+            return
+        for i, a in enumerate(members):
+            for b in members[i + 1:]:
+                kinds = shared[(a, b)]
+                if kind:
+                    kinds.add(kind)
+
+    # Blocks of applications sharing a key, read in index order
+    result = db.execute(
+        select(ApplicationIdentityKey.kind, ApplicationIdentityKey.value, ApplicationIdentityKey.application_id)
+        .order_by(ApplicationIdentityKey.kind, ApplicationIdentityKey.value),
+        execution_options={"stream_results": True, "yield_per": batch_size},
+    )
+    block, members = None, []
+    for kind, value, application_id in result:
+        seen.add(application_id)
+        if (kind, value) != block:
+            pair(members, block and block[0])
+            block, members = (kind, value), []
+        members.append(application_id)
+        if kind == "name_pincode":
+            pincode, _, name = value.partition(":")
+            names[application_id] = (pincode, name)
+    pair(members, block and block[0])
+    report.applications = len(seen)
+
+    # Blocks of similar names: same pincode and first distinctive word
+    name_blocks = defaultdict(list)
+    for application_id, (pincode, name) in names.items():
+        words = [word for word in name.split() if word not in COMMON_FIRST_WORDS]
+        if words:
+            name_blocks[(pincode, words[0])].append(application_id)
+    for members in name_blocks.values():
+        pair(members)
+
+    report.candidate_pairs = len(shared)
+    clusters = _DisjointSet()
+    best = defaultdict(float)
+    evidence = defaultdict(set)
+    for (a, b), kinds in shared.items():
+        score, matched_on = score_pair(kinds, names.get(a), names.get(b))
+        if score < threshold:
+            continue
+        report.duplicate_pairs += 1
+        clusters.union(a, b)
+        for application_id in (a, b):
+            best[application_id] = max(best[application_id], score)
+            evidence[application_id].update(matched_on)
+
+    members = {application_id: clusters.find(application_id) for application_id in best}
+    report.clusters = len(set(members.values()))
+    report.clustered_applications = len(members)
+    if not dry_run:
+        db.execute(delete(ApplicationDuplicate))
+        now = datetime.utcnow()
+        rows = [
+            {
+                "cluster_id": cluster_id, "application_id": application_id, "score": round(best[application_id], 4),
+                "matched_on": ",".join(sorted(evidence[application_id])), "detected_at": now,
+            }
+            for application_id, cluster_id in sorted(members.items())
+        ]
+        for start in range(0, len(rows), batch_size):
+            db.execute(insert(ApplicationDuplicate.__table__), rows[start:start + batch_size])
+    metrics["clusters"] = report.clusters
+    return report
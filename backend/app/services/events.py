@@ -0,0 +1,260 @@
+import asyncio
+import json
+import logging
+import os
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional, Set
+
+from sqlalchemy import event, func, select
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+
+from app.database import ASYNC_DATABASE_URL, ApplicationStatus
+from app.services import cache
+
+# Push notifications of application status changes
+#
+# GET /applications/track/{tracking_id}/events (server-sent events) and the
+# WebSocket at /applications/track/{tracking_id}/ws replace polling the
+# tracking endpoint. Every status change is an event whose id is its
+# ApplicationStatusUpdate id, so ids only grow: a client that reconnects with
+# Last-Event-ID is replayed the history rows it missed from the database, and
+# live events come from this worker's in-process bus.
+#
+#   EVENTS_BACKEND=memory      a change is published to the bus of the worker
+#                              that committed it, so with several workers
+#                              only clients connected to that worker hear it
+#   EVENTS_BACKEND=postgresql  a change runs pg_notify() in its own
+#                              transaction (delivered on commit); each worker
+#                              LISTENs on one dedicated connection and
+#                              publishes what it hears to its bus
+#
+# A subscriber that falls EVENTS_QUEUE_SIZE events behind, or every subscriber
+# when the LISTEN connection drops, is disconnected; clients reconnect with
+# Last-Event-ID and catch up from the database.
+#
+# With the postgresql backend, tracking cache invalidations travel on the same
+# channel: a commit that marks tracking IDs stale also notifies them, so every
+# worker's in-process cache (TRACKING_CACHE_BACKEND=memory) drops them. A
+# worker whose LISTEN connection dropped clears its cache.
+
+logger = logging.getLogger(__name__)
+
+EVENTS_BACKEND = os.getenv("EVENTS_BACKEND", "memory")
+EVENTS_CHANNEL = os.getenv("EVENTS_CHANNEL", "camopa_status_events")
+EVENTS_MAX_CONNECTIONS = int(os.getenv("EVENTS_MAX_CONNECTIONS", "1000"))
+EVENTS_HEARTBEAT_INTERVAL = float(os.getenv("EVENTS_HEARTBEAT_INTERVAL", "15"))
+EVENTS_QUEUE_SIZE = int(os.getenv("EVENTS_QUEUE_SIZE", "16"))
+EVENTS_RETRY_MS = int(os.getenv("EVENTS_RETRY_MS", "5000"))
+# Most history rows replayed to one resuming client
+EVENTS_MAX_REPLAY = 100
+
+def status_event(
+    event_id: int,
+    tracking_id: str,
+    status: ApplicationStatus,
+    previous_status: Optional[ApplicationStatus],
+    at: Optional[datetime],
+) -> dict:
+    return {
+        "id": event_id,
+        "tracking_id": tracking_id,
+        "status": status.value if status else None,
+        "previous_status": previous_status.value if previous_status else None,
+        "at": at.isoformat() if at else None,
+    }
+
+# Bus
+
+class EventStreamsFull(Exception):
+    """This worker already serves EVENTS_MAX_CONNECTIONS streams"""
+
+class Subscription:
+    def __init__(self, key: str, queue_size: int):
+        self.key = key
+        self.queue = asyncio.Queue(queue_size)
+        # Set when events were dropped; the stream ends so the client resumes
+        self.closed = False
+
+class EventBus:
+    """Fans events out to this worker's subscribers, keyed by tracking ID"""
+
+    def __init__(self, max_connections: int = EVENTS_MAX_CONNECTIONS, queue_size: int = EVENTS_QUEUE_SIZE):
+        self.max_connections = max_connections
+        self.queue_size = queue_size
+        self._subscribers: Dict[str, Set[Subscription]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.connections = 0
+        self.published = 0
+        self.dropped = 0
+
+    def subscribe(self, key: str) -> Subscription:
+        if self.connections >= self.max_connections:
+            raise EventStreamsFull()
+        self._loop = asyncio.get_running_loop()
+        subscription = Subscription(key, self.queue_size)
+        self._subscribers.setdefault(key, set()).add(subscription)
+        self.connections += 1
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        subscribers = self._subscribers.get(subscription.key)
+        if subscribers and subscription in subscribers:
+            subscribers.discard(subscription)
+            self.connections -= 1
+            if not subscribers:
+                del self._subscribers[subscription.key]
+
+    def publish(self, key: str, payload: dict):
+        """Deliver to this worker's subscribers; callable from any thread"""
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return  # nobody has subscribed in this process
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            self._deliver(key, payload)
+        else:
+            loop.call_soon_threadsafe(self._deliver, key, payload)
+
+    def _deliver(self, key: str, payload: dict):
+        self.published += 1
+        for subscription in self._subscribers.get(key, ()):
+            try:
+                subscription.queue.put_nowait(payload)
+            except asyncio.QueueFull:
+                subscription.closed = True
+                self.dropped += 1
+
+    def close_all(self):
+        """End every stream, e.g. after events may have been missed"""
+        for subscribers in self._subscribers.values():
+            for subscription in subscribers:
+                subscription.closed = True
+                # Wake a stream waiting on an empty queue
+                if subscription.queue.empty():
+                    subscription.queue.put_nowait(None)
+
+event_bus = EventBus()
+
+async def stream(subscription: Subscription, backlog: List[dict]) -> AsyncIterator[Optional[dict]]:
+    """The backlog, then live events; None every heartbeat interval without one"""
+    last_id = 0
+    for payload in backlog:
+        last_id = payload["id"]
+        yield payload
+    while not subscription.closed:
+        try:
+            payload = await asyncio.wait_for(subscription.queue.get(), EVENTS_HEARTBEAT_INTERVAL)
+        except asyncio.TimeoutError:
+            yield None
+            continue
+        # Subscribed before the backlog was read, so it may repeat events
+        if payload is not None and payload["id"] > last_id:
+            last_id = payload["id"]
+            yield payload
+
+# Publishing
+
+_PENDING_KEY = "pending_status_events"
+
+def publish_status_change(db: Session, payload: dict):
+    """Publish an event once the caller's transaction commits"""
+    if EVENTS_BACKEND == "postgresql" and db.get_bind().dialect.name == "postgresql":
+        # NOTIFY is transactional: delivered to listeners on commit only
+        db.execute(select(func.pg_notify(EVENTS_CHANNEL, json.dumps(payload))))
+    else:
+        db.info.setdefault(_PENDING_KEY, []).append(payload)
+
+@event.listens_for(Session, "after_commit")
+def _publish_after_commit(session):
+    for payload in session.info.pop(_PENDING_KEY, ()):
+        event_bus.publish(payload["tracking_id"], payload)
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_after_rollback(session, previous_transaction):
+    session.info.pop(_PENDING_KEY, None)
+
+# Tracking IDs per notification, well under NOTIFY's 8000 byte payload limit
+_INVALIDATIONS_PER_NOTIFY = 200
+
+def _broadcasts_invalidations() -> bool:
+    return EVENTS_BACKEND == "postgresql" and isinstance(cache.tracking_cache.backend, cache.LRUCacheBackend)
+
+@event.listens_for(Session, "before_commit")
+def _broadcast_invalidations(session):
+    stale = cache.stale_tracking_ids(session)
+    if not stale or not _broadcasts_invalidations() or session.get_bind().dialect.name != "postgresql":
+        return
+    stale = sorted(stale)
+    for start in range(0, len(stale), _INVALIDATIONS_PER_NOTIFY):
+        payload = json.dumps({"invalidate": stale[start:start + _INVALIDATIONS_PER_NOTIFY]})
+        session.execute(select(func.pg_notify(EVENTS_CHANNEL, payload)))
+
+# PostgreSQL fan-out
+
+class PostgresListener:
+    """LISTENs on a dedicated asyncpg connection and feeds the bus"""
+
+    def __init__(self, bus: EventBus, url: str = ASYNC_DATABASE_URL, channel: str = EVENTS_CHANNEL):
+        self.bus = bus
+        self.dsn = make_url(url).set(drivername="postgresql").render_as_string(hide_password=False)
+        self.channel = channel
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def _notified(self, connection, pid, channel, payload):
+        try:
+            event_payload = json.loads(payload)
+        except ValueError:
+            logger.warning("Ignoring malformed notification on %s", channel)
+            return
+        if "invalidate" in event_payload:
+            cache.tracking_cache.invalidate(event_payload["invalidate"])
+            return
+        self.bus.publish(event_payload["tracking_id"], event_payload)
+
+    async def _run(self):
+        import asyncpg
+
+        delay = 1.0
+        while True:
+            connection = None
+            try:
+                connection = await asyncpg.connect(self.dsn)
+                await connection.add_listener(self.channel, self._notified)
+                delay = 1.0
+                # Notifications sent while disconnected are lost
+                self.bus.close_all()
+                if _broadcasts_invalidations():
+                    cache.tracking_cache.clear()
+                closed = asyncio.Event()
+                connection.add_termination_listener(lambda _: closed.set())
+                await closed.wait()
+                logger.warning("Lost the %s LISTEN connection; reconnecting", self.channel)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Could not LISTEN on %s; retrying in %.0fs", self.channel, delay)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 60)
+            finally:
+                if connection is not None and not connection.is_closed():
+                    await connection.close()
+
+def create_listener(name: str = EVENTS_BACKEND) -> Optional[PostgresListener]:
+    if name == "postgresql":
+        return PostgresListener(event_bus)
+    return None
+
+listener = create_listener()
@@ -0,0 +1,234 @@
+import asyncio
+import hashlib
+import logging
+import multiprocessing
+import os
+import re
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from typing import Iterable, Optional
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import event, select, update
+from sqlalchemy.orm import Session
+
+from app.database import (
+    Application, ApprovalLetter, ApprovalLetterJob, AsyncSessionLocal, LetterJobStatus
+)
+from app.utils import ids
+from app.utils.pdf import render_approval_letter
+
+# Approval letter rendering pipeline
+#
+# Approving an application queues an ApprovalLetterJob in the same transaction.
+# Once it commits, the dispatcher renders the PDF in a process pool (keeping CPU
+# work off the event loop), stores it content-addressed under LETTERS_DIR and
+# records the path on the ApprovalLetter. Clients poll the job for its state.
+# A job left RUNNING by a worker that died is queued again when a worker
+# starts, once it has gone LETTER_LEASE_SECONDS without an update.
+
+logger = logging.getLogger(__name__)
+
+LETTERS_DIR = os.path.abspath(os.getenv("LETTERS_DIR", "./storage/letters"))
+LETTER_RENDER_WORKERS = int(os.getenv("LETTER_RENDER_WORKERS", "2"))
+LETTER_LEASE_SECONDS = int(os.getenv("LETTER_LEASE_SECONDS", "600"))
+
+DIGEST_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+
+def generate_dealership_id() -> str:
+    return ids.new_dealership_id()
+
+# Content-addressed storage
+
+def letter_path(digest: str) -> str:
+    return os.path.join(LETTERS_DIR, digest[:2], f"{digest}.pdf")
+
+def digest_of(file_path: Optional[str]) -> Optional[str]:
+    """Digest of a stored letter, or None if the path is not content-addressed"""
+    if not file_path:
+        return None
+    name = os.path.basename(file_path)
+    digest = name[:-4] if name.endswith(".pdf") else ""
+    return digest if DIGEST_PATTERN.match(digest) else None
+
+def store_pdf(pdf: bytes) -> str:
+    """Write the PDF under its SHA-256 digest (no-op if already stored); returns the path"""
+    path = letter_path(hashlib.sha256(pdf).hexdigest())
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "wb") as tmp:
+            tmp.write(pdf)
+        os.replace(tmp_path, path)
+    return path
+
+# Enqueueing
+
+_PENDING_KEY = "pending_letter_jobs"
+
+def enqueue_letter(db: Session, application_id: int) -> ApprovalLetterJob:
+    """Queue rendering for an application; dispatched after the session commits.
+
+    Returns the application's queued or running job instead if it has one.
+    """
+    job = db.scalars(
+        select(ApprovalLetterJob)
+        .where(
+            ApprovalLetterJob.application_id == application_id,
+            ApprovalLetterJob.status.in_([LetterJobStatus.QUEUED, LetterJobStatus.RUNNING]),
+        )
+        .order_by(ApprovalLetterJob.id)
+        .limit(1)
+    ).first()
+    if job is not None:
+        return job
+    job = ApprovalLetterJob(application_id=application_id, status=LetterJobStatus.QUEUED)
+    db.add(job)
+    db.flush()
+    db.info.setdefault(_PENDING_KEY, []).append(job.id)
+    return job
+
+@event.listens_for(Session, "after_commit")
+def _dispatch_after_commit(session):
+    job_ids = session.info.pop(_PENDING_KEY, None)
+    if job_ids:
+        dispatcher.submit(job_ids)
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_after_rollback(session, previous_transaction):
+    session.info.pop(_PENDING_KEY, None)
+
+# Dispatcher
+
+class LetterDispatcher:
+    """Runs queued jobs on the event loop, rendering in a process pool"""
+
+    def __init__(self, max_workers: int = LETTER_RENDER_WORKERS, lease_seconds: float = LETTER_LEASE_SECONDS):
+        self.max_workers = max_workers
+        self.lease_seconds = lease_seconds
+        self._executor = None
+        self._tasks = set()
+
+    def start(self):
+        # spawn: forking a process that runs an event loop and DB pools is unsafe
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn")
+        )
+
+    async def stop(self):
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self._executor:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def submit(self, job_ids: Iterable[int]):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # Committed from a script; a running API worker picks the job up on start
+            return
+        if self._executor is None:
+            return
+        for job_id in job_ids:
+            task = loop.create_task(self.run(job_id))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def resume_queued(self):
+        """Dispatch jobs queued while no worker was running, and jobs whose
+        worker died while rendering them"""
+        now = datetime.utcnow()
+        async with AsyncSessionLocal() as db:
+            await db.execute(
+                update(ApprovalLetterJob)
+                .where(
+                    ApprovalLetterJob.status == LetterJobStatus.RUNNING,
+                    ApprovalLetterJob.updated_at < now - timedelta(seconds=self.lease_seconds),
+                )
+                .values(status=LetterJobStatus.QUEUED, updated_at=now)
+            )
+            await db.commit()
+            result = await db.execute(
+                select(ApprovalLetterJob.id).where(ApprovalLetterJob.status == LetterJobStatus.QUEUED)
+            )
+            self.submit(result.scalars().all())
+
+    async def run(self, job_id: int):
+        letter = await self._claim(job_id)
+        if letter is None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+            pdf = await loop.run_in_executor(self._executor, render_approval_letter, letter)
+            path = await run_in_threadpool(store_pdf, pdf)
+            await self._complete(job_id, letter, path)
+        except Exception as exc:
+            logger.exception("Approval letter job %s failed", job_id)
+            await self._finish(job_id, LetterJobStatus.FAILED, error=str(exc))
+
+    async def _claim(self, job_id: int) -> Optional[dict]:
+        """Atomically move a queued job to RUNNING and snapshot the letter data"""
+        async with AsyncSessionLocal() as db:
+            claimed = await db.execute(
+                update(ApprovalLetterJob)
+                .where(ApprovalLetterJob.id == job_id, ApprovalLetterJob.status == LetterJobStatus.QUEUED)
+                .values(status=LetterJobStatus.RUNNING, attempts=ApprovalLetterJob.attempts + 1, updated_at=datetime.utcnow())
+                .returning(ApprovalLetterJob.application_id)
+            )
+            application_id = claimed.scalar()
+            if application_id is None:
+                return None  # already taken by another worker
+            application = await db.get(Application, application_id)
+            existing = (await db.execute(
+                select(ApprovalLetter).where(ApprovalLetter.application_id == application_id)
+            )).scalars().first()
+            await db.commit()
+
+        issued_date = existing.issued_date if existing else datetime.utcnow()
+        return {
+            "application_id": application_id,
+            "dealership_id": existing.dealership_id if existing else generate_dealership_id(),
+            "issued_date": issued_date.strftime("%d %B %Y"),
+            "issued_at": issued_date,
+            "tracking_id": application.tracking_id,
+            "full_name": application.full_name,
+            "business_name": application.business_name,
+            "street_address": application.street_address,
+            "city": application.city,
+            "state": application.state,
+            "postal_code": application.postal_code,
+        }
+
+    async def _complete(self, job_id: int, letter: dict, path: str):
+        async with AsyncSessionLocal() as db:
+            existing = (await db.execute(
+                select(ApprovalLetter).where(ApprovalLetter.application_id == letter["application_id"])
+            )).scalars().first()
+            if existing:
+                existing.file_path = path
+            else:
+                db.add(ApprovalLetter(
+                    application_id=letter["application_id"],
+                    dealership_id=letter["dealership_id"],
+                    file_path=path,
+                    issued_date=letter["issued_at"],
+                ))
+            await self._mark(db, job_id, LetterJobStatus.COMPLETED, file_path=path)
+            await db.commit()
+
+    async def _finish(self, job_id: int, status: LetterJobStatus, **values):
+        async with AsyncSessionLocal() as db:
+            await self._mark(db, job_id, status, **values)
+            await db.commit()
+
+    @staticmethod
+    async def _mark(db, job_id: int, status: LetterJobStatus, **values):
+        await db.execute(
+            update(ApprovalLetterJob)
+            .where(ApprovalLetterJob.id == job_id)
+            .values(status=status, updated_at=datetime.utcnow(), **values)
+        )
+
+dispatcher = LetterDispatcher()
@@ -0,0 +1,375 @@
+import enum
+import gzip
+import json
+import os
+import posixpath
+import tempfile
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from itertools import islice
+from typing import List, Optional, Tuple
+
+from sqlalchemy import DateTime, Enum, delete, exists, func, insert, select, text
+from sqlalchemy.orm import Session
+
+from app.database import (
+    Application, ApplicationDuplicate, ApplicationIdentityKey, ApplicationStatus, ApplicationStatusUpdate,
+    ApprovalLetter, ApprovalLetterJob, ArchivedRecord, LetterJobStatus, NotificationOutbox, NotificationStatus,
+    Payment, SupportRequest,
+)
+from app.services import analytics
+
+# Data lifecycle: archival and partitioning
+#
+# `python -m app.cli archive` moves rejected applications untouched for
+# ARCHIVE_APPLICATIONS_AFTER_DAYS and resolved support requests untouched for
+# ARCHIVE_SUPPORT_AFTER_DAYS out of the database, ARCHIVE_BATCH_SIZE at a time:
+#
+#   1. the batch is written to a gzipped NDJSON file under ARCHIVE_DIR, one
+#      line per record. An application's line carries its status history,
+#      payments, letters and notifications with it
+#   2. in one transaction, archived_records gets the file and line of each
+#      record and the rows are deleted
+#
+# A crash between the two leaves an unreferenced file and the rows in place,
+# so the job can simply run again. Applications with an email or a letter
+# still in flight wait for a later run.
+#
+# Archived records are read on demand through archived_records, one file
+# decompressed per read; the tracking endpoint falls back to it, so applicants
+# can still look up an archived application. Identity keys and duplicate
+# clusters are derived data and are deleted, not archived. Dashboard counters
+# stop counting archived applications, their approvals and their payments in
+# the transaction that deletes them, so they agree with `rebuild-analytics`,
+# which only sees the rows left.
+#
+# On PostgreSQL, application_status_updates and support_requests are range
+# partitioned by month of created_at (migration 0004), so recent rows and
+# their indexes sit in small partitions. Each archive run, and the daily
+# maintain-partitions job (app.services.scheduler), creates partitions
+# PARTITION_MONTHS_AHEAD months ahead. Rows past them land in the default
+# partition until their month's partition is created, which moves them in.
+
+ARCHIVE_DIR = os.path.abspath(os.getenv("ARCHIVE_DIR", "./storage/archive"))
+ARCHIVE_APPLICATIONS_AFTER_DAYS = int(os.getenv("ARCHIVE_APPLICATIONS_AFTER_DAYS", "365"))
+ARCHIVE_SUPPORT_AFTER_DAYS = int(os.getenv("ARCHIVE_SUPPORT_AFTER_DAYS", "180"))
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "1000"))
+PARTITION_MONTHS_AHEAD = int(os.getenv("PARTITION_MONTHS_AHEAD", "3"))
+
+PARTITIONED_TABLES = ("application_status_updates", "support_requests")
+# Tables whose size the storage report shows
+HOT_TABLES = ("applications", "application_status_updates", "payments", "support_requests", "archived_records")
+
+# archived_records.kind
+APPLICATION = "application"
+SUPPORT_REQUEST = "support_request"
+
+# Rows archived on an application's line, under these keys
+APPLICATION_CHILDREN = {
+    "status_updates": ApplicationStatusUpdate,
+    "payments": Payment,
+    "approval_letters": ApprovalLetter,
+    "letter_jobs": ApprovalLetterJob,
+    "notifications": NotificationOutbox,
+}
+# Derived from the application and deleted with it
+_DERIVED = (ApplicationIdentityKey, ApplicationDuplicate)
+
+metrics = Counter()
+
+@dataclass
+class ArchiveReport:
+    applications: int = 0
+    support_requests: int = 0
+    files: int = 0
+    bytes_written: int = 0
+    partitions_created: int = 0
+    dry_run: bool = False
+
+# Archive files
+
+def _plain(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, enum.Enum):
+        return value.value
+    raise TypeError(f"Cannot archive {type(value).__name__}")
+
+def restore(table, values: dict) -> dict:
+    """Column values from an archive line, typed as the table's columns"""
+    restored = dict(values)
+    for column in table.c:
+        value = values.get(column.key)
+        if value is None:
+            continue
+        if isinstance(column.type, DateTime):
+            restored[column.key] = datetime.fromisoformat(value)
+        elif isinstance(column.type, Enum) and column.type.enum_class is not None:
+            restored[column.key] = column.type.enum_class(value)
+    return restored
+
+def write_batch(kind: str, lines: List[dict]) -> Tuple[str, int]:
+    """Write one gzipped NDJSON file; returns its path relative to ARCHIVE_DIR and its size"""
+    now = datetime.utcnow()
+    relative = posixpath.join(kind, f"{now:%Y}", f"{now:%m}", f"{kind}-{now:%Y%m%dT%H%M%S%f}.ndjson.gz")
+    path = os.path.join(ARCHIVE_DIR, *relative.split("/"))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as raw:
+            with gzip.GzipFile(fileobj=raw, mode="wb", mtime=0) as out:
+                for line in lines:
+                    out.write(json.dumps(line, default=_plain, separators=(",", ":")).encode() + b"\n")
+            raw.flush()
+            # On disk before the rows it holds are deleted
+            os.fsync(raw.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return relative, os.path.getsize(path)
+
+def read_line(archive_file: str, line: int) -> dict:
+    with gzip.open(os.path.join(ARCHIVE_DIR, *archive_file.split("/")), "rt", encoding="utf-8") as fh:
+        return json.loads(next(islice(fh, line, None)))
+
+def _store(db: Session, kind: str, lines: List[dict], keys: List[tuple], report: ArchiveReport):
+    """Write a batch and index it; keys are (record_id, lookup_key, created_at) per line"""
+    archive_file, size = write_batch(kind, lines)
+    now = datetime.utcnow()
+    db.execute(insert(ArchivedRecord.__table__), [
+        {
+            "kind": kind, "record_id": record_id, "lookup_key": lookup_key, "archive_file": archive_file,
+            "line": line, "created_at": created_at or now, "archived_at": now,
+        }
+        for line, (record_id, lookup_key, created_at) in enumerate(keys)
+    ])
+    report.files += 1
+    report.bytes_written += size
+
+# Archiving
+
+def _due_applications(cutoff: datetime, after_id: int, limit: int):
+    mail_in_flight = exists().where(
+        NotificationOutbox.application_id == Application.id,
+        NotificationOutbox.status.in_((NotificationStatus.PENDING, NotificationStatus.SENDING)),
+    )
+    letter_in_flight = exists().where(
+        ApprovalLetterJob.application_id == Application.id,
+        ApprovalLetterJob.status.in_((LetterJobStatus.QUEUED, LetterJobStatus.RUNNING)),
+    )
+    return (
+        select(Application.__table__)
+        .where(
+            Application.status == ApplicationStatus.REJECTED,
+            Application.updated_at < cutoff,
+            Application.id > after_id,
+            ~mail_in_flight,
+            ~letter_in_flight,
+        )
+        .order_by(Application.id)
+        .limit(limit)
+    )
+
+def archive_applications(db: Session, cutoff: datetime, batch_size: int, report: ArchiveReport):
+    after_id = 0
+    while True:
+        rows = db.execute(_due_applications(cutoff, after_id, batch_size)).mappings().all()
+        if not rows:
+            return
+        after_id = rows[-1]["id"]
+        report.applications += len(rows)
+        if report.dry_run:
+            continue
+
+        application_ids = [row["id"] for row in rows]
+        children = {}
+        for key, model in APPLICATION_CHILDREN.items():
+            by_application = defaultdict(list)
+            for child in db.execute(
+                select(model.__table__).where(model.application_id.in_(application_ids)).order_by(model.id)
+            ).mappings():
+                by_application[child["application_id"]].append(dict(child))
+            children[key] = by_application
+        lines = [
+            {APPLICATION: dict(row), **{key: children[key][row["id"]] for key in APPLICATION_CHILDREN}}
+            for row in rows
+        ]
+        _store(db, APPLICATION, lines, [(row["id"], row["tracking_id"], row["created_at"]) for row in rows], report)
+        analytics.record_applications_removed(db, [
+            (row, children["status_updates"][row["id"]], children["payments"][row["id"]]) for row in rows
+        ])
+        for model in (*APPLICATION_CHILDREN.values(), *_DERIVED):
+            db.execute(delete(model.__table__).where(model.application_id.in_(application_ids)))
+        db.execute(delete(Application.__table__).where(Application.id.in_(application_ids)))
+        db.commit()
+        metrics["applications_archived"] += len(rows)
+
+def archive_support_requests(db: Session, cutoff: datetime, batch_size: int, report: ArchiveReport):
+    after_id = 0
+    while True:
+        rows = db.execute(
+            select(SupportRequest.__table__)
+            .where(
+                SupportRequest.is_resolved.is_(True),
+                func.coalesce(SupportRequest.updated_at, SupportRequest.created_at) < cutoff,
+                SupportRequest.id > after_id,
+            )
+            .order_by(SupportRequest.id)
+            .limit(batch_size)
+        ).mappings().all()
+        if not rows:
+            return
+        after_id = rows[-1]["id"]
+        report.support_requests += len(rows)
+        if report.dry_run:
+            continue
+
+        request_ids = [row["id"] for row in rows]
+        lines = [{SUPPORT_REQUEST: dict(row)} for row in rows]
+        _store(db, SUPPORT_REQUEST, lines, [(row["id"], None, row["created_at"]) for row in rows], report)
+        db.execute(delete(SupportRequest.__table__).where(SupportRequest.id.in_(request_ids)))
+        db.commit()
+        metrics["support_requests_archived"] += len(rows)
+
+def archive(
+    db: Session,
+    applications_after_days: int = ARCHIVE_APPLICATIONS_AFTER_DAYS,
+    support_after_days: int = ARCHIVE_SUPPORT_AFTER_DAYS,
+    batch_size: int = ARCHIVE_BATCH_SIZE,
+    dry_run: bool = False,
+    now: Optional[datetime] = None,
+) -> ArchiveReport:
+    """Create upcoming partitions and archive what is due; commits after each batch"""
+    now = now or datetime.utcnow()
+    report = ArchiveReport(dry_run=dry_run)
+    if not dry_run:
+        report.partitions_created = ensure_partitions(db, today=now.date())
+        db.commit()
+    archive_applications(db, now - timedelta(days=applications_after_days), batch_size, report)
+    archive_support_requests(db, now - timedelta(days=support_after_days), batch_size, report)
+    return report
+
+# Reading archived records
+
+def get_archived(db: Session, kind: str, record_id: Optional[int] = None, lookup_key: Optional[str] = None) -> Optional[dict]:
+    """An archived record by its original id or lookup key, with its archive line as `data`"""
+    query = select(ArchivedRecord).where(ArchivedRecord.kind == kind)
+    if record_id is not None:
+        query = query.where(ArchivedRecord.record_id == record_id)
+    else:
+        query = query.where(ArchivedRecord.lookup_key == lookup_key)
+    entry = db.scalars(query).first()
+    if entry is None:
+        return None
+    metrics["reads"] += 1
+    return {
+        "kind": entry.kind,
+        "record_id": entry.record_id,
+        "created_at": entry.created_at,
+        "archived_at": entry.archived_at,
+        "archive_file": entry.archive_file,
+        "data": read_line(entry.archive_file, entry.line),
+    }
+
+def get_archived_application(db: Session, tracking_id: str) -> Optional[dict]:
+    """An archived application's own columns"""
+    record = get_archived(db, APPLICATION, lookup_key=tracking_id)
+    return restore(Application.__table__, record["data"][APPLICATION]) if record else None
+
+# Partitions (PostgreSQL)
+
+def is_partitioned(db: Session, table: str) -> bool:
+    if db.get_bind().dialect.name != "postgresql":
+        return False
+    return db.execute(
+        text(
+            "SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+            "WHERE c.relname = :table AND pg_table_is_visible(c.oid)"
+        ),
+        {"table": table},
+    ).first() is not None
+
+def month_start(day: date, months: int = 0) -> date:
+    """First day of the month `months` after day's month"""
+    month = day.year * 12 + day.month - 1 + months
+    return date(month // 12, month % 12 + 1, 1)
+
+def partition_name(table: str, month: date) -> str:
+    return f"{table}_p{month:%Y%m}"
+
+def _add_partition(db: Session, table: str, name: str, start: date, end: date, default: Optional[str]):
+    bounds = f"FOR VALUES FROM ('{start}') TO ('{end}')"
+    in_range = {"start": start, "end": end}
+    stray = default and db.execute(
+        text(f"SELECT 1 FROM {default} WHERE created_at >= :start AND created_at < :end LIMIT 1"), in_range
+    ).first()
+    if not stray:
+        db.execute(text(f"CREATE TABLE {name} PARTITION OF {table} {bounds}"))
+        return
+    # PostgreSQL refuses a partition whose rows sit in the default partition:
+    # take the default out, create the partition, move the rows into it and
+    # put the default back. Writes to the table wait until the commit
+    db.execute(text(f"ALTER TABLE {table} DETACH PARTITION {default}"))
+    db.execute(text(f"CREATE TABLE {name} PARTITION OF {table} {bounds}"))
+    moved = db.execute(text(
+        f"WITH moved AS (DELETE FROM {default} WHERE created_at >= :start AND created_at < :end RETURNING *) "
+        f"INSERT INTO {table} SELECT * FROM moved"
+    ), in_range).rowcount
+    db.execute(text(f"ALTER TABLE {table} ATTACH PARTITION {default} DEFAULT"))
+    metrics["partition_rows_moved"] += moved
+
+def ensure_partitions(db: Session, months_ahead: int = PARTITION_MONTHS_AHEAD, today: Optional[date] = None) -> int:
+    """Create the monthly partitions from this month to months_ahead; returns how many were missing
+
+    Rows of a new partition's month already in the default partition are moved into it.
+    """
+    today = today or datetime.utcnow().date()
+    created = 0
+    for table in PARTITIONED_TABLES:
+        if not is_partitioned(db, table):
+            continue
+        existing = set(db.scalars(
+            text(
+                "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+                "WHERE i.inhparent = CAST(:table AS regclass)"
+            ),
+            {"table": table},
+        ))
+        default = f"{table}_default" if f"{table}_default" in existing else None
+        for months in range(months_ahead + 1):
+            start = month_start(today, months)
+            name = partition_name(table, start)
+            if name not in existing:
+                _add_partition(db, table, name, start, month_start(start, 1), default)
+                created += 1
+    metrics["partitions_created"] += created
+    return created
+
+def storage_report(db: Session) -> dict:
+    """Rows, and on PostgreSQL table and index bytes, of the tables archival keeps small"""
+    if db.get_bind().dialect.name != "postgresql":
+        return {"tables": {
+            table: {"rows": db.scalar(select(func.count()).select_from(text(table)))} for table in HOT_TABLES
+        }}
+    tables = {}
+    for table in HOT_TABLES:
+        relations = (
+            "SELECT relid FROM pg_partition_tree(CAST(:table AS regclass)) WHERE isleaf"
+            if is_partitioned(db, table) else "SELECT CAST(:table AS regclass) AS relid"
+        )
+        tables[table] = dict(db.execute(
+            text(
+                "SELECT count(*) AS partitions, coalesce(sum(greatest(c.reltuples, 0)), 0)::bigint AS rows, "
+                "coalesce(sum(pg_relation_size(t.relid)), 0)::bigint AS table_bytes, "
+                "coalesce(sum(pg_indexes_size(t.relid)), 0)::bigint AS index_bytes "
+                f"FROM ({relations}) t JOIN pg_class c ON c.oid = t.relid"
+            ),
+            {"table": table},
+        ).mappings().one())
+    return {
+        "shared_buffers_bytes": db.scalar(text("SELECT pg_size_bytes(current_setting('shared_buffers'))")),
+        "tables": tables,
+    }
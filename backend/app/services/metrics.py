@@ -0,0 +1,472 @@
+import asyncio
+import contextvars
+import glob
+import json
+import logging
+import os
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from starlette.routing import Match
+
+from app.utils.settings import env_bool
+
+slow_request_logger = logging.getLogger("app.slow_requests")
+
+# Request and database instrumentation, exposed on /metrics
+#
+# MetricsMiddleware times every HTTP request and labels it with the route
+# template and the app.routers module that serves it. Engine events add each
+# SQL statement to the current request's stats through a context variable, so
+# per-request query counts (N+1 patterns) and SQL time land in histograms, and
+# requests slower than SLOW_REQUEST_MS are logged with the statements they ran.
+#
+# Metrics live in this worker process. With several gunicorn workers, set
+# METRICS_DIR to a directory shared by them (emptied before each start): each
+# worker writes a snapshot there every METRICS_FLUSH_INTERVAL seconds and
+# /metrics serves the sum over all workers.
+
+METRICS_ENABLED = env_bool("METRICS_ENABLED", True)
+METRICS_DIR = os.getenv("METRICS_DIR")
+METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", "5"))
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "500"))
+# Statements kept per request for the slow-request log
+SLOW_REQUEST_MAX_STATEMENTS = int(os.getenv("SLOW_REQUEST_MAX_STATEMENTS", "50"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (100, 1000, 10000, 100000, 1000000, 10000000)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+# Metric types
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.values: Dict[tuple, object] = {}
+
+    def samples(self, values: dict):
+        """(suffix, labels, bucket bound or None, value) in exposition order"""
+        for labels, value in sorted(values.items()):
+            yield "", labels, None, value
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, labels: tuple = (), amount: float = 1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, labels: tuple, value: float):
+        self.values[labels] = value
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, labels: tuple, value: float):
+        # [count per bucket..., count above the last bucket, sum]
+        entry = self.values.get(labels)
+        if entry is None:
+            entry = self.values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                entry[i] += 1
+                break
+        else:
+            entry[len(self.buckets)] += 1
+        entry[-1] += value
+
+    def samples(self, values: dict):
+        for labels, entry in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, entry):
+                cumulative += count
+                yield "_bucket", labels, _format_value(bound), cumulative
+            cumulative += entry[len(self.buckets)]
+            yield "_bucket", labels, "+Inf", cumulative
+            yield "_count", labels, None, cumulative
+            yield "_sum", labels, None, entry[-1]
+
+class Registry:
+    def __init__(self):
+        self.metrics: List[Metric] = []
+        # Called before every export to refresh gauges and mirrored counters
+        self.collectors: List[Callable[[], None]] = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def collect(self):
+        for collector in self.collectors:
+            collector()
+
+    def snapshot(self) -> dict:
+        self.collect()
+        return {
+            metric.name: [[list(labels), value] for labels, value in metric.values.items()]
+            for metric in self.metrics
+        }
+
+    def render(self, snapshots: Optional[List[dict]] = None) -> str:
+        """Prometheus text exposition of this process, or of merged snapshots"""
+        if snapshots is None:
+            self.collect()
+            values = {metric.name: metric.values for metric in self.metrics}
+        else:
+            values = _merge(self.metrics, snapshots)
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for suffix, labels, bound, value in metric.samples(values.get(metric.name, {})):
+                pairs = [f'{name}="{_escape(label)}"' for name, label in zip(metric.labelnames, labels)]
+                if bound is not None:
+                    pairs.append(f'le="{bound}"')
+                label_text = "{" + ",".join(pairs) + "}" if pairs else ""
+                lines.append(f"{metric.name}{suffix}{label_text} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_value(value) -> str:
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+def _merge(metrics: List[Metric], snapshots: List[dict]) -> Dict[str, dict]:
+    # Counters and histograms add up across workers; gauges carry a pid label
+    merged = {}
+    for metric in metrics:
+        values = merged[metric.name] = {}
+        for snapshot in snapshots:
+            for labels, value in snapshot.get(metric.name, ()):
+                labels = tuple(labels)
+                if metric.kind == "histogram" and labels in values:
+                    values[labels] = [a + b for a, b in zip(values[labels], value)]
+                elif metric.kind == "counter" and labels in values:
+                    values[labels] += value
+                else:
+                    values[labels] = value
+    return merged
+
+registry = Registry()
+
+REQUEST_LABELS = ("router", "route", "method")
+
+http_requests = registry.register(Counter(
+    "http_requests_total", "HTTP requests by route and status code", REQUEST_LABELS + ("status",)
+))
+http_request_duration = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency", REQUEST_LABELS, LATENCY_BUCKETS
+))
+http_response_size = registry.register(Histogram(
+    "http_response_size_bytes", "HTTP response body size", REQUEST_LABELS, SIZE_BUCKETS
+))
+db_queries_per_request = registry.register(Histogram(
+    "db_queries_per_request", "SQL statements executed per HTTP request", REQUEST_LABELS, QUERY_COUNT_BUCKETS
+))
+db_query_seconds_per_request = registry.register(Histogram(
+    "db_query_seconds_per_request", "Time spent in SQL per HTTP request", REQUEST_LABELS, LATENCY_BUCKETS
+))
+http_slow_requests = registry.register(Counter(
+    "http_slow_requests_total", "Requests slower than SLOW_REQUEST_MS", REQUEST_LABELS
+))
+
+# Mirrored from the counters other modules keep for /health endpoints
+rate_limit_rejections = registry.register(Counter(
+    "rate_limit_rejections_total", "Requests rejected by each rate limit rule", ("rule",)
+))
+rate_limit_backend_errors = registry.register(Counter(
+    "rate_limit_backend_errors_total", "Rate limit checks allowed because the shared store failed"
+))
+tracking_loads = registry.register(Counter(
+    "tracking_loads_total", "Tracking cache misses that queried the database or joined a running query", ("outcome",)
+))
+tracking_stale_fills = registry.register(Counter(
+    "tracking_cache_stale_fills_total", "Tracking loads not cached because the application changed while they ran"
+))
+db_pool_checked_out = registry.register(Gauge(
+    "db_pool_checked_out", "Connections currently checked out", ("pid", "engine")
+))
+db_pool_checkouts = registry.register(Counter(
+    "db_pool_checkouts_total", "Connection checkouts", ("engine",)
+))
+db_pool_checkout_wait = registry.register(Counter(
+    "db_pool_checkout_wait_seconds_total", "Time spent waiting for a pooled connection", ("engine",)
+))
+event_streams_open = registry.register(Gauge(
+    "event_streams_open", "Open status event streams (SSE and WebSocket)", ("pid",)
+))
+events_published = registry.register(Counter(
+    "events_published_total", "Status events delivered to a worker's event bus"
+))
+event_streams_dropped = registry.register(Counter(
+    "event_streams_dropped_total", "Event streams closed because the client fell behind"
+))
+scheduler_job_runs = registry.register(Counter(
+    "scheduler_job_runs_total", "Scheduled job runs by outcome", ("job", "outcome")
+))
+scheduler_job_seconds = registry.register(Counter(
+    "scheduler_job_seconds_total", "Time spent running each scheduled job", ("job",)
+))
+scheduler_job_items = registry.register(Counter(
+    "scheduler_job_items_total", "Items processed by each scheduled job", ("job",)
+))
+scheduler_job_backlog = registry.register(Gauge(
+    "scheduler_job_backlog", "Items still due after a scheduled job's last run", ("pid", "job")
+))
+scheduler_job_last_duration = registry.register(Gauge(
+    "scheduler_job_last_duration_seconds", "Duration of a scheduled job's last run", ("pid", "job")
+))
+
+def _collect_app_metrics():
+    from app.database import async_engine, engine
+    from app.services import ratelimit, scheduler
+    from app.services.cache import tracking_cache, tracking_loads as loads
+    from app.services.events import event_bus
+    from app.utils.db_pool import _CheckoutTimer
+
+    for key, count in ratelimit.metrics.items():
+        if key.startswith("rejected:"):
+            rate_limit_rejections.values[(key.split(":", 1)[1],)] = count
+    rate_limit_backend_errors.values[()] = ratelimit.metrics["backend_errors"]
+    tracking_loads.values[("query",)] = loads.loads
+    tracking_loads.values[("coalesced",)] = loads.coalesced
+    tracking_stale_fills.values[()] = tracking_cache.stale_fills
+
+    pid = str(os.getpid())
+    event_streams_open.set((pid,), event_bus.connections)
+    events_published.values[()] = event_bus.published
+    event_streams_dropped.values[()] = event_bus.dropped
+
+    for key, value in scheduler.metrics.items():
+        kind, labels = key.split(":", 1)
+        if kind == "runs":
+            scheduler_job_runs.values[tuple(labels.split(":"))] = value
+        elif kind == "items":
+            scheduler_job_items.values[(labels,)] = value
+        elif kind == "seconds":
+            scheduler_job_seconds.values[(labels,)] = value
+    # Every worker reads all jobs' state when it polls, whichever ran them
+    for name, state in scheduler.scheduler.state.items():
+        if state.get("backlog") is not None:
+            scheduler_job_backlog.set((pid, name), state["backlog"])
+        if state.get("last_duration") is not None:
+            scheduler_job_last_duration.set((pid, name), state["last_duration"])
+
+    for name, pool in (("sync", engine.pool), ("async", async_engine.pool)):
+        if hasattr(pool, "checkedout"):
+            db_pool_checked_out.set((pid, name), pool.checkedout())
+        if isinstance(pool, _CheckoutTimer):
+            db_pool_checkouts.values[(name,)] = pool.checkouts
+            db_pool_checkout_wait.values[(name,)] = pool.total_wait
+
+registry.collectors.append(_collect_app_metrics)
+
+# Per-request SQL statistics
+
+class RequestStats:
+    __slots__ = ("queries", "sql_seconds", "statements")
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.statements: List[Tuple[float, str]] = []
+
+_request_stats: contextvars.ContextVar[Optional[RequestStats]] = contextvars.ContextVar("request_stats", default=None)
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._metrics_started = time.perf_counter()
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _request_stats.get()
+    if stats is None:
+        return
+    elapsed = time.perf_counter() - context._metrics_started
+    stats.queries += 1
+    stats.sql_seconds += elapsed
+    if len(stats.statements) < SLOW_REQUEST_MAX_STATEMENTS:
+        stats.statements.append((elapsed, statement))
+
+def instrument_engine(engine):
+    """Count and time an engine's statements (pass async_engine.sync_engine for async engines)"""
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+# Request instrumentation
+
+def _leaf_routes(routes):
+    for route in routes:
+        # Included routers (FastAPI wraps them) and mounts hold their own routes
+        nested = getattr(getattr(route, "original_router", None), "routes", None)
+        if nested is None and not hasattr(route, "endpoint"):
+            nested = getattr(route, "routes", None)
+        if nested is None:
+            yield route
+        else:
+            yield from _leaf_routes(nested)
+
+def _route_labels(scope) -> Tuple[str, str]:
+    """(router module, route template) of a request
+
+    Requests answered before routing (rate limited, CORS preflight) are matched
+    here; a partial match (wrong method) still names the route.
+    """
+    route = scope.get("route")
+    if route is None and "app" in scope:
+        partial = None
+        for candidate in _leaf_routes(scope["app"].router.routes):
+            match = candidate.matches(scope)[0]
+            if match == Match.FULL:
+                route = candidate
+                break
+            if match == Match.PARTIAL and partial is None:
+                partial = candidate
+        route = route or partial
+    if route is None:
+        return "none", "unmatched"
+    module = getattr(getattr(route, "endpoint", None), "__module__", "") or ""
+    return module.rsplit(".", 1)[-1] or "none", getattr(route, "path", "unmatched")
+
+class MetricsMiddleware:
+    """ASGI middleware recording request metrics and logging slow requests"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+        response = {"status": 500, "size": 0, "stream": False}
+
+        async def send_with_metrics(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                response["stream"] = any(
+                    name == b"content-type" and value.startswith(b"text/event-stream")
+                    for name, value in message.get("headers", ())
+                )
+            elif message["type"] == "http.response.body":
+                response["size"] += len(message.get("body", b""))
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_metrics)
+        finally:
+            elapsed = time.perf_counter() - start
+            _request_stats.reset(token)
+            self._record(scope, response["status"], response["size"], elapsed, stats, response["stream"])
+
+    def _record(self, scope, status: int, size: int, elapsed: float, stats: RequestStats, stream: bool = False):
+        router, route = _route_labels(scope)
+        labels = (router, route, scope["method"])
+        http_requests.inc(labels + (str(status),))
+        if stream:
+            # Event streams stay open for minutes; their duration is not latency
+            return
+        http_request_duration.observe(labels, elapsed)
+        http_response_size.observe(labels, size)
+        db_queries_per_request.observe(labels, stats.queries)
+        db_query_seconds_per_request.observe(labels, stats.sql_seconds)
+
+        if elapsed * 1000 >= SLOW_REQUEST_MS:
+            http_slow_requests.inc(labels)
+            lines = [
+                f"Slow request {scope['method']} {scope['path']} ({route}) -> {status} in {elapsed * 1000:.0f} ms; "
+                f"{stats.queries} SQL statements in {stats.sql_seconds * 1000:.0f} ms"
+            ]
+            lines.extend(f"  {seconds * 1000:8.1f} ms  {' '.join(sql.split())}" for seconds, sql in stats.statements)
+            if stats.queries > len(stats.statements):
+                lines.append(f"  ... {stats.queries - len(stats.statements)} more")
+            slow_request_logger.warning("\n".join(lines))
+
+# Export
+
+def _snapshot_path(pid: int) -> str:
+    return os.path.join(METRICS_DIR, f"{pid}.json")
+
+def write_snapshot():
+    """Write this worker's metrics for /metrics to merge; no-op without METRICS_DIR"""
+    if not METRICS_DIR:
+        return
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    path = _snapshot_path(os.getpid())
+    with open(path + ".tmp", "w") as stream:
+        json.dump(registry.snapshot(), stream)
+    os.replace(path + ".tmp", path)
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def render() -> str:
+    if not METRICS_DIR:
+        return registry.render()
+    write_snapshot()
+    gauges = {metric.name for metric in registry.metrics if metric.kind == "gauge"}
+    snapshots = []
+    for path in glob.glob(os.path.join(METRICS_DIR, "*.json")):
+        try:
+            with open(path) as stream:
+                snapshot = json.load(stream)
+        except (OSError, ValueError):
+            continue
+        # Counters of exited workers still count; their gauges are stale
+        if not _alive(int(os.path.basename(path).split(".")[0])):
+            snapshot = {name: values for name, values in snapshot.items() if name not in gauges}
+        snapshots.append(snapshot)
+    return registry.render(snapshots)
+
+class SnapshotWriter:
+    """Periodically writes this worker's snapshot while the app runs"""
+
+    def __init__(self, interval: float = METRICS_FLUSH_INTERVAL):
+        self.interval = interval
+        self._task = None
+
+    def start(self):
+        if METRICS_DIR and self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            write_snapshot()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                write_snapshot()
+            except OSError:
+                logging.getLogger(__name__).warning("Could not write metrics snapshot", exc_info=True)
+
+snapshot_writer = SnapshotWriter()
@@ -0,0 +1,400 @@
+import asyncio
+import logging
+import os
+import queue
+import random
+import smtplib
+import threading
+from collections import Counter
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+from email.utils import formatdate
+from typing import Dict, List, Optional, Sequence
+
+from sqlalchemy import bindparam, select, update
+from sqlalchemy.orm import Session
+
+from app.database import (
+    Application, ApplicationStatus, AsyncSessionLocal, NotificationOutbox, NotificationStatus
+)
+from app.utils.settings import env_bool
+
+# Applicant email notifications through a transactional outbox
+#
+# A status change adds its email to notification_outbox in the same
+# transaction as the ApplicationStatusUpdate row, so the email exists if and
+# only if the change committed, and the admin request never talks to SMTP.
+# A separate dispatcher process (python -m app.cli dispatch-notifications)
+# claims due rows in batches, sends them over a small pool of reused SMTP
+# connections and records the outcome:
+#
+#   PENDING --claim--> SENDING --accepted--> SENT
+#                         |--temporary error--> PENDING, retried with backoff
+#                         '--permanent error or out of attempts--> FAILED
+#
+# A claim lasts OUTBOX_LEASE_SECONDS; rows of a dispatcher that died mid-batch
+# become due again after that. Every message carries a Message-ID built from
+# the row's idempotency key, so a resend after such a crash is recognisable as
+# the same email.
+
+logger = logging.getLogger(__name__)
+
+NOTIFICATIONS_ENABLED = env_bool("NOTIFICATIONS_ENABLED", True)
+
+SMTP_SERVER = os.getenv("SMTP_SERVER", "localhost")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
+SMTP_USERNAME = os.getenv("SMTP_USERNAME", "")
+SMTP_PASSWORD = os.getenv("SMTP_PASSWORD", "")
+SMTP_STARTTLS = env_bool("SMTP_STARTTLS", True)
+SMTP_TIMEOUT = float(os.getenv("SMTP_TIMEOUT", "30"))
+SMTP_POOL_SIZE = int(os.getenv("SMTP_POOL_SIZE", "2"))
+EMAIL_FROM = os.getenv("EMAIL_FROM", "noreply@camopabeverages.com")
+
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "100"))
+OUTBOX_POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", "2"))
+OUTBOX_LEASE_SECONDS = int(os.getenv("OUTBOX_LEASE_SECONDS", "300"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "8"))
+OUTBOX_RETRY_BASE = float(os.getenv("OUTBOX_RETRY_BASE", "30"))
+OUTBOX_RETRY_MAX = float(os.getenv("OUTBOX_RETRY_MAX", "3600"))
+
+# Messages sent, retried and failed, and batches claimed, by this process
+metrics = Counter()
+
+# Enqueueing
+
+_STATUS_MESSAGES = {
+    ApplicationStatus.SUBMITTED: "has been received",
+    ApplicationStatus.UNDER_REVIEW: "is now under review",
+    ApplicationStatus.ADDITIONAL_INFO_REQUIRED: "needs more information from you. Our team will contact you with details",
+    ApplicationStatus.APPROVED: "has been approved. Your approval letter will be available shortly",
+    ApplicationStatus.REJECTED: "was not approved",
+}
+
+def status_change_email(application: Application, status: ApplicationStatus) -> Dict[str, str]:
+    label = status.value.replace("_", " ").capitalize()
+    return {
+        "subject": f"Camopa dealership application {application.tracking_id}: {label}",
+        "body": (
+            f"Dear {application.full_name},\n\n"
+            f"Your dealership application {application.tracking_id} {_STATUS_MESSAGES[status]}.\n\n"
+            f"You can check its status at any time with tracking ID {application.tracking_id}.\n\n"
+            "Camopa Beverages Dealership Team\n"
+        ),
+    }
+
+def enqueue_status_change(
+    db: Session,
+    application: Application,
+    previous_status: ApplicationStatus,
+    status: ApplicationStatus,
+    status_update_id: int,
+) -> Optional[NotificationOutbox]:
+    """Add the applicant's email for a status change to the caller's transaction"""
+    if not NOTIFICATIONS_ENABLED or not application.email:
+        return None
+    notification = NotificationOutbox(
+        idempotency_key=f"status-update-{status_update_id}",
+        application_id=application.id,
+        recipient=application.email,
+        **status_change_email(application, status),
+    )
+    db.add(notification)
+    return notification
+
+def review_reminder_email(applications: Sequence[Application], now: datetime) -> Dict[str, str]:
+    lines = [
+        f"  {application.tracking_id}  {application.business_name or application.full_name}, "
+        f"{application.city or 'unknown city'}: in review for {(now - application.updated_at).days} days"
+        for application in applications
+    ]
+    return {
+        "subject": f"Camopa: {len(applications)} dealership application(s) waiting on review",
+        "body": (
+            "These applications have been under review without a decision:\n\n"
+            + "\n".join(lines)
+            + "\n\nCamopa Beverages Dealership Team\n"
+        ),
+    }
+
+def enqueue_review_reminders(
+    db: Session, recipients: Sequence[str], applications: Sequence[Application], key: str
+) -> List[NotificationOutbox]:
+    """Add one reminder listing `applications` per admin recipient; `key` makes them idempotent"""
+    if not NOTIFICATIONS_ENABLED or not applications:
+        return []
+    email = review_reminder_email(applications, datetime.utcnow())
+    notifications = [
+        NotificationOutbox(idempotency_key=f"{key}:{recipient}", recipient=recipient, **email)
+        for recipient in recipients
+    ]
+    db.add_all(notifications)
+    return notifications
+
+# SMTP
+
+class PermanentDeliveryError(Exception):
+    """The server rejected the message; sending it again will not help"""
+
+class _ConnectFailed(Exception):
+    pass
+
+def _is_permanent(exc: Exception) -> bool:
+    if isinstance(exc, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in exc.recipients.values())
+    if isinstance(exc, smtplib.SMTPResponseException):
+        return exc.smtp_code >= 500
+    return False
+
+class SMTPPool:
+    """Up to `size` authenticated SMTP connections, reused across messages"""
+
+    def __init__(
+        self,
+        host: str = SMTP_SERVER,
+        port: int = SMTP_PORT,
+        username: str = SMTP_USERNAME,
+        password: str = SMTP_PASSWORD,
+        starttls: bool = SMTP_STARTTLS,
+        timeout: float = SMTP_TIMEOUT,
+        size: int = SMTP_POOL_SIZE,
+    ):
+        self.host, self.port = host, port
+        self.username, self.password = username, password
+        self.starttls = starttls
+        self.timeout = timeout
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self.connects = 0
+
+    def _connect(self) -> smtplib.SMTP:
+        smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.starttls:
+                smtp.starttls()
+            if self.username:
+                smtp.login(self.username, self.password)
+        except Exception:
+            smtp.close()
+            raise
+        self.connects += 1
+        return smtp
+
+    def send_many(self, messages: Sequence[EmailMessage]) -> List[Optional[Exception]]:
+        """Send on one pooled connection; returns None or the error for each message"""
+        results = []
+        with self._slots:
+            try:
+                smtp = self._idle.get_nowait()
+            except queue.Empty:
+                smtp = None
+            try:
+                for index, message in enumerate(messages):
+                    try:
+                        smtp, error = self._send(smtp, message)
+                    except _ConnectFailed as exc:
+                        # Says nothing about the messages, which are retried
+                        # later; the rest of the chunk would fail the same way
+                        results.extend([exc.__cause__] * (len(messages) - index))
+                        break
+                    results.append(error)
+            except BaseException:
+                if smtp is not None:
+                    smtp.close()
+                raise
+            if smtp is not None:
+                self._idle.put(smtp)
+        return results
+
+    def _send(self, smtp: Optional[smtplib.SMTP], message: EmailMessage):
+        # A reused connection may have been closed by the server while idle, so
+        # a disconnect is retried once on a fresh connection
+        error = None
+        for _ in range(2):
+            if smtp is None:
+                try:
+                    smtp = self._connect()
+                except (smtplib.SMTPException, OSError) as exc:
+                    raise _ConnectFailed() from exc
+            try:
+                smtp.send_message(message)
+                return smtp, None
+            except smtplib.SMTPServerDisconnected as exc:
+                smtp, error = None, exc
+            except (smtplib.SMTPResponseException, smtplib.SMTPRecipientsRefused) as exc:
+                # The server answered, so the connection is still usable
+                return self._reset(smtp), PermanentDeliveryError(str(exc)) if _is_permanent(exc) else exc
+            except (smtplib.SMTPException, OSError) as exc:
+                smtp.close()
+                return None, exc
+        return smtp, error
+
+    @staticmethod
+    def _reset(smtp: smtplib.SMTP) -> Optional[smtplib.SMTP]:
+        try:
+            smtp.rset()
+            return smtp
+        except (smtplib.SMTPException, OSError):
+            smtp.close()
+            return None
+
+    def close(self):
+        while True:
+            try:
+                smtp = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                smtp.quit()
+            except (smtplib.SMTPException, OSError):
+                smtp.close()
+
+def build_message(row) -> EmailMessage:
+    message = EmailMessage()
+    message["From"] = EMAIL_FROM
+    message["To"] = row.recipient
+    message["Subject"] = row.subject
+    message["Date"] = formatdate(localtime=False)
+    # Stable across resends of the same row
+    message["Message-ID"] = f"<{row.idempotency_key}@{EMAIL_FROM.rpartition('@')[2] or 'localhost'}>"
+    message.set_content(row.body)
+    return message
+
+def retry_delay(attempts: int) -> float:
+    """Exponential backoff with jitter, in seconds, after `attempts` tries"""
+    delay = min(OUTBOX_RETRY_MAX, OUTBOX_RETRY_BASE * 2 ** max(0, attempts - 1))
+    return delay * random.uniform(0.5, 1.0)
+
+# Dispatcher
+
+_outbox = NotificationOutbox.__table__
+
+_record_result = (
+    update(_outbox)
+    .where(_outbox.c.id == bindparam("row_id"), _outbox.c.status == NotificationStatus.SENDING)
+    .values(
+        status=bindparam("new_status"),
+        next_attempt_at=bindparam("due"),
+        error=bindparam("last_error"),
+        sent_at=bindparam("sent"),
+        updated_at=bindparam("now"),
+    )
+)
+
+class OutboxDispatcher:
+    """Drains notification_outbox in batches; run one or more per deployment"""
+
+    def __init__(
+        self,
+        pool: SMTPPool = None,
+        batch_size: int = OUTBOX_BATCH_SIZE,
+        poll_interval: float = OUTBOX_POLL_INTERVAL,
+        max_attempts: int = OUTBOX_MAX_ATTEMPTS,
+        session_factory=AsyncSessionLocal,
+    ):
+        self.pool = pool or SMTPPool()
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.session_factory = session_factory
+
+    async def run(self, stop: asyncio.Event = None):
+        stop = stop or asyncio.Event()
+        try:
+            while not stop.is_set():
+                try:
+                    claimed = await self.run_once()
+                except Exception:
+                    logger.exception("Notification batch failed")
+                    claimed = 0
+                if claimed < self.batch_size:
+                    # Drained; wait for new rows or the next retry to come due
+                    try:
+                        await asyncio.wait_for(stop.wait(), self.poll_interval)
+                    except asyncio.TimeoutError:
+                        pass
+        finally:
+            self.pool.close()
+
+    async def run_once(self) -> int:
+        """Claim, send and record one batch; returns the number claimed"""
+        rows = await self._claim()
+        if not rows:
+            return 0
+        metrics["batches"] += 1
+        messages = [build_message(row) for row in rows]
+        # One chunk per pooled connection, sent from worker threads
+        chunks = [list(range(i, len(rows), self.pool.size)) for i in range(min(self.pool.size, len(rows)))]
+        results: List[Optional[Exception]] = [None] * len(rows)
+        outcomes = await asyncio.gather(*(
+            asyncio.to_thread(self.pool.send_many, [messages[i] for i in chunk]) for chunk in chunks
+        ))
+        for chunk, outcome in zip(chunks, outcomes):
+            for i, error in zip(chunk, outcome):
+                results[i] = error
+        await self._record(rows, results)
+        return len(rows)
+
+    async def _claim(self):
+        now = datetime.utcnow()
+        due = (
+            select(NotificationOutbox.id)
+            .where(
+                NotificationOutbox.status.in_((NotificationStatus.PENDING, NotificationStatus.SENDING)),
+                NotificationOutbox.next_attempt_at <= now,
+            )
+            .order_by(NotificationOutbox.next_attempt_at)
+            .limit(self.batch_size)
+            # Concurrent dispatchers claim disjoint batches on PostgreSQL
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+        async with self.session_factory() as db:
+            result = await db.execute(
+                update(_outbox)
+                .where(_outbox.c.id.in_(due))
+                .values(
+                    status=NotificationStatus.SENDING,
+                    attempts=_outbox.c.attempts + 1,
+                    next_attempt_at=now + timedelta(seconds=OUTBOX_LEASE_SECONDS),
+                    updated_at=now,
+                )
+                .returning(
+                    _outbox.c.id, _outbox.c.idempotency_key, _outbox.c.recipient,
+                    _outbox.c.subject, _outbox.c.body, _outbox.c.attempts,
+                )
+            )
+            rows = result.all()
+            await db.commit()
+        return rows
+
+    async def _record(self, rows, results: Sequence[Optional[Exception]]):
+        now = datetime.utcnow()
+        params = []
+        for row, error in zip(rows, results):
+            values = {"row_id": row.id, "now": now, "due": now, "last_error": None, "sent": None}
+            if error is None:
+                values.update(new_status=NotificationStatus.SENT, sent=now)
+                metrics["sent"] += 1
+            elif isinstance(error, PermanentDeliveryError) or row.attempts >= self.max_attempts:
+                values.update(new_status=NotificationStatus.FAILED, last_error=str(error))
+                metrics["failed"] += 1
+                logger.warning("Notification %s failed after %d attempts: %s", row.idempotency_key, row.attempts, error)
+            else:
+                values.update(
+                    new_status=NotificationStatus.PENDING,
+                    due=now + timedelta(seconds=retry_delay(row.attempts)),
+                    last_error=str(error),
+                )
+                metrics["retried"] += 1
+            params.append(values)
+        async with self.session_factory() as db:
+            # One executemany for the whole batch
+            await db.execute(_record_result, params)
+            await db.commit()
+        logger.info(
+            "Notification batch: %d sent, %d to retry, %d failed",
+            sum(p["new_status"] == NotificationStatus.SENT for p in params),
+            sum(p["new_status"] == NotificationStatus.PENDING for p in params),
+            sum(p["new_status"] == NotificationStatus.FAILED for p in params),
+        )
@@ -0,0 +1,242 @@
+import ipaddress
+import logging
+import math
+import os
+import re
+import time
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+from typing import Optional, Pattern, Sequence, Tuple
+
+from starlette.responses import JSONResponse
+
+from app.services.cache import REDIS_URL
+from app.utils import ids
+from app.utils.settings import env_bool
+
+logger = logging.getLogger(__name__)
+
+# Rate limiting for the unauthenticated endpoints
+#
+# Token buckets: each key holds up to `burst` tokens and refills at
+# burst / period per second; a request spends one token or gets a 429 with
+# Retry-After. Buckets are kept per client IP (submissions and tracking polls)
+# and per tracking ID (polls for one application from many clients). WebSocket
+# connections take a token when they open; one turned away gets the 429 where
+# the server supports WebSocket denial responses, and a close before accept
+# (a 403) elsewhere.
+#
+# The memory backend keeps buckets per worker process, so with N workers a
+# client gets up to N times the configured rate; the redis backend shares them.
+# If the shared store fails, requests are let through rather than rejected.
+#
+# Limits are "<requests>/<seconds>" strings, e.g. RATE_LIMIT_TRACK_PER_IP=120/60.
+
+RATE_LIMIT_ENABLED = env_bool("RATE_LIMIT_ENABLED", True)
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+# Peers whose X-Forwarded-For is believed, e.g. the nginx in front of the API
+RATE_LIMIT_TRUSTED_PROXIES = [
+    ipaddress.ip_network(value.strip())
+    for value in os.getenv("RATE_LIMIT_TRUSTED_PROXIES", "127.0.0.1,::1").split(",")
+    if value.strip()
+]
+
+def parse_limit(value: str) -> Tuple[int, float]:
+    """'10/60' -> (burst 10, period 60 seconds)"""
+    requests, _, seconds = value.partition("/")
+    return int(requests), float(seconds or 1)
+
+# Rejections per rule and shared-store failures, for this worker process
+metrics = Counter()
+
+# Backends return 0 when a token was taken, else seconds until one is available.
+# refund gives a taken token back, for a request another rule then rejected
+
+class MemoryBucketBackend:
+    """Token buckets in this process, least recently used evicted first"""
+
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+
+    async def take(self, key: str, rate: float, burst: int) -> float:
+        # Runs on the event loop without awaiting, so needs no lock
+        now = time.monotonic()
+        tokens, updated = self._buckets.get(key, (burst, now))
+        tokens = min(burst, tokens + (now - updated) * rate)
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / rate
+        self._buckets[key] = (tokens, now)
+        self._buckets.move_to_end(key)
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return wait
+
+    async def refund(self, key: str, rate: float, burst: int):
+        if key in self._buckets:
+            tokens, updated = self._buckets[key]
+            self._buckets[key] = (min(burst, tokens + 1), updated)
+
+# Refill and take atomically; the state expires once the bucket would be full
+_TAKE_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1]) or burst
+local updated = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated) * rate)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000))
+return tostring(wait)
+"""
+
+_REFUND_SCRIPT = """
+local tokens = tonumber(redis.call('HGET', KEYS[1], 'tokens'))
+if tokens then
+    redis.call('HSET', KEYS[1], 'tokens', tostring(math.min(tonumber(ARGV[1]), tokens + 1)))
+end
+return 0
+"""
+
+class RedisBucketBackend:
+    """Token buckets shared through any Redis-compatible asyncio client (eval)"""
+
+    def __init__(self, client, prefix: str = "camopa:ratelimit:"):
+        self.client = client
+        self.prefix = prefix
+
+    async def take(self, key: str, rate: float, burst: int) -> float:
+        # Wall-clock time, so app servers must keep their clocks in sync
+        wait = await self.client.eval(_TAKE_SCRIPT, 1, self.prefix + key, rate, burst, time.time())
+        return float(wait)
+
+    async def refund(self, key: str, rate: float, burst: int):
+        await self.client.eval(_REFUND_SCRIPT, 1, self.prefix + key, burst)
+
+def create_backend(name: str = RATE_LIMIT_BACKEND):
+    if name == "redis":
+        try:
+            import redis.asyncio as redis
+        except ImportError as exc:
+            raise RuntimeError("RATE_LIMIT_BACKEND=redis requires the 'redis' package") from exc
+        return RedisBucketBackend(redis.from_url(REDIS_URL))
+    return MemoryBucketBackend()
+
+# Rules
+
+@dataclass(frozen=True)
+class Rule:
+    name: str
+    method: str  # or WEBSOCKET for WebSocket connections
+    path: Pattern
+    key: str  # "ip" or the name of a path parameter
+    burst: int
+    period: float
+
+    @property
+    def rate(self) -> float:
+        return self.burst / self.period
+
+def _rule(name: str, method: str, path: str, key: str, env: str, default: str) -> Rule:
+    burst, period = parse_limit(os.getenv(env, default))
+    return Rule(name, method, re.compile(path), key, burst, period)
+
+# Checked in order; a request takes a token from every matching rule until one
+# rejects it, and then gets back those it took (a poll turned away for its
+# tracking ID does not also use up its IP's allowance)
+RULES = (
+    _rule("submit_application", "POST", r"^/applications/?$", "ip", "RATE_LIMIT_SUBMIT_APPLICATION", "10/60"),
+    _rule("submit_support", "POST", r"^/support/?$", "ip", "RATE_LIMIT_SUBMIT_SUPPORT", "5/60"),
+    _rule("track_per_ip", "GET", r"^/applications/track/(?P<tracking_id>[^/]+)$", "ip", "RATE_LIMIT_TRACK_PER_IP", "120/60"),
+    _rule("track_per_id", "GET", r"^/applications/track/(?P<tracking_id>[^/]+)$", "tracking_id", "RATE_LIMIT_TRACK_PER_ID", "600/60"),
+    _rule("track_events_per_ip", "GET", r"^/applications/track/[^/]+/events$", "ip", "RATE_LIMIT_TRACK_EVENTS_PER_IP", "30/60"),
+    # The same events over a WebSocket; both kinds of stream share the bucket
+    _rule("track_events_per_ip", "WEBSOCKET", r"^/applications/track/[^/]+/ws$", "ip", "RATE_LIMIT_TRACK_EVENTS_PER_IP", "30/60"),
+)
+
+def _trusted(host: Optional[str]) -> bool:
+    try:
+        address = ipaddress.ip_address(host)
+    except (TypeError, ValueError):
+        return False
+    return any(address in network for network in RATE_LIMIT_TRUSTED_PROXIES)
+
+def client_ip(scope) -> str:
+    """The connecting client, looking through trusted proxies"""
+    host = (scope.get("client") or ("unknown", 0))[0]
+    if not _trusted(host):
+        return host
+    forwarded = []
+    for name, value in scope.get("headers", ()):
+        if name == b"x-forwarded-for":
+            forwarded.extend(part.strip() for part in value.decode("latin-1").split(","))
+    # Proxies append, so the last entry not added by a trusted proxy is the client
+    for candidate in reversed(forwarded):
+        if not _trusted(candidate):
+            return candidate
+    return host
+
+class RateLimitMiddleware:
+    """ASGI middleware applying RULES before requests reach the routers"""
+
+    def __init__(self, app, backend=None, rules: Sequence[Rule] = RULES):
+        self.app = app
+        self.backend = backend or create_backend()
+        self.rules = rules
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] in ("http", "websocket") and RATE_LIMIT_ENABLED:
+            wait = await self._check(scope)
+            if wait:
+                response = JSONResponse(
+                    {"detail": "Too many requests, please retry later"},
+                    status_code=429,
+                    headers={"Retry-After": str(max(1, math.ceil(wait)))},
+                )
+                if scope["type"] == "http" or "websocket.http.response" in scope.get("extensions", {}):
+                    await response(scope, receive, send)
+                else:
+                    await send({"type": "websocket.close", "code": 1008})
+                return
+        await self.app(scope, receive, send)
+
+    async def _check(self, scope) -> float:
+        method = scope["method"] if scope["type"] == "http" else "WEBSOCKET"
+        path = scope["path"]
+        taken = []
+        for rule in self.rules:
+            if rule.method != method:
+                continue
+            match = rule.path.match(path)
+            if match is None:
+                continue
+            key = client_ip(scope) if rule.key == "ip" else match.group(rule.key)
+            if rule.key == "tracking_id":
+                # Spellings of one ID ("01m5...", "01M5-...") share a bucket
+                key = ids.normalize(key) or key
+            bucket = f"{rule.name}:{key}"
+            try:
+                wait = await self.backend.take(bucket, rule.rate, rule.burst)
+                if wait:
+                    for taken_rule, taken_bucket in taken:
+                        await self.backend.refund(taken_bucket, taken_rule.rate, taken_rule.burst)
+            except Exception:
+                metrics["backend_errors"] += 1
+                logger.warning("Rate limit backend failed; allowing request", exc_info=True)
+                return 0.0
+            if wait:
+                metrics[f"rejected:{rule.name}"] += 1
+                return wait
+            taken.append((rule, bucket))
+        return 0.0
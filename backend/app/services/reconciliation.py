@@ -0,0 +1,345 @@
+import csv
+import io
+import json
+import re
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from typing import IO, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import DateTime, Integer, bindparam, func, select, update
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.orm import Session
+
+from app.database import Application, Payment, PaymentStatus
+from app.services import analytics, cache
+
+# Reconciliation of pending UPI payments against bank statements
+#
+# A statement (CSV, or the <STMTTRN> blocks of an OFX/QFX export) is matched
+# in one pass against an in-memory hash index of every pending payment, keyed
+# by (normalised UPI reference, amount in paise). Each credit line is then
+#
+#   matched    exactly one pending payment has its reference and amount
+#   ambiguous  several pending payments share the reference and amount, or
+#              several statement lines claim the same payment
+#   unmatched  no pending payment has the reference, or none has the amount
+#
+# Matched payments are marked COMPLETED, with the statement's posting date as
+# their payment date, by a single UPDATE ... FROM whose (id, date) pairs are
+# bound as one parameter. The UPDATE only touches rows still PENDING, so a
+# payment changed since the index was read is skipped rather than overwritten.
+
+FORMATS = ("csv", "ofx")
+MAX_REPORTED_ENTRIES = 1000
+
+# CSV headers are lowercased with runs of other characters turned into "_"
+REFERENCE_COLUMNS = (
+    "upi_reference", "upi_ref", "upi_ref_no", "utr", "utr_no", "utr_number", "rrn",
+    "reference", "reference_no", "reference_number", "ref_no", "transaction_reference",
+)
+AMOUNT_COLUMNS = ("amount", "credit", "credit_amount", "deposit", "deposit_amount", "amount_inr")
+DATE_COLUMNS = ("date", "transaction_date", "txn_date", "value_date", "posted_date", "posting_date")
+DATE_FORMATS = (
+    "%Y-%m-%d", "%Y-%m-%d %H:%M:%S", "%d-%m-%Y", "%d/%m/%Y", "%d/%m/%y",
+    "%d-%b-%Y", "%d %b %Y", "%d-%m-%Y %H:%M:%S", "%d/%m/%Y %H:%M:%S",
+)
+
+_OFX_TRANSACTION = re.compile(r"<STMTTRN>(.*?)</STMTTRN>", re.IGNORECASE | re.DOTALL)
+_OFX_FIELD = re.compile(r"<(\w+)>([^<\r\n]*)")
+# UPI references (UTR/RRN) are 12 digits, e.g. "UPI/412345678901/payer@okbank"
+_UPI_REFERENCE = re.compile(r"(?<!\d)\d{12}(?!\d)")
+
+@dataclass
+class StatementEntry:
+    row: int
+    reference: Optional[str]
+    amount: Optional[Decimal]
+    posted_at: Optional[datetime] = None
+
+@dataclass
+class ReconciliationReport:
+    total: int = 0
+    matched: int = 0
+    applied: int = 0
+    ignored: int = 0
+    unmatched: int = 0
+    ambiguous: int = 0
+    failed: int = 0
+    dry_run: bool = False
+    unmatched_entries: List[dict] = field(default_factory=list)
+    ambiguous_entries: List[dict] = field(default_factory=list)
+    errors: List[dict] = field(default_factory=list)
+
+    def add_unmatched(self, entry: StatementEntry, reason: str, payment_ids=()):
+        self.unmatched += 1
+        if len(self.unmatched_entries) < MAX_REPORTED_ENTRIES:
+            self.unmatched_entries.append(_entry(entry, reason, payment_ids))
+
+    def add_ambiguous(self, entry: StatementEntry, reason: str, payment_ids=()):
+        self.ambiguous += 1
+        if len(self.ambiguous_entries) < MAX_REPORTED_ENTRIES:
+            self.ambiguous_entries.append(_entry(entry, reason, payment_ids))
+
+    def add_error(self, row: int, error):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ENTRIES:
+            self.errors.append({"row": row, "error": str(error)})
+
+def _entry(entry: StatementEntry, reason: str, payment_ids) -> dict:
+    return {
+        "row": entry.row,
+        "reference": entry.reference,
+        "amount": float(entry.amount) if entry.amount is not None else None,
+        "reason": reason,
+        "payment_ids": sorted(payment_ids),
+    }
+
+# Parsing
+
+def normalize_reference(reference) -> Optional[str]:
+    if reference is None:
+        return None
+    normalized = re.sub(r"[\s\-/]", "", str(reference)).upper()
+    return normalized or None
+
+def _paise(amount) -> int:
+    return int((Decimal(str(amount)) * 100).to_integral_value())
+
+_AMOUNT_NOISE = re.compile(r"(?i)inr|rs\.?|₹|,|\s")
+_AMOUNT_SUFFIX = re.compile(r"(?i)(.*?)(cr|dr)")
+_OFX_DATE = re.compile(r"(\d{8})(\d{6})?(?!\d)")
+
+def _parse_amount(value: str) -> Decimal:
+    cleaned = _AMOUNT_NOISE.sub("", value or "")
+    suffix = _AMOUNT_SUFFIX.fullmatch(cleaned)
+    if suffix:
+        cleaned = suffix.group(1) if suffix.group(2).lower() == "cr" else "-" + suffix.group(1)
+    try:
+        return Decimal(cleaned)
+    except InvalidOperation:
+        raise ValueError(f"Invalid amount '{value}'")
+
+class _DateParser:
+    """Parses statement dates, trying the format that matched last time first
+
+    A statement uses one date format throughout, and a failed strptime costs
+    as much as a successful one, so this saves trying DATE_FORMATS per line.
+    """
+
+    def __init__(self):
+        self.formats = list(DATE_FORMATS)
+
+    def __call__(self, value: Optional[str]) -> Optional[datetime]:
+        value = (value or "").strip()
+        if not value:
+            return None
+        # OFX dates: YYYYMMDD[HHMMSS[.XXX]][[offset:TZ]]
+        ofx = _OFX_DATE.match(value)
+        if ofx:
+            return datetime.strptime(ofx.group(1) + (ofx.group(2) or "000000"), "%Y%m%d%H%M%S")
+        for position, fmt in enumerate(self.formats):
+            try:
+                parsed = datetime.strptime(value, fmt)
+            except ValueError:
+                continue
+            if position:
+                self.formats.insert(0, self.formats.pop(position))
+            return parsed
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            return None
+
+def _column(header: List[str], candidates: Tuple[str, ...]) -> Optional[str]:
+    names = {re.sub(r"[^a-z0-9]+", "_", name.strip().lower()).strip("_"): name for name in header}
+    return next((names[candidate] for candidate in candidates if candidate in names), None)
+
+def _iter_csv(text: IO[str]) -> Iterator[Tuple[int, Optional[StatementEntry], Optional[str]]]:
+    reader = csv.DictReader(text)
+    header = reader.fieldnames or []
+    reference_column = _column(header, REFERENCE_COLUMNS)
+    amount_column = _column(header, AMOUNT_COLUMNS)
+    date_column = _column(header, DATE_COLUMNS)
+    parse_date = _DateParser()
+    if not reference_column or not amount_column:
+        raise ValueError(
+            f"Statement needs a reference column (one of {REFERENCE_COLUMNS}) "
+            f"and an amount column (one of {AMOUNT_COLUMNS})"
+        )
+    # Row 1 is the header
+    for row_number, record in enumerate(reader, start=2):
+        try:
+            amount = _parse_amount(record.get(amount_column))
+        except ValueError as exc:
+            yield row_number, None, str(exc)
+            continue
+        yield row_number, StatementEntry(
+            row=row_number,
+            reference=normalize_reference(record.get(reference_column)),
+            amount=amount,
+            posted_at=parse_date(record.get(date_column)) if date_column else None,
+        ), None
+
+def _iter_ofx(text: IO[str]) -> Iterator[Tuple[int, Optional[StatementEntry], Optional[str]]]:
+    # OFX 1.x is SGML with unclosed leaf tags, so fields are read with a regex
+    # rather than an XML parser; entries are numbered by transaction
+    parse_date = _DateParser()
+    for number, block in enumerate(_OFX_TRANSACTION.finditer(text.read()), start=1):
+        fields = {name.upper(): value.strip() for name, value in _OFX_FIELD.findall(block.group(1))}
+        try:
+            amount = _parse_amount(fields.get("TRNAMT"))
+        except ValueError as exc:
+            yield number, None, str(exc)
+            continue
+        if fields.get("TRNTYPE", "").upper() == "DEBIT" and amount > 0:
+            amount = -amount
+        memo_reference = _UPI_REFERENCE.search(" ".join(fields.get(name, "") for name in ("MEMO", "NAME")))
+        reference = fields.get("REFNUM") or (memo_reference.group(0) if memo_reference else fields.get("FITID"))
+        yield number, StatementEntry(
+            row=number,
+            reference=normalize_reference(reference),
+            amount=amount,
+            posted_at=parse_date(fields.get("DTPOSTED")),
+        ), None
+
+def iter_statement(stream: IO[bytes], fmt: str) -> Iterator[Tuple[int, Optional[StatementEntry], Optional[str]]]:
+    """Yield (row number, entry, parse error) from a binary CSV or OFX statement"""
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    if fmt == "csv":
+        return _iter_csv(text)
+    if fmt == "ofx":
+        return _iter_ofx(text)
+    raise ValueError(f"Unsupported format '{fmt}', expected one of {FORMATS}")
+
+# Matching
+
+PaymentIndex = Dict[Tuple[str, int], List[Tuple[int, float]]]
+
+def build_index(db: Session, batch_size: int = 10000) -> Tuple[PaymentIndex, Dict[str, List[int]]]:
+    """Hash every pending payment by (reference, paise), and by reference alone"""
+    index: PaymentIndex = defaultdict(list)
+    by_reference: Dict[str, List[int]] = defaultdict(list)
+    result = db.execute(
+        select(Payment.id, Payment.upi_reference, Payment.amount).where(
+            Payment.status == PaymentStatus.PENDING, Payment.upi_reference.isnot(None)
+        ),
+        execution_options={"stream_results": True, "yield_per": batch_size},
+    )
+    for payment_id, reference, amount in result:
+        reference = normalize_reference(reference)
+        if reference is None or amount is None:
+            continue
+        index[(reference, _paise(amount))].append((payment_id, amount))
+        by_reference[reference].append(payment_id)
+    return index, by_reference
+
+def match_statement(
+    entries: Iterator[Tuple[int, Optional[StatementEntry], Optional[str]]],
+    index: PaymentIndex,
+    by_reference: Dict[str, List[int]],
+    report: ReconciliationReport,
+) -> Dict[int, Tuple[StatementEntry, float]]:
+    """Classify every statement line; returns payment id -> (entry, amount) for the matches"""
+    matches: Dict[int, Tuple[StatementEntry, float]] = {}
+    # Payments claimed by more than one line, with every line claiming them
+    contested: Dict[int, List[StatementEntry]] = {}
+
+    for row_number, entry, parse_error in entries:
+        report.total += 1
+        if parse_error:
+            report.add_error(row_number, parse_error)
+            continue
+        if entry.amount <= 0:
+            report.ignored += 1  # debits and reversals are not payments to us
+            continue
+        if entry.reference is None:
+            report.add_unmatched(entry, "missing_reference")
+            continue
+
+        candidates = index.get((entry.reference, _paise(entry.amount)))
+        if not candidates:
+            if entry.reference in by_reference:
+                report.add_unmatched(entry, "amount_mismatch", by_reference[entry.reference])
+            else:
+                report.add_unmatched(entry, "unknown_reference")
+        elif len(candidates) > 1:
+            report.add_ambiguous(entry, "multiple_payments", [payment_id for payment_id, _ in candidates])
+        else:
+            payment_id, amount = candidates[0]
+            if payment_id in contested:
+                contested[payment_id].append(entry)
+            elif payment_id in matches:
+                contested[payment_id] = [matches.pop(payment_id)[0], entry]
+            else:
+                matches[payment_id] = (entry, amount)
+
+    for payment_id, claims in contested.items():
+        for entry in claims:
+            report.add_ambiguous(entry, "duplicate_entry", [payment_id])
+    report.matched = len(matches)
+    return matches
+
+# Applying
+
+def _matched_rows(db: Session, rows: List[Tuple[int, datetime]]):
+    """A FROM clause of (payment_id, paid_at) pairs, bound as a single parameter"""
+    dialect = db.get_bind().dialect
+    if dialect.name == "postgresql":
+        return func.unnest(
+            bindparam("payment_ids", [payment_id for payment_id, _ in rows], type_=ARRAY(Integer)),
+            bindparam("paid_at", [paid_at for _, paid_at in rows], type_=ARRAY(DateTime())),
+        ).table_valued("payment_id", "paid_at").render_derived()
+
+    # SQLite: json_each over [[id, "paid_at"], ...], dates in the column's storage format
+    to_storage = Payment.__table__.c.payment_date.type.dialect_impl(dialect).bind_processor(dialect)
+    payload = json.dumps([[payment_id, to_storage(paid_at) if to_storage else paid_at] for payment_id, paid_at in rows])
+    pairs = func.json_each(bindparam("matched", payload)).table_valued("value")
+    return select(
+        func.json_extract(pairs.c.value, "$[0]").label("payment_id"),
+        func.json_extract(pairs.c.value, "$[1]").label("paid_at"),
+    ).subquery()
+
+def apply_matches(db: Session, matches: Dict[int, Tuple[StatementEntry, float]], report: ReconciliationReport):
+    """Mark matched payments COMPLETED in one UPDATE, skipping any no longer pending"""
+    if not matches:
+        return
+    now = datetime.utcnow()
+    matched = _matched_rows(db, [(payment_id, entry.posted_at or now) for payment_id, (entry, _) in matches.items()])
+    payments = Payment.__table__
+    updated = db.execute(
+        update(payments)
+        .where(payments.c.id == matched.c.payment_id, payments.c.status == PaymentStatus.PENDING)
+        .values(status=PaymentStatus.COMPLETED, payment_date=matched.c.paid_at, updated_at=now)
+        .returning(payments.c.id, payments.c.amount)
+    ).all()
+
+    analytics.record_payment_changes(
+        db, ((PaymentStatus.PENDING, amount, PaymentStatus.COMPLETED, amount) for _, amount in updated)
+    )
+    tracking_ids = db.execute(
+        select(Application.tracking_id).distinct()
+        .join(Payment, Payment.application_id == Application.id)
+        .where(Payment.id.in_(select(matched.c.payment_id)))
+    ).scalars()
+    for tracking_id in tracking_ids:
+        cache.mark_tracking_stale(db, tracking_id)
+
+    report.applied = len(updated)
+    for payment_id in matches.keys() - {payment_id for payment_id, _ in updated}:
+        report.add_ambiguous(matches[payment_id][0], "no_longer_pending", [payment_id])
+
+def reconcile(
+    db: Session,
+    entries: Iterator[Tuple[int, Optional[StatementEntry], Optional[str]]],
+    dry_run: bool = False,
+) -> ReconciliationReport:
+    """Match a statement against pending payments and complete the matches in one transaction"""
+    report = ReconciliationReport(dry_run=dry_run)
+    index, by_reference = build_index(db)
+    matches = match_statement(entries, index, by_reference, report)
+    if not dry_run:
+        apply_matches(db, matches, report)
+        db.commit()
+    return report
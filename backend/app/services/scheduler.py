@@ -0,0 +1,369 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import func, insert, or_, select, text, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.database import (
+    AnalyticsCounter, Application, ApplicationStatus, JobRunStatus, Payment, PaymentStatus, ScheduledJob,
+    SessionLocal, User, engine,
+)
+from app.services import analytics, cache, lifecycle, notifications
+from app.utils.settings import env_bool
+
+# Periodic maintenance jobs, run inside the app processes
+#
+# Every worker runs a Scheduler that wakes each SCHEDULER_POLL_INTERVAL
+# seconds, reads scheduled_jobs (one row per job) and starts the jobs that are
+# due. Of several gunicorn workers, only one runs a given job:
+#
+#   lock   on PostgreSQL a worker first takes the job's session-level advisory
+#          lock, pg_try_advisory_lock(LOCK_CLASS, hashtext(name)), on a
+#          connection it keeps for the run. The lock is the job's leadership:
+#          it is released when the run ends or the worker dies, so a crashed
+#          run can be taken over at once
+#   claim  a conditional UPDATE moves next_run_at on by the job's interval
+#          only if the row is still due. Exactly one worker sees a row count
+#          of 1; elsewhere (SQLite) a RUNNING row is only taken over after
+#          SCHEDULER_LEASE_SECONDS
+#
+# A job processes SCHEDULER_BATCH_SIZE items per transaction, committing each
+# batch, until it runs out of work or has run for SCHEDULER_MAX_RUNTIME
+# seconds. A run cut short by the cap leaves the job due again, so the rest is
+# worked off over the next polls without one long transaction or lock. Each
+# run records its duration, items processed, the backlog left and any error
+# on the job's row (GET /admin/jobs), and in the scheduler_* metrics.
+#
+# The work itself runs in threads with ordinary sessions, off the event loop.
+
+logger = logging.getLogger(__name__)
+
+SCHEDULER_ENABLED = env_bool("SCHEDULER_ENABLED", True)
+SCHEDULER_POLL_INTERVAL = float(os.getenv("SCHEDULER_POLL_INTERVAL", "30"))
+SCHEDULER_BATCH_SIZE = int(os.getenv("SCHEDULER_BATCH_SIZE", "500"))
+SCHEDULER_MAX_RUNTIME = float(os.getenv("SCHEDULER_MAX_RUNTIME", "60"))
+SCHEDULER_LEASE_SECONDS = float(os.getenv("SCHEDULER_LEASE_SECONDS", "600"))
+
+# Jobs; 0 turns one off
+PAYMENT_EXPIRY_DAYS = float(os.getenv("PAYMENT_EXPIRY_DAYS", "7"))
+REVIEW_NUDGE_DAYS = float(os.getenv("REVIEW_NUDGE_DAYS", "3"))
+ANALYTICS_REBUILD_HOURS = float(os.getenv("ANALYTICS_REBUILD_HOURS", "24"))
+PARTITION_MAINTENANCE_HOURS = float(os.getenv("PARTITION_MAINTENANCE_HOURS", "24"))
+
+# pg_try_advisory_lock(class, key) class for scheduled jobs
+LOCK_CLASS = 0x5CED
+
+# Runs by outcome, items processed and seconds spent, by job, in this process
+metrics = Counter()
+
+@dataclass
+class Job:
+    name: str
+    # Seconds from the start of one run to the next
+    interval: float
+    # Processes up to batch_size items in the session it is given, which the
+    # scheduler commits; returns the number processed. A batch_size of 0 runs
+    # the job as one batch
+    run_batch: Callable[[Session, int], int]
+    # Items still due, recorded after each run
+    backlog: Optional[Callable[[Session], int]] = None
+    batch_size: int = SCHEDULER_BATCH_SIZE
+    max_runtime: float = SCHEDULER_MAX_RUNTIME
+
+# Jobs
+
+def _expiring_payments(now: datetime):
+    return (
+        Payment.status == PaymentStatus.PENDING,
+        Payment.created_at < now - timedelta(days=PAYMENT_EXPIRY_DAYS),
+    )
+
+def expire_pending_payments(db: Session, batch_size: int) -> int:
+    """Fail payments left PENDING for PAYMENT_EXPIRY_DAYS, so the applicant can pay again"""
+    now = datetime.utcnow()
+    payments = Payment.__table__
+    due = select(Payment.id).where(*_expiring_payments(now)).limit(batch_size).with_for_update(skip_locked=True)
+    # Only rows still pending, so a payment completed meanwhile is left alone
+    expired = db.execute(
+        update(payments)
+        .where(payments.c.id.in_(due.scalar_subquery()), payments.c.status == PaymentStatus.PENDING)
+        .values(status=PaymentStatus.FAILED, updated_at=now)
+        .returning(payments.c.application_id, payments.c.amount)
+    ).all()
+    if not expired:
+        return 0
+    analytics.record_payment_changes(
+        db, ((PaymentStatus.PENDING, amount, PaymentStatus.FAILED, amount) for _, amount in expired)
+    )
+    application_ids = {application_id for application_id, _ in expired}
+    for tracking_id in db.scalars(select(Application.tracking_id).where(Application.id.in_(application_ids))):
+        cache.mark_tracking_stale(db, tracking_id)
+    return len(expired)
+
+def expiring_payments_backlog(db: Session) -> int:
+    return db.scalar(select(func.count()).select_from(Payment).where(*_expiring_payments(datetime.utcnow())))
+
+def _stale_reviews(now: datetime):
+    cutoff = now - timedelta(days=REVIEW_NUDGE_DAYS)
+    return (
+        Application.status == ApplicationStatus.UNDER_REVIEW,
+        Application.updated_at < cutoff,
+        or_(Application.review_nudged_at.is_(None), Application.review_nudged_at < cutoff),
+    )
+
+def nudge_stale_reviews(db: Session, batch_size: int) -> int:
+    """Email admins a list of applications under review for REVIEW_NUDGE_DAYS; repeated while they stay there"""
+    now = datetime.utcnow()
+    stale = db.execute(
+        select(
+            Application.id, Application.tracking_id, Application.business_name, Application.full_name,
+            Application.city, Application.updated_at,
+        )
+        .where(*_stale_reviews(now))
+        .order_by(Application.id)
+        .limit(batch_size)
+    ).all()
+    if not stale:
+        return 0
+    admins = db.scalars(select(User.email).where(User.is_admin.is_(True), User.email.isnot(None))).all()
+    notifications.enqueue_review_reminders(db, admins, stale, key=f"review-reminder:{now.isoformat()}:{stale[0].id}")
+    # Not an edit of the application, so updated_at keeps its value
+    db.execute(
+        update(Application)
+        .where(Application.id.in_([row.id for row in stale]))
+        .values(review_nudged_at=now, updated_at=Application.updated_at)
+        .execution_options(synchronize_session=False)
+    )
+    return len(stale)
+
+def stale_reviews_backlog(db: Session) -> int:
+    return db.scalar(select(func.count()).select_from(Application).where(*_stale_reviews(datetime.utcnow())))
+
+def rebuild_analytics(db: Session, batch_size: int) -> int:
+    """Recompute the dashboard counters, correcting any drift; returns the number of counters"""
+    analytics.rebuild(db)
+    return db.scalar(select(func.count()).select_from(AnalyticsCounter))
+
+def maintain_partitions(db: Session, batch_size: int) -> int:
+    """Create the coming months' history partitions (PostgreSQL); returns how many were created"""
+    return lifecycle.ensure_partitions(db)
+
+def default_jobs() -> List[Job]:
+    jobs = []
+    if PAYMENT_EXPIRY_DAYS > 0:
+        jobs.append(Job("expire-pending-payments", 15 * 60, expire_pending_payments, expiring_payments_backlog))
+    if REVIEW_NUDGE_DAYS > 0:
+        jobs.append(Job("nudge-stale-reviews", 60 * 60, nudge_stale_reviews, stale_reviews_backlog))
+    if ANALYTICS_REBUILD_HOURS > 0:
+        jobs.append(Job("rebuild-analytics", ANALYTICS_REBUILD_HOURS * 3600, rebuild_analytics, batch_size=0))
+    if PARTITION_MAINTENANCE_HOURS > 0:
+        jobs.append(Job("maintain-partitions", PARTITION_MAINTENANCE_HOURS * 3600, maintain_partitions, batch_size=0))
+    return jobs
+
+# State
+
+def list_jobs(db: Session) -> List[ScheduledJob]:
+    return db.scalars(select(ScheduledJob).order_by(ScheduledJob.name)).all()
+
+@contextmanager
+def job_lock(name: str):
+    """Yields whether this process now leads the job; always True off PostgreSQL"""
+    if engine.dialect.name != "postgresql":
+        yield True
+        return
+    params = {"lock_class": LOCK_CLASS, "name": name}
+    with engine.connect() as connection:
+        locked = connection.scalar(text("SELECT pg_try_advisory_lock(:lock_class, hashtext(:name))"), params)
+        # The lock outlives the transaction; don't sit idle in one for the run
+        connection.commit()
+        try:
+            yield locked
+        finally:
+            if locked:
+                connection.execute(text("SELECT pg_advisory_unlock(:lock_class, hashtext(:name))"), params)
+                connection.commit()
+
+_jobs = ScheduledJob.__table__
+
+class Scheduler:
+    """Polls scheduled_jobs and runs due jobs in worker threads while the app runs"""
+
+    def __init__(
+        self,
+        jobs: List[Job] = None,
+        poll_interval: float = SCHEDULER_POLL_INTERVAL,
+        lease_seconds: float = SCHEDULER_LEASE_SECONDS,
+        session_factory=SessionLocal,
+    ):
+        self.jobs: Dict[str, Job] = {job.name: job for job in (default_jobs() if jobs is None else jobs)}
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.session_factory = session_factory
+        # Each job's row as of the last poll, for the metrics gauges
+        self.state: Dict[str, dict] = {}
+        self._task = None
+        self._running: Dict[str, asyncio.Task] = {}
+        self._stopping = threading.Event()
+
+    def start(self):
+        if SCHEDULER_ENABLED and self.jobs and self._task is None:
+            self._stopping.clear()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Stop polling, and let running jobs finish their current batch"""
+        self._stopping.set()
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._running:
+            await asyncio.gather(*self._running.values(), return_exceptions=True)
+
+    async def _run(self):
+        while True:
+            try:
+                await self.run_due()
+            except Exception:
+                logger.exception("Scheduler poll failed")
+            await asyncio.sleep(self.poll_interval)
+
+    async def run_due(self) -> List[str]:
+        """Start the due jobs not already running in this process; returns their names"""
+        loop = asyncio.get_running_loop()
+        started = []
+        for name in await asyncio.to_thread(self.due_jobs):
+            if name in self._running:
+                continue
+            task = loop.create_task(asyncio.to_thread(self.run_job, self.jobs[name]))
+            task.add_done_callback(lambda _, name=name: self._running.pop(name, None))
+            self._running[name] = task
+            started.append(name)
+        return started
+
+    def due_jobs(self) -> List[str]:
+        """Names of the jobs due now, adding rows for new jobs (due at once)"""
+        now = datetime.utcnow()
+        with self.session_factory() as db:
+            known = set(db.scalars(select(ScheduledJob.name).where(ScheduledJob.name.in_(self.jobs))))
+            for name in self.jobs.keys() - known:
+                try:
+                    db.execute(insert(_jobs).values(name=name, next_run_at=now, runs=0, failures=0, created_at=now, updated_at=now))
+                    db.commit()
+                except IntegrityError:
+                    # Another worker added it first
+                    db.rollback()
+            rows = db.execute(select(_jobs).where(_jobs.c.name.in_(self.jobs))).mappings().all()
+        self.state = {row["name"]: dict(row) for row in rows}
+        return sorted(row["name"] for row in rows if row["next_run_at"] <= now)
+
+    def _claim(self, db: Session, job: Job, now: datetime, force: bool) -> bool:
+        conditions = [_jobs.c.name == job.name]
+        if not force:
+            conditions.append(_jobs.c.next_run_at <= now)
+        if db.get_bind().dialect.name != "postgresql":
+            # Without an advisory lock a RUNNING row may still be running
+            conditions.append(or_(
+                _jobs.c.status.is_(None),
+                _jobs.c.status != JobRunStatus.RUNNING,
+                _jobs.c.last_started_at < now - timedelta(seconds=self.lease_seconds),
+            ))
+        claimed = db.execute(
+            update(_jobs)
+            .where(*conditions)
+            .values(
+                status=JobRunStatus.RUNNING,
+                last_started_at=now,
+                next_run_at=now + timedelta(seconds=job.interval),
+                updated_at=now,
+            )
+        ).rowcount == 1
+        db.commit()
+        return claimed
+
+    def run_job(self, job: Job, force: bool = False) -> Optional[dict]:
+        """Run one job if it is due (or forced) and no other worker is running it
+
+        Returns the run's outcome, or None if this process did not run it.
+        """
+        with job_lock(job.name) as locked:
+            if not locked:
+                return None
+            with self.session_factory() as db:
+                if not self._claim(db, job, datetime.utcnow(), force):
+                    return None
+            return self._execute(job)
+
+    def _execute(self, job: Job) -> dict:
+        start = time.monotonic()
+        processed, batches, capped, error = 0, 0, False, None
+        try:
+            while True:
+                with self.session_factory() as db:
+                    count = job.run_batch(db, job.batch_size)
+                    db.commit()
+                processed += count
+                batches += 1
+                if not job.batch_size or count < job.batch_size:
+                    break
+                if time.monotonic() - start >= job.max_runtime or self._stopping.is_set():
+                    capped = True
+                    break
+        except Exception as exc:
+            logger.exception("Scheduled job %s failed", job.name)
+            error = f"{type(exc).__name__}: {exc}"
+        backlog = None
+        if job.backlog:
+            try:
+                with self.session_factory() as db:
+                    backlog = job.backlog(db)
+            except Exception:
+                logger.warning("Could not count the backlog of %s", job.name, exc_info=True)
+        duration = time.monotonic() - start
+        now = datetime.utcnow()
+
+        values = dict(
+            status=JobRunStatus.FAILED if error else JobRunStatus.COMPLETED,
+            last_finished_at=now,
+            last_duration=duration,
+            last_processed=processed,
+            backlog=backlog,
+            last_error=error,
+            runs=_jobs.c.runs + 1,
+            failures=_jobs.c.failures + (1 if error else 0),
+            updated_at=now,
+        )
+        if capped:
+            # Due again at the next poll
+            values["next_run_at"] = now
+        with self.session_factory() as db:
+            db.execute(update(_jobs).where(_jobs.c.name == job.name).values(**values))
+            db.commit()
+
+        outcome = "failed" if error else "completed"
+        metrics[f"runs:{job.name}:{outcome}"] += 1
+        metrics[f"items:{job.name}"] += processed
+        metrics[f"seconds:{job.name}"] += duration
+        self.state.setdefault(job.name, {}).update(name=job.name, backlog=backlog, last_duration=duration)
+        logger.info(
+            "Scheduled job %s %s: %d items in %d batches, %.1fs%s, backlog %s",
+            job.name, outcome, processed, batches, duration, " (runtime cap)" if capped else "", backlog,
+        )
+        return {
+            "job": job.name, "status": outcome, "processed": processed, "batches": batches,
+            "duration": round(duration, 3), "capped": capped, "backlog": backlog, "error": error,
+        }
+
+scheduler = Scheduler()
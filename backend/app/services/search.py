@@ -0,0 +1,207 @@
+import re
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import DDL, and_, column, event, func, literal, literal_column, or_, select, table, text
+from sqlalchemy.orm import Session
+
+from app import crud
+from app.database import Application, ApplicationStatus
+
+# Admin application search
+#
+# Admins look dealers up by applicant or business name, city, GST/PAN
+# (registration_number) or phone. Each backend keeps a search index next to
+# the applications table:
+#
+#   postgresql  GIN index over a 'simple' tsvector of the searchable columns
+#               for word and prefix matches, plus a pg_trgm GIN index over the
+#               same text for typo-tolerant matches (word_similarity). Where
+#               pg_trgm is not available (no postgresql-contrib) the trigram
+#               index is skipped and search has no typo-tolerant fallback
+#   sqlite      FTS5 table with the trigram tokenizer over those columns,
+#               kept in sync by triggers; queries match any trigram of the
+#               search terms and rank by bm25, so prefixes, substrings of
+#               phone/GST numbers and misspellings all score
+#
+# Indexes are created with the table; `ensure_index` adds them to an existing
+# database (python -m app.cli rebuild-search-index). Other dialects fall back
+# to unindexed LIKE matching.
+
+SEARCH_COLUMNS = ("full_name", "business_name", "city", "registration_number", "phone")
+
+MAX_TERMS = 8
+
+# Ranked results are paginated by offset; deep pages are not useful for search
+MAX_OFFSET = 1000
+
+# The indexed expression. Written as literal SQL so queries repeat it verbatim:
+# with bound parameters in place of the constants (asyncpg) PostgreSQL would not
+# recognise it as the indexed expression
+_DOCUMENT_SQL = " || ' ' || ".join(f"coalesce({name}, '')" for name in SEARCH_COLUMNS)
+_TSVECTOR_SQL = f"to_tsvector('simple'::regconfig, {_DOCUMENT_SQL})"
+_TRIGRAM_SQL = f"lower({_DOCUMENT_SQL})"
+
+# PostgreSQL
+_PG_DDL = [
+    f"CREATE INDEX IF NOT EXISTS ix_applications_search_tsv ON applications USING gin (({_TSVECTOR_SQL}))",
+]
+_PG_TRIGRAM_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    f"CREATE INDEX IF NOT EXISTS ix_applications_search_trgm ON applications USING gin (({_TRIGRAM_SQL}) gin_trgm_ops)",
+]
+_TRIGRAM_AVAILABLE_SQL = "SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'"
+_TRIGRAM_INSTALLED_SQL = "SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'"
+
+# SQLite: an external-content FTS5 table stores only the index, reading column
+# values from applications. Triggers follow the FTS5 documentation's pattern;
+# the update trigger only fires when a searchable column changes
+_FTS_COLUMNS = ", ".join(SEARCH_COLUMNS)
+_FTS_NEW = ", ".join(f"new.{name}" for name in SEARCH_COLUMNS)
+_FTS_OLD = ", ".join(f"old.{name}" for name in SEARCH_COLUMNS)
+
+_SQLITE_DDL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS applications_search USING fts5(
+        {_FTS_COLUMNS}, content='applications', content_rowid='id', tokenize='trigram'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS applications_search_ai AFTER INSERT ON applications BEGIN
+        INSERT INTO applications_search(rowid, {_FTS_COLUMNS}) VALUES (new.id, {_FTS_NEW});
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS applications_search_ad AFTER DELETE ON applications BEGIN
+        INSERT INTO applications_search(applications_search, rowid, {_FTS_COLUMNS}) VALUES ('delete', old.id, {_FTS_OLD});
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS applications_search_au AFTER UPDATE OF {_FTS_COLUMNS} ON applications BEGIN
+        INSERT INTO applications_search(applications_search, rowid, {_FTS_COLUMNS}) VALUES ('delete', old.id, {_FTS_OLD});
+        INSERT INTO applications_search(rowid, {_FTS_COLUMNS}) VALUES (new.id, {_FTS_NEW});
+    END""",
+]
+
+_SQLITE_DROP = [
+    "DROP TRIGGER IF EXISTS applications_search_ai",
+    "DROP TRIGGER IF EXISTS applications_search_ad",
+    "DROP TRIGGER IF EXISTS applications_search_au",
+    "DROP TABLE IF EXISTS applications_search",
+]
+
+def _trigram_available(ddl, target, bind, **kw) -> bool:
+    return bind.execute(text(_TRIGRAM_AVAILABLE_SQL)).first() is not None
+
+_table = Application.__table__
+_fts_table = table("applications_search", column("rowid"))
+for _statement in _PG_DDL:
+    event.listen(_table, "after_create", DDL(_statement).execute_if(dialect="postgresql"))
+for _statement in _PG_TRIGRAM_DDL:
+    event.listen(_table, "after_create", DDL(_statement).execute_if(dialect="postgresql", callable_=_trigram_available))
+for _statement in _SQLITE_DDL:
+    event.listen(_table, "after_create", DDL(_statement).execute_if(dialect="sqlite"))
+for _statement in _SQLITE_DROP:
+    event.listen(_table, "before_drop", DDL(_statement).execute_if(dialect="sqlite"))
+
+def ensure_index(db: Session):
+    """Create the search index if missing and (re)build it from applications"""
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        # Expression indexes are maintained by PostgreSQL itself
+        statements = list(_PG_DDL)
+        if db.execute(text(_TRIGRAM_AVAILABLE_SQL)).first():
+            statements += _PG_TRIGRAM_DDL
+        for statement in statements:
+            db.execute(text(statement))
+        _trigram_installed.clear()
+    elif dialect == "sqlite":
+        for statement in _SQLITE_DDL:
+            db.execute(text(statement))
+        db.execute(text("INSERT INTO applications_search(applications_search) VALUES ('rebuild')"))
+
+# Queries
+
+def terms(q: str) -> List[str]:
+    """Lowercased word terms of a search string"""
+    return re.findall(r"\w+", q.lower())[:MAX_TERMS]
+
+def _trigrams(term: str) -> List[str]:
+    return [term[i:i + 3] for i in range(len(term) - 2)]
+
+# Each backend has a strict query (every term matches as a word prefix or
+# substring) and an approximate one for misspellings, which is only used when
+# nothing matches strictly: it matches far more rows, so ranking costs more
+
+# Whether pg_trgm is installed, by database URL; looked up once per process
+_trigram_installed: Dict[str, bool] = {}
+
+def _has_trigram(db: Session) -> bool:
+    url = str(db.get_bind().url)
+    if url not in _trigram_installed:
+        _trigram_installed[url] = db.execute(text(_TRIGRAM_INSTALLED_SQL)).first() is not None
+    return _trigram_installed[url]
+
+def _postgresql_queries(words: List[str], fuzzy: bool):
+    tsvector = literal_column(_TSVECTOR_SQL)
+    tsquery = func.to_tsquery(literal_column("'simple'::regconfig"), " & ".join(f"{word}:*" for word in words))
+    yield tsvector.op("@@")(tsquery), func.ts_rank(tsvector, tsquery)
+    if not fuzzy:
+        return
+
+    # Some words of the document approximately match the search string
+    document = literal_column(_TRIGRAM_SQL)
+    phrase = " ".join(words)
+    yield literal(phrase).op("<%")(document), func.word_similarity(phrase, document)
+
+def _sqlite_queries(words: List[str]):
+    # The trigram tokenizer needs three characters; shorter terms are ignored
+    words = [word for word in words if len(word) >= 3]
+    if not words:
+        return
+    fts = literal_column("applications_search")
+    # bm25 is lower for better matches
+    score = -func.bm25(fts)
+    yield fts.op("MATCH")(" AND ".join(f'"{word}"' for word in words)), score
+
+    grams = dict.fromkeys(gram for word in words for gram in _trigrams(word))
+    yield fts.op("MATCH")(" OR ".join(f'"{gram}"' for gram in grams)), score
+
+def _fallback_queries(words: List[str]):
+    columns = [getattr(Application, name) for name in SEARCH_COLUMNS]
+    yield and_(*(or_(*(column.ilike(f"%{word}%") for column in columns)) for word in words)), literal_column("0.0")
+
+def _page(db: Session, condition, score, limit, offset, status):
+    query = select(*crud.APPLICATION_RESPONSE_COLUMNS, score.label("score"))
+    if db.get_bind().dialect.name == "sqlite":
+        query = query.select_from(_fts_table.join(_table, _table.c.id == _fts_table.c.rowid))
+    query = query.where(condition)
+    if status:
+        query = query.where(Application.status == status)
+    return db.execute(query.order_by(score.desc(), Application.id).offset(offset).limit(limit)).all()
+
+def search_applications(
+    db: Session,
+    q: str,
+    limit: int = 20,
+    offset: int = 0,
+    status: Optional[ApplicationStatus] = None,
+) -> Tuple[list, Optional[int], bool]:
+    """Ranked matches for q, best first; returns (rows, next_offset, approximate)"""
+    words = terms(q)
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        queries = _postgresql_queries(words, _has_trigram(db))
+    elif dialect == "sqlite":
+        queries = _sqlite_queries(words)
+    else:
+        queries = _fallback_queries(words)
+    queries = list(queries) if words else []
+
+    rows, approximate = [], False
+    for i, (condition, score) in enumerate(queries):
+        # Fetch one extra row to know whether another page exists
+        rows = _page(db, condition, score, limit + 1, offset, status)
+        approximate = i > 0
+        # Past the last strict page is still the strict result set
+        if rows or (offset and _page(db, condition, score, 1, 0, status)):
+            break
+
+    next_offset = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        if offset + limit <= MAX_OFFSET:
+            next_offset = offset + limit
+    return rows, next_offset, approximate
@@ -0,0 +1,303 @@
+import csv
+import os
+import re
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+from sqlalchemy import event, func, or_, select
+from sqlalchemy.orm import Session
+
+from app.database import Application, ApplicationStatus, ApplicationStatusUpdate
+
+# Dealership territories
+#
+# A territory is the set of pincodes sharing their first
+# TERRITORY_PREFIX_LENGTH digits (3: an India Post sorting district) and holds
+# at most TERRITORY_MAX_DEALERS approved dealers. Two in-memory indexes answer
+# coverage questions without touching the database:
+#
+#   regions   a digit trie over pincode prefixes from TERRITORY_DATA_PATH,
+#             matched longest prefix first. The bundled file names zones,
+#             postal circles (states) and the larger sorting districts; India
+#             Post's pincode directory (pincode, districtname, statename
+#             columns) can be pointed at instead for every pincode
+#   dealers   approved applications by territory, loaded from the database
+#             on first use
+#
+# The dealer index stays current incrementally. A status change committed
+# through crud.update_application_status is applied after commit in the
+# worker that made it; every TERRITORY_REFRESH_SECONDS each worker reads the
+# approval changes in application_status_updates since the last one it saw
+# (an id range scan), which covers other workers and the CLI.
+#
+# Submissions to a covered territory are noted in their admin notes
+# (TERRITORY_CONFLICT_MODE=flag), turned away (reject) or let through (off).
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+TERRITORY_DATA_PATH = os.getenv("TERRITORY_DATA_PATH", os.path.join(DATA_DIR, "pincode_prefixes.csv"))
+TERRITORY_PREFIX_LENGTH = int(os.getenv("TERRITORY_PREFIX_LENGTH", "3"))
+TERRITORY_MAX_DEALERS = int(os.getenv("TERRITORY_MAX_DEALERS", "1"))
+TERRITORY_REFRESH_SECONDS = float(os.getenv("TERRITORY_REFRESH_SECONDS", "30"))
+# flag, reject or off
+TERRITORY_CONFLICT_MODE = os.getenv("TERRITORY_CONFLICT_MODE", "flag")
+
+PINCODE_PATTERN = re.compile(r"^[1-9]\d{5}$")
+
+metrics = Counter()
+
+class TerritoryCovered(Exception):
+    """A submission's territory already has its full complement of dealers"""
+
+    def __init__(self, coverage: dict):
+        self.coverage = coverage
+        super().__init__(
+            f"Territory {coverage['territory']} ({coverage['territory_name']}) already has "
+            f"{len(coverage['dealers'])} approved dealer(s)"
+        )
+
+def normalize_pincode(value: Optional[str]) -> Optional[str]:
+    digits = re.sub(r"\s", "", value or "")
+    return digits if PINCODE_PATTERN.match(digits) else None
+
+# Regions
+
+@dataclass(frozen=True)
+class Region:
+    prefix: str
+    name: str
+    state: Optional[str]
+
+class PincodeTrie:
+    """Digit trie of pincode prefixes; lookups walk at most six nodes"""
+
+    __slots__ = ("children", "region", "size")
+
+    def __init__(self):
+        self.children: Dict[str, "PincodeTrie"] = {}
+        self.region: Optional[Region] = None
+        self.size = 0
+
+    def insert(self, region: Region):
+        node = self
+        for digit in region.prefix:
+            node = node.children.setdefault(digit, PincodeTrie())
+        if node.region is None:
+            self.size += 1
+        node.region = region
+
+    def longest_match(self, digits: str) -> Optional[Region]:
+        node, match = self, self.region
+        for digit in digits:
+            node = node.children.get(digit)
+            if node is None:
+                break
+            match = node.region or match
+        return match
+
+def load_regions(path: str = TERRITORY_DATA_PATH) -> PincodeTrie:
+    """Build the trie from prefix,name,state rows or India Post's directory
+
+    The directory only has whole pincodes, so a territory without a row of its
+    own is named after the first district listed in it.
+    """
+    trie = PincodeTrie()
+    prefixes, territories = set(), {}
+    with open(path, newline="", encoding="utf-8-sig") as fh:
+        for row in csv.DictReader(fh):
+            row = {(key or "").strip().lower(): (value or "").strip() for key, value in row.items()}
+            prefix = row.get("prefix") or row.get("pincode") or ""
+            name = row.get("name") or row.get("districtname") or row.get("district") or ""
+            state = row.get("state") or row.get("statename") or None
+            if prefix.isdigit() and len(prefix) <= 6 and name:
+                region = Region(prefix, name.title() if name.isupper() else name, state)
+                trie.insert(region)
+                prefixes.add(prefix)
+                if len(prefix) > TERRITORY_PREFIX_LENGTH:
+                    territories.setdefault(territory_of(prefix), region)
+    for territory, region in territories.items():
+        if territory not in prefixes:
+            trie.insert(Region(territory, region.name, region.state))
+    return trie
+
+# Dealers
+
+@dataclass(frozen=True)
+class Dealer:
+    application_id: int
+    tracking_id: str
+    business_name: Optional[str]
+    city: Optional[str]
+    postal_code: str
+
+def territory_of(pincode: str) -> str:
+    return pincode[:TERRITORY_PREFIX_LENGTH]
+
+_DEALER_COLUMNS = (
+    Application.id, Application.tracking_id, Application.business_name, Application.city, Application.postal_code,
+)
+
+class TerritoryIndex:
+    def __init__(self, data_path: str = TERRITORY_DATA_PATH, refresh_seconds: float = TERRITORY_REFRESH_SECONDS):
+        self.data_path = data_path
+        self.refresh_seconds = refresh_seconds
+        self._regions: Optional[PincodeTrie] = None
+        self._dealers: Dict[str, Dict[int, Dealer]] = {}
+        self._territories: Dict[int, str] = {}
+        self._last_update_id: Optional[int] = None
+        self._refreshed_at = 0.0
+        self._lock = threading.RLock()
+
+    @property
+    def regions(self) -> PincodeTrie:
+        if self._regions is None:
+            with self._lock:
+                if self._regions is None:
+                    self._regions = load_regions(self.data_path)
+        return self._regions
+
+    @property
+    def loaded(self) -> bool:
+        return self._last_update_id is not None
+
+    def _set(self, application_id: int, dealer: Optional[Dealer]):
+        """Add or replace an approved dealer, or remove one (dealer None)"""
+        previous = self._territories.pop(application_id, None)
+        if previous is not None:
+            members = self._dealers[previous]
+            members.pop(application_id, None)
+            if not members:
+                del self._dealers[previous]
+        pincode = normalize_pincode(dealer.postal_code) if dealer else None
+        if pincode:
+            territory = territory_of(pincode)
+            self._dealers.setdefault(territory, {})[application_id] = dealer
+            self._territories[application_id] = territory
+
+    def load(self, db: Session):
+        """Build the dealer index from scratch"""
+        # Read first: changes committed while loading are replayed by refresh
+        last_update_id = db.scalar(select(func.max(ApplicationStatusUpdate.id))) or 0
+        rows = db.execute(select(*_DEALER_COLUMNS).where(Application.status == ApplicationStatus.APPROVED)).all()
+        with self._lock:
+            self._dealers, self._territories = {}, {}
+            for row in rows:
+                self._set(row.id, Dealer(row.id, row.tracking_id, row.business_name, row.city, row.postal_code))
+            self._last_update_id = last_update_id
+            self._refreshed_at = time.monotonic()
+        metrics["loads"] += 1
+
+    def refresh(self, db: Session) -> int:
+        """Apply the approvals and revocations recorded since the last load or refresh"""
+        # Read first, as in load: a change committed after it is left for the
+        # next refresh rather than skipped
+        last_update_id = db.scalar(select(func.max(ApplicationStatusUpdate.id))) or 0
+        rows = db.execute(
+            select(Application.status, *_DEALER_COLUMNS)
+            .select_from(ApplicationStatusUpdate)
+            .join(Application, Application.id == ApplicationStatusUpdate.application_id)
+            .where(
+                ApplicationStatusUpdate.id > self._last_update_id,
+                ApplicationStatusUpdate.id <= last_update_id,
+                or_(
+                    ApplicationStatusUpdate.new_status == ApplicationStatus.APPROVED,
+                    ApplicationStatusUpdate.previous_status == ApplicationStatus.APPROVED,
+                ),
+            )
+            .order_by(ApplicationStatusUpdate.id)
+        ).all()
+        with self._lock:
+            # Set from the application's current status, so replays are harmless
+            for row in rows:
+                approved = row.status == ApplicationStatus.APPROVED
+                self._set(row.id, Dealer(row.id, row.tracking_id, row.business_name, row.city, row.postal_code) if approved else None)
+            self._last_update_id = max(self._last_update_id, last_update_id)
+            self._refreshed_at = time.monotonic()
+        metrics["refreshes"] += 1
+        metrics["changes_applied"] += len(rows)
+        return len(rows)
+
+    def ensure_fresh(self, db: Session):
+        if not self.loaded:
+            self.load(db)
+        elif time.monotonic() - self._refreshed_at >= self.refresh_seconds:
+            self.refresh(db)
+
+    def apply(self, dealer: Dealer, approved: bool):
+        """A status change committed in this worker"""
+        if not self.loaded:
+            return  # the first load will read it
+        with self._lock:
+            self._set(dealer.application_id, dealer if approved else None)
+        metrics["changes_applied"] += 1
+
+    def coverage(self, pincode: str) -> Optional[dict]:
+        """Territory and approved dealers for a pincode; None if it is not a known pincode"""
+        pincode = normalize_pincode(pincode)
+        region = self.regions.longest_match(pincode) if pincode else None
+        if region is None:
+            return None
+        territory = territory_of(pincode)
+        # The pincode's own region when the data has nothing at the territory's level
+        territory_region = self.regions.longest_match(territory) or region
+        with self._lock:
+            dealers = sorted(self._dealers.get(territory, {}).values(), key=lambda dealer: dealer.application_id)
+        return {
+            "pincode": pincode,
+            "territory": territory,
+            "territory_name": territory_region.name,
+            "state": region.state or territory_region.state,
+            "place": region.name,
+            "max_dealers": TERRITORY_MAX_DEALERS,
+            "covered": len(dealers) >= TERRITORY_MAX_DEALERS,
+            "dealers": [vars(dealer) for dealer in dealers],
+        }
+
+territory_index = TerritoryIndex()
+
+def get_coverage(db: Session, pincode: str) -> Optional[dict]:
+    territory_index.ensure_fresh(db)
+    return territory_index.coverage(pincode)
+
+def find_conflict(db: Session, postal_code: Optional[str]) -> Optional[TerritoryCovered]:
+    """The conflict a new application for postal_code has, unless the check is off"""
+    if TERRITORY_CONFLICT_MODE == "off":
+        return None
+    coverage = get_coverage(db, postal_code)
+    if coverage is None or not coverage["covered"]:
+        return None
+    metrics["conflicts"] += 1
+    return TerritoryCovered(coverage)
+
+def check_submission(db: Session, application: Application):
+    """Flag or reject a new application for a covered territory"""
+    conflict = find_conflict(db, application.postal_code)
+    if conflict is None:
+        return
+    if TERRITORY_CONFLICT_MODE == "reject":
+        raise conflict
+    note = str(conflict)
+    application.admin_notes = f"{application.admin_notes}\n{note}" if application.admin_notes else note
+
+# Status changes in this worker, applied once they commit
+
+_PENDING_KEY = "pending_territory_changes"
+
+def record_status_change(db: Session, application: Application, previous_status, new_status):
+    if ApplicationStatus.APPROVED not in (previous_status, new_status) or previous_status == new_status:
+        return
+    dealer = Dealer(
+        application.id, application.tracking_id, application.business_name, application.city, application.postal_code
+    )
+    db.info.setdefault(_PENDING_KEY, []).append((dealer, new_status == ApplicationStatus.APPROVED))
+
+@event.listens_for(Session, "after_commit")
+def _apply_after_commit(session):
+    for dealer, approved in session.info.pop(_PENDING_KEY, ()):
+        territory_index.apply(dealer, approved)
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_after_rollback(session, previous_transaction):
+    session.info.pop(_PENDING_KEY, None)
@@ -0,0 +1,196 @@
+import functools
+import inspect
+import json
+import os
+from collections import abc
+from dataclasses import replace
+from datetime import date, datetime, time
+from decimal import Decimal
+from enum import Enum
+from typing import Any, Callable, Dict, Optional, Union, get_args, get_origin, get_type_hints
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.routing import APIRoute, request_response
+from fastapi.datastructures import DefaultPlaceholder
+from pydantic import BaseModel
+from starlette.responses import Response
+
+from app.utils.settings import env_bool
+
+try:
+    from pydantic_core import PydanticUndefined
+except ImportError:  # pydantic 1.x marks required fields with Ellipsis
+    PydanticUndefined = Ellipsis
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Fast JSON response rendering
+#
+# By default FastAPI validates whatever a handler returns against its
+# response_model and only then serializes it. Our handlers return ORM objects
+# and rows that were typed on the way into the database, so that second
+# validation is pure overhead on list endpoints. Routes converted here build
+# plain dicts straight from the objects, using a converter compiled once per
+# response_model, and encode them to bytes with orjson (stdlib json if orjson
+# is not installed). The response_model still drives the OpenAPI schema.
+#
+# Enable per router with APIRouter(route_class=FastJSONRoute) or enable(router),
+# or for every router from app.main with FAST_JSON_RESPONSES=true.
+
+FAST_JSON_RESPONSES = env_bool("FAST_JSON_RESPONSES", False)
+
+def _default(value):
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode()
+
+# Converters turn a returned object into JSON-ready builtins following the
+# annotation; None means the value can be passed to the encoder as is
+
+Converter = Optional[Callable[[Any], Any]]
+
+_MISSING = object()
+_EMPTY = {}
+
+_SEQUENCE_ORIGINS = (list, tuple, set, frozenset, abc.Sequence, abc.Iterable)
+_MAPPING_ORIGINS = (dict, abc.Mapping)
+
+def _converter(annotation, models: Dict[type, Callable]) -> Converter:
+    origin = get_origin(annotation)
+    args = get_args(annotation)
+
+    if origin is Union:
+        options = [arg for arg in args if arg is not type(None)]
+        if len(options) != 1:
+            return jsonable_encoder
+        inner = _converter(options[0], models)
+        if inner is None:
+            return None
+        return lambda value: None if value is None else inner(value)
+
+    if origin in _SEQUENCE_ORIGINS:
+        inner = _converter(args[0], models) if args else None
+        if inner is None:
+            return list
+        return lambda values: [inner(value) for value in values]
+
+    if origin in _MAPPING_ORIGINS:
+        inner = _converter(args[1], models) if len(args) == 2 else None
+        if inner is None:
+            return None
+        return lambda values: {key: inner(value) for key, value in values.items()}
+
+    if inspect.isclass(annotation) and issubclass(annotation, BaseModel):
+        return _model_converter(annotation, models)
+
+    if annotation is Any:
+        return jsonable_encoder
+    return None
+
+def _model_converter(model, models: Dict[type, Callable]) -> Callable:
+    if model in models:
+        return models[model]
+    # Registered before compiling fields so self-referencing models resolve
+    models[model] = lambda obj: convert(obj)
+
+    hints = get_type_hints(model)
+    fields = []
+    for name, field in model.__fields__.items():
+        default = getattr(field, "default", None)
+        if default is PydanticUndefined or default is Ellipsis:
+            default = None
+        fields.append((name, _converter(hints.get(name, Any), models), default))
+
+    def convert(obj):
+        if obj is None:
+            return None
+        if isinstance(obj, abc.Mapping):
+            values, source = obj, None
+        else:
+            # Loaded ORM attributes (and pydantic fields) live in the instance
+            # __dict__; reading it skips the instrumented descriptors. Anything
+            # missing there (rows, deferred columns, properties) uses getattr
+            values, source = getattr(obj, "__dict__", _EMPTY), obj
+        result = {}
+        for name, conv, default in fields:
+            value = values.get(name, _MISSING)
+            if value is _MISSING:
+                value = default if source is None else getattr(source, name, default)
+            result[name] = value if conv is None else conv(value)
+        return result
+
+    models[model] = convert
+    return convert
+
+def response_encoder(annotation) -> Callable[[Any], bytes]:
+    """Compile an encoder from a response_model annotation to JSON bytes"""
+    convert = _converter(annotation, {})
+    if convert is None:
+        return dumps
+    return lambda content: dumps(convert(content))
+
+# Route integration
+
+def _eligible(route: APIRoute) -> bool:
+    return (
+        route.response_model is not None
+        and isinstance(route.response_class, DefaultPlaceholder)
+        and not route.response_model_include
+        and not route.response_model_exclude
+        and not route.response_model_exclude_unset
+        and not route.response_model_exclude_defaults
+        and not route.response_model_exclude_none
+        and not getattr(route.dependant.call, "_fast_json", False)
+    )
+
+def install(route: APIRoute) -> bool:
+    """Serve an existing route through the fast encoder; returns False if not applicable"""
+    if not _eligible(route):
+        return False
+
+    encode = response_encoder(route.response_model)
+    status_code = route.status_code or 200
+    call = route.dependant.call
+
+    def render(content):
+        if isinstance(content, Response):
+            return content
+        return Response(encode(content), status_code=status_code, media_type="application/json")
+
+    if inspect.iscoroutinefunction(call):
+        @functools.wraps(call)
+        async def endpoint(**values):
+            return render(await call(**values))
+    else:
+        @functools.wraps(call)
+        def endpoint(**values):
+            return render(call(**values))
+    endpoint._fast_json = True
+
+    route.endpoint = endpoint
+    route.dependant = replace(route.dependant, call=endpoint)
+    route.app = request_response(route.get_route_handler())
+    return True
+
+class FastJSONRoute(APIRoute):
+    """APIRoute serving its response_model through the fast encoder"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        install(self)
+
+def enable(router) -> int:
+    """Convert every eligible route already on a router; returns how many changed"""
+    return sum(install(route) for route in router.routes if isinstance(route, APIRoute))
@@ -0,0 +1,111 @@
+import os
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Optional
+
+# Time-ordered, checksummed public IDs
+#
+# Tracking and dealership IDs are 16 Crockford base32 characters followed by
+# a check character:
+#
+#   48 bits  milliseconds since the Unix epoch (as in a ULID)
+#   32 bits  random, incremented instead of redrawn within one millisecond
+#
+# IDs sort by creation time, so inserts append to the right edge of the unique
+# B-tree indexes instead of splitting pages all over them, and one process
+# never repeats an ID. Across processes two IDs collide only if they are drawn
+# in the same millisecond with the same 32 random bits.
+#
+# The check character is Luhn mod 32 over the other sixteen. It catches every
+# single mistyped character and every swap of adjacent characters except 0
+# and Z, so a lookup can turn away a mistyped ID without touching the
+# database. Input is read the Crockford way: case-insensitive, hyphens
+# ignored, I and L read as 1, O as 0.
+#
+# IDs issued before this scheme (8 hex digits, e.g. "3F9A0C1B") carry no
+# check character and are still accepted as they are.
+
+ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+ID_LENGTH = 17
+DEALERSHIP_PREFIX = "CMPA-D-"
+
+_VALUES = {char: value for value, char in enumerate(ALPHABET)}
+_READ_AS = str.maketrans({"I": "1", "L": "1", "O": "0", "-": None, " ": None})
+_LEGACY_ID = re.compile(r"[0-9A-F]{8}")
+
+def _encode(value: int, length: int) -> str:
+    chars = []
+    for _ in range(length):
+        value, digit = divmod(value, 32)
+        chars.append(ALPHABET[digit])
+    return "".join(reversed(chars))
+
+def check_character(body: str) -> str:
+    """Luhn mod 32 check character for a string of ALPHABET characters"""
+    total = 0
+    for position, char in enumerate(reversed(body)):
+        addend = _VALUES[char] * (2 if position % 2 == 0 else 1)
+        total += addend // 32 + addend % 32
+    return ALPHABET[-total % 32]
+
+class IdGenerator:
+    """Monotonic ID source; thread-safe, one per process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._last_ms = 0
+        self._sequence = 0
+
+    def new_id(self) -> str:
+        with self._lock:
+            now_ms = time.time_ns() // 1_000_000
+            if now_ms > self._last_ms:
+                self._last_ms = now_ms
+                self._sequence = int.from_bytes(os.urandom(4), "big")
+            else:
+                # Same millisecond, or the clock stepped back: stay ordered
+                self._sequence += 1
+                if self._sequence >> 32:
+                    self._last_ms += 1
+                    self._sequence = int.from_bytes(os.urandom(4), "big")
+            body = _encode(self._last_ms, 10) + _encode(self._sequence, 6)
+        return body + check_character(body)
+
+_generator = IdGenerator()
+
+def new_tracking_id() -> str:
+    return _generator.new_id()
+
+def new_dealership_id() -> str:
+    return DEALERSHIP_PREFIX + _generator.new_id()
+
+def normalize(value: str) -> Optional[str]:
+    """The canonical form of a typed ID, or None if its check character is wrong"""
+    value = (value or "").strip().upper()
+    if _LEGACY_ID.fullmatch(value):
+        return value
+    value = value.translate(_READ_AS)
+    if len(value) != ID_LENGTH or any(char not in _VALUES for char in value):
+        return None
+    if check_character(value[:-1]) != value[-1]:
+        return None
+    return value
+
+def normalize_dealership_id(value: str) -> Optional[str]:
+    value = (value or "").strip().upper()
+    if not value.startswith(DEALERSHIP_PREFIX):
+        return None
+    normalized = normalize(value[len(DEALERSHIP_PREFIX):])
+    return DEALERSHIP_PREFIX + normalized if normalized else None
+
+def created_at(value: str) -> Optional[datetime]:
+    """When a (current scheme) ID was issued, in UTC"""
+    value = normalize(value)
+    if value is None or len(value) != ID_LENGTH:
+        return None
+    milliseconds = 0
+    for char in value[:10]:
+        milliseconds = milliseconds * 32 + _VALUES[char]
+    return datetime.fromtimestamp(milliseconds / 1000, tz=timezone.utc)
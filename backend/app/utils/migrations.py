@@ -0,0 +1,91 @@
+import os
+from typing import Optional
+
+from sqlalchemy import inspect, text
+
+# Schema migrations (Alembic)
+#
+# The schema is owned by the revisions under backend/migrations and applied
+# once per deploy with `python -m app.cli migrate`, not by the API workers.
+# Databases created by the create_all() the app used to run at startup have no
+# alembic_version table; `upgrade` stamps those at BASELINE, whose tables they
+# already have, and applies the later revisions from there.
+#
+# Revisions add indexes with create_index below: on PostgreSQL that is
+# CREATE INDEX CONCURRENTLY outside the migration transaction, so a large
+# table keeps taking writes while its index builds.
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+BASELINE = "0001"
+# pg_advisory_lock key held while migrating, so concurrent deploys take turns
+MIGRATION_LOCK_KEY = 0x63616D6F7061  # "camopa"
+
+def alembic_config():
+    from alembic.config import Config
+
+    config = Config(os.path.join(BACKEND_DIR, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(BACKEND_DIR, "migrations"))
+    return config
+
+def upgrade(revision: str = "head"):
+    """Bring the database at DATABASE_URL up to `revision`"""
+    from alembic import command
+    from app.database import engine
+
+    config = alembic_config()
+    with engine.connect() as connection:
+        inspector = inspect(connection)
+        unversioned = not inspector.has_table("alembic_version") and inspector.has_table("applications")
+    if unversioned:
+        command.stamp(config, BASELINE)
+    command.upgrade(config, revision)
+
+def current_revision() -> Optional[str]:
+    from alembic.runtime.migration import MigrationContext
+    from app.database import engine
+
+    with engine.connect() as connection:
+        return MigrationContext.configure(connection).get_current_revision()
+
+# Helpers for revision scripts
+
+def create_index(name: str, table: str, expression: str, unique: bool = False, using: Optional[str] = None):
+    """CREATE INDEX IF NOT EXISTS, concurrently on PostgreSQL
+
+    `expression` is the parenthesised part of CREATE INDEX, e.g. "created_at, id".
+    """
+    from alembic import op
+
+    kind = "UNIQUE INDEX" if unique else "INDEX"
+    method = f" USING {using}" if using else ""
+    if op.get_bind().dialect.name != "postgresql":
+        op.execute(f"CREATE {kind} IF NOT EXISTS {name} ON {table}{method} ({expression})")
+        return
+    # CONCURRENTLY cannot run inside a transaction block
+    with op.get_context().autocommit_block():
+        # A concurrent build that failed leaves an INVALID index behind, which
+        # IF NOT EXISTS would otherwise mistake for a finished one
+        invalid = op.get_bind().execute(
+            text(
+                "SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+                "WHERE c.relname = :name AND pg_table_is_visible(c.oid) AND NOT i.indisvalid"
+            ),
+            {"name": name},
+        ).first()
+        if invalid:
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+        op.execute(f"CREATE {kind} CONCURRENTLY IF NOT EXISTS {name} ON {table}{method} ({expression})")
+
+def drop_index(name: str):
+    from alembic import op
+
+    if op.get_bind().dialect.name != "postgresql":
+        op.execute(f"DROP INDEX IF EXISTS {name}")
+        return
+    with op.get_context().autocommit_block():
+        op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+
+def has_table(name: str) -> bool:
+    from alembic import op
+
+    return inspect(op.get_bind()).has_table(name)
@@ -0,0 +1,37 @@
+# bcrypt password hashing
+#
+# Kept free of app imports so process-pool workers can import it cheaply.
+# bcrypt only reads the first 72 bytes of a password; passlib truncated longer
+# ones silently and bcrypt>=5 raises instead, so truncate here to keep existing
+# hashes verifiable.
+
+from typing import Optional, Tuple
+
+import bcrypt
+
+MAX_PASSWORD_BYTES = 72
+
+def _secret(password: str) -> bytes:
+    return password.encode("utf-8")[:MAX_PASSWORD_BYTES]
+
+def hash_password(password: str, rounds: int) -> str:
+    return bcrypt.hashpw(_secret(password), bcrypt.gensalt(rounds)).decode()
+
+def hash_rounds(hashed: str) -> Optional[int]:
+    """Cost factor of a bcrypt hash ("$2b$12$..."), or None if unrecognised"""
+    parts = hashed.split("$")
+    if len(parts) < 4 or not parts[2].isdigit():
+        return None
+    return int(parts[2])
+
+def verify_password(password: str, hashed: Optional[str], rounds: int) -> Tuple[bool, Optional[str]]:
+    """Check a password; on success also return a replacement hash if the cost factor changed"""
+    if not hashed:
+        return False, None
+    try:
+        ok = bcrypt.checkpw(_secret(password), hashed.encode())
+    except ValueError:
+        return False, None  # not a bcrypt hash
+    if ok and hash_rounds(hashed) != rounds:
+        return True, hash_password(password, rounds)
+    return ok, None
@@ -0,0 +1,79 @@
+# Minimal text-only PDF writer
+#
+# Kept free of app imports so process-pool workers can import it cheaply.
+# Output is deterministic for the same input, which makes content-addressed
+# storage of rendered letters deduplicate naturally.
+
+PAGE_WIDTH, PAGE_HEIGHT = 595, 842  # A4 in points
+MARGIN = 72
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+def _wrap(text: str, width: int = 90):
+    words, line = text.split(), ""
+    for word in words:
+        if line and len(line) + 1 + len(word) > width:
+            yield line
+            line = word
+        else:
+            line = f"{line} {word}" if line else word
+    yield line
+
+def render_text_pdf(title: str, paragraphs) -> bytes:
+    """Render a title and paragraphs of plain text onto a single A4 page"""
+    commands = ["BT", f"/F2 18 Tf {MARGIN} {PAGE_HEIGHT - MARGIN} Td 22 TL", f"({_escape(title)}) Tj T*", "/F1 11 Tf 15 TL T*"]
+    for paragraph in paragraphs:
+        for line in _wrap(paragraph):
+            commands.append(f"({_escape(line)}) Tj T*")
+        commands.append("T*")
+    commands.append("ET")
+    content = "\n".join(commands).encode("latin-1", "replace")
+
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        (
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] "
+            "/Resources << /Font << /F1 4 0 R /F2 5 0 R >> >> /Contents 6 0 R >>"
+        ).encode(),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>",
+        b"<< /Length %d >>\nstream\n" % len(content) + content + b"\nendstream",
+    ]
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+def render_approval_letter(letter: dict) -> bytes:
+    """Render the dealership approval letter from plain application data"""
+    address = ", ".join(
+        part for part in (letter.get("street_address"), letter.get("city"), letter.get("state"), letter.get("postal_code")) if part
+    )
+    paragraphs = [
+        f"Date: {letter['issued_date']}",
+        f"Dealership ID: {letter['dealership_id']}",
+        f"Application tracking ID: {letter['tracking_id']}",
+        f"To: {letter.get('full_name') or ''}, {letter.get('business_name') or ''}",
+        address,
+        f"Dear {letter.get('full_name') or 'Applicant'},",
+        (
+            "We are pleased to inform you that your application for a Camopa Beverages dealership "
+            f"has been approved for the area of {letter.get('city') or letter.get('state') or 'your territory'}."
+        ),
+        (
+            "Please quote your dealership ID in all future correspondence. Our regional team will "
+            "contact you with onboarding details, pricing and the first order schedule."
+        ),
+        "Sincerely,",
+        "Camopa Beverages Dealership Team",
+    ]
+    return render_text_pdf("Camopa Beverages - Dealership Approval Letter", paragraphs)
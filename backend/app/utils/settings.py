@@ -0,0 +1,7 @@
+import os
+
+# Environment settings helpers
+
+def env_bool(name: str, default: bool) -> bool:
+    """A flag from the environment: 1, true, yes or on (any case) are true"""
+    return os.getenv(name, str(default)).strip().lower() in ("1", "true", "yes", "on")
@@ -0,0 +1,149 @@
+"""Query counts and latency of the application detail endpoints.
+
+Seeds applications that each have payments, status history and (for half of
+them) an approval letter, then serves pages of ApplicationDetailResponse:
+
+  lazy    the relationships loaded on first access, as serializing a plain
+          query would (1 + 3N queries per page)
+  eager   crud.get_application_details_page / get_application_detail
+
+Also requests GET /admin/applications/details and /admin/applications/{id}
+through the app. Every eager path must run exactly the expected number of
+statements, so the script doubles as the query-count regression check: it
+exits non-zero if that number changes.
+
+Usage (from the backend directory):
+    python benchmarks/bench_application_details.py
+    python benchmarks/bench_application_details.py --applications 2000 --page-size 100
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault(
+    "DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+)
+
+import httpx
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app import crud, schemas
+from app.database import (
+    Application, ApplicationStatus, ApplicationStatusUpdate, ApprovalLetter, Base, Payment,
+    PaymentStatus, User, async_engine, engine
+)
+from app.main import app
+from app.services import auth
+
+# Application + letter, payments, status updates
+EXPECTED_QUERIES = 3
+
+def seed(applications, payments, updates):
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    now = datetime.utcnow()
+    with Session(bind=engine) as db:
+        admin = User(email="admin@example.com", hashed_password="", is_admin=True)
+        db.add(admin)
+        db.flush()
+        for i in range(applications):
+            application = Application(
+                tracking_id=f"D{i:07d}", full_name=f"Dealer {i}", email=f"dealer{i}@example.com",
+                phone="9876543210", business_name=f"Dealer {i} Traders", business_type="Retail",
+                registration_number=f"27AABCU{i:04d}R1ZM", street_address="1 Market Road", city="Pune",
+                state="Maharashtra", postal_code="411001", area_of_operation="Pune",
+                expected_monthly_sales=100000.0, previous_experience="", references="",
+                status=ApplicationStatus.APPROVED if i % 2 else ApplicationStatus.UNDER_REVIEW,
+            )
+            application.payments = [
+                Payment(amount=50000.0, transaction_id=f"TXN{i}-{j}", payment_method="UPI",
+                        status=PaymentStatus.COMPLETED, upi_reference=f"UPI{i}-{j}", payment_date=now)
+                for j in range(payments)
+            ]
+            application.status_updates = [
+                ApplicationStatusUpdate(previous_status=ApplicationStatus.SUBMITTED,
+                                        new_status=ApplicationStatus.UNDER_REVIEW, notes=f"Step {j}",
+                                        updated_by=admin.id)
+                for j in range(updates)
+            ]
+            if i % 2:
+                application.approval_letter = ApprovalLetter(dealership_id=f"DLR{i:07d}", file_path=f"letters/{i}.pdf")
+            db.add(application)
+        db.commit()
+
+class QueryCounter:
+    def __init__(self, *engines):
+        self.count = 0
+        for target in engines:
+            event.listen(target, "before_cursor_execute", self._count)
+
+    def _count(self, *args):
+        self.count += 1
+
+def serialize(applications):
+    # What the response_model does with returned objects
+    return [schemas.ApplicationDetailResponse.model_validate(a, from_attributes=True) for a in applications]
+
+def lazy_page(db, limit):
+    return db.query(Application).order_by(Application.created_at.desc(), Application.id.desc()).limit(limit).all()
+
+def eager_page(db, limit):
+    return crud.get_application_details_page(db, limit=limit)[0]
+
+def measure(label, load, counter, repeat, expected=None):
+    samples, counts = [], set()
+    for _ in range(repeat):
+        with Session(bind=engine) as db:
+            counter.count = 0
+            start = time.perf_counter()
+            serialize(load(db))
+            samples.append(time.perf_counter() - start)
+            counts.add(counter.count)
+    (queries,) = counts
+    print(f"{label:>32} {queries:>8} {statistics.median(samples) * 1e3:>9.1f}")
+    if expected is not None and queries != expected:
+        sys.exit(f"{label}: expected {expected} queries, ran {queries}")
+
+async def check_endpoints(counter, page_size, application_id):
+    app.dependency_overrides[auth.require_admin] = lambda: auth.CurrentUser(id=1, email="admin@example.com", is_admin=True)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for path in (f"/admin/applications/details?limit={page_size}", f"/admin/applications/{application_id}"):
+            counter.count = 0
+            start = time.perf_counter()
+            response = await client.get(path)
+            elapsed = time.perf_counter() - start
+            response.raise_for_status()
+            print(f"{'GET ' + path.split('?')[0]:>32} {counter.count:>8} {elapsed * 1e3:>9.1f}")
+            if counter.count != EXPECTED_QUERIES:
+                sys.exit(f"{path}: expected {EXPECTED_QUERIES} queries, ran {counter.count}")
+    await async_engine.dispose()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--applications", type=int, default=500)
+    parser.add_argument("--payments", type=int, default=3)
+    parser.add_argument("--updates", type=int, default=4)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    seed(args.applications, args.payments, args.updates)
+    counter = QueryCounter(engine, async_engine.sync_engine)
+
+    print(f"{'path':>32} {'queries':>8} {'ms':>9}")
+    measure(f"lazy page of {args.page_size}", lambda db: lazy_page(db, args.page_size), counter, args.repeat)
+    measure(f"eager page of {args.page_size}", lambda db: eager_page(db, args.page_size), counter, args.repeat, EXPECTED_QUERIES)
+    measure("lazy detail", lambda db: [crud.get_application(db, 2)], counter, args.repeat)
+    measure("eager detail", lambda db: [crud.get_application_detail(db, 2)], counter, args.repeat, EXPECTED_QUERIES)
+    asyncio.run(check_endpoints(counter, args.page_size, 2))
+
+if __name__ == "__main__":
+    main()
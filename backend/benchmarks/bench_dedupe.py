@@ -0,0 +1,176 @@
+"""Duplicate detection: submission checks, the clustering job and concurrent repeats.
+
+Seeds --applications synthetic applications, --duplicates of them re-submitted
+with variations (GSTIN for PAN, +91 phone, upper-case email, a reworded
+business name in the same pincode), and indexes them with rebuild_keys. Then:
+
+1. Times --lookups submission checks against the identity key index and the
+   same check as an ad hoc query over the applications columns.
+2. Runs the clustering job and scores it against the injected duplicates
+   (precision and recall over duplicate pairs).
+3. Submits one business --concurrency times at once through the API and
+   counts how many got in (should be 1).
+
+Usage (from the backend directory):
+    python benchmarks/bench_dedupe.py
+    python benchmarks/bench_dedupe.py --applications 500000 --duplicates 10000
+    DATABASE_URL=postgresql://... python benchmarks/bench_dedupe.py
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault(
+    "DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+)
+os.environ.setdefault("RATE_LIMIT_ENABLED", "False")
+
+import httpx
+from sqlalchemy import func, insert, or_, select
+from sqlalchemy.orm import Session
+
+from app.database import Application, ApplicationDuplicate, Base, SessionLocal, engine
+from app.main import app
+from app.services import dedupe
+
+LETTERS = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+WORDS = ["Sharma", "Patel", "Balaji", "Ganesh", "Krishna", "Laxmi", "Sai", "Royal", "Metro", "Star", "Global", "Prime"]
+TRADES = ["Traders", "Enterprises", "Agencies", "Distributors", "Beverages", "Stores"]
+
+def pan(i):
+    digits = f"{i % 10000:04d}"
+    letters = "".join(LETTERS[(i // 10000 // 26 ** k) % 26] for k in range(4))
+    return f"{letters[:3]}C{letters[3]}{digits}F"
+
+def application(i, rng):
+    pincode = f"{400001 + i % 5000}"
+    return {
+        "tracking_id": f"D{i:09d}", "full_name": f"Dealer {i}", "email": f"dealer{i}@example.com",
+        "phone": f"9{i:09d}", "business_name": f"{rng.choice(WORDS)} {rng.choice(WORDS)} {TRADES[i % len(TRADES)]} {i}",
+        "business_type": "Retail", "registration_number": pan(i), "street_address": "1 Market Road", "city": "Pune",
+        "state": "Maharashtra", "postal_code": pincode, "area_of_operation": "Pune",
+        "expected_monthly_sales": 100000.0, "previous_experience": "", "references": "",
+    }
+
+def variant(row, n, rng):
+    """The same business applying again, written differently"""
+    copy = dict(row, tracking_id=f"V{n:09d}", full_name=row["full_name"].upper())
+    change = n % 4
+    if change == 0:  # GSTIN instead of PAN, new contact details
+        copy.update(registration_number=f"27{row['registration_number']}1Z5", email=f"other{n}@example.com", phone=f"8{n:09d}")
+    elif change == 1:  # same phone and email, written differently; no registration number
+        copy.update(phone="+91 " + row["phone"], email=row["email"].upper(), registration_number="")
+    elif change == 2:  # reworded name in the same pincode, same phone
+        copy.update(business_name="M/s " + row["business_name"] + " Pvt Ltd", email=f"other{n}@example.com", registration_number="")
+    else:  # typo in the name, same email
+        name = row["business_name"]
+        copy.update(business_name=name[:3] + name[4:], phone=f"8{n:09d}", registration_number="")
+    return copy
+
+def seed(applications, duplicates):
+    """Returns the injected (original id, duplicate id) pairs"""
+    import app.services.search  # noqa: F401 (its DDL creates the search index with the tables)
+
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    rng = random.Random(7)
+    now = datetime.utcnow()
+    rows = [application(i, rng) for i in range(applications)]
+    originals = rng.sample(range(applications), duplicates)
+    rows += [variant(rows[i], n, rng) for n, i in enumerate(originals)]
+    with Session(bind=engine) as db:
+        for start in range(0, len(rows), 10000):
+            db.execute(insert(Application.__table__), [
+                dict(row, created_at=now, updated_at=now) for row in rows[start:start + 10000]
+            ])
+        db.commit()
+        # Ids follow insertion order
+        first_id = db.scalar(select(func.min(Application.id)))
+        start = time.perf_counter()
+        indexed = dedupe.rebuild_keys(db)
+        db.commit()
+        print(f"rebuild_keys: {indexed} applications in {time.perf_counter() - start:.1f}s")
+    return rows, {(first_id + i, first_id + applications + n) for n, i in enumerate(originals)}
+
+def adhoc_matches(db, row):
+    """The check without the index: OR over the raw columns, normalised in SQL"""
+    pan_value, _ = dedupe.normalize_registration(row["registration_number"])
+    conditions = [
+        func.lower(Application.email) == dedupe.normalize_email(row["email"]),
+        Application.phone.like(f"%{dedupe.normalize_phone(row['phone'])}"),
+        func.lower(Application.business_name).like(f"%{row['business_name'].lower()}%")
+        & (Application.postal_code == row["postal_code"]),
+    ]
+    if pan_value:
+        conditions.append(func.upper(Application.registration_number).like(f"%{pan_value}%"))
+    return db.execute(select(Application.id).where(or_(*conditions))).all()
+
+def lookups(rows, count):
+    rng = random.Random(11)
+    sample = [rows[rng.randrange(len(rows))] for _ in range(count)]
+    print(f"\n{count} submission checks")
+    print(f"{'check':>16} {'median ms':>10} {'p95 ms':>8}")
+    with SessionLocal() as db:
+        for name, check in (
+            ("identity index", lambda row: dedupe.lookup(db, dedupe.identity_keys(row))),
+            ("ad hoc query", lambda row: adhoc_matches(db, row)),
+        ):
+            timings = []
+            for row in sample:
+                start = time.perf_counter()
+                check(row)
+                timings.append(time.perf_counter() - start)
+            timings.sort()
+            print(f"{name:>16} {statistics.median(timings) * 1e3:>10.2f} {timings[int(len(timings) * 0.95)] * 1e3:>8.2f}")
+
+def clustering(truth):
+    with SessionLocal() as db:
+        start = time.perf_counter()
+        report = dedupe.find_duplicates(db)
+        db.commit()
+        elapsed = time.perf_counter() - start
+        members = db.execute(select(ApplicationDuplicate.application_id, ApplicationDuplicate.cluster_id)).all()
+    clusters = dict(members)
+    found = {(a, b) for a, b in truth if a in clusters and clusters.get(a) == clusters.get(b)}
+    by_cluster = {}
+    for application_id, cluster_id in members:
+        by_cluster.setdefault(cluster_id, []).append(application_id)
+    predicted = sum(len(ids) * (len(ids) - 1) // 2 for ids in by_cluster.values())
+    print(f"\nfind_duplicates in {elapsed:.1f}s: {vars(report)}")
+    print(f"recall {len(found) / len(truth):.3f} ({len(found)}/{len(truth)} injected pairs clustered)")
+    print(f"precision {len(found) / predicted if predicted else 1:.3f} ({predicted} pairs in clusters)")
+
+async def concurrent(count, base):
+    payload = {key: base[key] for key in base if key not in ("tracking_id",)}
+    payload.update(email="race@example.com", phone="7000000001", registration_number="ZZZCZ9999Z",
+                   business_name="Race Condition Traders")
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        responses = await asyncio.gather(*(client.post("/applications/", json=payload) for _ in range(count)))
+    codes = sorted(response.status_code for response in responses)
+    print(f"\n{count} simultaneous submissions of one business: {codes.count(201)} accepted, {codes.count(409)} rejected"
+          + (f", other {[c for c in codes if c not in (201, 409)]}" if len(codes) != codes.count(201) + codes.count(409) else ""))
+    if codes.count(201) != 1:
+        raise SystemExit("expected exactly one submission to get in")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--applications", type=int, default=100000)
+    parser.add_argument("--duplicates", type=int, default=2000)
+    parser.add_argument("--lookups", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    args = parser.parse_args()
+
+    rows, truth = seed(args.applications, args.duplicates)
+    lookups(rows, args.lookups)
+    clustering(truth)
+    asyncio.run(concurrent(args.concurrency, rows[0]))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+"""Status change push (server-sent events) against polling the tracking endpoint.
+
+Serves the app with uvicorn on a local port and:
+
+1. Keeps --clients trackers watching one application for --seconds, first
+   polling GET /applications/track/{id} every --poll-interval seconds (with
+   the tracking cache off, as after every status change), then holding
+   /events streams. Counts the SQL statements each approach costs, for
+   streams split into opening them and watching.
+2. Changes the status through PUT /admin/applications/{id}/status and times
+   how long the event takes to reach every open stream.
+3. Resumes a stream with Last-Event-ID after missed changes, and opens one
+   stream more than EVENTS_MAX_CONNECTIONS allows.
+
+Usage (from the backend directory):
+    python benchmarks/bench_events.py
+    python benchmarks/bench_events.py --clients 500 --seconds 20
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault(
+    "DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+)
+os.environ.setdefault("RATE_LIMIT_ENABLED", "False")
+
+import httpx
+import uvicorn
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.database import Application, Base, User, async_engine, engine
+from app.main import app
+from app.services import auth, cache, events
+
+TRACKING_ID = "E0E00001"  # a legacy ID, which carries no check character
+
+statements = {"n": 0}
+
+@event.listens_for(async_engine.sync_engine, "before_cursor_execute")
+def count_statements(*args):
+    statements["n"] += 1
+
+def seed():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    with Session(bind=engine) as db:
+        admin = User(email="admin@example.com", hashed_password="", is_admin=True)
+        db.add(admin)
+        db.add(Application(
+            tracking_id=TRACKING_ID, full_name="Event Dealer", email="events@example.com", phone="9876543210",
+            business_name="Event Traders", business_type="Retail", registration_number="27AABCU9603R1ZM",
+            street_address="1 Market Road", city="Pune", state="Maharashtra", postal_code="411001",
+            area_of_operation="Pune", expected_monthly_sales=100000.0, previous_experience="", references="",
+        ))
+        db.commit()
+        return admin.id
+
+class Stream:
+    """One SSE client, recording when each event arrives"""
+
+    def __init__(self, client, last_event_id=None):
+        self.client = client
+        self.last_event_id = last_event_id
+        self.events = []
+        self.ready = asyncio.Event()
+        self.status = None
+        self.task = asyncio.ensure_future(self._run())
+
+    async def _run(self):
+        headers = {"Last-Event-ID": str(self.last_event_id)} if self.last_event_id is not None else {}
+        async with self.client.stream("GET", f"/applications/track/{TRACKING_ID}/events", headers=headers) as response:
+            self.status = response.status_code
+            self.ready.set()
+            fields = {}
+            async for line in response.aiter_lines():
+                if line.startswith("data:"):
+                    fields["data"] = json.loads(line[5:])
+                elif line == "" and "data" in fields:
+                    self.events.append((time.perf_counter(), fields.pop("data")))
+
+    async def close(self):
+        self.task.cancel()
+        await asyncio.gather(self.task, return_exceptions=True)
+
+async def change_status(client, status):
+    response = await client.put("/admin/applications/1/status", json={"status": status})
+    response.raise_for_status()
+
+async def wait_for(predicate, timeout=10):
+    deadline = time.perf_counter() + timeout
+    while not predicate():
+        if time.perf_counter() > deadline:
+            raise TimeoutError
+        await asyncio.sleep(0.005)
+
+async def polling(client, clients, seconds, interval):
+    cache.tracking_cache.backend.ttl = 0  # every poll misses, as right after a change
+    statements["n"] = 0
+
+    async def tracker(offset):
+        await asyncio.sleep(offset)
+        deadline = time.perf_counter() + seconds - offset
+        while time.perf_counter() < deadline:
+            (await client.get(f"/applications/track/{TRACKING_ID}")).raise_for_status()
+            await asyncio.sleep(interval)
+
+    await asyncio.gather(*(tracker(i * interval / clients) for i in range(clients)))
+    return statements["n"]
+
+async def streaming(client, clients, seconds):
+    statements["n"] = 0
+    streams = [Stream(client) for _ in range(clients)]
+    await wait_for(lambda: all(len(stream.events) == 1 for stream in streams))
+    connecting = statements["n"]
+    await asyncio.sleep(seconds)
+    return streams, connecting, statements["n"] - connecting
+
+async def run(args, admin_id):
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(app, port=port, log_level="warning", lifespan="off"))
+    serving = asyncio.ensure_future(server.serve())
+    await wait_for(lambda: server.started)
+    app.dependency_overrides[auth.require_admin] = lambda: auth.CurrentUser(id=admin_id, email="admin@example.com", is_admin=True)
+    limits = httpx.Limits(max_connections=args.clients + 10)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=30) as client:
+        print(f"\n{args.clients} trackers for {args.seconds:g}s")
+        print(f"{'mode':>24} {'connecting':>11} {'watching':>9}")
+        polled = await polling(client, args.clients, args.seconds, args.poll_interval)
+        print(f"{f'poll every {args.poll_interval:g}s':>24} {'-':>11} {polled:>9}")
+        streams, connecting, watching = await streaming(client, args.clients, args.seconds)
+        print(f"{'event streams':>24} {connecting:>11} {watching:>9}")
+
+        latencies = []
+        for status in ("under_review", "approved"):
+            count = len(streams[0].events)
+            start = time.perf_counter()
+            await change_status(client, status)
+            await wait_for(lambda: all(len(stream.events) > count for stream in streams))
+            latencies.extend(stream.events[-1][0] - start for stream in streams)
+            assert all(stream.events[-1][1]["status"] == status for stream in streams)
+        print(f"\nstatus change to {args.clients} streams: p50 {statistics.median(latencies) * 1e3:.1f} ms, "
+              f"max {max(latencies) * 1e3:.1f} ms (including the PUT)")
+
+        last_id = streams[0].events[-1][1]["id"]
+        for stream in streams:
+            await stream.close()
+        await wait_for(lambda: events.event_bus.connections == 0)
+        for status in ("additional_info_required", "under_review"):
+            await change_status(client, status)
+        resumed = Stream(client, last_event_id=last_id)
+        await wait_for(lambda: len(resumed.events) == 2)
+        print(f"resumed after id {last_id}: replayed {[payload['status'] for _, payload in resumed.events]}")
+        await resumed.close()
+
+        events.event_bus.max_connections = 1
+        held, refused = Stream(client), Stream(client)
+        await asyncio.gather(held.ready.wait(), refused.ready.wait())
+        print(f"over the connection cap: {held.status}, {refused.status}")
+        await held.close()
+        await refused.close()
+
+    server.should_exit = True
+    await serving
+    await async_engine.dispose()
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--poll-interval", type=float, default=2)
+    args = parser.parse_args()
+
+    admin_id = seed()
+    asyncio.run(run(args, admin_id))
+
+if __name__ == "__main__":
+    main()
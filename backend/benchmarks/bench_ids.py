@@ -0,0 +1,141 @@
+"""Insert throughput and unique-index size of tracking ID schemes.
+
+Inserts --rows rows, --batch-size per transaction, into a table with a unique
+index on its ID column, for:
+
+  legacy        str(uuid4())[:8].upper(), the previous tracking IDs
+  random        17 random Crockford characters, as long as the new IDs
+  time-ordered  app.utils.ids.new_tracking_id()
+
+and reports rows per second (overall and for the last tenth, once the index
+no longer fits in cache), the size of the unique index, and how many IDs
+collided with one already issued. Then looks up mistyped and well-formed
+tracking IDs through GET /applications/track/{id} and counts the SQL
+statements each costs.
+
+Usage (from the backend directory):
+    python benchmarks/bench_ids.py
+    python benchmarks/bench_ids.py --rows 2000000
+    DATABASE_URL=postgresql://... python benchmarks/bench_ids.py
+"""
+import argparse
+import asyncio
+import os
+import secrets
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault(
+    "DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+)
+os.environ.setdefault("RATE_LIMIT_ENABLED", "False")
+
+import httpx
+from sqlalchemy import Column, Integer, MetaData, String, Table, event, func, select, text
+
+from app.database import Base, async_engine, engine
+from app.main import app
+from app.utils import ids
+
+def legacy_id():
+    return str(uuid.uuid4())[:8].upper()
+
+def random_id():
+    body = "".join(secrets.choice(ids.ALPHABET) for _ in range(ids.ID_LENGTH - 1))
+    return body + ids.check_character(body)
+
+SCHEMES = {"legacy": legacy_id, "random": random_id, "time-ordered": ids.new_tracking_id}
+
+def bench_table(name):
+    metadata = MetaData()
+    return Table(
+        f"id_bench_{name.replace('-', '_')}", metadata,
+        Column("id", Integer, primary_key=True),
+        Column("tracking_id", String, nullable=False),
+        Column("payload", String, nullable=False),
+    ), metadata
+
+def upsert(table):
+    if engine.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    # A collision is skipped and counted rather than failing the batch
+    return insert(table).on_conflict_do_nothing(index_elements=["tracking_id"])
+
+def index_bytes(connection, index_name):
+    if engine.dialect.name == "postgresql":
+        return connection.execute(select(func.pg_relation_size(index_name))).scalar()
+    return connection.execute(text("SELECT SUM(pgsize) FROM dbstat WHERE name = :name"), {"name": index_name}).scalar()
+
+def insert_rows(name, generate, rows, batch_size):
+    table, metadata = bench_table(name)
+    index_name = f"ix_{table.name}_tracking_id"
+    metadata.drop_all(bind=engine)
+    metadata.create_all(bind=engine)
+    with engine.begin() as connection:
+        connection.execute(text(f"CREATE UNIQUE INDEX {index_name} ON {table.name} (tracking_id)"))
+
+    statement = upsert(table)
+    payload = "x" * 64
+    tail_from = rows - rows // 10
+    start = time.perf_counter()
+    tail_start = tail_rows = None
+    for offset in range(0, rows, batch_size):
+        # From the first batch reaching the last 10%, which may start before it
+        if tail_start is None and offset + batch_size > tail_from:
+            tail_start, tail_rows = time.perf_counter(), rows - offset
+        with engine.begin() as connection:
+            connection.execute(statement, [
+                {"tracking_id": generate(), "payload": payload}
+                for _ in range(min(batch_size, rows - offset))
+            ])
+    end = time.perf_counter()
+
+    with engine.connect() as connection:
+        stored = connection.execute(select(func.count()).select_from(table)).scalar()
+        size = index_bytes(connection, index_name)
+    metadata.drop_all(bind=engine)
+    return rows / (end - start), tail_rows / (end - tail_start), size, rows - stored
+
+async def lookups():
+    statements = {"n": 0}
+
+    @event.listens_for(async_engine.sync_engine, "before_cursor_execute")
+    def count(*args):
+        statements["n"] += 1
+
+    valid = ids.new_tracking_id()
+    mistyped = valid[:5] + ("0" if valid[5] != "0" else "1") + valid[6:]
+    print(f"\n{'lookup':>28} {'status':>7} {'statements':>11}")
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        for label, tracking_id in (
+            ("mistyped (bad check char)", mistyped),
+            ("garbage", "not-a-tracking-id"),
+            ("well-formed, unknown", valid),
+        ):
+            statements["n"] = 0
+            response = await client.get(f"/applications/track/{tracking_id}")
+            print(f"{label:>28} {response.status_code:>7} {statements['n']:>11}")
+    await async_engine.dispose()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=500000)
+    parser.add_argument("--batch-size", type=int, default=100)
+    args = parser.parse_args()
+
+    print(f"\n{args.rows} rows on {engine.dialect.name}, {args.batch_size} per transaction")
+    print(f"{'scheme':>14} {'rows/s':>9} {'last 10%':>9} {'index MB':>9} {'collisions':>11}")
+    for name, generate in SCHEMES.items():
+        overall, tail, size, collisions = insert_rows(name, generate, args.rows, args.batch_size)
+        print(f"{name:>14} {overall:>9.0f} {tail:>9.0f} {size / 2**20:>9.1f} {collisions:>11}")
+
+    Base.metadata.create_all(bind=engine)
+    asyncio.run(lookups())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""Microbenchmark response encoding for 1, 100 and 10,000-row responses.
+
+Loads support requests and payments as ORM objects, then times turning them
+into response bytes four ways:
+
+  fastapi          FastAPI's default: validate against response_model, dump JSON
+  jsonable         validate, jsonable_encoder + JSONResponse (custom response_class)
+  fast_json        app.utils.fast_json with orjson, no re-validation
+  fast_json-stdlib the same converter with the stdlib json fallback
+
+A 1-row response is a single object (GET /support/{id}); larger ones are lists
+(GET /support/, GET /payments/application/{id}).
+
+Usage (from the backend directory):
+    python benchmarks/bench_json_responses.py
+    python benchmarks/bench_json_responses.py --sizes 1 100 10000 --repeat 7
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault(
+    "DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+)
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+from sqlalchemy.orm import Session
+
+from app import schemas
+from app.database import (
+    Application, Base, Payment, PaymentStatus, SupportRequest, engine
+)
+from app.utils import fast_json
+
+def seed(rows):
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    db = Session(bind=engine)
+    application = Application(tracking_id="BENCH", full_name="Bench Dealer", email="bench@example.com")
+    db.add(application)
+    db.flush()
+    db.add_all(
+        SupportRequest(
+            name=f"Dealer {i}", email=f"dealer{i}@example.com",
+            subject="Payment status", message="Has my payment been verified yet? " * 4,
+        )
+        for i in range(rows)
+    )
+    db.add_all(
+        Payment(
+            application_id=application.id, amount=50000.0 + i, transaction_id=f"TXN{i:06d}",
+            payment_method="UPI", status=PaymentStatus.COMPLETED, upi_reference=f"UPI{i}",
+            payment_date=datetime.utcnow(),
+        )
+        for i in range(rows)
+    )
+    db.commit()
+    db.close()
+
+def load(model, limit):
+    # Loaded and detached like the objects a handler returns
+    with Session(bind=engine, expire_on_commit=False) as db:
+        return db.query(model).order_by(model.id).limit(limit).all()
+
+def encoders(response_model):
+    route = APIRoute("/bench", lambda: None, response_model=response_model)
+    field = route.response_field
+
+    # The steps fastapi.routing.serialize_response runs, minus the coroutine
+    def default(content):
+        value, errors = field.validate(content, {}, loc=("response",))
+        assert not errors, errors
+        return field.serialize_json(value)
+
+    def jsonable(content):
+        value, errors = field.validate(content, {}, loc=("response",))
+        assert not errors, errors
+        return JSONResponse(jsonable_encoder(field.serialize(value))).body
+
+    encode = fast_json.response_encoder(response_model)
+
+    def stdlib(content):
+        orjson, fast_json.orjson = fast_json.orjson, None
+        try:
+            return encode(content)
+        finally:
+            fast_json.orjson = orjson
+
+    paths = {"fastapi": default, "jsonable": jsonable, "fast_json": encode, "fast_json-stdlib": stdlib}
+    if fast_json.orjson is None:
+        del paths["fast_json-stdlib"]  # fast_json already falls back to stdlib
+    return paths
+
+def measure(encode, content, repeat):
+    # Scale inner loops so small responses are timed over enough calls
+    rows = len(content) if isinstance(content, list) else 1
+    loops = max(1, 20000 // rows)
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(loops):
+            encode(content)
+        samples.append((time.perf_counter() - start) / loops)
+    return statistics.median(samples)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 100, 10000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    seed(max(args.sizes))
+    print(f"orjson: {'yes' if fast_json.orjson else 'no'}")
+
+    for model, schema in ((SupportRequest, schemas.SupportRequestResponse), (Payment, schemas.PaymentResponse)):
+        objects = load(model, max(args.sizes))
+        print(f"\n{schema.__name__}")
+        print(f"{'rows':>6} {'path':>17} {'us/response':>12} {'us/row':>8} {'speedup':>8}")
+        for size in args.sizes:
+            content = objects[0] if size == 1 else objects[:size]
+            response_model = schema if size == 1 else List[schema]
+            paths = encoders(response_model)
+            # All paths must produce the same document
+            reference = paths["fastapi"](content)
+            for name, encode in paths.items():
+                assert json.loads(encode(content)) == json.loads(reference), name
+
+            baseline = None
+            for name, encode in paths.items():
+                elapsed = measure(encode, content, args.repeat)
+                baseline = baseline or elapsed
+                print(f"{size:>6} {name:>17} {elapsed * 1e6:>12.1f} {elapsed * 1e6 / size:>8.2f} {baseline / elapsed:>7.2f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+"""Data lifecycle: partitioning migration, archival, the archive read path and table sizes.
+
+Seeds --applications synthetic applications created over the last --years
+years (a third of them rejected, each with status history and most with a
+payment) and --support-requests support requests (most resolved), at schema
+revision 0003. Then:
+
+1. Runs migration 0004, which partitions the status history and support
+   requests on PostgreSQL, and times it.
+2. Archives everything due with the default ages, and reports the rows moved,
+   the archive bytes written and the table sizes before and after (after a
+   VACUUM FULL on PostgreSQL).
+3. Times --reads lookups of archived applications against live ones.
+4. Checks that every sampled record reads back exactly as it was, and that
+   nothing due is left behind.
+5. On PostgreSQL, counts the partitions a query over the last week reads.
+
+Usage (from the backend directory):
+    python benchmarks/bench_lifecycle.py
+    python benchmarks/bench_lifecycle.py --applications 500000 --support-requests 200000
+    DATABASE_URL=postgresql://... python benchmarks/bench_lifecycle.py
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+_scratch = tempfile.mkdtemp()
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_scratch, 'bench.db')}")
+os.environ.setdefault("ARCHIVE_DIR", os.path.join(_scratch, "archive"))
+
+from alembic import command
+from sqlalchemy import func, insert, select, text
+from sqlalchemy.orm import Session
+
+from app import crud
+from app.database import (
+    Application, ApplicationStatus, ApplicationStatusUpdate, ArchivedRecord, Base, Payment, PaymentStatus,
+    SessionLocal, SupportRequest, User, engine,
+)
+from app.services import lifecycle
+from app.utils import migrations
+
+STATUSES = [ApplicationStatus.SUBMITTED, ApplicationStatus.UNDER_REVIEW, ApplicationStatus.APPROVED, ApplicationStatus.REJECTED]
+
+def seed(applications, support_requests, years):
+    import app.services.search  # noqa: F401 (its DDL creates the search index with the tables)
+
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    # Back to revision 0003, so the benchmark runs migration 0004 itself
+    ArchivedRecord.__table__.drop(bind=engine)
+    rng = random.Random(3)
+    now = datetime.utcnow()
+    span = timedelta(days=365 * years)
+    with Session(bind=engine) as db:
+        admin = User(email="lifecycle-admin@example.com", hashed_password="", is_admin=True)
+        db.add(admin)
+        db.flush()
+        for start in range(0, applications, 10000):
+            rows = []
+            for i in range(start, min(start + 10000, applications)):
+                created_at = now - span * rng.random()
+                rows.append({
+                    "tracking_id": f"L{i:09d}", "full_name": f"Dealer {i}", "email": f"dealer{i}@example.com",
+                    "phone": f"9{i:09d}", "business_name": f"Dealer Motors {i}", "business_type": "Retail",
+                    "registration_number": "", "street_address": "1 Market Road", "city": "Pune",
+                    "state": "Maharashtra", "postal_code": "411001", "area_of_operation": "Pune",
+                    "expected_monthly_sales": 100000.0, "previous_experience": "", "references": "",
+                    "admin_notes": "Checked documents" if i % 2 else None,
+                    "status": rng.choices(STATUSES, [15, 15, 37, 33])[0],
+                    "created_at": created_at, "updated_at": created_at + timedelta(days=rng.randrange(1, 30)),
+                })
+            db.execute(insert(Application.__table__), rows)
+            first_id = db.scalar(select(func.max(Application.id))) - len(rows) + 1
+            history, payments = [], []
+            for offset, row in enumerate(rows):
+                application_id = first_id + offset
+                history.append({
+                    "application_id": application_id, "previous_status": ApplicationStatus.SUBMITTED,
+                    "new_status": ApplicationStatus.UNDER_REVIEW, "updated_by": admin.id,
+                    "created_at": row["created_at"] + timedelta(hours=4),
+                })
+                if row["status"] in (ApplicationStatus.APPROVED, ApplicationStatus.REJECTED):
+                    history.append({
+                        "application_id": application_id, "previous_status": ApplicationStatus.UNDER_REVIEW,
+                        "new_status": row["status"], "updated_by": admin.id, "notes": "Reviewed",
+                        "created_at": row["updated_at"],
+                    })
+                if rng.random() < 0.8:
+                    payments.append({
+                        "application_id": application_id, "amount": 25000.0, "payment_method": "UPI",
+                        "transaction_id": f"LTX{application_id:010d}", "status": PaymentStatus.COMPLETED,
+                        "upi_reference": f"{rng.randrange(10**12):012d}", "payment_date": row["created_at"],
+                        "created_at": row["created_at"], "updated_at": row["created_at"],
+                    })
+            db.execute(insert(ApplicationStatusUpdate.__table__), history)
+            if payments:
+                db.execute(insert(Payment.__table__), payments)
+        for start in range(0, support_requests, 10000):
+            rows = []
+            for i in range(start, min(start + 10000, support_requests)):
+                created_at = now - span * rng.random()
+                rows.append({
+                    "name": f"Customer {i}", "email": f"customer{i}@example.com", "subject": "Application status",
+                    "message": "When will my application be reviewed? " * 4, "is_resolved": rng.random() < 0.8,
+                    "created_at": created_at, "updated_at": created_at + timedelta(days=rng.randrange(0, 10)),
+                })
+            db.execute(insert(SupportRequest.__table__), rows)
+        db.commit()
+
+def migrate():
+    command.stamp(migrations.alembic_config(), "0003")
+    start = time.perf_counter()
+    # Not head: create_all already made what later revisions add
+    migrations.upgrade("0004")
+    print(f"migration 0004 in {time.perf_counter() - start:.1f}s")
+
+def snapshot(db, count):
+    """Due applications and support requests, with what the archive must reproduce"""
+    cutoff = datetime.utcnow() - timedelta(days=lifecycle.ARCHIVE_APPLICATIONS_AFTER_DAYS)
+    rows = db.execute(lifecycle._due_applications(cutoff, 0, count)).mappings().all()
+    applications = {}
+    for row in rows:
+        applications[row["tracking_id"]] = {
+            lifecycle.APPLICATION: dict(row),
+            **{
+                key: [dict(child) for child in db.execute(
+                    select(model.__table__).where(model.application_id == row["id"]).order_by(model.id)
+                ).mappings()]
+                for key, model in lifecycle.APPLICATION_CHILDREN.items()
+            },
+        }
+    cutoff = datetime.utcnow() - timedelta(days=lifecycle.ARCHIVE_SUPPORT_AFTER_DAYS)
+    support = {
+        row["id"]: dict(row) for row in db.execute(
+            select(SupportRequest.__table__)
+            .where(SupportRequest.is_resolved.is_(True), SupportRequest.updated_at < cutoff)
+            .limit(count)
+        ).mappings()
+    }
+    return applications, support
+
+def vacuum(full=False):
+    """Fresh statistics for the size report; VACUUM FULL also returns deleted rows' space"""
+    if engine.dialect.name != "postgresql":
+        return
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        for table in lifecycle.HOT_TABLES:
+            connection.execute(text(f"VACUUM {'FULL ' if full else ''}ANALYZE {table}"))
+
+def sizes(report):
+    return {
+        table: f"{values['rows']} rows" + (
+            f", {values['table_bytes'] / 2**20:.1f} MiB + {values['index_bytes'] / 2**20:.1f} MiB indexes"
+            if "table_bytes" in values else ""
+        )
+        for table, values in report["tables"].items()
+    }
+
+def timed(label, lookup, keys):
+    timings = []
+    for key in keys:
+        start = time.perf_counter()
+        if lookup(key) is None:
+            raise SystemExit(f"{label}: {key} not found")
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    print(f"{label:>22} {statistics.median(timings) * 1e3:>10.2f} {timings[int(len(timings) * 0.95)] * 1e3:>8.2f}")
+
+def verify(db, applications, support):
+    for tracking_id, expected in applications.items():
+        record = lifecycle.get_archived(db, lifecycle.APPLICATION, lookup_key=tracking_id)
+        data = record["data"]
+        if lifecycle.restore(Application.__table__, data[lifecycle.APPLICATION]) != expected[lifecycle.APPLICATION]:
+            raise SystemExit(f"archived application {tracking_id} differs from the original")
+        for key, model in lifecycle.APPLICATION_CHILDREN.items():
+            if [lifecycle.restore(model.__table__, child) for child in data[key]] != expected[key]:
+                raise SystemExit(f"archived {key} of {tracking_id} differ from the originals")
+    for request_id, expected in support.items():
+        record = lifecycle.get_archived(db, lifecycle.SUPPORT_REQUEST, record_id=request_id)
+        if lifecycle.restore(SupportRequest.__table__, record["data"][lifecycle.SUPPORT_REQUEST]) != expected:
+            raise SystemExit(f"archived support request {request_id} differs from the original")
+    left = lifecycle.archive(db, dry_run=True)
+    print(f"\n{len(applications)} applications and {len(support)} support requests read back unchanged; "
+          f"due after archiving: {left.applications} applications, {left.support_requests} support requests")
+    if left.applications or left.support_requests:
+        raise SystemExit("archival left due records behind")
+
+def pruning(db):
+    plan = db.scalar(
+        text(
+            "EXPLAIN (FORMAT JSON) SELECT count(*) FROM application_status_updates "
+            "WHERE created_at >= :since AND created_at < :until"
+        ),
+        {"since": datetime.utcnow() - timedelta(days=7), "until": datetime.utcnow()},
+    )
+    plan = plan if isinstance(plan, list) else json.loads(plan)
+    scanned = set()
+
+    def walk(node):
+        if "Relation Name" in node:
+            scanned.add(node["Relation Name"])
+        for child in node.get("Plans", []):
+            walk(child)
+
+    walk(plan[0]["Plan"])
+    total = db.scalar(text(
+        "SELECT count(*) FROM pg_inherits WHERE inhparent = CAST('application_status_updates' AS regclass)"
+    ))
+    print(f"\nlast week's status history reads {len(scanned)} of {total} partitions: {sorted(scanned)}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--applications", type=int, default=100000)
+    parser.add_argument("--support-requests", type=int, default=50000)
+    parser.add_argument("--years", type=float, default=3)
+    parser.add_argument("--reads", type=int, default=200)
+    args = parser.parse_args()
+
+    seed(args.applications, args.support_requests, args.years)
+    migrate()
+    vacuum()
+    with SessionLocal() as db:
+        before = lifecycle.storage_report(db)
+        applications, support = snapshot(db, args.reads)
+        live = db.scalars(select(Application.tracking_id).where(Application.status != ApplicationStatus.REJECTED).limit(args.reads)).all()
+        start = time.perf_counter()
+        report = lifecycle.archive(db)
+        elapsed = time.perf_counter() - start
+    # The space deleted rows leave is reused by new rows; VACUUM FULL hands it back
+    vacuum(full=True)
+    with SessionLocal() as db:
+        after = lifecycle.storage_report(db)
+    print(f"\narchive in {elapsed:.1f}s: {vars(report)}")
+    for table, size in sizes(before).items():
+        print(f"  {table:>28}: {size}  ->  {sizes(after)[table]}")
+
+    with SessionLocal() as db:
+        print(f"\n{len(live)} lookups each")
+        print(f"{'lookup':>22} {'median ms':>10} {'p95 ms':>8}")
+        timed("live application", lambda key: crud.get_application_response(db, key), live)
+        timed("archived application", lambda key: crud.get_archived_application_response(db, key), list(applications))
+        verify(db, applications, support)
+        if db.get_bind().dialect.name == "postgresql":
+            pruning(db)
+
+if __name__ == "__main__":
+    main()
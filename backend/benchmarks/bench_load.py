@@ -0,0 +1,530 @@
+"""Load test: a realistic traffic mix against the API, with results saved for comparison.
+
+  seed      fills the database with --applications synthetic applications
+            (payments, status history and support requests alongside) and
+            an admin user
+  run       drives --concurrency clients for --duration seconds, each picking
+            a scenario by the weights in --mix:
+              track          GET /applications/track/{id} for a seeded application
+              track_missing  the same with an unknown tracking ID
+              submit         POST /applications/
+              list           GET /applications/ (first keyset page)
+              admin_details  GET /admin/applications/details
+              admin_search   GET /admin/applications/search
+              admin_support  GET /support/page
+            --transport inprocess calls the ASGI app directly (no sockets;
+            measures the app and the database), http starts uvicorn with
+            --workers workers on a local port, or targets --url, and measures
+            what a client sees. Reports count, errors, throughput and
+            p50/p95/p99/max latency per scenario and overall, and writes them
+            with the run settings to --output as JSON.
+  compare   prints two result files side by side and exits 1 when a scenario's
+            p95 latency or throughput regressed by more than --threshold percent
+
+Usage (from the backend directory):
+    python benchmarks/bench_load.py seed --applications 20000
+    python benchmarks/bench_load.py run --duration 30 --concurrency 32
+    python benchmarks/bench_load.py run --transport http --workers 4 --output after.json
+    python benchmarks/bench_load.py run --mix track=90,submit=10 --output before.json
+    python benchmarks/bench_load.py compare before.json after.json --threshold 10
+    DATABASE_URL=postgresql://... python benchmarks/bench_load.py seed
+
+run seeds the database first when it has no applications, so a bare `run`
+against the default temporary SQLite database works. Without DATABASE_URL
+each invocation gets a fresh temporary database: seed and run separately only
+with an explicit DATABASE_URL.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import secrets
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.environ.setdefault(
+    "DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+)
+os.environ.setdefault("RATE_LIMIT_ENABLED", "False")
+os.environ.setdefault("JWT_SECRET", secrets.token_urlsafe(48))
+# Under load the slow request log would print most submissions; the latencies are reported anyway
+os.environ.setdefault("SLOW_REQUEST_MS", "60000")
+
+import httpx
+from sqlalchemy import func, insert, inspect, select
+from sqlalchemy.orm import Session
+
+from app.database import (
+    Application, ApplicationStatus, ApplicationStatusUpdate, Base, Payment, PaymentStatus, SupportRequest, User,
+    engine,
+)
+from app.services import analytics, auth
+from app.utils import ids
+
+RESULTS_DIR = os.path.join(BACKEND_DIR, "benchmarks", "results")
+DEFAULT_MIX = "track=70,track_missing=5,submit=15,list=4,admin_details=3,admin_search=2,admin_support=1"
+ADMIN_EMAIL = "loadtest-admin@example.com"
+SEED_BATCH_SIZE = 5000
+# Below this many samples a scenario's percentiles are too noisy to compare
+MIN_COMPARABLE_SAMPLES = 20
+
+CITIES = [
+    ("Maharashtra", "Pune", "411001"), ("Maharashtra", "Mumbai", "400001"), ("Karnataka", "Bengaluru", "560001"),
+    ("Tamil Nadu", "Chennai", "600001"), ("Delhi", "New Delhi", "110001"), ("Gujarat", "Ahmedabad", "380001"),
+    ("Telangana", "Hyderabad", "500001"), ("West Bengal", "Kolkata", "700001"), ("Rajasthan", "Jaipur", "302001"),
+    ("Uttar Pradesh", "Lucknow", "226001"),
+]
+FIRST_NAMES = ["Aarav", "Priya", "Rohan", "Ananya", "Vikram", "Meera", "Arjun", "Kavya", "Rahul", "Sneha"]
+LAST_NAMES = ["Sharma", "Patel", "Iyer", "Reddy", "Gupta", "Nair", "Singh", "Joshi", "Das", "Mehta"]
+BUSINESS_TYPES = ["Retail", "Wholesale", "Distribution", "Service Centre"]
+SEARCH_TERMS = ["Traders", "Sharma", "Pune", "Enterprises", "Patel", "Bengaluru", "27AAB"]
+STATUSES = [
+    (ApplicationStatus.SUBMITTED, 40), (ApplicationStatus.UNDER_REVIEW, 25),
+    (ApplicationStatus.ADDITIONAL_INFO_REQUIRED, 10), (ApplicationStatus.APPROVED, 15),
+    (ApplicationStatus.REJECTED, 10),
+]
+
+# Seeding
+
+def _application_row(rng, i, created_at):
+    state, city, postal_code = rng.choice(CITIES)
+    first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+    status = rng.choices([s for s, _ in STATUSES], [w for _, w in STATUSES])[0]
+    return {
+        "tracking_id": ids.new_tracking_id(), "full_name": f"{first} {last}",
+        "email": f"dealer{i}@example.com", "phone": f"98{rng.randrange(10**8):08d}",
+        "business_name": f"{last} {rng.choice(['Traders', 'Enterprises', 'Motors', 'Agencies'])} {i}",
+        "business_type": rng.choice(BUSINESS_TYPES), "registration_number": f"27AAB{i:06d}R1Z",
+        "street_address": f"{rng.randrange(1, 500)} Market Road", "city": city, "state": state,
+        "postal_code": postal_code, "area_of_operation": city,
+        "expected_monthly_sales": float(rng.randrange(50, 500) * 1000),
+        "previous_experience": "Five years in two-wheeler retail", "references": "",
+        "status": status, "created_at": created_at, "updated_at": created_at,
+    }
+
+def _history_rows(rng, application_id, status, created_at, admin_id):
+    """Status updates leading from SUBMITTED to `status`, made by the admin"""
+    steps = {
+        ApplicationStatus.SUBMITTED: [],
+        ApplicationStatus.UNDER_REVIEW: [ApplicationStatus.UNDER_REVIEW],
+        ApplicationStatus.ADDITIONAL_INFO_REQUIRED: [ApplicationStatus.UNDER_REVIEW, ApplicationStatus.ADDITIONAL_INFO_REQUIRED],
+        ApplicationStatus.APPROVED: [ApplicationStatus.UNDER_REVIEW, ApplicationStatus.APPROVED],
+        ApplicationStatus.REJECTED: [ApplicationStatus.UNDER_REVIEW, ApplicationStatus.REJECTED],
+    }[status]
+    previous, at, rows = ApplicationStatus.SUBMITTED, created_at, []
+    for new in steps:
+        at += timedelta(hours=rng.randrange(1, 72))
+        rows.append({
+            "application_id": application_id, "previous_status": previous, "new_status": new,
+            "notes": "", "updated_by": admin_id, "created_at": at,
+        })
+        previous = new
+    return rows
+
+def seed(applications, support_requests, seed_value=1):
+    """Recreates the schema and fills it; returns the row counts"""
+    import app.services.search  # noqa: F401 (its DDL creates the search index with the tables)
+
+    rng = random.Random(seed_value)
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    now = datetime.utcnow()
+    counts = defaultdict(int)
+    with Session(bind=engine) as db:
+        admin = User(email=ADMIN_EMAIL, hashed_password="", is_admin=True)
+        db.add(admin)
+        db.flush()
+        for start in range(0, applications, SEED_BATCH_SIZE):
+            stop = min(start + SEED_BATCH_SIZE, applications)
+            rows = [
+                _application_row(rng, i, now - timedelta(days=365) * (applications - i) / applications)
+                for i in range(start, stop)
+            ]
+            db.execute(insert(Application.__table__), rows)
+            first_id = db.scalar(select(func.max(Application.id))) - len(rows) + 1
+            payments, history = [], []
+            for offset, row in enumerate(rows):
+                application_id = first_id + offset
+                history.extend(_history_rows(rng, application_id, row["status"], row["created_at"], admin.id))
+                if row["status"] != ApplicationStatus.SUBMITTED:
+                    payment_status = rng.choices(list(PaymentStatus), [15, 80, 4, 1])[0]
+                    payments.append({
+                        "application_id": application_id, "amount": 25000.0, "payment_method": "UPI",
+                        "transaction_id": f"TXN{application_id:010d}", "status": payment_status,
+                        "upi_reference": f"{rng.randrange(10**12):012d}", "payment_date": row["created_at"],
+                        "created_at": row["created_at"], "updated_at": row["created_at"],
+                    })
+            if payments:
+                db.execute(insert(Payment.__table__), payments)
+            if history:
+                db.execute(insert(ApplicationStatusUpdate.__table__), history)
+            counts["applications"] += len(rows)
+            counts["payments"] += len(payments)
+            counts["status_updates"] += len(history)
+        support_rows = [
+            {
+                "name": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}", "email": f"support{i}@example.com",
+                "subject": "Application status", "message": "When will my application be reviewed?",
+                "is_resolved": rng.random() < 0.6, "created_at": now - timedelta(minutes=i), "updated_at": now,
+            }
+            for i in range(support_requests)
+        ]
+        if support_rows:
+            db.execute(insert(SupportRequest.__table__), support_rows)
+        counts["support_requests"] = support_requests
+        analytics.rebuild(db)
+        db.commit()
+    return dict(counts)
+
+def seeded_counts():
+    with Session(bind=engine) as db:
+        return {
+            "applications": db.scalar(select(func.count()).select_from(Application)),
+            "payments": db.scalar(select(func.count()).select_from(Payment)),
+            "status_updates": db.scalar(select(func.count()).select_from(ApplicationStatusUpdate)),
+            "support_requests": db.scalar(select(func.count()).select_from(SupportRequest)),
+        }
+
+def load_fixtures():
+    """Tracking IDs to look up and a bearer token for the admin user"""
+    with Session(bind=engine) as db:
+        tracking_ids = db.scalars(select(Application.tracking_id)).all()
+        admin = db.scalars(select(User).where(User.email == ADMIN_EMAIL)).first()
+        if admin is None:
+            raise SystemExit(f"no {ADMIN_EMAIL} user; run the seed command against this database")
+        token, _ = auth.create_access_token(admin)
+    return tracking_ids, token
+
+# Scenarios
+
+def _submission(rng):
+    state, city, postal_code = rng.choice(CITIES)
+    n = rng.randrange(10**9)
+    return {
+        "full_name": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}", "email": f"load{n}@example.com",
+        "phone": f"97{rng.randrange(10**8):08d}", "business_name": f"Load Test Motors {n}",
+        "business_type": rng.choice(BUSINESS_TYPES), "registration_number": f"27LOAD{n:09d}",
+        "street_address": "2 Station Road", "city": city, "state": state, "postal_code": postal_code,
+        "area_of_operation": city, "expected_monthly_sales": 150000.0,
+        "previous_experience": "Three years in retail", "references": "",
+    }
+
+SCENARIOS = {
+    "track": lambda ctx, rng: ("GET", f"/applications/track/{rng.choice(ctx['tracking_ids'])}", None, False),
+    "track_missing": lambda ctx, rng: ("GET", f"/applications/track/{ids.new_tracking_id()}", None, False),
+    "submit": lambda ctx, rng: ("POST", "/applications/", _submission(rng), False),
+    "list": lambda ctx, rng: ("GET", "/applications/?limit=50", None, False),
+    "admin_details": lambda ctx, rng: ("GET", "/admin/applications/details?limit=50", None, True),
+    "admin_search": lambda ctx, rng: ("GET", f"/admin/applications/search?q={rng.choice(SEARCH_TERMS)}", None, True),
+    "admin_support": lambda ctx, rng: ("GET", "/support/page?limit=50", None, True),
+}
+# Responses each scenario is expected to return; anything else is an error
+EXPECTED_STATUS = {"track_missing": 404, "submit": 201}
+
+def parse_mix(value):
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in SCENARIOS:
+            raise argparse.ArgumentTypeError(f"unknown scenario {name!r}; expected one of {', '.join(SCENARIOS)}")
+        try:
+            mix[name] = float(weight or 1)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"bad weight for {name}: {weight!r}")
+    if not any(mix.values()):
+        raise argparse.ArgumentTypeError("the mix has no positive weights")
+    return mix
+
+# Running
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def start_server(workers):
+    port = free_port()
+    process = subprocess.Popen(
+        [
+            sys.executable, "-W", "ignore", "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1",
+            "--port", str(port), "--workers", str(workers), "--log-level", "warning", "--no-access-log",
+        ],
+        cwd=BACKEND_DIR,
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.perf_counter() + 60
+    while True:
+        if process.poll() is not None:
+            raise SystemExit(f"uvicorn exited with status {process.returncode}")
+        try:
+            if httpx.get(f"{url}/health", timeout=1).status_code == 200:
+                return process, url
+        except httpx.TransportError:
+            pass
+        if time.perf_counter() > deadline:
+            process.terminate()
+            raise SystemExit("uvicorn did not start within 60s")
+        time.sleep(0.2)
+
+def make_client(transport, url, concurrency):
+    if transport == "inprocess":
+        from app.main import app
+        return httpx.AsyncClient(transport=httpx.ASGITransport(app=app, raise_app_exceptions=False), base_url="http://loadtest", timeout=60)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    return httpx.AsyncClient(base_url=url, limits=limits, timeout=60)
+
+async def drive(client, ctx, mix, concurrency, duration, warmup, max_requests, seed_value):
+    """Closed loop: every client sends its next request when the last one returns"""
+    names, weights = list(mix), list(mix.values())
+    samples = defaultdict(list)
+    errors = defaultdict(int)
+    failures = defaultdict(int)
+    state = {"sent": 0}
+    measuring_from = time.perf_counter() + warmup
+    stop_at = measuring_from + duration
+
+    async def user(n):
+        rng = random.Random(seed_value * 1000 + n)
+        headers = {"Authorization": f"Bearer {ctx['token']}"}
+        while True:
+            now = time.perf_counter()
+            if now >= stop_at or (max_requests and state["sent"] >= max_requests):
+                return
+            name = rng.choices(names, weights)[0]
+            method, path, body, admin = SCENARIOS[name](ctx, rng)
+            measured = now >= measuring_from
+            if measured:
+                state["sent"] += 1
+            start = time.perf_counter()
+            try:
+                response = await client.request(method, path, json=body, headers=headers if admin else None)
+                status_code = response.status_code
+            except httpx.HTTPError as exc:
+                status_code = type(exc).__name__
+            elapsed = time.perf_counter() - start
+            if not measured:
+                continue
+            samples[name].append(elapsed)
+            if status_code != EXPECTED_STATUS.get(name, 200):
+                errors[name] += 1
+                failures[f"{name} {status_code}"] += 1
+
+    await asyncio.gather(*(user(n) for n in range(concurrency)))
+    elapsed = time.perf_counter() - measuring_from
+    return samples, errors, failures, elapsed
+
+def percentile(ordered, fraction):
+    """Nearest-rank percentile of an ascending list"""
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+def summarize(latencies, error_count, elapsed):
+    ordered = sorted(latencies)
+    if not ordered:
+        return {"requests": 0, "errors": error_count, "throughput_rps": 0.0}
+    return {
+        "requests": len(ordered),
+        "errors": error_count,
+        "error_rate": round(error_count / len(ordered), 4),
+        "throughput_rps": round(len(ordered) / elapsed, 1),
+        "mean_ms": round(sum(ordered) / len(ordered) * 1e3, 2),
+        "p50_ms": round(percentile(ordered, 0.50) * 1e3, 2),
+        "p95_ms": round(percentile(ordered, 0.95) * 1e3, 2),
+        "p99_ms": round(percentile(ordered, 0.99) * 1e3, 2),
+        "max_ms": round(ordered[-1] * 1e3, 2),
+    }
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def print_results(results):
+    print(f"{'scenario':>14} {'requests':>9} {'errors':>7} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    rows = list(results["scenarios"].items()) + [("overall", results["overall"])]
+    for name, row in rows:
+        if not row["requests"]:
+            print(f"{name:>14} {0:>9} {row['errors']:>7}")
+            continue
+        print(
+            f"{name:>14} {row['requests']:>9} {row['errors']:>7} {row['throughput_rps']:>8.1f} "
+            f"{row['p50_ms']:>8.2f} {row['p95_ms']:>8.2f} {row['p99_ms']:>8.2f} {row['max_ms']:>8.2f}"
+        )
+    for failure, count in sorted(results["failures"].items()):
+        print(f"  {count} x {failure}")
+
+def run(args):
+    if args.url is None and (not inspect(engine).has_table("applications") or not seeded_counts()["applications"]):
+        print(f"seeding {args.applications} applications ...")
+        seed(args.applications, args.support_requests, args.seed)
+    counts = seeded_counts()
+    tracking_ids, token = load_fixtures()
+    ctx = {"tracking_ids": tracking_ids, "token": token}
+    engine.dispose()  # the http server workers open their own connections
+
+    server, url = None, args.url
+    if args.transport == "http" and url is None:
+        server, url = start_server(args.workers)
+    try:
+        async def go():
+            async with make_client(args.transport, url, args.concurrency) as client:
+                return await drive(
+                    client, ctx, args.mix, args.concurrency, args.duration, args.warmup, args.requests, args.seed,
+                )
+        samples, errors, failures, elapsed = asyncio.run(go())
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    results = {
+        "meta": {
+            "started_at": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+            "git_commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "database": engine.dialect.name,
+            "transport": args.transport,
+            "url": args.url,
+            "workers": args.workers if args.transport == "http" and args.url is None else None,
+            "concurrency": args.concurrency,
+            "duration_s": round(elapsed, 2),
+            "warmup_s": args.warmup,
+            "mix": args.mix,
+            "seed": args.seed,
+            "data": counts,
+        },
+        "overall": summarize([s for values in samples.values() for s in values], sum(errors.values()), elapsed),
+        "scenarios": {name: summarize(samples[name], errors[name], elapsed) for name in args.mix if name in samples},
+        "failures": dict(failures),
+    }
+    meta = results["meta"]
+    print(
+        f"\n{meta['transport']} on {meta['database']} ({counts['applications']} applications), "
+        f"{args.concurrency} clients for {elapsed:.1f}s"
+    )
+    print_results(results)
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"load-{datetime.utcnow():%Y%m%d-%H%M%S}-{meta['transport']}-{meta['database']}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as fh:
+        json.dump(results, fh, indent=2)
+        fh.write("\n")
+    print(f"\nresults written to {output}")
+
+# Comparing
+
+def _change(before, after):
+    return (after - before) / before * 100 if before else 0.0
+
+def compare(args):
+    with open(args.baseline) as fh:
+        baseline = json.load(fh)
+    with open(args.candidate) as fh:
+        candidate = json.load(fh)
+    for label, results in (("baseline", baseline), ("candidate", candidate)):
+        meta = results["meta"]
+        print(
+            f"{label:>9}: {meta['git_commit'] or '?'} {meta['transport']} on {meta['database']}, "
+            f"{meta['concurrency']} clients, {meta['duration_s']}s, {meta['data']['applications']} applications"
+        )
+    settings = ("transport", "database", "concurrency", "mix")
+    differing = [name for name in settings if baseline["meta"].get(name) != candidate["meta"].get(name)]
+    # Submissions grow the table from run to run, so only a different seed size counts
+    sizes = [results["meta"]["data"]["applications"] for results in (baseline, candidate)]
+    if abs(_change(*sizes)) > args.threshold:
+        differing.append("applications")
+    if differing:
+        print(f"warning: the runs differ in {', '.join(differing)}; the comparison may not be meaningful")
+
+    print(f"\n{'scenario':>14} {'p95 ms':>19} {'change':>8} {'req/s':>19} {'change':>8}")
+    regressions = []
+    rows = [
+        (name, baseline["scenarios"][name], candidate["scenarios"][name])
+        for name in baseline["scenarios"] if name in candidate["scenarios"]
+    ] + [("overall", baseline["overall"], candidate["overall"])]
+    for name, before, after in rows:
+        if min(before["requests"], after["requests"]) < MIN_COMPARABLE_SAMPLES:
+            print(f"{name:>14} too few requests to compare")
+            continue
+        latency = _change(before["p95_ms"], after["p95_ms"])
+        throughput = _change(before["throughput_rps"], after["throughput_rps"])
+        flags = []
+        if latency > args.threshold:
+            flags.append("p95")
+        if -throughput > args.threshold:
+            flags.append("throughput")
+        if after["errors"] > before["errors"] and after.get("error_rate", 0) > before.get("error_rate", 0):
+            flags.append("errors")
+        if flags:
+            regressions.append(f"{name}: {', '.join(flags)}")
+        print(
+            f"{name:>14} {before['p95_ms']:>9.2f} -> {after['p95_ms']:<6.2f} {latency:>+7.1f}% "
+            f"{before['throughput_rps']:>8.1f} -> {after['throughput_rps']:<7.1f} {throughput:>+7.1f}%"
+            + ("  REGRESSED" if flags else "")
+        )
+
+    if regressions:
+        print(f"\nregressions beyond {args.threshold:g}%:")
+        for regression in regressions:
+            print(f"  {regression}")
+        return 1
+    print(f"\nno regressions beyond {args.threshold:g}%")
+    return 0
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    seed_parser = subparsers.add_parser("seed", help="fill the database with synthetic data")
+    seed_parser.add_argument("--applications", type=int, default=20000)
+    seed_parser.add_argument("--support-requests", type=int, default=2000)
+    seed_parser.add_argument("--seed", type=int, default=1)
+
+    run_parser = subparsers.add_parser("run", help="drive the traffic mix and record the results")
+    run_parser.add_argument("--transport", choices=("inprocess", "http"), default="inprocess")
+    run_parser.add_argument("--url", help="an already running server to target (implies --transport http)")
+    run_parser.add_argument("--workers", type=int, default=1, help="uvicorn workers for --transport http")
+    run_parser.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX))
+    run_parser.add_argument("--concurrency", type=int, default=16)
+    run_parser.add_argument("--duration", type=float, default=20, help="seconds to measure for")
+    run_parser.add_argument("--warmup", type=float, default=3, help="seconds of unmeasured traffic first")
+    run_parser.add_argument("--requests", type=int, default=0, help="stop after this many measured requests")
+    run_parser.add_argument("--output", help=f"results file (default: a timestamped file in {RESULTS_DIR})")
+    run_parser.add_argument("--applications", type=int, default=20000, help="to seed an empty database with")
+    run_parser.add_argument("--support-requests", type=int, default=2000)
+    run_parser.add_argument("--seed", type=int, default=1)
+
+    compare_parser = subparsers.add_parser("compare", help="compare two result files")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("candidate")
+    compare_parser.add_argument("--threshold", type=float, default=10, help="percent")
+
+    args = parser.parse_args()
+    if args.command == "seed":
+        counts = seed(args.applications, args.support_requests, args.seed)
+        print(", ".join(f"{count} {name.replace('_', ' ')}" for name, count in counts.items()))
+    elif args.command == "run":
+        if args.url:
+            args.transport = "http"
+        run(args)
+    else:
+        sys.exit(compare(args))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""Login throughput at 1, 10 and 100 concurrent users.
+
+Drives POST /auth/login against two in-process ASGI apps: one verifying
+bcrypt inline on the event loop (the previous crud approach) and the real
+router, which verifies in app.services.auth's process pool. While logins run,
+a probe requests GET /health every 5 ms; its latency, measured from when each
+probe was due, shows how long other requests stall behind password checks.
+
+Afterwards, GET /auth/me is timed with and without the JWT claims cache.
+
+Usage (from the backend directory):
+    python benchmarks/bench_login.py --rounds 10
+    python benchmarks/bench_login.py --rounds 12 --workers 4 --concurrency 1 10 100
+"""
+import argparse
+import asyncio
+import os
+import secrets
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault(
+    "DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+)
+os.environ.setdefault("JWT_SECRET", secrets.token_urlsafe(48))
+
+import httpx
+from fastapi import Depends, FastAPI, HTTPException
+from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app import crud
+from app.database import Base, UnitOfWork, User, engine
+from app.routers import auth as auth_router
+from app.services import auth
+from app.services.cache import LRUCacheBackend
+from app.utils import passwords
+
+PASSWORD = "correct horse battery staple"
+
+def seed(users, rounds):
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    hashed_password = passwords.hash_password(PASSWORD, rounds)
+    db = Session(bind=engine)
+    db.add_all(
+        User(email=f"admin{i}@example.com", hashed_password=hashed_password, is_admin=True)
+        for i in range(users)
+    )
+    db.commit()
+    db.close()
+
+def with_health(app):
+    @app.get("/health")
+    async def health():
+        return {"status": "healthy"}
+    return app
+
+def build_inline_app():
+    app = FastAPI()
+
+    @app.post("/auth/login")
+    async def login(form: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = UnitOfWork):
+        user = await db.run_sync(crud.get_user_by_email, email=form.username)
+        ok, _ = passwords.verify_password(form.password, user.hashed_password if user else None, auth.hasher.rounds)
+        if not ok:
+            raise HTTPException(status_code=401)
+        token, expires_in = auth.create_access_token(user)
+        return {"access_token": token, "token_type": "bearer", "expires_in": expires_in}
+
+    return with_health(app)
+
+def build_pool_app():
+    app = FastAPI()
+    app.include_router(auth_router.router)
+    return with_health(app)
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+async def drive_logins(app, concurrency, logins, users):
+    transport = httpx.ASGITransport(app=app)
+    semaphore = asyncio.Semaphore(concurrency)
+    probe_latencies = []
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+
+        async def one(i):
+            async with semaphore:
+                response = await client.post(
+                    "/auth/login", data={"username": f"admin{i % users}@example.com", "password": PASSWORD}
+                )
+                response.raise_for_status()
+
+        async def probe(done):
+            # Latency counts from when the probe was due to send, so time spent
+            # waiting for a blocked event loop is included
+            due = time.perf_counter()
+            while not done.is_set():
+                await asyncio.sleep(max(0.0, due - time.perf_counter()))
+                (await client.get("/health")).raise_for_status()
+                now = time.perf_counter()
+                probe_latencies.append(now - due)
+                due = max(due + 0.005, now)
+
+        done = asyncio.Event()
+        probe_task = asyncio.create_task(probe(done))
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(logins)))
+        elapsed = time.perf_counter() - start
+        done.set()
+        await probe_task
+    return elapsed, probe_latencies
+
+async def drive_me(app, token, requests):
+    transport = httpx.ASGITransport(app=app)
+    headers = {"Authorization": f"Bearer {token}"}
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        start = time.perf_counter()
+        for _ in range(requests):
+            (await client.get("/auth/me", headers=headers)).raise_for_status()
+        return time.perf_counter() - start
+
+async def run(args):
+    print(f"bcrypt rounds={args.rounds}, pool workers={args.workers}, cpus={os.cpu_count()}")
+    print(f"{'mode':>6} {'users':>5} {'logins':>6} {'logins/s':>9} {'probe p50 ms':>13} {'probe p99 ms':>13}")
+
+    for name, build in (("inline", build_inline_app), ("pool", build_pool_app)):
+        if name == "pool":
+            auth.hasher.start()
+            # Spawn the workers before timing anything
+            await asyncio.gather(*(auth.hasher.hash(PASSWORD) for _ in range(args.workers)))
+        app = build()
+        for concurrency in args.concurrency:
+            logins = args.logins or max(20, 2 * concurrency)
+            elapsed, probes = await drive_logins(app, concurrency, logins, args.users)
+            p50 = statistics.median(probes) * 1e3 if probes else float("nan")
+            p99 = percentile(probes, 0.99) * 1e3 if probes else float("nan")
+            print(f"{name:>6} {concurrency:>5} {logins:>6} {logins / elapsed:>9.1f} {p50:>13.1f} {p99:>13.1f}")
+    auth.hasher.stop()
+
+    db = Session(bind=engine)
+    token, _ = auth.create_access_token(db.query(User).first())
+    db.close()
+    app = build_pool_app()
+    for label, ttl in (("uncached", 0), ("cached", auth.AUTH_CLAIMS_CACHE_TTL)):
+        auth.claims_cache = LRUCacheBackend(ttl=ttl)
+        elapsed = await drive_me(app, token, args.me_requests)
+        print(f"GET /auth/me {label:>8}: {args.me_requests / elapsed:,.0f} req/s")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--logins", type=int, default=None, help="per level; defaults to max(20, 2 * concurrency)")
+    parser.add_argument("--rounds", type=int, default=10, help="bcrypt cost factor (production default is 12)")
+    parser.add_argument("--workers", type=int, default=auth.AUTH_HASH_WORKERS)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--me-requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    seed(args.users, args.rounds)
+    auth.hasher.rounds = args.rounds
+    auth.hasher.max_workers = args.workers
+    asyncio.run(run(args))
+
+if __name__ == "__main__":
+    main()
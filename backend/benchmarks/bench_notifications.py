@@ -0,0 +1,245 @@
+"""Status-change emails through the notification outbox, against a local SMTP stub.
+
+1. Changes application statuses through PUT /admin/applications/{id}/status
+   while the stub takes --smtp-delay seconds per message, and compares the
+   request time with sending one email inline.
+2. Drains --messages outbox rows with a new SMTP connection per message and
+   with the pooled dispatcher.
+3. Drains them again while the stub defers some messages with 451 and rejects
+   others with 550, and checks every message was delivered once or failed.
+
+Usage (from the backend directory):
+    python benchmarks/bench_notifications.py
+    python benchmarks/bench_notifications.py --messages 5000 --smtp-delay 1
+"""
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault(
+    "DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+)
+
+import httpx
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.orm import Session
+
+from app.database import (
+    Application, Base, NotificationOutbox, NotificationStatus, User, async_engine, engine
+)
+from app.main import app
+from app.services import auth, notifications
+
+class StubSMTPServer:
+    """Minimal SMTP server on its own thread and event loop
+
+    Records the Message-ID of every accepted message. `delay` is spent before
+    answering DATA; `defer` maps a Message-ID to how many times to answer 451
+    before accepting; Message-IDs in `reject` get 550.
+    """
+
+    def __init__(self):
+        self.delay = 0.0
+        self.defer = {}
+        self.reject = set()
+        self.accepted = Counter()
+        self.connections = 0
+        self._loop = asyncio.new_event_loop()
+        self._started = threading.Event()
+        threading.Thread(target=self._run, daemon=True).start()
+        self._started.wait()
+
+    def _run(self):
+        asyncio.set_event_loop(self._loop)
+        server = self._loop.run_until_complete(asyncio.start_server(self._session, "127.0.0.1", 0))
+        self.port = server.sockets[0].getsockname()[1]
+        self._started.set()
+        self._loop.run_forever()
+
+    async def _session(self, reader, writer):
+        self.connections += 1
+        writer.write(b"220 stub ESMTP\r\n")
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            verb = line[:4].upper()
+            if verb == b"DATA":
+                writer.write(b"354 End data with <CR><LF>.<CR><LF>\r\n")
+                await writer.drain()
+                data = await reader.readuntil(b"\r\n.\r\n")
+                writer.write(await self._deliver(data))
+            elif verb == b"QUIT":
+                writer.write(b"221 Bye\r\n")
+                await writer.drain()
+                break
+            else:
+                writer.write(b"250 OK\r\n")
+            await writer.drain()
+        writer.close()
+
+    async def _deliver(self, data: bytes) -> bytes:
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        message_id = next(
+            (line.split(b":", 1)[1].strip().decode() for line in data.split(b"\r\n") if line.lower().startswith(b"message-id:")),
+            None,
+        )
+        if message_id in self.reject:
+            return b"550 Mailbox unavailable\r\n"
+        if self.defer.get(message_id):
+            self.defer[message_id] -= 1
+            return b"451 Try again later\r\n"
+        self.accepted[message_id] += 1
+        return b"250 Queued\r\n"
+
+class UnpooledSMTP(notifications.SMTPPool):
+    """A new connection for every message, as sending inline would use"""
+
+    def send_many(self, messages):
+        results = []
+        for message in messages:
+            smtp = self._connect()
+            try:
+                results.append(self._send(smtp, message)[1])
+            finally:
+                smtp.quit()
+        return results
+
+def seed(applications):
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    with Session(bind=engine) as db:
+        admin = User(email="admin@example.com", hashed_password="", is_admin=True)
+        db.add(admin)
+        db.add_all(
+            Application(
+                tracking_id=f"N{i:07d}", full_name=f"Dealer {i}", email=f"dealer{i}@example.com",
+                phone="9876543210", business_name=f"Dealer {i} Traders", business_type="Retail",
+                registration_number=f"27AABCU{i:04d}R1ZM", street_address="1 Market Road", city="Pune",
+                state="Maharashtra", postal_code="411001", area_of_operation="Pune",
+                expected_monthly_sales=100000.0, previous_experience="", references="",
+            )
+            for i in range(applications)
+        )
+        db.commit()
+        return admin.id
+
+def fill_outbox(messages):
+    now = datetime.utcnow()
+    with Session(bind=engine) as db:
+        db.execute(delete(NotificationOutbox))
+        db.execute(insert(NotificationOutbox), [
+            {
+                "idempotency_key": f"bench-{i}", "application_id": None, "recipient": f"dealer{i}@example.com",
+                "subject": "Camopa dealership application: Under review", "body": "Your application is now under review.\n",
+                "status": NotificationStatus.PENDING, "attempts": 0, "next_attempt_at": now, "created_at": now, "updated_at": now,
+            }
+            for i in range(messages)
+        ])
+        db.commit()
+
+def outbox_statuses():
+    with Session(bind=engine) as db:
+        return dict(db.execute(select(NotificationOutbox.status, func.count()).group_by(NotificationOutbox.status)).all())
+
+async def drain(dispatcher):
+    # Retries are due immediately (OUTBOX_RETRY_BASE=0); loop until none remain
+    while await dispatcher.run_once():
+        pass
+
+async def admin_latency(stub, admin_id, changes):
+    print(f"\n{changes} status changes with the mail server taking {stub.delay:g}s per message")
+    app.dependency_overrides[auth.require_admin] = lambda: auth.CurrentUser(id=admin_id, email="admin@example.com", is_admin=True)
+    samples = []
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        for application_id in range(1, changes + 1):
+            start = time.perf_counter()
+            response = await client.put(f"/admin/applications/{application_id}/status", json={"status": "under_review"})
+            samples.append(time.perf_counter() - start)
+            response.raise_for_status()
+    assert outbox_statuses() == {NotificationStatus.PENDING: changes}
+
+    pool = UnpooledSMTP(port=stub.port, starttls=False)
+    with Session(bind=engine) as db:
+        row = db.execute(select(NotificationOutbox)).scalars().first()
+        message = notifications.build_message(row)
+    start = time.perf_counter()
+    await asyncio.to_thread(pool.send_many, [message])
+    inline = time.perf_counter() - start
+    print(f"{'outbox request p50':>22} {statistics.median(samples) * 1e3:>9.1f} ms")
+    print(f"{'outbox request max':>22} {max(samples) * 1e3:>9.1f} ms")
+    print(f"{'inline send':>22} {inline * 1e3:>9.1f} ms")
+
+async def throughput(stub, messages):
+    stub.delay = 0.0
+    print(f"\n{messages} queued messages")
+    print(f"{'mode':>10} {'connects':>9} {'msg/s':>9}")
+    for name, pool in (
+        ("unpooled", UnpooledSMTP(port=stub.port, starttls=False)),
+        ("pooled", notifications.SMTPPool(port=stub.port, starttls=False)),
+    ):
+        fill_outbox(messages)
+        stub.accepted.clear()
+        dispatcher = notifications.OutboxDispatcher(pool=pool)
+        start = time.perf_counter()
+        await drain(dispatcher)
+        elapsed = time.perf_counter() - start
+        pool.close()
+        assert outbox_statuses() == {NotificationStatus.SENT: messages}
+        print(f"{name:>10} {pool.connects:>9} {messages / elapsed:>9.0f}")
+
+async def retries(stub, messages):
+    notifications.OUTBOX_RETRY_BASE = 0
+    fill_outbox(messages)
+    stub.accepted.clear()
+    domain = notifications.EMAIL_FROM.rpartition("@")[2]
+    message_ids = [f"<bench-{i}@{domain}>" for i in range(messages)]
+    stub.defer = {message_id: 2 for message_id in message_ids[::3]}
+    stub.reject = set(message_ids[1::50])
+    dispatcher = notifications.OutboxDispatcher(pool=notifications.SMTPPool(port=stub.port, starttls=False))
+    notifications.metrics.clear()
+    await drain(dispatcher)
+    dispatcher.pool.close()
+
+    statuses = outbox_statuses()
+    duplicates = sum(count - 1 for count in stub.accepted.values())
+    print(f"\n{messages} messages, {len(stub.defer)} deferred twice, {len(stub.reject)} rejected")
+    print(f"attempts: {dict(notifications.metrics)}")
+    print(f"outbox: sent {statuses.get(NotificationStatus.SENT, 0)}, failed {statuses.get(NotificationStatus.FAILED, 0)}; "
+          f"delivered {len(stub.accepted)}, duplicates {duplicates}")
+    assert statuses.get(NotificationStatus.SENT) == len(stub.accepted) == messages - len(stub.reject)
+    assert statuses.get(NotificationStatus.FAILED) == len(stub.reject)
+    assert duplicates == 0
+
+async def run(args, admin_id):
+    stub = StubSMTPServer()
+    stub.delay = args.smtp_delay
+    await admin_latency(stub, admin_id, args.changes)
+    await throughput(stub, args.messages)
+    await retries(stub, args.messages)
+    await async_engine.dispose()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--changes", type=int, default=50)
+    parser.add_argument("--messages", type=int, default=1000)
+    parser.add_argument("--smtp-delay", type=float, default=0.5)
+    args = parser.parse_args()
+
+    # Rejected messages are logged as warnings; the summary reports them
+    logging.getLogger(notifications.__name__).setLevel(logging.ERROR)
+    admin_id = seed(max(args.changes, 100))
+    asyncio.run(run(args, admin_id))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""Request coalescing and rate limiting on the public endpoints.
+
+1. Fires a burst of concurrent GET /applications/track/{id} at a cold cache,
+   with and without coalescing, counting the SELECTs that reach the database.
+2. Floods POST /support/ from one client and from many (X-Forwarded-For),
+   counting accepted and rejected requests.
+3. Times a tracking poll served from cache with the middleware off and on,
+   and a bare token-bucket take on the memory backend.
+
+Usage (from the backend directory):
+    python benchmarks/bench_rate_limit.py
+    python benchmarks/bench_rate_limit.py --burst 1000 --flood 500
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault(
+    "DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+)
+
+import httpx
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.database import Application, Base, async_engine, engine
+from app.main import app
+from app.routers import applications
+from app.services import ratelimit
+from app.services.cache import SingleFlight, tracking_cache
+
+TRACKING_ID = "BE0C0001"  # a legacy ID, which carries no check character
+
+def seed():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    with Session(bind=engine) as db:
+        db.add(Application(
+            tracking_id=TRACKING_ID, full_name="Bench Dealer", email="bench@example.com", phone="9876543210",
+            business_name="Bench Traders", business_type="Retail", registration_number="27AABCU9603R1ZM",
+            street_address="1 Market Road", city="Pune", state="Maharashtra", postal_code="411001",
+            area_of_operation="Pune", expected_monthly_sales=100000.0, previous_experience="", references="",
+        ))
+        db.commit()
+
+class Uncoalesced:
+    """Stands in for SingleFlight: every caller runs its own load"""
+
+    async def do(self, key, load):
+        return await load()
+
+selects = Counter()
+
+@event.listens_for(async_engine.sync_engine, "before_cursor_execute")
+def count_selects(conn, cursor, statement, parameters, context, executemany):
+    if statement.lstrip().upper().startswith("SELECT"):
+        selects["n"] += 1
+
+def client():
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench")
+
+async def burst(size):
+    print(f"\n{size} concurrent polls for one tracking ID, cold cache")
+    print(f"{'mode':>11} {'selects':>8} {'ms':>8}")
+    ratelimit.RATE_LIMIT_ENABLED = False
+    async with client() as http:
+        for name, loads in (("uncoalesced", Uncoalesced()), ("coalesced", SingleFlight())):
+            applications.tracking_loads = loads
+            tracking_cache.invalidate([TRACKING_ID])
+            selects.clear()
+            start = time.perf_counter()
+            responses = await asyncio.gather(*(http.get(f"/applications/track/{TRACKING_ID}") for _ in range(size)))
+            elapsed = time.perf_counter() - start
+            assert all(response.status_code == 200 for response in responses)
+            print(f"{name:>11} {selects['n']:>8} {elapsed * 1e3:>8.1f}")
+
+async def flood(requests):
+    limit = next(rule for rule in ratelimit.RULES if rule.name == "submit_support")
+    print(f"\n{requests} POST /support/ (limit {limit.burst}/{limit.period:g}s per IP)")
+    print(f"{'clients':>8} {'accepted':>9} {'rejected':>9}")
+    ratelimit.RATE_LIMIT_ENABLED = True
+    body = {"name": "Bot", "email": "bot@example.com", "subject": "Hi", "message": "Flood"}
+    async with client() as http:
+        for clients in (1, requests):
+            statuses = Counter()
+            for i in range(requests):
+                headers = {"X-Forwarded-For": f"203.0.{i % clients // 256}.{i % clients % 256}"}
+                response = await http.post("/support/", json=body, headers=headers)
+                statuses[response.status_code] += 1
+            print(f"{clients:>8} {statuses[200]:>9} {statuses[429]:>9}")
+            # Start the next round with full buckets
+            app.middleware_stack = None
+
+async def overhead(polls):
+    # Stay within one tracking ID's burst so every poll is served
+    per_id = next(rule for rule in ratelimit.RULES if rule.name == "track_per_id")
+    polls = min(polls, per_id.burst - 1)
+    app.middleware_stack = None
+    print(f"\n{polls} cached tracking polls from distinct clients")
+    print(f"{'middleware':>10} {'us/request':>11}")
+    async with client() as http:
+        await http.get(f"/applications/track/{TRACKING_ID}")
+        for enabled in (False, True):
+            ratelimit.RATE_LIMIT_ENABLED = enabled
+            start = time.perf_counter()
+            for i in range(polls):
+                headers = {"X-Forwarded-For": f"198.51.{i // 256 % 256}.{i % 256}"}
+                response = await http.get(f"/applications/track/{TRACKING_ID}", headers=headers)
+                assert response.status_code == 200, response.status_code
+            elapsed = time.perf_counter() - start
+            print(f"{'on' if enabled else 'off':>10} {elapsed / polls * 1e6:>11.1f}")
+
+    backend = ratelimit.MemoryBucketBackend()
+    start = time.perf_counter()
+    for i in range(100000):
+        await backend.take(f"bench:{i % 1000}", 2.0, 120)
+    print(f"memory bucket take: {(time.perf_counter() - start) / 100000 * 1e6:.2f} us")
+
+async def run(args):
+    await burst(args.burst)
+    await flood(args.flood)
+    await overhead(args.polls)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--burst", type=int, default=500)
+    parser.add_argument("--flood", type=int, default=200)
+    parser.add_argument("--polls", type=int, default=500, help="capped below the per-tracking-ID burst")
+    args = parser.parse_args()
+
+    seed()
+    asyncio.run(run(args))
+
+if __name__ == "__main__":
+    main()
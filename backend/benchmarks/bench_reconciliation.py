@@ -0,0 +1,186 @@
+"""Bank statement reconciliation of pending UPI payments.
+
+Seeds --payments pending payments and writes a --lines statement, as CSV and
+as OFX, mixing lines that match one payment with unknown references, wrong
+amounts, repeated lines, references shared by two pending payments and
+debits. Then:
+
+  per line    look up each line's payment and PATCH-style update it in its
+              own transaction, timed over --sample lines and extrapolated
+  reconcile   reconciliation.reconcile: one pass over the statement against
+              an in-memory index, then a single UPDATE
+
+It checks every line lands in the expected bucket, that matched payments are
+COMPLETED with the statement's date, and that the dashboard payment counters
+agree with a rebuild from the payments table.
+
+Usage (from the backend directory):
+    python benchmarks/bench_reconciliation.py
+    python benchmarks/bench_reconciliation.py --payments 200000 --lines 100000
+"""
+import argparse
+import csv
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault(
+    "DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+)
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.orm import Session
+
+from app import crud, schemas
+from app.database import Application, Base, Payment, PaymentStatus, engine
+from app.services import analytics, reconciliation
+
+PAYMENTS_PER_APPLICATION = 3
+POSTED = datetime(2026, 10, 1, 9, 30)
+SHARED_AMOUNT = 30000.0
+
+def seed(payments, shared):
+    """Pending payments; the last `shared` pairs of them share a reference and amount"""
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    now = datetime.utcnow()
+    applications = -(-payments // PAYMENTS_PER_APPLICATION)
+    rows = []
+    for i in range(payments):
+        pair = i - (payments - 2 * shared)
+        if pair < 0:
+            reference, amount = f"{9 * 10**11 + i:012d}", 25000.0 + (i % 7) * 0.5
+        else:
+            reference, amount = f"{8 * 10**11 + pair // 2:012d}", SHARED_AMOUNT
+        rows.append({
+            "application_id": i // PAYMENTS_PER_APPLICATION + 1, "amount": amount,
+            "payment_method": "UPI", "status": PaymentStatus.PENDING, "upi_reference": reference,
+            "created_at": now, "updated_at": now,
+        })
+    with Session(bind=engine) as db:
+        db.execute(insert(Application.__table__), [
+            {
+                "tracking_id": f"R{i:07d}", "full_name": f"Dealer {i}", "email": f"dealer{i}@example.com",
+                "phone": "9876543210", "business_name": f"Dealer {i} Traders", "business_type": "Retail",
+                "registration_number": f"27AABCU{i:04d}R1ZM", "street_address": "1 Market Road", "city": "Pune",
+                "state": "Maharashtra", "postal_code": "411001", "area_of_operation": "Pune",
+                "expected_monthly_sales": 100000.0, "previous_experience": "", "references": "",
+                "created_at": now, "updated_at": now,
+            }
+            for i in range(1, applications + 1)
+        ])
+        db.execute(insert(Payment.__table__), rows)
+        analytics.rebuild(db)
+        db.commit()
+    return rows
+
+def statement(rows, lines, shared):
+    """Statement lines as (reference, amount, kind), with the kind expected for each"""
+    rng = random.Random(7)
+    unique = rows[:len(rows) - 2 * shared]
+    odd = max(lines // 100, 1)
+    shared = min(odd, shared)
+    matched = rng.sample(unique, lines - 4 * odd - shared)
+    entries = [(row["upi_reference"], row["amount"], "matched") for row in matched[odd:]]
+    # The first `odd` sampled payments each appear on two lines
+    entries += [(row["upi_reference"], row["amount"], "duplicate") for row in matched[:odd] for _ in range(2)]
+    entries += [(f"{7 * 10**11 + i:012d}", 1000.0, "unknown") for i in range(odd)]
+    entries += [(row["upi_reference"], row["amount"] + 1, "mismatch") for row in rng.sample(unique, odd)]
+    entries += [(f"{8 * 10**11 + i:012d}", SHARED_AMOUNT, "shared") for i in range(shared)]
+    entries += [(f"{6 * 10**11 + i:012d}", -500.0, "debit") for i in range(odd)]
+    rng.shuffle(entries)
+    return entries
+
+def write_csv(path, entries):
+    with open(path, "w", newline="") as out:
+        writer = csv.writer(out)
+        writer.writerow(["Txn Date", "Description", "UTR No.", "Amount (INR)"])
+        for reference, amount, _ in entries:
+            writer.writerow([POSTED.strftime("%d/%m/%Y %H:%M:%S"), f"UPI/{reference}/dealer@okbank", reference, f"{amount:,.2f}"])
+
+def write_ofx(path, entries):
+    with open(path, "w") as out:
+        out.write("OFXHEADER:100\nDATA:OFXSGML\n\n<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><BANKTRANLIST>\n")
+        for i, (reference, amount, _) in enumerate(entries):
+            out.write(
+                f"<STMTTRN>\n<TRNTYPE>{'CREDIT' if amount > 0 else 'DEBIT'}\n<DTPOSTED>{POSTED:%Y%m%d%H%M%S}[+5.5:IST]\n"
+                f"<TRNAMT>{amount:.2f}\n<FITID>B{i:08d}\n<NAME>UPI CREDIT\n<MEMO>UPI/{reference}/dealer@okbank\n</STMTTRN>\n"
+            )
+        out.write("</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>\n")
+
+def per_line(entries, sample):
+    """Find and complete each line's payment one request at a time"""
+    start = time.perf_counter()
+    with Session(bind=engine) as db:
+        for reference, amount, _ in entries[:sample]:
+            if amount <= 0:
+                continue
+            candidates = db.execute(
+                select(Payment.id).where(Payment.upi_reference == reference, Payment.status == PaymentStatus.PENDING,
+                                         Payment.amount == amount)
+            ).scalars().all()
+            if len(candidates) == 1:
+                crud.update_payment(db, candidates[0], schemas.PaymentUpdate(status=PaymentStatus.COMPLETED, payment_date=POSTED))
+            db.commit()
+    return (time.perf_counter() - start) / sample
+
+def check(report, entries, shared):
+    kinds = {}
+    for _, _, kind in entries:
+        kinds[kind] = kinds.get(kind, 0) + 1
+    assert report.total == len(entries)
+    assert report.matched == report.applied == kinds["matched"], (report.matched, report.applied)
+    assert report.unmatched == kinds["unknown"] + kinds["mismatch"]
+    assert report.ambiguous == kinds["duplicate"] + kinds["shared"]
+    assert report.ignored == kinds["debit"] and report.failed == 0
+
+    with Session(bind=engine) as db:
+        completed = db.execute(
+            select(func.count(), func.min(Payment.payment_date), func.max(Payment.payment_date))
+            .where(Payment.status == PaymentStatus.COMPLETED)
+        ).one()
+        assert completed == (kinds["matched"], POSTED, POSTED), completed
+        counters = analytics.summary(db)["payments_by_status"]
+        analytics.rebuild(db)
+        assert analytics.summary(db)["payments_by_status"] == counters
+        db.rollback()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--payments", type=int, default=100000)
+    parser.add_argument("--lines", type=int, default=50000)
+    parser.add_argument("--shared", type=int, default=200, help="pairs of payments sharing a reference")
+    parser.add_argument("--sample", type=int, default=300, help="lines timed on the per-line path")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    rows = seed(args.payments, args.shared)
+    entries = statement(rows, args.lines, args.shared)
+    paths = {"csv": os.path.join(directory, "statement.csv"), "ofx": os.path.join(directory, "statement.ofx")}
+    write_csv(paths["csv"], entries)
+    write_ofx(paths["ofx"], entries)
+
+    print(f"\n{args.payments} pending payments, {len(entries)}-line statement")
+    per_line_seconds = per_line(entries, args.sample)
+    print(f"{'per line':>20} {per_line_seconds * 1e3:>8.2f} ms/line, ~{per_line_seconds * len(entries):.0f} s for the statement")
+
+    for fmt, path in paths.items():
+        seed(args.payments, args.shared)
+        with Session(bind=engine) as db, open(path, "rb") as stream:
+            start = time.perf_counter()
+            report = reconciliation.reconcile(db, reconciliation.iter_statement(stream, fmt))
+            elapsed = time.perf_counter() - start
+        check(report, entries, args.shared)
+        print(f"{f'reconcile ({fmt})':>20} {elapsed:>8.2f} s: matched {report.matched}, unmatched {report.unmatched}, "
+              f"ambiguous {report.ambiguous}, ignored {report.ignored}")
+
+    with Session(bind=engine) as db, open(paths["csv"], "rb") as stream:
+        report = reconciliation.reconcile(db, reconciliation.iter_statement(stream, "csv"), dry_run=True)
+    print(f"{'rerun (dry run)':>20} matched {report.matched}, unmatched {report.unmatched}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+"""Scheduled jobs: single runs across workers, the runtime cap, and batch transaction times.
+
+Seeds --payments pending payments (half of them past PAYMENT_EXPIRY_DAYS) and
+--reviews applications (half of them under review for longer than
+REVIEW_NUDGE_DAYS), and two admins. Then:
+
+1. Runs --workers schedulers side by side, as gunicorn workers would, polling
+   until nothing is due, with jobs capped at --max-runtime seconds per run.
+   Checks that no job ever ran in two workers at once, that every run was
+   recorded, and that the cap left a backlog the following runs worked off.
+2. Checks that every due payment expired and no other, that every stale
+   review was nudged once with one reminder per admin per batch, and that the
+   payment counters agree with the payments table.
+3. Compares the longest batch transaction with expiring the same payments in
+   a single UPDATE.
+
+Usage (from the backend directory):
+    python benchmarks/bench_scheduler.py
+    python benchmarks/bench_scheduler.py --payments 500000 --workers 8
+    DATABASE_URL=postgresql://... python benchmarks/bench_scheduler.py
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault(
+    "DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+)
+
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.orm import Session
+
+from app.database import (
+    AnalyticsCounter, Application, ApplicationStatus, Base, NotificationOutbox, Payment, PaymentStatus,
+    SessionLocal, User, engine,
+)
+from app.services import analytics, scheduler
+
+def seed(payments, reviews):
+    import app.services.search  # noqa: F401 (its DDL creates the search index with the tables)
+
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    now = datetime.utcnow()
+    old = now - timedelta(days=scheduler.PAYMENT_EXPIRY_DAYS + scheduler.REVIEW_NUDGE_DAYS + 1)
+    with Session(bind=engine) as db:
+        db.add_all([User(email=f"admin{i}@example.com", hashed_password="", is_admin=True) for i in range(2)])
+        count = max(payments, reviews)
+        for start in range(0, count, 10000):
+            stop = min(start + 10000, count)
+            db.execute(insert(Application.__table__), [
+                {
+                    "tracking_id": f"S{i:09d}", "full_name": f"Dealer {i}", "email": f"dealer{i}@example.com",
+                    "business_name": f"Dealer Motors {i}", "city": "Pune", "state": "Maharashtra",
+                    "status": ApplicationStatus.UNDER_REVIEW if i < reviews else ApplicationStatus.SUBMITTED,
+                    "created_at": old if i % 2 else now, "updated_at": old if i % 2 else now,
+                }
+                for i in range(start, stop)
+            ])
+        first_id = db.scalar(select(func.min(Application.id)))
+        for start in range(0, payments, 10000):
+            db.execute(insert(Payment.__table__), [
+                {
+                    "application_id": first_id + i, "amount": 25000.0, "payment_method": "UPI",
+                    "transaction_id": f"STX{i:010d}", "status": PaymentStatus.PENDING,
+                    "created_at": old if i % 2 else now, "updated_at": old if i % 2 else now,
+                }
+                for i in range(start, min(start + 10000, payments))
+            ])
+        analytics.rebuild(db)
+        db.commit()
+
+class Probe:
+    """Wraps one job's batches in every worker, to catch overlapping runs and time each transaction"""
+
+    def __init__(self):
+        self.active = 0
+        self.max_active = 0
+        self.batch_seconds = []
+        self._lock = threading.Lock()
+
+    def wrap(self, run_batch):
+        def probed(db, batch_size):
+            with self._lock:
+                self.active += 1
+                self.max_active = max(self.max_active, self.active)
+            start = time.perf_counter()
+            try:
+                count = run_batch(db, batch_size)
+                db.commit()
+                return count
+            finally:
+                self.batch_seconds.append(time.perf_counter() - start)
+                with self._lock:
+                    self.active -= 1
+        return probed
+
+def make_workers(count, batch_size, max_runtime):
+    workers, probes = [], {}
+    for _ in range(count):
+        jobs = scheduler.default_jobs()
+        for job in jobs:
+            job.max_runtime = max_runtime
+            if job.batch_size:
+                job.batch_size = batch_size
+            job.run_batch = probes.setdefault(job.name, Probe()).wrap(job.run_batch)
+        workers.append(scheduler.Scheduler(jobs=jobs))
+    return workers, probes
+
+async def drive(workers):
+    """Poll every worker together until none starts a job; returns how often each job was started"""
+    started = defaultdict(int)
+    while True:
+        names = [name for names in await asyncio.gather(*(worker.run_due() for worker in workers)) for name in names]
+        await asyncio.gather(*(task for worker in workers for task in list(worker._running.values())))
+        if not names:
+            return started
+        for name in names:
+            started[name] += 1
+
+def check_runs(workers, probes, started):
+    with SessionLocal() as db:
+        rows = {row.name: row for row in scheduler.list_jobs(db)}
+    print(f"\n{len(workers)} workers")
+    print(f"{'job':>24} {'started':>8} {'ran':>5} {'batches':>8} {'items':>8} {'most at once':>13} {'max batch ms':>13}")
+    for name, probe in probes.items():
+        row = rows[name]
+        print(f"{name:>24} {started[name]:>8} {row.runs:>5} {len(probe.batch_seconds):>8} "
+              f"{scheduler.metrics[f'items:{name}']:>8} {probe.max_active:>13} {max(probe.batch_seconds) * 1e3:>13.1f}")
+        if probe.max_active > 1:
+            raise SystemExit(f"{name} ran in two workers at once")
+        if row.runs != scheduler.metrics[f"runs:{name}:completed"]:
+            raise SystemExit(f"{name}: {row.runs} runs recorded, {scheduler.metrics[f'runs:{name}:completed']} completed")
+        if row.failures:
+            raise SystemExit(f"{name} failed: {row.last_error}")
+        if row.backlog:
+            raise SystemExit(f"{name} left a backlog of {row.backlog}")
+    return rows
+
+def verify(payments, reviews, batch_size):
+    expired_due = payments // 2
+    with SessionLocal() as db:
+        statuses = dict(db.execute(select(Payment.status, func.count()).group_by(Payment.status)).all())
+        nudged = db.scalar(select(func.count()).select_from(Application).where(Application.review_nudged_at.isnot(None)))
+        reminders = db.scalar(select(func.count()).select_from(NotificationOutbox))
+        counters = {
+            key: count for key, count in db.execute(
+                select(AnalyticsCounter.key, AnalyticsCounter.count).where(AnalyticsCounter.metric == analytics.PAYMENTS_BY_STATUS)
+            )
+            if count
+        }
+    print(f"\npayments: {statuses.get(PaymentStatus.FAILED, 0)} expired of {expired_due} due, "
+          f"{statuses.get(PaymentStatus.PENDING, 0)} still pending; counters {counters}")
+    print(f"reviews: {nudged} nudged of {reviews // 2} stale; {reminders} reminder emails")
+    if statuses.get(PaymentStatus.FAILED, 0) != expired_due or statuses.get(PaymentStatus.PENDING, 0) != payments - expired_due:
+        raise SystemExit("payment expiry missed due payments or expired others")
+    if counters != {status.value: count for status, count in statuses.items()}:
+        raise SystemExit("payment counters disagree with the payments table")
+    if nudged != reviews // 2:
+        raise SystemExit("not every stale review was nudged")
+    # Two admins, one reminder each per batch
+    if reminders != 2 * -(-(reviews // 2) // batch_size):
+        raise SystemExit(f"expected one reminder per admin per batch, found {reminders}")
+
+def one_shot(payments):
+    """Undo the expiry and time it again as a single UPDATE"""
+    old = datetime.utcnow() - timedelta(days=scheduler.PAYMENT_EXPIRY_DAYS)
+    with SessionLocal() as db:
+        db.execute(update(Payment).where(Payment.status == PaymentStatus.FAILED).values(status=PaymentStatus.PENDING))
+        db.commit()
+        start = time.perf_counter()
+        count = db.execute(
+            update(Payment).where(Payment.status == PaymentStatus.PENDING, Payment.created_at < old)
+            .values(status=PaymentStatus.FAILED, updated_at=datetime.utcnow())
+        ).rowcount
+        db.commit()
+    print(f"\none UPDATE expiring all {count} due payments: {(time.perf_counter() - start) * 1e3:.1f} ms in one transaction")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--payments", type=int, default=100000)
+    parser.add_argument("--reviews", type=int, default=20000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--batch-size", type=int, default=scheduler.SCHEDULER_BATCH_SIZE)
+    parser.add_argument("--max-runtime", type=float, default=0.5, help="seconds per run, small to exercise the cap")
+    args = parser.parse_args()
+
+    seed(args.payments, args.reviews)
+    workers, probes = make_workers(args.workers, args.batch_size, args.max_runtime)
+    start = time.perf_counter()
+    started = asyncio.run(drive(workers))
+    print(f"all jobs drained in {time.perf_counter() - start:.1f}s")
+    rows = check_runs(workers, probes, started)
+    runs = {name: row.runs for name, row in rows.items() if name not in ("rebuild-analytics", "maintain-partitions")}
+    print(f"runs of the chunked jobs under the {args.max_runtime}s runtime cap: {runs}")
+    verify(args.payments, args.reviews, args.batch_size)
+    one_shot(args.payments)
+
+if __name__ == "__main__":
+    main()
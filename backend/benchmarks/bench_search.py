@@ -0,0 +1,155 @@
+"""Admin application search over a large synthetic table.
+
+Seeds synthetic applications (1,000,000 by default), then times a mix of
+searches through app.services.search against the unindexed fallback that
+ILIKEs every searchable column (unranked, stopping at the first page):
+
+  exact       full applicant name
+  prefix      the start of a surname
+  typo        a misspelt surname plus business word
+  city        a city name
+  gst         the first ten characters of a GST number
+  phone       six digits from the middle of a phone number
+
+For each query it prints the indexed and fallback p50/p95 latency, whether
+the indexed results were approximate (typo-tolerant) matches, and the rank of
+the seeded target row in them (where there is one).
+
+Usage (from the backend directory):
+    python benchmarks/bench_search.py --rows 100000
+    DATABASE_URL=postgresql+psycopg2://... python benchmarks/bench_search.py
+"""
+import argparse
+import os
+import random
+import statistics
+import string
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault(
+    "DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+)
+
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+
+from app.database import Application, Base, engine
+from app.services import search
+
+FIRST_NAMES = (
+    "Aarav", "Vivaan", "Aditya", "Vihaan", "Arjun", "Sai", "Reyansh", "Krishna", "Ishaan", "Rohan",
+    "Priya", "Ananya", "Diya", "Isha", "Kavya", "Meera", "Neha", "Pooja", "Riya", "Sneha",
+    "Rajesh", "Suresh", "Ramesh", "Mahesh", "Dinesh", "Anil", "Sunil", "Vikram", "Amit", "Manoj",
+)
+SURNAMES = (
+    "Sharma", "Verma", "Agarwal", "Gupta", "Mehta", "Patel", "Shah", "Reddy", "Naidu", "Iyer",
+    "Nair", "Menon", "Pillai", "Rao", "Kulkarni", "Deshpande", "Joshi", "Chauhan", "Rathore", "Yadav",
+    "Singh", "Khan", "Das", "Bose", "Banerjee", "Mukherjee", "Chatterjee", "Ghosh", "Sinha", "Mishra",
+)
+BUSINESS_WORDS = ("Traders", "Enterprises", "Distributors", "Agencies", "Beverages", "Stores", "Suppliers", "Marketing")
+CITIES = (
+    ("Mumbai", "Maharashtra"), ("Pune", "Maharashtra"), ("Nagpur", "Maharashtra"), ("Delhi", "Delhi"),
+    ("Bengaluru", "Karnataka"), ("Mysuru", "Karnataka"), ("Chennai", "Tamil Nadu"), ("Coimbatore", "Tamil Nadu"),
+    ("Hyderabad", "Telangana"), ("Kolkata", "West Bengal"), ("Ahmedabad", "Gujarat"), ("Surat", "Gujarat"),
+    ("Jaipur", "Rajasthan"), ("Lucknow", "Uttar Pradesh"), ("Kanpur", "Uttar Pradesh"), ("Indore", "Madhya Pradesh"),
+    ("Bhopal", "Madhya Pradesh"), ("Patna", "Bihar"), ("Kochi", "Kerala"), ("Guwahati", "Assam"),
+)
+UPPER = string.ascii_uppercase
+
+def gst_number(rng):
+    # State code, PAN (5 letters, 4 digits, 1 letter), entity number, Z, check
+    pan = "".join(rng.choices(UPPER, k=5)) + f"{rng.randrange(10000):04d}" + rng.choice(UPPER)
+    return f"{rng.randrange(1, 38):02d}{pan}1Z{rng.choice(UPPER + string.digits)}"
+
+def synthetic(rng, i):
+    first, surname = rng.choice(FIRST_NAMES), rng.choice(SURNAMES)
+    city, state = rng.choice(CITIES)
+    return {
+        "tracking_id": f"S{i:09d}",
+        "full_name": f"{first} {surname}",
+        "email": f"{first.lower()}.{surname.lower()}{i}@example.com",
+        "phone": f"9{rng.randrange(10 ** 9):09d}",
+        "business_name": f"{surname} {rng.choice(BUSINESS_WORDS)}",
+        "business_type": "Retail",
+        "registration_number": gst_number(rng),
+        "street_address": f"{rng.randrange(1, 500)} Market Road",
+        "city": city,
+        "state": state,
+        "postal_code": f"{rng.randrange(110000, 860000)}",
+        "area_of_operation": city,
+        "expected_monthly_sales": float(rng.randrange(50000, 500000)),
+        "previous_experience": "",
+        "references": "",
+    }
+
+def seed(rows, batch_size=10000):
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    rng = random.Random(42)
+    start = time.perf_counter()
+    with Session(bind=engine) as db:
+        for offset in range(0, rows, batch_size):
+            batch = [synthetic(rng, i) for i in range(offset, min(rows, offset + batch_size))]
+            db.execute(insert(Application.__table__), batch)
+        db.commit()
+    print(f"seeded {rows:,} applications in {time.perf_counter() - start:.1f}s ({engine.dialect.name})")
+
+def queries(db):
+    # Targets are real seeded rows so a rank can be reported
+    target = db.query(Application).filter(Application.id == 1).one()
+    surname = target.full_name.split()[1]
+    typo = surname[:3] + surname[2:]  # a doubled letter
+    return [
+        ("exact", target.full_name, None),
+        ("prefix", surname[:4], None),
+        ("typo", f"{typo} {target.business_name.split()[1]}", None),
+        ("city", target.city, None),
+        ("gst", target.registration_number[:10], target.id),
+        ("phone", target.phone[2:8], None),
+    ]
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        samples.append(time.perf_counter() - start)
+    return result, statistics.median(samples) * 1e3, percentile(samples, 0.95) * 1e3
+
+def fallback_search(db, q, limit):
+    condition, score = next(search._fallback_queries(search.terms(q)))
+    return db.execute(select(Application.id).where(condition).order_by(Application.id).limit(limit)).all()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--no-seed", action="store_true", help="reuse the rows from a previous run")
+    parser.add_argument("--skip-fallback", action="store_true")
+    args = parser.parse_args()
+
+    if not args.no_seed:
+        seed(args.rows)
+
+    with Session(bind=engine) as db:
+        print(f"{'query':>7} {'q':>24} {'hits':>5} {'mode':>7} {'rank':>5} {'p50 ms':>8} {'p95 ms':>8} {'fallback p50':>13} {'p95':>8}")
+        for label, q, target_id in queries(db):
+            (rows, _, approximate), p50, p95 = timed(lambda: search.search_applications(db, q, limit=args.limit), args.repeat)
+            ids = [row.id for row in rows]
+            rank = str(ids.index(target_id) + 1) if target_id in ids else "-"
+            if args.skip_fallback:
+                base50 = base95 = float("nan")
+            else:
+                _, base50, base95 = timed(lambda: fallback_search(db, q, args.limit), args.repeat)
+            print(f"{label:>7} {q[:24]:>24} {len(rows):>5} {'approx' if approximate else 'strict':>7} {rank:>5} {p50:>8.1f} {p95:>8.1f} {base50:>13.1f} {base95:>8.1f}")
+
+if __name__ == "__main__":
+    main()
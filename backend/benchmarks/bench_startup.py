@@ -0,0 +1,122 @@
+"""Worker boot time with the schema created at import time and with migrations.
+
+  create_all   every worker imports app.main and then runs
+               Base.metadata.create_all(), as app.main used to
+  migrations   `python -m app.cli migrate` runs once; workers only import
+
+1. Boots --runs workers one after another against an up-to-date database and
+   reports the median and worst boot times, plus the statements create_all()
+   issues per worker.
+2. Starts --workers workers at the same moment against an empty database, as
+   a gunicorn restart on a fresh deploy would, and counts the workers that
+   failed to boot.
+
+Usage (from the backend directory):
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --runs 20 --workers 16
+    DATABASE_URL=postgresql://... python benchmarks/bench_startup.py
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.environ.setdefault(
+    "DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+)
+
+from sqlalchemy import event, text
+
+from app.database import Base, engine
+from app.utils import migrations
+
+WORKERS = {
+    "create_all": "import app.main\nfrom app.database import Base, engine\nBase.metadata.create_all(bind=engine)",
+    "migrations": "import app.main",
+}
+
+def reset():
+    """An empty database"""
+    if engine.dialect.name == "postgresql":
+        with engine.begin() as connection:
+            connection.execute(text("DROP SCHEMA public CASCADE"))
+            connection.execute(text("CREATE SCHEMA public"))
+    else:
+        import app.services.search  # noqa: F401 (its DDL drops the FTS table)
+        Base.metadata.drop_all(bind=engine)
+        with engine.begin() as connection:
+            connection.execute(text("DROP TABLE IF EXISTS alembic_version"))
+    engine.dispose()
+
+def spawn(mode):
+    return subprocess.Popen(
+        [sys.executable, "-W", "ignore", "-c", WORKERS[mode]],
+        cwd=BACKEND_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True,
+    )
+
+def boot(mode):
+    start = time.perf_counter()
+    process = spawn(mode)
+    _, errors = process.communicate()
+    if process.returncode:
+        raise RuntimeError(f"{mode} worker failed:\n{errors}")
+    return time.perf_counter() - start
+
+def create_all_statements():
+    statements = {"n": 0}
+
+    def count(*args):
+        statements["n"] += 1
+
+    event.listen(engine, "before_cursor_execute", count)
+    Base.metadata.create_all(bind=engine)
+    event.remove(engine, "before_cursor_execute", count)
+    return statements["n"]
+
+def sequential(runs):
+    reset()
+    migrations.upgrade()
+    print(f"\n{runs} boots each against an up-to-date database")
+    print(f"{'mode':>12} {'median ms':>10} {'max ms':>8}")
+    for mode in WORKERS:
+        boot(mode)  # warm the filesystem cache
+        samples = [boot(mode) for _ in range(runs)]
+        print(f"{mode:>12} {statistics.median(samples) * 1e3:>10.0f} {max(samples) * 1e3:>8.0f}")
+    print(f"create_all() issues {create_all_statements()} statements per worker even with nothing to create")
+
+def simultaneous(workers):
+    print(f"\n{workers} workers starting together on an empty database")
+    print(f"{'mode':>12} {'failed':>7}")
+    for mode in WORKERS:
+        reset()
+        if mode == "migrations":
+            migrations.upgrade()
+        processes = [spawn(mode) for _ in range(workers)]
+        failures = []
+        for process in processes:
+            _, errors = process.communicate()
+            if process.returncode:
+                failures.append(next(
+                    (line for line in reversed(errors.splitlines()) if "Error" in line), errors.strip()[-120:]
+                ))
+        engine.dispose()
+        print(f"{mode:>12} {len(failures):>7}")
+        for failure in sorted(set(failures)):
+            print(f"{'':>14}{failure[:120]}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+
+    sequential(args.runs)
+    simultaneous(args.workers)
+
+if __name__ == "__main__":
+    main()
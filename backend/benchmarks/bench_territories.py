@@ -0,0 +1,164 @@
+"""Dealer territories: coverage lookups, incremental refresh and cross-worker agreement.
+
+Seeds --applications synthetic applications over random pincodes, --approved
+of them approved with a status history row each. Then:
+
+1. Times --lookups coverage queries against the in-memory territory index and
+   as a query over the applications table (approved, postal_code LIKE '411%').
+2. Approves and revokes --changes applications through
+   crud.update_application_status, one commit each, and times a second index
+   (standing in for another worker) catching up with refresh() against a full
+   load().
+3. Checks both indexes against the database for every territory.
+
+Usage (from the backend directory):
+    python benchmarks/bench_territories.py
+    python benchmarks/bench_territories.py --applications 500000 --approved 20000
+    DATABASE_URL=postgresql://... python benchmarks/bench_territories.py
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault(
+    "DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+)
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.orm import Session
+
+from app import crud
+from app.database import Application, ApplicationStatus, ApplicationStatusUpdate, Base, SessionLocal, User, engine
+from app.services import territories
+
+def pincode(rng):
+    return f"{rng.randrange(110, 856)}{rng.randrange(1000):03d}"
+
+def seed(applications, approved):
+    """Returns the admin user's id"""
+    import app.services.search  # noqa: F401 (its DDL creates the search index with the tables)
+
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    rng = random.Random(5)
+    now = datetime.utcnow()
+    approved_ids = set(rng.sample(range(applications), approved))
+    with Session(bind=engine) as db:
+        admin = User(email="territories-admin@example.com", hashed_password="", is_admin=True)
+        db.add(admin)
+        db.flush()
+        for start in range(0, applications, 10000):
+            stop = min(start + 10000, applications)
+            db.execute(insert(Application.__table__), [
+                {
+                    "tracking_id": f"T{i:09d}", "full_name": f"Dealer {i}", "email": f"dealer{i}@example.com",
+                    "phone": f"9{i:09d}", "business_name": f"Dealer Motors {i}", "business_type": "Retail",
+                    "registration_number": "", "street_address": "1 Market Road", "city": "Somewhere",
+                    "state": "Somewhere", "postal_code": pincode(rng), "area_of_operation": "Somewhere",
+                    "expected_monthly_sales": 100000.0, "previous_experience": "", "references": "",
+                    "status": ApplicationStatus.APPROVED if i in approved_ids else ApplicationStatus.SUBMITTED,
+                    "created_at": now, "updated_at": now,
+                }
+                for i in range(start, stop)
+            ])
+        # Ids follow insertion order
+        first_id = db.scalar(select(func.min(Application.id)))
+        db.execute(insert(ApplicationStatusUpdate.__table__), [
+            {"application_id": first_id + i, "previous_status": ApplicationStatus.SUBMITTED,
+             "new_status": ApplicationStatus.APPROVED, "updated_by": admin.id, "created_at": now}
+            for i in sorted(approved_ids)
+        ])
+        db.commit()
+        return admin.id
+
+def sql_coverage(db, territory):
+    return db.scalars(
+        select(Application.id)
+        .where(Application.status == ApplicationStatus.APPROVED, Application.postal_code.like(f"{territory}%"))
+        .order_by(Application.id)
+    ).all()
+
+def lookups(count):
+    rng = random.Random(9)
+    sample = [pincode(rng) for _ in range(count)]
+    print(f"\n{count} coverage lookups")
+    print(f"{'lookup':>16} {'median ms':>10} {'p95 ms':>8}")
+    with SessionLocal() as db:
+        territories.territory_index.load(db)
+        for name, lookup in (
+            ("territory index", lambda code: territories.get_coverage(db, code)),
+            ("sql prefix scan", lambda code: sql_coverage(db, territories.territory_of(code))),
+        ):
+            timings = []
+            for code in sample:
+                start = time.perf_counter()
+                lookup(code)
+                timings.append(time.perf_counter() - start)
+            timings.sort()
+            print(f"{name:>16} {statistics.median(timings) * 1e3:>10.3f} {timings[int(len(timings) * 0.95)] * 1e3:>8.3f}")
+
+def changes(count, admin_id):
+    """Status changes in this worker; another worker's index catches up by refresh"""
+    other = territories.TerritoryIndex(refresh_seconds=0)
+    with SessionLocal() as db:
+        other.load(db)
+        application_ids = db.scalars(select(Application.id)).all()
+    rng = random.Random(13)
+    start = time.perf_counter()
+    for application_id in rng.sample(application_ids, count):
+        with SessionLocal() as db:
+            current = db.scalar(select(Application.status).where(Application.id == application_id))
+            target = ApplicationStatus.REJECTED if current == ApplicationStatus.APPROVED else ApplicationStatus.APPROVED
+            crud.update_application_status(db, application_id, target, admin_id)
+            db.commit()
+    print(f"\n{count} status changes committed in {time.perf_counter() - start:.1f}s")
+
+    with SessionLocal() as db:
+        start = time.perf_counter()
+        applied = other.refresh(db)
+        refresh_ms = (time.perf_counter() - start) * 1e3
+        start = time.perf_counter()
+        territories.TerritoryIndex().load(db)
+        load_ms = (time.perf_counter() - start) * 1e3
+    print(f"incremental refresh: {applied} changes in {refresh_ms:.1f} ms; full load: {load_ms:.1f} ms")
+    return other
+
+def verify(indexes):
+    with SessionLocal() as db:
+        rows = db.execute(
+            select(Application.id, Application.postal_code).where(Application.status == ApplicationStatus.APPROVED)
+        ).all()
+    expected = defaultdict(list)
+    for application_id, postal_code in rows:
+        expected[territories.territory_of(postal_code)].append(application_id)
+    for name, index in indexes:
+        mismatches = [
+            territory for territory in set(expected) | set(index._dealers)
+            if sorted(index._dealers.get(territory, {})) != sorted(expected.get(territory, []))
+        ]
+        print(f"{name}: {len(mismatches)} of {len(expected)} territories differ from the database")
+        if mismatches:
+            raise SystemExit(f"{name} is out of date for territories {sorted(mismatches)[:10]}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--applications", type=int, default=100000)
+    parser.add_argument("--approved", type=int, default=5000)
+    parser.add_argument("--lookups", type=int, default=500)
+    parser.add_argument("--changes", type=int, default=200)
+    args = parser.parse_args()
+
+    admin_id = seed(args.applications, args.approved)
+    lookups(args.lookups)
+    other = changes(args.changes, admin_id)
+    verify([("this worker", territories.territory_index), ("other worker", other)])
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+import re
+from logging.config import fileConfig
+
+from alembic import context
+from sqlalchemy import text
+
+from app.database import DATABASE_URL, Base, engine
+from app.utils.migrations import MIGRATION_LOCK_KEY
+
+config = context.config
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name, disable_existing_loggers=False)
+
+target_metadata = Base.metadata
+
+# Created by revisions as raw DDL rather than declared on the models, so
+# autogenerate must not propose dropping them
+UNMODELLED = {
+    "applications_search",
+    "applications_search_config",
+    "applications_search_data",
+    "applications_search_docsize",
+    "applications_search_idx",
+    "ix_applications_search_tsv",
+    "ix_applications_search_trgm",
+}
+
+# Partitions of the tables revision 0004 partitions by month (app.services.lifecycle)
+PARTITION = re.compile(r"^(application_status_updates|support_requests)_(history|default|p\d{6})$")
+
+def include_name(name, type_, parent_names):
+    if type_ == "table" and PARTITION.match(name):
+        return False
+    return name not in UNMODELLED
+
+def run_migrations_offline():
+    context.configure(
+        url=DATABASE_URL,
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+        include_name=include_name,
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+def run_migrations_online():
+    with engine.connect() as connection:
+        postgresql = connection.dialect.name == "postgresql"
+        if postgresql:
+            # Held for the session, across the commits of autocommit blocks
+            connection.execute(text("SELECT pg_advisory_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+            connection.commit()
+        try:
+            context.configure(
+                connection=connection,
+                target_metadata=target_metadata,
+                include_name=include_name,
+                # SQLite can only ALTER a table by copying it
+                render_as_batch=connection.dialect.name == "sqlite",
+            )
+            with context.begin_transaction():
+                context.run_migrations()
+        finally:
+            if postgresql:
+                connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": MIGRATION_LOCK_KEY})
+                connection.commit()
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,129 @@
+"""Baseline: the schema create_all() built before migrations existed
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18 10:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+# Enum columns store member names, as SQLAlchemy's Enum(ApplicationStatus) does
+APPLICATION_STATUS = ("SUBMITTED", "UNDER_REVIEW", "ADDITIONAL_INFO_REQUIRED", "APPROVED", "REJECTED")
+PAYMENT_STATUS = ("PENDING", "COMPLETED", "FAILED", "REFUNDED")
+
+def _enum(values, name):
+    # Types are created once up front; two tables share applicationstatus
+    return postgresql.ENUM(*values, name=name, create_type=False)
+
+def upgrade():
+    bind = op.get_bind()
+    for values, name in ((APPLICATION_STATUS, "applicationstatus"), (PAYMENT_STATUS, "paymentstatus")):
+        postgresql.ENUM(*values, name=name).create(bind, checkfirst=True)
+
+    op.create_table(
+        "users",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("email", sa.String()),
+        sa.Column("hashed_password", sa.String()),
+        sa.Column("is_admin", sa.Boolean()),
+        sa.Column("created_at", sa.DateTime()),
+        sa.Column("updated_at", sa.DateTime()),
+    )
+    op.create_index("ix_users_id", "users", ["id"])
+    op.create_index("ix_users_email", "users", ["email"], unique=True)
+
+    op.create_table(
+        "applications",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("tracking_id", sa.String()),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id")),
+        sa.Column("full_name", sa.String()),
+        sa.Column("email", sa.String()),
+        sa.Column("phone", sa.String()),
+        sa.Column("business_name", sa.String()),
+        sa.Column("business_type", sa.String()),
+        sa.Column("registration_number", sa.String()),
+        sa.Column("street_address", sa.String()),
+        sa.Column("city", sa.String()),
+        sa.Column("state", sa.String()),
+        sa.Column("postal_code", sa.String()),
+        sa.Column("area_of_operation", sa.String()),
+        sa.Column("expected_monthly_sales", sa.Float()),
+        sa.Column("previous_experience", sa.Text()),
+        sa.Column("references", sa.Text()),
+        sa.Column("status", _enum(APPLICATION_STATUS, "applicationstatus")),
+        sa.Column("admin_notes", sa.Text()),
+        sa.Column("created_at", sa.DateTime()),
+        sa.Column("updated_at", sa.DateTime()),
+    )
+    op.create_index("ix_applications_id", "applications", ["id"])
+    op.create_index("ix_applications_tracking_id", "applications", ["tracking_id"], unique=True)
+
+    op.create_table(
+        "payments",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("application_id", sa.Integer(), sa.ForeignKey("applications.id")),
+        sa.Column("amount", sa.Float()),
+        sa.Column("transaction_id", sa.String()),
+        sa.Column("payment_method", sa.String()),
+        sa.Column("status", _enum(PAYMENT_STATUS, "paymentstatus")),
+        sa.Column("upi_reference", sa.String()),
+        sa.Column("payment_date", sa.DateTime()),
+        sa.Column("created_at", sa.DateTime()),
+        sa.Column("updated_at", sa.DateTime()),
+    )
+    op.create_index("ix_payments_id", "payments", ["id"])
+    op.create_index("ix_payments_transaction_id", "payments", ["transaction_id"], unique=True)
+
+    op.create_table(
+        "approval_letters",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("application_id", sa.Integer(), sa.ForeignKey("applications.id"), unique=True),
+        sa.Column("dealership_id", sa.String()),
+        sa.Column("file_path", sa.String()),
+        sa.Column("issued_date", sa.DateTime()),
+        sa.Column("created_at", sa.DateTime()),
+        sa.Column("updated_at", sa.DateTime()),
+    )
+    op.create_index("ix_approval_letters_id", "approval_letters", ["id"])
+    op.create_index("ix_approval_letters_dealership_id", "approval_letters", ["dealership_id"], unique=True)
+
+    op.create_table(
+        "application_status_updates",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("application_id", sa.Integer(), sa.ForeignKey("applications.id")),
+        sa.Column("previous_status", _enum(APPLICATION_STATUS, "applicationstatus")),
+        sa.Column("new_status", _enum(APPLICATION_STATUS, "applicationstatus")),
+        sa.Column("notes", sa.Text()),
+        sa.Column("updated_by", sa.Integer(), sa.ForeignKey("users.id")),
+        sa.Column("created_at", sa.DateTime()),
+    )
+    op.create_index("ix_application_status_updates_id", "application_status_updates", ["id"])
+
+    op.create_table(
+        "support_requests",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("name", sa.String()),
+        sa.Column("email", sa.String()),
+        sa.Column("subject", sa.String()),
+        sa.Column("message", sa.Text()),
+        sa.Column("is_resolved", sa.Boolean()),
+        sa.Column("created_at", sa.DateTime()),
+        sa.Column("updated_at", sa.DateTime()),
+    )
+    op.create_index("ix_support_requests_id", "support_requests", ["id"])
+
+def downgrade():
+    for name in (
+        "support_requests", "application_status_updates", "approval_letters", "payments", "applications", "users"
+    ):
+        op.drop_table(name)
+    bind = op.get_bind()
+    for name in ("paymentstatus", "applicationstatus"):
+        postgresql.ENUM(name=name).drop(bind, checkfirst=True)
@@ -0,0 +1,158 @@
+"""Tables and indexes added by the performance work
+
+Indexes on the baseline tables are built concurrently on PostgreSQL. Every
+step is skipped if it already exists, because databases that ran create_all()
+at startup already have the new tables and may have some of these indexes.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 10:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from app.utils import migrations
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+LETTER_JOB_STATUS = ("QUEUED", "RUNNING", "COMPLETED", "FAILED")
+NOTIFICATION_STATUS = ("PENDING", "SENDING", "SENT", "FAILED")
+
+# (name, table, columns) for keyset pagination and foreign key lookups
+INDEXES = [
+    ("ix_applications_created_at_id", "applications", "created_at, id"),
+    ("ix_applications_status_created_at_id", "applications", "status, created_at, id"),
+    ("ix_applications_state_city_created_at_id", "applications", "state, city, created_at, id"),
+    ("ix_support_requests_created_at_id", "support_requests", "created_at, id"),
+    ("ix_support_requests_is_resolved_created_at_id", "support_requests", "is_resolved, created_at, id"),
+    ("ix_payments_application_id", "payments", "application_id"),
+    ("ix_application_status_updates_application_id", "application_status_updates", "application_id"),
+]
+
+# Application search (app.services.search), as it stood in this revision
+SEARCH_COLUMNS = ("full_name", "business_name", "city", "registration_number", "phone")
+_DOCUMENT_SQL = " || ' ' || ".join(f"coalesce({name}, '')" for name in SEARCH_COLUMNS)
+_FTS_COLUMNS = ", ".join(SEARCH_COLUMNS)
+_FTS_NEW = ", ".join(f"new.{name}" for name in SEARCH_COLUMNS)
+_FTS_OLD = ", ".join(f"old.{name}" for name in SEARCH_COLUMNS)
+
+SQLITE_SEARCH_DDL = [
+    f"""CREATE TRIGGER IF NOT EXISTS applications_search_ai AFTER INSERT ON applications BEGIN
+        INSERT INTO applications_search(rowid, {_FTS_COLUMNS}) VALUES (new.id, {_FTS_NEW});
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS applications_search_ad AFTER DELETE ON applications BEGIN
+        INSERT INTO applications_search(applications_search, rowid, {_FTS_COLUMNS}) VALUES ('delete', old.id, {_FTS_OLD});
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS applications_search_au AFTER UPDATE OF {_FTS_COLUMNS} ON applications BEGIN
+        INSERT INTO applications_search(applications_search, rowid, {_FTS_COLUMNS}) VALUES ('delete', old.id, {_FTS_OLD});
+        INSERT INTO applications_search(rowid, {_FTS_COLUMNS}) VALUES (new.id, {_FTS_NEW});
+    END""",
+]
+
+def _create_tables():
+    bind = op.get_bind()
+    for values, name in ((LETTER_JOB_STATUS, "letterjobstatus"), (NOTIFICATION_STATUS, "notificationstatus")):
+        postgresql.ENUM(*values, name=name).create(bind, checkfirst=True)
+
+    if not migrations.has_table("approval_letter_jobs"):
+        op.create_table(
+            "approval_letter_jobs",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("application_id", sa.Integer(), sa.ForeignKey("applications.id")),
+            sa.Column("status", postgresql.ENUM(*LETTER_JOB_STATUS, name="letterjobstatus", create_type=False), nullable=False),
+            sa.Column("attempts", sa.Integer(), nullable=False),
+            sa.Column("error", sa.Text()),
+            sa.Column("file_path", sa.String()),
+            sa.Column("created_at", sa.DateTime()),
+            sa.Column("updated_at", sa.DateTime()),
+        )
+        op.create_index("ix_approval_letter_jobs_id", "approval_letter_jobs", ["id"])
+        op.create_index("ix_approval_letter_jobs_application_id", "approval_letter_jobs", ["application_id"])
+        op.create_index("ix_approval_letter_jobs_status_created_at", "approval_letter_jobs", ["status", "created_at"])
+
+    if not migrations.has_table("notification_outbox"):
+        op.create_table(
+            "notification_outbox",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("idempotency_key", sa.String(), nullable=False, unique=True),
+            sa.Column("application_id", sa.Integer(), sa.ForeignKey("applications.id")),
+            sa.Column("recipient", sa.String(), nullable=False),
+            sa.Column("subject", sa.String(), nullable=False),
+            sa.Column("body", sa.Text(), nullable=False),
+            sa.Column("status", postgresql.ENUM(*NOTIFICATION_STATUS, name="notificationstatus", create_type=False), nullable=False),
+            sa.Column("attempts", sa.Integer(), nullable=False),
+            sa.Column("next_attempt_at", sa.DateTime(), nullable=False),
+            sa.Column("error", sa.Text()),
+            sa.Column("sent_at", sa.DateTime()),
+            sa.Column("created_at", sa.DateTime()),
+            sa.Column("updated_at", sa.DateTime()),
+        )
+        op.create_index("ix_notification_outbox_id", "notification_outbox", ["id"])
+        op.create_index("ix_notification_outbox_application_id", "notification_outbox", ["application_id"])
+        op.create_index("ix_notification_outbox_status_next_attempt_at", "notification_outbox", ["status", "next_attempt_at"])
+
+    if not migrations.has_table("analytics_counters"):
+        op.create_table(
+            "analytics_counters",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("metric", sa.String(), nullable=False),
+            sa.Column("key", sa.String(), nullable=False),
+            sa.Column("count", sa.Integer(), nullable=False),
+            sa.Column("total", sa.Float(), nullable=False),
+            sa.UniqueConstraint("metric", "key", name="uq_analytics_counters_metric_key"),
+        )
+        op.create_index("ix_analytics_counters_id", "analytics_counters", ["id"])
+
+def _create_search_index():
+    dialect = op.get_bind().dialect.name
+    if dialect == "postgresql":
+        migrations.create_index(
+            "ix_applications_search_tsv", "applications", f"(to_tsvector('simple'::regconfig, {_DOCUMENT_SQL}))",
+            using="gin",
+        )
+        # Typo-tolerant search needs pg_trgm (postgresql-contrib); without it
+        # the trigram index is skipped and search matches words only
+        available = op.get_bind().execute(
+            sa.text("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+        ).first()
+        if available:
+            op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+            migrations.create_index(
+                "ix_applications_search_trgm", "applications", f"(lower({_DOCUMENT_SQL})) gin_trgm_ops", using="gin",
+            )
+    elif dialect == "sqlite":
+        created = not migrations.has_table("applications_search")
+        op.execute(
+            f"""CREATE VIRTUAL TABLE IF NOT EXISTS applications_search USING fts5(
+                {_FTS_COLUMNS}, content='applications', content_rowid='id', tokenize='trigram'
+            )"""
+        )
+        for statement in SQLITE_SEARCH_DDL:
+            op.execute(statement)
+        if created:
+            op.execute("INSERT INTO applications_search(applications_search) VALUES ('rebuild')")
+
+def upgrade():
+    _create_tables()
+    for name, table, columns in INDEXES:
+        migrations.create_index(name, table, columns)
+    _create_search_index()
+
+def downgrade():
+    if op.get_bind().dialect.name == "sqlite":
+        for name in ("applications_search_ai", "applications_search_ad", "applications_search_au"):
+            op.execute(f"DROP TRIGGER IF EXISTS {name}")
+        op.execute("DROP TABLE IF EXISTS applications_search")
+    for name in ("ix_applications_search_trgm", "ix_applications_search_tsv"):
+        migrations.drop_index(name)
+    for name, _, _ in reversed(INDEXES):
+        migrations.drop_index(name)
+    for name in ("analytics_counters", "notification_outbox", "approval_letter_jobs"):
+        op.drop_table(name)
+    bind = op.get_bind()
+    for name in ("notificationstatus", "letterjobstatus"):
+        postgresql.ENUM(name=name).drop(bind, checkfirst=True)
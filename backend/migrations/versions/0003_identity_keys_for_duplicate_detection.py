@@ -0,0 +1,43 @@
+"""Identity keys for duplicate detection
+
+Existing applications get their keys from `python -m app.cli
+rebuild-identity-keys`, which normalises them in Python; until it runs, new
+submissions are only checked against each other.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 10:09:42.542126
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        "application_identity_keys",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("application_id", sa.Integer(), sa.ForeignKey("applications.id"), nullable=False),
+        sa.Column("kind", sa.String(), nullable=False),
+        sa.Column("value", sa.String(), nullable=False),
+    )
+    op.create_index("ix_application_identity_keys_application_id", "application_identity_keys", ["application_id"])
+    op.create_index("ix_application_identity_keys_kind_value", "application_identity_keys", ["kind", "value"])
+
+    op.create_table(
+        "application_duplicates",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("cluster_id", sa.Integer(), nullable=False),
+        sa.Column("application_id", sa.Integer(), sa.ForeignKey("applications.id"), nullable=False, unique=True),
+        sa.Column("score", sa.Float(), nullable=False),
+        sa.Column("matched_on", sa.String(), nullable=False),
+        sa.Column("detected_at", sa.DateTime(), nullable=False),
+    )
+    op.create_index("ix_application_duplicates_cluster_id", "application_duplicates", ["cluster_id"])
+
+def downgrade():
+    op.drop_table("application_duplicates")
+    op.drop_table("application_identity_keys")
@@ -0,0 +1,125 @@
+"""Archive index, and partitioned status history and support requests
+
+On PostgreSQL, application_status_updates and support_requests become tables
+range partitioned by month of created_at: existing rows go to a _history
+partition, then come this month and PARTITION_MONTHS_AHEAD (3) more, and a
+_default partition. Each table is copied into its partitioned replacement
+inside this revision's transaction, so writes to it wait for the copy;
+migrate at a quiet time. The primary key becomes (id, created_at), as
+PostgreSQL requires of partitioned tables, and created_at becomes NOT NULL on
+every database.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 10:19:20.614847
+"""
+from datetime import date, datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+MONTHS_AHEAD = 3
+
+# (indexes as (name, columns), foreign keys as (column, referenced table)) of
+# the partitioned tables, as they stand in this revision
+PARTITIONED = {
+    "application_status_updates": (
+        [
+            ("ix_application_status_updates_id", "id"),
+            ("ix_application_status_updates_application_id", "application_id"),
+        ],
+        [("application_id", "applications"), ("updated_by", "users")],
+    ),
+    "support_requests": (
+        [
+            ("ix_support_requests_id", "id"),
+            ("ix_support_requests_created_at_id", "created_at, id"),
+            ("ix_support_requests_is_resolved_created_at_id", "is_resolved, created_at, id"),
+        ],
+        [],
+    ),
+}
+
+def _month_start(day, months=0):
+    month = day.year * 12 + day.month - 1 + months
+    return date(month // 12, month % 12 + 1, 1)
+
+def _replace_table(table, staging, primary_key, partitions=()):
+    """Move table aside as `staging`, recreate it with its rows, then drop staging"""
+    indexes, foreign_keys = PARTITIONED[table]
+    op.execute(f"ALTER TABLE {table} RENAME TO {staging}")
+    op.execute(f"ALTER TABLE {staging} RENAME CONSTRAINT {table}_pkey TO {staging}_pkey")
+    for name, _ in indexes:
+        op.execute(f"DROP INDEX IF EXISTS {name}")
+    partition_by = " PARTITION BY RANGE (created_at)" if partitions else ""
+    op.execute(f"CREATE TABLE {table} (LIKE {staging} INCLUDING DEFAULTS){partition_by}")
+    op.execute(f"ALTER TABLE {table} ADD CONSTRAINT {table}_pkey PRIMARY KEY ({primary_key})")
+    for partition in partitions:
+        op.execute(f"CREATE TABLE {table}_{partition}")
+    op.execute(f"INSERT INTO {table} SELECT * FROM {staging}")
+    # The id sequence would otherwise be dropped with the old table
+    op.execute(f"ALTER SEQUENCE {table}_id_seq OWNED BY {table}.id")
+    op.execute(f"DROP TABLE {staging}")
+    for name, columns in indexes:
+        op.execute(f"CREATE INDEX {name} ON {table} ({columns})")
+    for column, referenced in foreign_keys:
+        op.create_foreign_key(f"{table}_{column}_fkey", table, referenced, [column], ["id"])
+
+def _partitions(table):
+    this_month = _month_start(datetime.utcnow().date())
+    partitions = [f"history PARTITION OF {table} FOR VALUES FROM (MINVALUE) TO ('{this_month}')"]
+    for months in range(MONTHS_AHEAD + 1):
+        start = _month_start(this_month, months)
+        partitions.append(
+            f"p{start:%Y%m} PARTITION OF {table} FOR VALUES FROM ('{start}') TO ('{_month_start(start, 1)}')"
+        )
+    partitions.append(f"default PARTITION OF {table} DEFAULT")
+    return partitions
+
+def upgrade():
+    op.create_table(
+        "archived_records",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("kind", sa.String(), nullable=False),
+        sa.Column("record_id", sa.Integer(), nullable=False),
+        sa.Column("lookup_key", sa.String()),
+        sa.Column("archive_file", sa.String(), nullable=False),
+        sa.Column("line", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("archived_at", sa.DateTime(), nullable=False),
+        sa.UniqueConstraint("kind", "record_id", name="uq_archived_records_kind_record_id"),
+    )
+    op.create_index("ix_archived_records_lookup_key", "archived_records", ["lookup_key"])
+
+    bind = op.get_bind()
+    now = datetime.utcnow()
+    bind.execute(
+        sa.text("UPDATE application_status_updates SET created_at = :now WHERE created_at IS NULL"), {"now": now}
+    )
+    bind.execute(
+        sa.text("UPDATE support_requests SET created_at = coalesce(updated_at, :now) WHERE created_at IS NULL"),
+        {"now": now},
+    )
+    for table in PARTITIONED:
+        with op.batch_alter_table(table) as batch:
+            batch.alter_column("created_at", existing_type=sa.DateTime(), nullable=False)
+
+    if bind.dialect.name == "postgresql":
+        for table in PARTITIONED:
+            _replace_table(table, f"{table}_unpartitioned", "id, created_at", _partitions(table))
+
+def downgrade():
+    if op.get_bind().dialect.name == "postgresql":
+        for table in PARTITIONED:
+            _replace_table(table, f"{table}_partitioned", "id")
+    for table in PARTITIONED:
+        with op.batch_alter_table(table) as batch:
+            batch.alter_column("created_at", existing_type=sa.DateTime(), nullable=True)
+
+    op.drop_index("ix_archived_records_lookup_key", table_name="archived_records")
+    op.drop_table("archived_records")
@@ -0,0 +1,49 @@
+"""Scheduled job state, and the columns and index the scheduled jobs query
+
+The payments index is built concurrently on PostgreSQL.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 10:28:02.457052
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from app.utils import migrations
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+JOB_RUN_STATUS = ("RUNNING", "COMPLETED", "FAILED")
+
+def upgrade():
+    postgresql.ENUM(*JOB_RUN_STATUS, name="jobrunstatus").create(op.get_bind(), checkfirst=True)
+    op.create_table(
+        "scheduled_jobs",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("name", sa.String(), nullable=False, unique=True),
+        sa.Column("status", postgresql.ENUM(*JOB_RUN_STATUS, name="jobrunstatus", create_type=False)),
+        sa.Column("next_run_at", sa.DateTime(), nullable=False),
+        sa.Column("last_started_at", sa.DateTime()),
+        sa.Column("last_finished_at", sa.DateTime()),
+        sa.Column("last_duration", sa.Float()),
+        sa.Column("last_processed", sa.Integer()),
+        sa.Column("backlog", sa.Integer()),
+        sa.Column("last_error", sa.Text()),
+        sa.Column("runs", sa.Integer(), nullable=False),
+        sa.Column("failures", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime()),
+        sa.Column("updated_at", sa.DateTime()),
+    )
+    op.add_column("applications", sa.Column("review_nudged_at", sa.DateTime()))
+    migrations.create_index("ix_payments_status_created_at", "payments", "status, created_at")
+
+def downgrade():
+    migrations.drop_index("ix_payments_status_created_at")
+    with op.batch_alter_table("applications") as batch:
+        batch.drop_column("review_nudged_at")
+    op.drop_table("scheduled_jobs")
+    postgresql.ENUM(name="jobrunstatus").drop(op.get_bind(), checkfirst=True)
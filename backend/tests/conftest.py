@@ -0,0 +1,51 @@
+"""Shared fixtures
+
+Tests run against DATABASE_URL, a throwaway SQLite file unless set. Tests that
+need PostgreSQL skip themselves elsewhere; point DATABASE_URL at an empty
+PostgreSQL database to run them (its public schema is dropped and recreated).
+
+Usage (from the backend directory):
+    python -m pytest -q
+    DATABASE_URL=postgresql://... python -m pytest -q
+"""
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault(
+    "DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'test.db')}"
+)
+os.environ.setdefault("JWT_SECRET", "test-secret")
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.database import Base, engine
+
+@pytest.fixture
+def db(monkeypatch):
+    """A session on freshly created tables"""
+    import app.services.search  # noqa: F401 (its DDL creates the search index with the tables)
+    from app.services import territories
+
+    # Loaded from the previous test's tables otherwise
+    monkeypatch.setattr(territories, "territory_index", territories.TerritoryIndex())
+
+    if engine.dialect.name == "postgresql":
+        # Also drops what tests create outside the models
+        with engine.begin() as connection:
+            connection.execute(text("DROP SCHEMA public CASCADE; CREATE SCHEMA public"))
+    else:
+        Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    with Session(bind=engine) as session:
+        yield session
+
+def requires_postgresql():
+    return pytest.mark.skipif(
+        engine.dialect.name != "postgresql" or engine.dialect.driver != "psycopg2",
+        reason="needs DATABASE_URL pointing at PostgreSQL (psycopg2)",
+    )
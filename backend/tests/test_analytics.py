@@ -0,0 +1,14 @@
+from app.services import analytics
+
+def test_percentile_interpolates_within_the_bucket():
+    # 10 approvals in (4, 8] hours, 10 in (8, 12]
+    buckets = {"8": 10, "12": 10}
+
+    assert analytics._percentile(buckets, 20, 0.25) == 6.0
+    assert analytics._percentile(buckets, 20, 0.50) == 8.0
+    assert analytics._percentile(buckets, 20, 0.90) == 11.2
+    assert analytics._percentile({"1": 4}, 4, 0.5) == 0.5
+
+def test_percentile_in_the_open_ended_bucket_is_unknown():
+    assert analytics._percentile({"1": 1, "inf": 9}, 10, 0.5) is None
+    assert analytics._percentile({}, 0, 0.5) is None
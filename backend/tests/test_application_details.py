@@ -0,0 +1,100 @@
+import asyncio
+from datetime import datetime
+
+import httpx
+import pytest
+from sqlalchemy import event
+
+from app import crud, schemas
+from app.database import (
+    Application, ApplicationStatus, ApplicationStatusUpdate, ApprovalLetter, Payment, PaymentStatus, User,
+    async_engine, engine,
+)
+from app.main import app
+from app.services import auth
+
+# Application + letter, payments, status updates
+EXPECTED_QUERIES = 3
+
+def seed(db, applications):
+    now = datetime.utcnow()
+    admin = User(email="admin@example.com", hashed_password="", is_admin=True)
+    db.add(admin)
+    db.flush()
+    for i in range(applications):
+        application = Application(
+            tracking_id=f"D{i:07d}", full_name=f"Dealer {i}", email=f"dealer{i}@example.com", phone="9876543210",
+            business_name=f"Dealer {i} Traders", business_type="Retail", registration_number=f"27AABCU{i:04d}R1ZM",
+            street_address="1 Market Road", city="Pune", state="Maharashtra", postal_code="411001",
+            area_of_operation="Pune", expected_monthly_sales=100000.0, previous_experience="", references="",
+            status=ApplicationStatus.APPROVED if i % 2 else ApplicationStatus.UNDER_REVIEW,
+        )
+        application.payments = [
+            Payment(amount=50000.0, transaction_id=f"TXN{i}-{j}", payment_method="UPI",
+                    status=PaymentStatus.COMPLETED, payment_date=now)
+            for j in range(3)
+        ]
+        application.status_updates = [
+            ApplicationStatusUpdate(
+                previous_status=ApplicationStatus.SUBMITTED, new_status=ApplicationStatus.UNDER_REVIEW, updated_by=admin.id,
+            )
+            for _ in range(2)
+        ]
+        if i % 2:
+            application.approval_letter = ApprovalLetter(dealership_id=f"DLR{i:07d}", file_path=f"letters/{i}.pdf")
+        db.add(application)
+    db.commit()
+    db.expunge_all()
+
+@pytest.fixture
+def statements():
+    """Statements run on the sync and async engines while the test runs"""
+    executed = []
+
+    def count(conn, cursor, statement, *args):
+        executed.append(statement)
+
+    targets = (engine, async_engine.sync_engine)
+    for target in targets:
+        event.listen(target, "before_cursor_execute", count)
+    yield executed
+    for target in targets:
+        event.remove(target, "before_cursor_execute", count)
+
+def serialize(applications):
+    # What the response_model does with returned objects
+    return [schemas.ApplicationDetailResponse.model_validate(a, from_attributes=True) for a in applications]
+
+@pytest.mark.parametrize("applications", [1, 10, 60])
+def test_eager_paths_run_a_fixed_number_of_queries(db, statements, applications):
+    seed(db, applications)
+
+    statements.clear()
+    page = serialize(crud.get_application_details_page(db, limit=50)[0])
+    assert len(page) == min(applications, 50)
+    assert len(statements) == EXPECTED_QUERIES
+
+    db.expunge_all()
+    statements.clear()
+    (detail,) = serialize([crud.get_application_detail(db, applications)])
+    assert len(detail.payments) == 3
+    assert len(statements) == EXPECTED_QUERIES
+
+def test_detail_endpoints_run_a_fixed_number_of_queries(db, statements):
+    seed(db, 20)
+
+    async def get(paths):
+        app.dependency_overrides[auth.require_admin] = lambda: auth.CurrentUser(id=1, email="admin@example.com", is_admin=True)
+        counts = []
+        try:
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+                for path in paths:
+                    statements.clear()
+                    (await client.get(path)).raise_for_status()
+                    counts.append(len(statements))
+        finally:
+            app.dependency_overrides.clear()
+            await async_engine.dispose()
+        return counts
+
+    assert asyncio.run(get(["/admin/applications/details?limit=20", "/admin/applications/2"])) == [EXPECTED_QUERIES] * 2
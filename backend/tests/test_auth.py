@@ -0,0 +1,108 @@
+import asyncio
+import base64
+import json
+import time
+from datetime import datetime, timedelta
+
+import httpx
+import pytest
+from jose import jwt
+
+from app.database import User, async_engine
+from app.main import app
+from app.services import auth
+from app.services.cache import LRUCacheBackend
+from app.utils import passwords
+
+@pytest.fixture
+def users(db, monkeypatch):
+    """An admin and a dealer, both with password "correct horse", hashed at cost 4"""
+    monkeypatch.setattr(auth, "hasher", auth.PasswordHasher(rounds=4))
+    monkeypatch.setattr(auth, "claims_cache", LRUCacheBackend())
+    hashed = passwords.hash_password("correct horse", 4)
+    admin = User(email="admin@example.com", hashed_password=hashed, is_admin=True)
+    dealer = User(email="dealer@example.com", hashed_password=hashed, is_admin=False)
+    db.add_all([admin, dealer])
+    db.commit()
+    return admin, dealer
+
+def send(*requests):
+    """Responses to (method, path, token or None, form data or None) requests, in order"""
+    async def run():
+        responses = []
+        try:
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+                for method, path, token, data in requests:
+                    headers = {"Authorization": f"Bearer {token}"} if token else {}
+                    responses.append(await client.request(method, path, headers=headers, data=data))
+        finally:
+            await async_engine.dispose()
+        return responses
+    return asyncio.run(run())
+
+def login(email, password):
+    (response,) = send(("POST", "/auth/login", None, {"username": email, "password": password}))
+    return response
+
+def token(user, secret=None, algorithm=None, expires=timedelta(hours=1)):
+    now = datetime.utcnow()
+    claims = {"sub": str(user.id), "email": user.email, "admin": user.is_admin, "iat": now, "exp": now + expires}
+    return jwt.encode(claims, secret or auth.signing_key(), algorithm=algorithm or auth.JWT_ALGORITHM)
+
+def test_login_issues_a_token_for_the_right_password(users):
+    response = login("admin@example.com", "correct horse")
+    assert response.status_code == 200
+    body = response.json()
+    assert body["token_type"] == "bearer" and body["expires_in"] == auth.JWT_EXPIRATION_MINUTES * 60
+
+    (me,) = send(("GET", "/auth/me", body["access_token"], None))
+    assert me.json() == {"email": "admin@example.com", "id": users[0].id, "is_admin": True}
+
+    for email, password in [("admin@example.com", "wrong horse"), ("nobody@example.com", "correct horse")]:
+        response = login(email, password)
+        assert response.status_code == 401 and response.json() == {"detail": "Incorrect email or password"}
+
+def test_login_rehashes_at_the_current_cost(db, users, monkeypatch):
+    monkeypatch.setattr(auth, "hasher", auth.PasswordHasher(rounds=5))
+
+    assert login("dealer@example.com", "correct horse").status_code == 200
+    db.expire_all()
+    stored = db.get(User, users[1].id).hashed_password
+    assert passwords.hash_rounds(stored) == 5 and passwords.verify_password("correct horse", stored, 5) == (True, None)
+
+def test_bad_tokens_are_rejected(db, users):
+    admin, dealer = users
+    gone = User(email="gone@example.com", hashed_password="", is_admin=True)
+    db.add(gone)
+    db.commit()
+    gone_token = token(gone)
+    db.delete(gone)
+    db.commit()
+    # alg "none", which jose cannot even produce
+    claims = {"sub": str(admin.id), "admin": True, "exp": int(time.time()) + 3600}
+    unsigned = ".".join(
+        base64.urlsafe_b64encode(json.dumps(part).encode()).decode().rstrip("=")
+        for part in ({"alg": "none", "typ": "JWT"}, claims)
+    ) + "."
+
+    bad = [
+        None,
+        "not-a-jwt",
+        token(admin, secret="someone-elses-secret"),
+        token(admin, expires=timedelta(seconds=-1)),
+        token(admin, algorithm="HS512"),
+        unsigned,
+        gone_token,
+    ]
+    for response in send(*[("GET", "/admin/analytics", value, None) for value in bad]):
+        assert response.status_code == 401
+        assert response.headers["WWW-Authenticate"] == "Bearer"
+
+    dealer_only, admin_ok = send(("GET", "/admin/analytics", token(dealer), None), ("GET", "/admin/analytics", token(admin), None))
+    assert dealer_only.status_code == 403 and dealer_only.json() == {"detail": "Admin privileges required"}
+    assert admin_ok.status_code == 200
+
+def test_no_signing_key_means_no_tokens(monkeypatch):
+    monkeypatch.setattr(auth, "JWT_SECRET", None)
+    with pytest.raises(auth.MissingSecretError):
+        auth.signing_key()
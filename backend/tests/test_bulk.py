@@ -0,0 +1,66 @@
+import pytest
+from sqlalchemy import event, select
+
+from app.database import Application, ApplicationStatus, engine
+from app.services import bulk, territories
+
+from conftest import requires_postgresql
+
+def record(i, **overrides):
+    return dict(
+        {
+            "full_name": f"Dealer {i}", "email": f"dealer{i}@example.com", "phone": f"98{i:08d}",
+            "business_name": f"Dealer Motors {i}", "business_type": "Proprietorship",
+            "registration_number": f"GST{i:010d}", "street_address": f"{i} MG Road", "city": "Pune",
+            "state": "Maharashtra", "postal_code": "411001", "area_of_operation": "Pune",
+            "expected_monthly_sales": 100000.0, "previous_experience": "", "references": 'Says "hi", twice',
+        },
+        **overrides,
+    )
+
+@requires_postgresql()
+def test_copy_inserts_rows_and_nulls(db):
+    inserts = []
+
+    def count_inserts(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("INSERT INTO APPLICATIONS"):
+            inserts.append(statement)
+
+    event.listen(engine, "before_cursor_execute", count_inserts)
+    try:
+        report = bulk.import_applications(db, ((i, record(i), None) for i in range(1, 51)), batch_size=20)
+    finally:
+        event.remove(engine, "before_cursor_execute", count_inserts)
+
+    assert (report.inserted, report.failed) == (50, 0)
+    # Every batch went in by COPY, none by the row-by-row fallback
+    assert inserts == []
+    rows = db.execute(
+        select(Application.user_id, Application.admin_notes, Application.previous_experience, Application.references)
+    ).all()
+    assert len(rows) == 50
+    assert set(rows) == {(None, None, "", 'Says "hi", twice')}
+
+def test_import_reports_invalid_rows(db):
+    records = [(1, record(1), None), (2, record(2, email="not an email"), None), (3, None, "Invalid JSON: x")]
+    report = bulk.import_applications(db, records)
+
+    assert (report.total, report.inserted, report.failed) == (3, 1, 2)
+    assert [error["row"] for error in report.errors] == [2, 3]
+    assert db.scalar(select(Application.tracking_id)) is not None
+
+@pytest.mark.parametrize("mode", ["flag", "reject"])
+def test_import_reports_territory_conflicts(db, monkeypatch, mode):
+    monkeypatch.setattr(territories, "TERRITORY_CONFLICT_MODE", mode)
+    db.add(Application(tracking_id="DEALER01", business_name="Pune Motors", postal_code="411045", status=ApplicationStatus.APPROVED))
+    db.commit()
+
+    records = [(2, record(2), None), (3, record(3, postal_code="560001"), None)]
+    report = bulk.import_applications(db, records)
+
+    rejected = mode == "reject"
+    assert (report.inserted, report.failed, report.flagged) == ((1, 1, 0) if rejected else (2, 0, 1))
+    assert [(conflict["row"], conflict["rejected"]) for conflict in report.conflicts] == [(2, rejected)]
+    assert "Territory 411" in report.conflicts[0]["conflict"]
+    notes = dict(db.execute(select(Application.postal_code, Application.admin_notes).where(Application.tracking_id != "DEALER01")).all())
+    assert notes == ({"560001": None} if rejected else {"411001": report.conflicts[0]["conflict"], "560001": None})
@@ -0,0 +1,66 @@
+import asyncio
+import json
+import select as selectors
+
+from sqlalchemy import text
+
+from app.database import engine
+from app.services import cache, events
+
+from conftest import requires_postgresql
+
+def test_fill_invalidated_while_loading_is_not_stored():
+    tracking_cache = cache.ResponseCache(cache.LRUCacheBackend())
+
+    async def run():
+        started, release = asyncio.Event(), asyncio.Event()
+
+        async def load():
+            started.set()
+            await release.wait()
+            return b"stale"
+
+        fill = asyncio.ensure_future(tracking_cache.fill("T1", load))
+        await started.wait()
+        tracking_cache.invalidate(["T1"])
+        release.set()
+        assert await fill == b"stale"
+        assert await tracking_cache.get("T1") is None
+
+        async def fresh():
+            return b"fresh"
+
+        assert await tracking_cache.fill("T1", fresh) == b"fresh"
+        assert await tracking_cache.get("T1") == b"fresh"
+
+    asyncio.run(run())
+    assert tracking_cache.stale_fills == 1
+    assert tracking_cache._fills == {}
+
+def test_notified_invalidation_drops_entries(monkeypatch):
+    tracking_cache = cache.ResponseCache(cache.LRUCacheBackend())
+    monkeypatch.setattr(cache, "tracking_cache", tracking_cache)
+    asyncio.run(tracking_cache.set("T1", b"body"))
+
+    listener = events.PostgresListener(events.EventBus(), url="postgresql+asyncpg://localhost/camopa")
+    listener._notified(None, 0, events.EVENTS_CHANNEL, json.dumps({"invalidate": ["T1"]}))
+
+    assert asyncio.run(tracking_cache.get("T1")) is None
+
+@requires_postgresql()
+def test_commit_notifies_stale_tracking_ids(db, monkeypatch):
+    monkeypatch.setattr(events, "EVENTS_BACKEND", "postgresql")
+    monkeypatch.setattr(cache, "tracking_cache", cache.ResponseCache(cache.LRUCacheBackend()))
+    with engine.connect() as listening:
+        listening.execute(text(f"LISTEN {events.EVENTS_CHANNEL}"))
+        listening.commit()
+        connection = listening.connection.driver_connection
+
+        cache.mark_tracking_stale(db, "T2")
+        cache.mark_tracking_stale(db, "T1")
+        db.commit()
+
+        selectors.select([connection], [], [], 5)
+        connection.poll()
+        assert [json.loads(notify.payload) for notify in connection.notifies] == [{"invalidate": ["T1", "T2"]}]
+        listening.execute(text("UNLISTEN *"))
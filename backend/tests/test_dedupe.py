@@ -0,0 +1,64 @@
+import asyncio
+
+import httpx
+
+from app import crud, schemas
+from app.database import ApplicationStatus, async_engine
+from app.main import app
+from app.services import dedupe
+
+def submission(**fields):
+    values = dict(
+        full_name="Asha Rao", email="asha@example.com", phone="+91 98765 43210", business_name="Rao Motors Pvt Ltd",
+        business_type="Retail", registration_number="27AABCU9603R1ZM", street_address="1 Market Road", city="Pune",
+        state="Maharashtra", postal_code="411001", area_of_operation="Pune", expected_monthly_sales=100000.0,
+        previous_experience="", references="",
+    )
+    values.update(fields)
+    return schemas.ApplicationCreate(**values)
+
+def post(application):
+    async def send():
+        try:
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+                return await client.post("/applications/", json=application.dict())
+        finally:
+            await async_engine.dispose()
+    return asyncio.run(send())
+
+def test_duplicate_submission_is_rejected_without_naming_the_match(db):
+    crud.create_application(db, submission(), user_id=None)
+    db.commit()
+
+    # Same PAN (inside a different GSTIN) and phone, written differently
+    response = post(submission(
+        email="someone.else@example.com", phone="09876543210", business_name="Another Name",
+        registration_number="29AABCU9603R1ZX",
+    ))
+    assert response.status_code == 409
+    assert response.json() == {"detail": dedupe.DuplicateApplication.public_message}
+    assert str(dedupe.DuplicateApplication(["phone", "pan"])) == (
+        "An application with the same pan, phone is already in progress"
+    )
+
+def test_flag_mode_notes_the_match(db, monkeypatch):
+    monkeypatch.setattr(dedupe, "DEDUPE_MODE", "flag")
+    first = crud.create_application(db, submission(), user_id=None)
+    second = crud.create_application(db, submission(email="ASHA@example.com ", business_name="Rao Motors"), user_id=None)
+
+    assert second.admin_notes == f"Possible duplicate of #{first.id} (email, gst, name_pincode, pan, phone)"
+
+def test_rejected_applications_do_not_block(db):
+    first = crud.create_application(db, submission(), user_id=None)
+    first.status = ApplicationStatus.REJECTED
+    second = crud.create_application(db, submission(), user_id=None)
+
+    assert second.admin_notes.startswith(f"Possible duplicate of #{first.id} ")
+
+def test_unrelated_submission_is_not_flagged(db):
+    crud.create_application(db, submission(), user_id=None)
+    other = crud.create_application(db, submission(
+        email="ravi@example.com", phone="9123456780", business_name="Ravi Auto", registration_number="ABCDE1234F",
+    ), user_id=None)
+
+    assert other.admin_notes is None
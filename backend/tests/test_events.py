@@ -0,0 +1,103 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app import crud
+from app.database import Application, ApplicationStatus, User, async_engine
+from app.main import app
+from app.routers import applications
+from app.services import events
+
+CHANGES = [ApplicationStatus.UNDER_REVIEW, ApplicationStatus.ADDITIONAL_INFO_REQUIRED, ApplicationStatus.UNDER_REVIEW]
+
+@pytest.fixture
+def history(db, monkeypatch):
+    """An application taken through CHANGES; returns (admin id, application id, status update ids)"""
+    monkeypatch.setattr(events, "event_bus", events.EventBus())
+    admin = User(email="admin@example.com", hashed_password="", is_admin=True)
+    application = Application(tracking_id="E0E00001", full_name="Asha Rao")
+    db.add_all([admin, application])
+    db.commit()
+    update_ids = []
+    for status in CHANGES:
+        crud.update_application_status(db, application.id, status, admin.id)
+        db.commit()
+        update_ids.append(crud.get_status_events(db, "E0E00001")[0]["id"])
+    return admin.id, application.id, update_ids
+
+def run(coroutine):
+    async def run_and_dispose():
+        try:
+            return await asyncio.wait_for(coroutine, 5)
+        finally:
+            await async_engine.dispose()
+    return asyncio.run(run_and_dispose())
+
+async def collect(subscription, backlog, count):
+    received = []
+    async for payload in events.stream(subscription, backlog):
+        received.append(payload)
+        if len(received) == count:
+            return received
+
+def test_replay_after_last_event_id(db, history):
+    _, _, update_ids = history
+
+    (current,) = crud.get_status_events(db, "E0E00001")
+    assert (current["id"], current["status"], current["previous_status"]) == (update_ids[-1], "under_review", None)
+
+    replayed = crud.get_status_events(db, "E0E00001", after_id=update_ids[0])
+    assert [(event["id"], event["previous_status"], event["status"]) for event in replayed] == [
+        (update_ids[1], "under_review", "additional_info_required"),
+        (update_ids[2], "additional_info_required", "under_review"),
+    ]
+    assert crud.get_status_events(db, "E0E00001", after_id=update_ids[-1]) == []
+    assert crud.get_status_events(db, "E0E00404", after_id=0) is None
+
+def test_replay_is_capped_at_the_most_recent_events(db, history, monkeypatch):
+    monkeypatch.setattr(events, "EVENTS_MAX_REPLAY", 2)
+    _, _, update_ids = history
+
+    assert [event["id"] for event in crud.get_status_events(db, "E0E00001", after_id=0)] == update_ids[1:]
+
+def test_resumed_stream_replays_then_goes_live_without_repeats(db, history):
+    admin_id, application_id, update_ids = history
+
+    async def resume():
+        subscription, backlog = await applications._subscribe("E0E00001", update_ids[0])
+        # Committed after subscribing; it also arrives live, after a repeat of
+        # an event the backlog already has
+        events.event_bus.publish("E0E00001", backlog[-1])
+        crud.update_application_status(db, application_id, ApplicationStatus.APPROVED, admin_id)
+        db.commit()
+        try:
+            return await collect(subscription, backlog, 3)
+        finally:
+            events.event_bus.unsubscribe(subscription)
+
+    received = run(resume())
+    assert [event["id"] for event in received][:2] == update_ids[1:]
+    assert received[2]["id"] > update_ids[-1] and received[2]["status"] == "approved"
+    assert events.event_bus.connections == 0
+
+def test_server_sent_events_carry_their_ids(db, history):
+    _, _, update_ids = history
+
+    async def read():
+        subscription, backlog = await applications._subscribe("E0E00001", update_ids[1])
+        subscription.closed = True  # end after the backlog
+        return [chunk async for chunk in applications._server_sent_events(subscription, backlog)]
+
+    chunks = run(read())
+    assert chunks[0] == f"retry: {events.EVENTS_RETRY_MS}\n\n"
+    assert chunks[1].startswith(f"id: {update_ids[2]}\nevent: status\ndata: ")
+
+def test_bad_last_event_id_and_unknown_applications(db, history):
+    async def get(path, headers):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            return await client.get(path, headers=headers)
+
+    bad = run(get("/applications/track/E0E00001/events", {"Last-Event-ID": "latest"}))
+    assert bad.status_code == 400 and bad.json() == {"detail": "Invalid Last-Event-ID"}
+    assert run(get("/applications/track/E0E00404/events", {"Last-Event-ID": "1"})).status_code == 404
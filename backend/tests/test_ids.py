@@ -0,0 +1,56 @@
+import time
+from datetime import datetime, timezone
+
+from app.utils import ids
+
+def test_every_single_mistyped_character_is_caught():
+    tracking_id = ids.new_tracking_id()
+    assert len(tracking_id) == ids.ID_LENGTH and ids.normalize(tracking_id) == tracking_id
+
+    for position in range(ids.ID_LENGTH):
+        for char in ids.ALPHABET:
+            if char != tracking_id[position]:
+                typo = tracking_id[:position] + char + tracking_id[position + 1:]
+                assert ids.normalize(typo) is None
+
+def test_adjacent_swaps_are_caught_except_0_and_z():
+    body = ids.ALPHABET[:16]
+    for a in ids.ALPHABET:
+        for b in ids.ALPHABET:
+            if a == b:
+                continue
+            original = body[:7] + a + b + body[9:]
+            swapped = body[:7] + b + a + body[9:]
+            caught = ids.check_character(original) != ids.check_character(swapped)
+            assert caught == ({a, b} != {"0", "Z"})
+
+def test_typed_ids_are_read_the_crockford_way():
+    body = "01HZ8X2K0M4TQ7VW"
+    tracking_id = body + ids.check_character(body)
+    typed = f" {tracking_id[:6].lower()}-{tracking_id[6:12]}-{tracking_id[12:]} ".replace("1", "l").replace("0", "O")
+
+    assert ids.normalize(typed) == tracking_id
+    assert ids.normalize("3f9a0c1b") == "3F9A0C1B"
+    assert ids.normalize("3F9A0C1") is None
+    assert ids.normalize("") is None and ids.normalize(None) is None
+    assert ids.normalize(body + "U") is None
+
+def test_dealership_ids():
+    dealership_id = ids.new_dealership_id()
+    assert dealership_id.startswith(ids.DEALERSHIP_PREFIX)
+    assert ids.normalize_dealership_id(dealership_id.lower()) == dealership_id
+    assert ids.normalize_dealership_id(dealership_id[len(ids.DEALERSHIP_PREFIX):]) is None
+
+def test_ids_sort_by_creation_time():
+    generated = [ids.new_tracking_id() for _ in range(1000)]
+    assert generated == sorted(generated) and len(set(generated)) == len(generated)
+
+    issued = ids.created_at(generated[0])
+    assert abs(issued - datetime.now(timezone.utc)).total_seconds() < 5
+    assert ids.created_at("3F9A0C1B") is None
+
+def test_sequence_stays_ordered_when_the_clock_steps_back(monkeypatch):
+    generator = ids.IdGenerator()
+    first = generator.new_id()
+    monkeypatch.setattr(time, "time_ns", lambda: 0)
+    assert generator.new_id() > first
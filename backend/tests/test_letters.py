@@ -0,0 +1,113 @@
+import asyncio
+import os
+from datetime import datetime, timedelta
+
+import httpx
+
+from app.database import (
+    Application, ApplicationStatus, ApprovalLetter, ApprovalLetterJob, LetterJobStatus, async_engine,
+)
+from app.main import app
+from app.services import auth, letters
+
+def approved_application(db, tracking_id="E0E00001"):
+    application = Application(
+        tracking_id=tracking_id, full_name="Asha Rao", business_name="Rao Motors", street_address="1 Market Road",
+        city="Pune", state="Maharashtra", postal_code="411001", status=ApplicationStatus.APPROVED,
+    )
+    db.add(application)
+    db.commit()
+    return application.id
+
+def post(paths, admin=False):
+    async def send():
+        if admin:
+            app.dependency_overrides[auth.require_admin] = lambda: auth.CurrentUser(id=1, email="admin@example.com", is_admin=True)
+        try:
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+                return [await client.post(path) for path in paths]
+        finally:
+            app.dependency_overrides.clear()
+            await async_engine.dispose()
+    return asyncio.run(send())
+
+def test_render_needs_an_admin(db):
+    application_id = approved_application(db)
+
+    (response,) = post([f"/approval-letters/{application_id}/render"])
+    assert response.status_code == 401
+    assert db.query(ApprovalLetterJob).count() == 0
+
+def test_render_returns_the_job_in_progress(db):
+    application_id = approved_application(db)
+
+    first, second = post([f"/approval-letters/{application_id}/render"] * 2, admin=True)
+    assert first.status_code == second.status_code == 202
+    assert second.json()["id"] == first.json()["id"]
+    assert first.json()["status"] == LetterJobStatus.QUEUED
+
+    db.get(ApprovalLetterJob, first.json()["id"]).status = LetterJobStatus.COMPLETED
+    db.commit()
+    (third,) = post([f"/approval-letters/{application_id}/render"], admin=True)
+    assert third.json()["id"] != first.json()["id"]
+
+def letter_job(db, tracking_id="E0E00001", **values):
+    values.setdefault("status", LetterJobStatus.QUEUED)
+    job = ApprovalLetterJob(application_id=approved_application(db, tracking_id), **values)
+    db.add(job)
+    db.commit()
+    return job.id
+
+def run(coroutine):
+    async def run_and_dispose():
+        try:
+            return await coroutine
+        finally:
+            await async_engine.dispose()
+    return asyncio.run(run_and_dispose())
+
+def test_job_renders_and_stores_the_letter(db, tmp_path, monkeypatch):
+    monkeypatch.setattr(letters, "LETTERS_DIR", str(tmp_path))
+    job_id = letter_job(db)
+    # No process pool: the render runs on the default executor
+    dispatcher = letters.LetterDispatcher()
+
+    run(dispatcher.run(job_id))
+    job = db.get(ApprovalLetterJob, job_id)
+    letter = db.query(ApprovalLetter).one()
+    assert (job.status, job.attempts) == (LetterJobStatus.COMPLETED, 1)
+    assert job.file_path == letter.file_path and os.path.isfile(letter.file_path)
+    assert letter.file_path == letters.letter_path(letters.digest_of(letter.file_path))
+
+    # Claimed once only
+    run(dispatcher.run(job_id))
+    db.refresh(job)
+    assert job.attempts == 1
+
+def test_failed_render_is_recorded(db, tmp_path, monkeypatch):
+    def fail(letter):
+        raise RuntimeError("no fonts")
+    monkeypatch.setattr(letters, "LETTERS_DIR", str(tmp_path))
+    monkeypatch.setattr(letters, "render_approval_letter", fail)
+    job_id = letter_job(db)
+
+    run(letters.LetterDispatcher().run(job_id))
+    job = db.get(ApprovalLetterJob, job_id)
+    assert (job.status, job.error) == (LetterJobStatus.FAILED, "no fonts")
+    assert db.query(ApprovalLetter).count() == 0
+
+def test_start_requeues_jobs_left_running_past_the_lease(db, monkeypatch):
+    now = datetime.utcnow()
+    stale, fresh = (
+        letter_job(db, tracking_id, status=LetterJobStatus.RUNNING, updated_at=updated_at)
+        for tracking_id, updated_at in (("E0E00001", now - timedelta(seconds=700)), ("E0E00002", now))
+    )
+    dispatcher = letters.LetterDispatcher(lease_seconds=600)
+    submitted = []
+    monkeypatch.setattr(dispatcher, "submit", submitted.extend)
+
+    run(dispatcher.resume_queued())
+    db.expire_all()
+    assert submitted == [stale]
+    assert db.get(ApprovalLetterJob, stale).status == LetterJobStatus.QUEUED
+    assert db.get(ApprovalLetterJob, fresh).status == LetterJobStatus.RUNNING
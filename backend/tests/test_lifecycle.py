@@ -0,0 +1,100 @@
+import json
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import insert, select, text
+
+from app.database import (
+    AnalyticsCounter, Application, ApplicationStatus, ApplicationStatusUpdate, Payment, PaymentStatus, SupportRequest,
+)
+from app.services import analytics, lifecycle, scheduler
+
+from conftest import requires_postgresql
+
+def counters(db):
+    return {
+        (metric, key): (count, round(total, 6))
+        for metric, key, count, total in db.execute(
+            select(AnalyticsCounter.metric, AnalyticsCounter.key, AnalyticsCounter.count, AnalyticsCounter.total)
+        )
+        if count or total
+    }
+
+def test_archiving_applications_uncounts_them(db, tmp_path, monkeypatch):
+    monkeypatch.setattr(lifecycle, "ARCHIVE_DIR", str(tmp_path))
+    old = datetime.utcnow() - timedelta(days=lifecycle.ARCHIVE_APPLICATIONS_AFTER_DAYS + 30)
+    for i, status in enumerate([ApplicationStatus.REJECTED, ApplicationStatus.REJECTED, ApplicationStatus.APPROVED]):
+        application = Application(
+            tracking_id=f"T{i}", full_name=f"Dealer {i}", state="Maharashtra", city="Pune" if i else "Nagpur",
+            status=status, created_at=old - timedelta(days=i), updated_at=old,
+        )
+        db.add(application)
+        db.flush()
+        db.add_all([
+            ApplicationStatusUpdate(
+                application_id=application.id, previous_status=ApplicationStatus.UNDER_REVIEW,
+                new_status=ApplicationStatus.APPROVED, created_at=old - timedelta(hours=5),
+            ),
+            ApplicationStatusUpdate(
+                application_id=application.id, previous_status=ApplicationStatus.APPROVED,
+                new_status=status, created_at=old,
+            ),
+            Payment(
+                application_id=application.id, amount=25000.0 + i, transaction_id=f"TX{i}",
+                status=PaymentStatus.COMPLETED, created_at=old,
+            ),
+        ])
+    db.flush()
+    analytics.rebuild(db)
+    db.commit()
+
+    report = lifecycle.archive(db)
+
+    assert report.applications == 2
+    kept = counters(db)
+    analytics.rebuild(db)
+    assert kept == counters(db)
+    assert kept[(analytics.APPLICATIONS_BY_STATUS, "approved")] == (1, 0.0)
+    assert (analytics.APPLICATIONS_BY_STATUS, "rejected") not in kept
+
+@requires_postgresql()
+def test_new_partition_takes_its_rows_from_the_default(db):
+    # Partitioned as migration 0004 leaves it, but with only the default partition
+    db.execute(text("ALTER TABLE support_requests RENAME TO support_requests_plain"))
+    db.execute(text("CREATE TABLE support_requests (LIKE support_requests_plain INCLUDING DEFAULTS) PARTITION BY RANGE (created_at)"))
+    db.execute(text("CREATE TABLE support_requests_default PARTITION OF support_requests DEFAULT"))
+    this_month = lifecycle.month_start(datetime.utcnow().date())
+    days = [this_month, lifecycle.month_start(this_month, 2), lifecycle.month_start(this_month, 12), date(2000, 1, 1)]
+    db.execute(insert(SupportRequest.__table__), [
+        {"name": "Dealer", "email": "dealer@example.com", "subject": "Help", "message": "Hi", "created_at": day}
+        for day in days
+    ])
+    db.commit()
+
+    assert scheduler.maintain_partitions(db, 0) == lifecycle.PARTITION_MONTHS_AHEAD + 1
+    db.commit()
+
+    placed = dict(db.execute(text("SELECT created_at::date, tableoid::regclass::text FROM support_requests")).all())
+    assert placed == {
+        days[0]: lifecycle.partition_name("support_requests", days[0]),
+        days[1]: lifecycle.partition_name("support_requests", days[1]),
+        days[2]: "support_requests_default",
+        days[3]: "support_requests_default",
+    }
+    assert lifecycle.ensure_partitions(db) == 0
+
+def test_archive_command_takes_an_explicit_zero(db, capsys):
+    from app import cli
+
+    db.add_all([
+        Application(tracking_id="T0", full_name="Dealer", status=ApplicationStatus.REJECTED),
+        SupportRequest(name="Dealer", email="dealer@example.com", subject="Help", message="Hi", is_resolved=True),
+    ])
+    db.commit()
+
+    def archive(*options):
+        assert cli.main(["archive", "--dry-run", *options]) == 0
+        report = json.loads(capsys.readouterr().out)
+        return report["applications"], report["support_requests"]
+
+    assert archive() == (0, 0)
+    assert archive("--applications-after-days", "0", "--support-after-days", "0") == (1, 1)
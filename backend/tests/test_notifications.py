@@ -0,0 +1,111 @@
+import asyncio
+import smtplib
+from datetime import datetime, timedelta
+
+from app import crud
+from app.database import Application, ApplicationStatus, NotificationOutbox, NotificationStatus, User, async_engine
+from app.services import notifications
+
+class FakePool:
+    """Stands in for SMTPPool; `errors` maps a recipient to the error sending to it raises"""
+
+    size = 2
+
+    def __init__(self, errors=None):
+        self.errors = errors or {}
+        self.sent = []
+
+    def send_many(self, messages):
+        self.sent.extend(messages)
+        return [self.errors.get(message["To"]) for message in messages]
+
+    def close(self):
+        pass
+
+def outbox(db, *recipients, **values):
+    rows = [
+        NotificationOutbox(idempotency_key=f"key-{recipient}", recipient=recipient, subject="Status", body="Hello", **values)
+        for recipient in recipients
+    ]
+    db.add_all(rows)
+    db.commit()
+    return {row.recipient: row.id for row in rows}
+
+def run_once(dispatcher):
+    async def run():
+        try:
+            return await dispatcher.run_once()
+        finally:
+            await async_engine.dispose()
+    return asyncio.run(run())
+
+def states(db):
+    db.expire_all()
+    return {row.recipient: row for row in db.query(NotificationOutbox)}
+
+def test_email_is_queued_with_the_status_change(db):
+    admin = User(email="admin@example.com", hashed_password="", is_admin=True)
+    application = Application(tracking_id="E0E00001", full_name="Asha Rao", email="asha@example.com")
+    db.add_all([admin, application])
+    db.commit()
+
+    crud.update_application_status(db, application.id, ApplicationStatus.UNDER_REVIEW, admin.id)
+    db.rollback()
+    assert db.query(NotificationOutbox).count() == 0
+
+    crud.update_application_status(db, application.id, ApplicationStatus.UNDER_REVIEW, admin.id)
+    db.commit()
+    (row,) = db.query(NotificationOutbox).all()
+    assert (row.recipient, row.status, row.attempts) == ("asha@example.com", NotificationStatus.PENDING, 0)
+    assert row.idempotency_key.startswith("status-update-") and "under review" in row.body
+
+def test_outcomes_move_rows_to_sent_pending_or_failed(db):
+    outbox(db, "ok@example.com", "busy@example.com", "gone@example.com")
+    pool = FakePool({
+        "busy@example.com": smtplib.SMTPResponseException(451, b"try again later"),
+        "gone@example.com": notifications.PermanentDeliveryError("550 no such user"),
+    })
+    dispatcher = notifications.OutboxDispatcher(pool=pool)
+
+    assert run_once(dispatcher) == 3
+    rows = states(db)
+    assert (rows["ok@example.com"].status, rows["ok@example.com"].attempts) == (NotificationStatus.SENT, 1)
+    assert rows["ok@example.com"].sent_at is not None and rows["ok@example.com"].error is None
+    busy = rows["busy@example.com"]
+    assert busy.status == NotificationStatus.PENDING and busy.next_attempt_at > datetime.utcnow()
+    assert "try again later" in busy.error
+    assert (rows["gone@example.com"].status, rows["gone@example.com"].error) == (NotificationStatus.FAILED, "550 no such user")
+
+    # Nothing due until the backoff has passed
+    assert run_once(dispatcher) == 0
+
+def test_temporary_errors_fail_after_the_last_attempt(db):
+    outbox(db, "busy@example.com")
+    pool = FakePool({"busy@example.com": smtplib.SMTPServerDisconnected("closed")})
+    dispatcher = notifications.OutboxDispatcher(pool=pool, max_attempts=2)
+
+    for attempt, status in [(1, NotificationStatus.PENDING), (2, NotificationStatus.FAILED)]:
+        db.query(NotificationOutbox).update({"next_attempt_at": datetime.utcnow() - timedelta(seconds=1)})
+        db.commit()
+        assert run_once(dispatcher) == 1
+        row = states(db)["busy@example.com"]
+        assert (row.attempts, row.status) == (attempt, status)
+    # Both attempts were the same email
+    assert len({message["Message-ID"] for message in pool.sent}) == 1
+
+def test_claims_of_a_dead_dispatcher_expire(db):
+    past, future = datetime.utcnow() - timedelta(seconds=1), datetime.utcnow() + timedelta(seconds=60)
+    outbox(db, "abandoned@example.com", status=NotificationStatus.SENDING, attempts=1, next_attempt_at=past)
+    outbox(db, "in-flight@example.com", status=NotificationStatus.SENDING, attempts=1, next_attempt_at=future)
+    pool = FakePool()
+
+    assert run_once(notifications.OutboxDispatcher(pool=pool)) == 1
+    rows = states(db)
+    assert [message["To"] for message in pool.sent] == ["abandoned@example.com"]
+    assert (rows["abandoned@example.com"].status, rows["abandoned@example.com"].attempts) == (NotificationStatus.SENT, 2)
+    assert rows["in-flight@example.com"].status == NotificationStatus.SENDING
+
+def test_retry_delay_backs_off_up_to_the_maximum():
+    for attempts in range(1, 12):
+        ceiling = min(notifications.OUTBOX_RETRY_MAX, notifications.OUTBOX_RETRY_BASE * 2 ** (attempts - 1))
+        assert ceiling / 2 <= notifications.retry_delay(attempts) <= ceiling
@@ -0,0 +1,71 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import httpx
+import pytest
+
+from app import crud
+from app.database import Application, ApplicationStatus, async_engine
+from app.main import app
+from app.utils import pagination
+
+def seed(db, count):
+    # Three applications per timestamp, so pages split ties on id
+    start = datetime(2026, 1, 1)
+    for i in range(count):
+        db.add(Application(
+            tracking_id=f"P{i:07d}", full_name=f"Dealer {i}", city="Pune" if i % 2 else "Nagpur",
+            status=ApplicationStatus.SUBMITTED, created_at=start + timedelta(minutes=i // 3),
+        ))
+    db.commit()
+
+def walk(db, limit, **filters):
+    pages, cursor = [], None
+    while True:
+        rows, cursor = crud.get_applications_page(db, cursor=cursor, limit=limit, **filters)
+        pages.append([row.tracking_id for row in rows])
+        if cursor is None:
+            return pages
+
+def newest_first(db, **filters):
+    rows = db.query(Application).filter_by(**filters).all()
+    return [row.tracking_id for row in sorted(rows, key=lambda row: (row.created_at, row.id), reverse=True)]
+
+def test_pages_cover_every_row_once_newest_first(db):
+    seed(db, 25)
+
+    pages = walk(db, 10)
+    assert [len(page) for page in pages] == [10, 10, 5]
+    assert sum(pages, []) == newest_first(db)
+
+    pages = walk(db, 4, city="Pune")
+    assert sum(pages, []) == newest_first(db, city="Pune")
+    # An exact multiple of the page size ends without an empty page
+    assert [len(page) for page in walk(db, 5)] == [5] * 5
+
+def test_rows_added_meanwhile_do_not_shift_later_pages(db):
+    seed(db, 12)
+    expected = newest_first(db)
+
+    first, cursor = crud.get_applications_page(db, limit=6)
+    db.add(Application(tracking_id="PNEWEST0", full_name="Newest", created_at=datetime(2027, 1, 1)))
+    db.commit()
+    rest, _ = crud.get_applications_page(db, cursor=cursor, limit=6)
+    assert [row.tracking_id for row in first + rest] == expected
+
+def test_cursor_round_trip_and_malformed_cursors(db):
+    created_at = datetime(2026, 3, 4, 5, 6, 7, 890)
+    cursor = pagination.encode_cursor(created_at, 42)
+    assert "=" not in cursor and pagination.decode_cursor(cursor) == (created_at, 42)
+    for bad in ("not-a-cursor", pagination.encode_cursor(created_at, 42)[:-3], ""):
+        with pytest.raises(ValueError):
+            pagination.decode_cursor(bad)
+
+    async def get():
+        try:
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+                return await client.get("/applications/", params={"cursor": "not-a-cursor"})
+        finally:
+            await async_engine.dispose()
+    response = asyncio.run(get())
+    assert response.status_code == 400 and response.json() == {"detail": "Invalid pagination cursor"}
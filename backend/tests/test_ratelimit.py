@@ -0,0 +1,67 @@
+import asyncio
+import re
+
+from app.services import ratelimit
+
+def websocket_scope(path, extensions=None):
+    return {"type": "websocket", "path": path, "client": ("203.0.113.7", 50000), "headers": [], "extensions": extensions or {}}
+
+def connect(middleware, scope):
+    """Messages the middleware sends for one connection, and whether it reached the app"""
+    sent, reached = [], []
+
+    async def app(scope, receive, send):
+        reached.append(scope["path"])
+
+    async def receive():
+        return {"type": "websocket.connect"}
+
+    async def send(message):
+        sent.append(message)
+
+    middleware.app = app
+    asyncio.run(middleware(scope, receive, send))
+    return sent, bool(reached)
+
+def test_websocket_connections_are_limited_per_ip():
+    rule = ratelimit.Rule("streams", "WEBSOCKET", re.compile(r"^/applications/track/[^/]+/ws$"), "ip", 2, 60)
+    middleware = ratelimit.RateLimitMiddleware(None, backend=ratelimit.MemoryBucketBackend(), rules=[rule])
+    path = "/applications/track/E0E00001/ws"
+
+    assert connect(middleware, websocket_scope(path)) == ([], True)
+    assert connect(middleware, websocket_scope(path)) == ([], True)
+
+    sent, reached = connect(middleware, websocket_scope(path, {"websocket.http.response": {}}))
+    assert not reached
+    assert sent[0]["type"] == "websocket.http.response.start" and sent[0]["status"] == 429
+    assert (b"retry-after", b"30") in sent[0]["headers"]
+
+    sent, reached = connect(middleware, websocket_scope(path))
+    assert (sent, reached) == ([{"type": "websocket.close", "code": 1008}], False)
+
+def test_http_rules_do_not_match_websockets():
+    middleware = ratelimit.RateLimitMiddleware(None, backend=ratelimit.MemoryBucketBackend())
+    limit = next(rule for rule in ratelimit.RULES if rule.name == "track_per_ip").burst
+
+    for _ in range(limit + 1):
+        assert connect(middleware, websocket_scope("/applications/track/E0E00001")) == ([], True)
+
+def test_rejection_gives_back_the_tokens_other_rules_took():
+    track = r"^/applications/track/(?P<tracking_id>[^/]+)$"
+    rules = [
+        ratelimit.Rule("per_ip", "GET", re.compile(track), "ip", 3, 60),
+        ratelimit.Rule("per_id", "GET", re.compile(track), "tracking_id", 1, 60),
+    ]
+    middleware = ratelimit.RateLimitMiddleware(None, backend=ratelimit.MemoryBucketBackend(), rules=rules)
+
+    def poll(tracking_id):
+        scope = {"type": "http", "method": "GET", "path": f"/applications/track/{tracking_id}",
+                 "client": ("203.0.113.7", 50000), "headers": []}
+        return connect(middleware, scope)[1]
+
+    assert poll("E0E00001")
+    # Turned away for the ID, twice, without spending the IP's tokens
+    assert not poll("E0E00001") and not poll("e0e00001")
+    assert poll("E0E00002") and poll("E0E00003")
+    assert not poll("E0E00004")
+    assert ratelimit.metrics["rejected:per_id"] >= 2 and ratelimit.metrics["rejected:per_ip"] >= 1
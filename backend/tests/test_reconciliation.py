@@ -0,0 +1,103 @@
+import io
+from datetime import datetime
+
+import pytest
+
+from app.database import Application, Payment, PaymentStatus
+from app.services import reconciliation
+
+STATEMENT = """Txn Date,Description,UTR No.,Credit
+05/03/2026,UPI from Asha,4123-4567-8901,"₹5,000.00 Cr"
+05/03/2026,UPI from Ravi,412345678902,2600.00
+06/03/2026,UPI from Meena,412345678903,1000
+06/03/2026,UPI from John,412345678905,750
+07/03/2026,UPI from John again,412345678905,750
+07/03/2026,Already settled,412345678906,300
+07/03/2026,Charges,412345678907,-100
+08/03/2026,Garbled,412345678908,abc
+08/03/2026,Cash deposit,,2000
+"""
+
+def seed(db):
+    application = Application(tracking_id="E0E00001", full_name="Asha Rao")
+    db.add(application)
+    db.flush()
+    payments = {}
+    for name, reference, amount, status in [
+        ("matched", "412345678901", 5000.0, PaymentStatus.PENDING),
+        ("wrong_amount", "412345678902", 2500.0, PaymentStatus.PENDING),
+        ("shared_a", "412345678903", 1000.0, PaymentStatus.PENDING),
+        ("shared_b", "412345678903", 1000.0, PaymentStatus.PENDING),
+        ("claimed_twice", "412345678905", 750.0, PaymentStatus.PENDING),
+        ("settled", "412345678906", 300.0, PaymentStatus.COMPLETED),
+    ]:
+        payments[name] = Payment(
+            application_id=application.id, amount=amount, transaction_id=f"TXN-{name}", payment_method="UPI",
+            status=status, upi_reference=reference,
+        )
+    db.add_all(payments.values())
+    db.commit()
+    return {name: payment.id for name, payment in payments.items()}
+
+def statuses(db, payment_ids):
+    db.expire_all()
+    return {name: db.get(Payment, payment_id).status for name, payment_id in payment_ids.items()}
+
+def reasons(entries):
+    return sorted((entry["row"], entry["reason"]) for entry in entries)
+
+def test_statement_lines_are_classified(db):
+    payment_ids = seed(db)
+    before = statuses(db, payment_ids)
+
+    dry = reconciliation.reconcile(db, reconciliation.iter_statement(io.BytesIO(STATEMENT.encode()), "csv"), dry_run=True)
+    assert (dry.matched, dry.applied) == (1, 0)
+    assert statuses(db, payment_ids) == before
+
+    report = reconciliation.reconcile(db, reconciliation.iter_statement(io.BytesIO(STATEMENT.encode()), "csv"))
+    assert (report.total, report.matched, report.applied, report.ignored) == (9, 1, 1, 1)
+    assert (report.unmatched, report.ambiguous, report.failed) == (3, 3, 1)
+    assert reasons(report.unmatched_entries) == [(3, "amount_mismatch"), (7, "unknown_reference"), (10, "missing_reference")]
+    assert reasons(report.ambiguous_entries) == [(4, "multiple_payments"), (5, "duplicate_entry"), (6, "duplicate_entry")]
+    assert report.errors == [{"row": 9, "error": "Invalid amount 'abc'"}]
+
+    after = statuses(db, payment_ids)
+    assert after.pop("matched") == PaymentStatus.COMPLETED
+    assert after == {name: status for name, status in before.items() if name != "matched"}
+    assert db.get(Payment, payment_ids["matched"]).payment_date == datetime(2026, 3, 5)
+
+def test_ofx_references_come_from_refnum_or_the_memo(db):
+    payment_ids = seed(db)
+    statement = """OFXHEADER:100
+<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><BANKTRANLIST>
+<STMTTRN><TRNTYPE>CREDIT<DTPOSTED>20260305101500[+5:30:IST]<TRNAMT>5000.00<FITID>F1<MEMO>UPI/412345678901/asha@okbank</STMTTRN>
+<STMTTRN><TRNTYPE>CREDIT<DTPOSTED>20260305<TRNAMT>750.00<FITID>F2<REFNUM>412345678905</STMTTRN>
+<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>20260305<TRNAMT>100.00<FITID>F3</STMTTRN>
+</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>
+"""
+
+    report = reconciliation.reconcile(db, reconciliation.iter_statement(io.BytesIO(statement.encode()), "ofx"))
+    assert (report.total, report.applied, report.ignored) == (3, 2, 1)
+    db.expire_all()
+    assert db.get(Payment, payment_ids["matched"]).payment_date == datetime(2026, 3, 5, 10, 15)
+    assert db.get(Payment, payment_ids["claimed_twice"]).status == PaymentStatus.COMPLETED
+
+def test_payments_changed_since_matching_are_left_alone(db):
+    payment_ids = seed(db)
+    entries = reconciliation.iter_statement(io.BytesIO(STATEMENT.encode()), "csv")
+    report = reconciliation.ReconciliationReport()
+    matches = reconciliation.match_statement(entries, *reconciliation.build_index(db), report)
+
+    # Failed by the expiry job meanwhile
+    db.get(Payment, payment_ids["matched"]).status = PaymentStatus.FAILED
+    db.commit()
+    reconciliation.apply_matches(db, matches, report)
+    db.commit()
+    assert report.applied == 0
+    assert (2, "no_longer_pending") in reasons(report.ambiguous_entries)
+    assert statuses(db, {"matched": payment_ids["matched"]}) == {"matched": PaymentStatus.FAILED}
+
+def test_statement_without_a_reference_column_is_refused():
+    statement = io.BytesIO(b"Date,Narration,Amount\n05/03/2026,UPI,100\n")
+    with pytest.raises(ValueError, match="reference column"):
+        list(reconciliation.iter_statement(statement, "csv"))
@@ -0,0 +1,94 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import update
+
+from app.database import JobRunStatus, ScheduledJob, engine
+from app.services import scheduler
+from conftest import requires_postgresql
+
+def counting_job(name="count", items=5, batch_size=2, **options):
+    """A job with `items` to process; its batches are recorded in .batches"""
+    remaining = [items]
+    batches = []
+
+    def run_batch(db, batch_size):
+        count = min(batch_size, remaining[0])
+        remaining[0] -= count
+        batches.append(count)
+        return count
+
+    job = scheduler.Job(name, 3600, run_batch, backlog=lambda db: remaining[0], batch_size=batch_size, **options)
+    job.batches = batches
+    return job
+
+def row(db, name):
+    db.expire_all()
+    return db.query(ScheduledJob).filter_by(name=name).one()
+
+def test_due_job_runs_in_batches_and_is_claimed_once(db):
+    job = counting_job()
+    jobs = scheduler.Scheduler([job], lease_seconds=600)
+
+    assert jobs.due_jobs() == ["count"]
+    outcome = jobs.run_job(job)
+    assert (outcome["status"], outcome["processed"], outcome["batches"], outcome["backlog"]) == ("completed", 5, 3, 0)
+    assert job.batches == [2, 2, 1]
+
+    state = row(db, "count")
+    assert (state.status, state.runs, state.failures, state.last_processed) == (JobRunStatus.COMPLETED, 1, 0, 5)
+    assert state.next_run_at - state.last_started_at == timedelta(seconds=3600)
+    # Not due again until the interval has passed, unless forced
+    assert jobs.due_jobs() == [] and jobs.run_job(job) is None
+    assert jobs.run_job(job, force=True)["status"] == "completed"
+
+def test_runtime_cap_leaves_the_job_due(db):
+    job = counting_job(items=10, max_runtime=0)
+    jobs = scheduler.Scheduler([job])
+    jobs.due_jobs()
+
+    outcome = jobs.run_job(job)
+    assert (outcome["capped"], outcome["processed"], outcome["backlog"]) == (True, 2, 8)
+    assert jobs.due_jobs() == ["count"]
+
+def test_failed_run_is_recorded(db):
+    def fail(db, batch_size):
+        raise RuntimeError("disk full")
+    job = scheduler.Job("fail", 60, fail)
+    jobs = scheduler.Scheduler([job])
+    jobs.due_jobs()
+
+    assert jobs.run_job(job)["error"] == "RuntimeError: disk full"
+    state = row(db, "fail")
+    assert (state.status, state.failures, state.last_error) == (JobRunStatus.FAILED, 1, "RuntimeError: disk full")
+
+@pytest.mark.skipif(engine.dialect.name == "postgresql", reason="PostgreSQL leads jobs with an advisory lock instead")
+def test_running_job_is_taken_over_after_the_lease(db):
+    job = counting_job()
+    jobs = scheduler.Scheduler([job], lease_seconds=600)
+    jobs.due_jobs()
+
+    def running_since(seconds_ago):
+        now = datetime.utcnow()
+        db.execute(
+            update(ScheduledJob)
+            .where(ScheduledJob.name == "count")
+            .values(status=JobRunStatus.RUNNING, last_started_at=now - timedelta(seconds=seconds_ago), next_run_at=now)
+        )
+        db.commit()
+
+    running_since(60)
+    assert jobs.run_job(job) is None and jobs.run_job(job, force=True) is None
+    running_since(601)
+    assert jobs.run_job(job)["status"] == "completed"
+
+@requires_postgresql()
+def test_advisory_lock_leads_the_job(db):
+    job = counting_job()
+    jobs = scheduler.Scheduler([job])
+    jobs.due_jobs()
+
+    with scheduler.job_lock("count") as locked:
+        assert locked
+        assert jobs.run_job(job) is None
+    assert jobs.run_job(job)["status"] == "completed"
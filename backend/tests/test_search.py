@@ -0,0 +1,69 @@
+import pytest
+
+from app.database import Application, ApplicationStatus, engine
+from app.services import search
+
+def seed(db):
+    rows = [
+        ("Asha Rao", "Rao Motors", "Pune", "27AABCU9603R1ZM", "9876543210", ApplicationStatus.UNDER_REVIEW),
+        ("Ravi Kumar", "Kumar Motors", "Pune", "29AAGCR4375J1ZU", "9123456780", ApplicationStatus.APPROVED),
+        ("Meena Rao", "Sunrise Traders", "Nagpur", "ABCDE1234F", "9988776655", ApplicationStatus.SUBMITTED),
+        ("John D'Souza", "Coastal Beverages", "Panaji", "30AAACC1206D1ZT", "9012345678", ApplicationStatus.REJECTED),
+    ]
+    for i, (full_name, business_name, city, registration_number, phone, status) in enumerate(rows):
+        db.add(Application(
+            tracking_id=f"S{i:07d}", full_name=full_name, business_name=business_name, city=city,
+            registration_number=registration_number, phone=phone, status=status,
+        ))
+    db.commit()
+
+def names(results):
+    rows, _, approximate = results
+    return [row.business_name for row in rows], approximate
+
+def test_every_term_must_match_and_better_matches_rank_first(db):
+    seed(db)
+
+    assert names(search.search_applications(db, "Rao")) == (["Rao Motors", "Sunrise Traders"], False)
+    assert names(search.search_applications(db, "motors pune")) in [
+        (["Kumar Motors", "Rao Motors"], False), (["Rao Motors", "Kumar Motors"], False),
+    ]
+    assert names(search.search_applications(db, "rao motors")) == (["Rao Motors"], False)
+
+def test_prefixes_of_numbers_and_words_match(db):
+    seed(db)
+
+    assert names(search.search_applications(db, "98765")) == (["Rao Motors"], False)
+    assert names(search.search_applications(db, "27AABCU")) == (["Rao Motors"], False)
+    assert names(search.search_applications(db, "coast")) == (["Coastal Beverages"], False)
+
+def test_status_filter_and_pages(db):
+    seed(db)
+
+    assert names(search.search_applications(db, "motors", status=ApplicationStatus.APPROVED)) == (["Kumar Motors"], False)
+    first, next_offset, _ = search.search_applications(db, "motors", limit=1)
+    second, last_offset, _ = search.search_applications(db, "motors", limit=1, offset=next_offset)
+    assert next_offset == 1 and last_offset is None
+    assert {first[0].business_name, second[0].business_name} == {"Rao Motors", "Kumar Motors"}
+    # Past the last strict page: still strict, just empty
+    assert search.search_applications(db, "motors", offset=5) == ([], None, False)
+
+def test_index_follows_edits(db):
+    seed(db)
+    application = db.query(Application).filter_by(business_name="Sunrise Traders").one()
+    application.business_name = "Sunset Distributors"
+    db.commit()
+
+    assert names(search.search_applications(db, "sunset")) == (["Sunset Distributors"], False)
+    # At most an approximate match now
+    matches, approximate = names(search.search_applications(db, "sunrise"))
+    assert approximate or matches == []
+
+def test_misspellings_fall_back_to_approximate_matches(db):
+    if engine.dialect.name == "postgresql" and not search._has_trigram(db):
+        pytest.skip("needs pg_trgm for approximate matches")
+    seed(db)
+
+    matches, approximate = names(search.search_applications(db, "Coastel Beverges"))
+    assert approximate and matches[0] == "Coastal Beverages"
+    assert names(search.search_applications(db, "Coastal")) == (["Coastal Beverages"], False)
@@ -0,0 +1,82 @@
+from app.database import Application, ApplicationStatus, ApplicationStatusUpdate
+from app.services import territories
+
+def approved_dealer(tracking_id, postal_code):
+    return Application(
+        tracking_id=tracking_id, business_name=f"{tracking_id} Motors", city="Pune", postal_code=postal_code,
+        status=ApplicationStatus.APPROVED,
+    )
+
+def test_india_post_directory(db, tmp_path):
+    directory = tmp_path / "pincodes.csv"
+    directory.write_text(
+        "officename,pincode,districtname,statename\n"
+        "Shivajinagar S.O,411005,PUNE,MAHARASHTRA\n"
+        "Aundh S.O,411007,PUNE,MAHARASHTRA\n"
+        "Fort S.O,400001,MUMBAI,MAHARASHTRA\n"
+    )
+    index = territories.TerritoryIndex(data_path=str(directory))
+    db.add(approved_dealer("DEALER01", "411005"))
+    db.commit()
+    index.load(db)
+
+    coverage = index.coverage("411007")
+    assert (coverage["territory"], coverage["territory_name"], coverage["place"]) == ("411", "Pune", "Pune")
+    assert coverage["covered"] and [dealer["tracking_id"] for dealer in coverage["dealers"]] == ["DEALER01"]
+    assert index.coverage("400001")["covered"] is False
+    assert index.coverage("560001") is None
+
+def approve(db, application):
+    application.status = ApplicationStatus.APPROVED
+    db.add(ApplicationStatusUpdate(
+        application=application, previous_status=ApplicationStatus.SUBMITTED, new_status=ApplicationStatus.APPROVED,
+    ))
+
+def test_refresh_applies_approvals_and_revocations(db):
+    index = territories.TerritoryIndex()
+    first = approved_dealer("DEALER01", "411005")
+    second = approved_dealer("DEALER02", "411007")
+    second.status = ApplicationStatus.SUBMITTED
+    db.add_all([first, second])
+    db.commit()
+    index.load(db)
+    assert [dealer["tracking_id"] for dealer in index.coverage("411005")["dealers"]] == ["DEALER01"]
+
+    approve(db, second)
+    first.status = ApplicationStatus.REJECTED
+    db.add(ApplicationStatusUpdate(
+        application=first, previous_status=ApplicationStatus.APPROVED, new_status=ApplicationStatus.REJECTED,
+    ))
+    db.commit()
+    assert index.refresh(db) == 2
+    assert [dealer["tracking_id"] for dealer in index.coverage("411005")["dealers"]] == ["DEALER02"]
+    assert index.refresh(db) == 0
+
+def test_refresh_keeps_approvals_committed_while_it_reads(db, monkeypatch):
+    index = territories.TerritoryIndex()
+    late = approved_dealer("DEALER01", "411005")
+    late.status = ApplicationStatus.SUBMITTED
+    db.add(late)
+    db.commit()
+    index.load(db)
+
+    execute = db.execute
+    def execute_then_approve(*args, **kwargs):
+        # Another worker's approval lands between refresh's queries
+        result = execute(*args, **kwargs)
+        monkeypatch.setattr(db, "execute", execute)
+        approve(db, late)
+        db.flush()
+        return result
+    monkeypatch.setattr(db, "execute", execute_then_approve)
+    assert index.refresh(db) == 0
+    assert index.refresh(db) == 1
+    assert index.coverage("411005")["covered"]
+
+def test_territory_falls_back_to_the_pincode_region():
+    trie = territories.PincodeTrie()
+    trie.insert(territories.Region("411005", "Shivajinagar", "Maharashtra"))
+    index = territories.TerritoryIndex()
+    index._regions = trie
+
+    assert index.coverage("411005")["territory_name"] == "Shivajinagar"
@@ -1,4 +1,4 @@
-import React, { useState } from 'react';
+import React, { useEffect, useState } from 'react';
 import { 
   Box, 
   Typography, 
@@ -28,8 +28,21 @@ const ApplicationTracker = ({ isEmbedded = false }) => {
   const [application, setApplication] = useState(null);
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState('');
+  const [trackedId, setTrackedId] = useState(null);
   const isMobile = window.innerWidth <= 768;
 
+  // Follow status changes pushed by the server instead of polling. The
+  // browser reconnects on its own and resumes from the last event it saw
+  useEffect(() => {
+    if (!trackedId) return undefined;
+    const source = new EventSource(`${process.env.REACT_APP_API_URL}/applications/track/${trackedId}/events`);
+    source.addEventListener('status', (event) => {
+      const { status } = JSON.parse(event.data);
+      setApplication((current) => (current ? { ...current, status } : current));
+    });
+    return () => source.close();
+  }, [trackedId]);
+
   const handleTrackingIdChange = (e) => {
     setTrackingId(e.target.value);
   };
@@ -45,9 +58,11 @@ const ApplicationTracker = ({ isEmbedded = false }) => {
     try {
       const response = await axios.get(`${process.env.REACT_APP_API_URL}/applications/track/${trackingId}`);
       setApplication(response.data);
+      setTrackedId(trackingId.trim());
     } catch (err) {
       setError(err.response?.data?.detail || 'Application not found. Please check your tracking ID.');
       setApplication(null);
+      setTrackedId(null);
     } finally {
       setLoading(false);
     }